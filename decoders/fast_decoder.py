@@ -6,6 +6,7 @@
 """
 
 import os
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Optional, Tuple
 
@@ -17,6 +18,8 @@ class FastXLogDecoder:
 
     def __init__(self, max_workers=4):
         self.max_workers = max_workers
+        # 每个文件的解码统计 {filepath: {'bytes', 'lines', 'decode_time'}}，供性能分析面板使用
+        self.file_stats = {}
 
     def decode_single_file(self, filepath: str) -> Tuple[str, List[str], Optional[str]]:
         """解码单个文件"""
@@ -26,6 +29,7 @@ class FastXLogDecoder:
                 return (filepath, [], "不支持的文件格式，只能解析.xlog文件")
 
             output_file = filepath + ".log"
+            started = time.perf_counter()
 
             # 使用原始解码器确保准确性
             ParseFile(filepath, output_file)
@@ -36,6 +40,11 @@ class FastXLogDecoder:
                 with open(output_file, 'r', encoding='utf-8', errors='ignore') as f:
                     results = f.readlines()
 
+            self.file_stats[filepath] = {
+                'bytes': os.path.getsize(filepath),
+                'lines': len(results),
+                'decode_time': time.perf_counter() - started
+            }
             return (filepath, results, None)
         except Exception as e:
             return (filepath, [], str(e))
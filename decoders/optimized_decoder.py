@@ -5,12 +5,14 @@
 优化的Mars xlog解码器 - 支持多线程并行处理
 """
 
+import mmap
 import os
 import struct
 import threading
+import time
 import zlib
 from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from typing import Iterator, List, Tuple
 
 # 从原始解码器导入常量
 MAGIC_NO_COMPRESS_START = 0x03
@@ -29,6 +31,8 @@ class OptimizedXLogDecoder:
         self.max_workers = max_workers
         self.lastseq = 0
         self.seq_lock = threading.Lock()
+        # 最近一次 iter_blocks() 的统计（块数、解压耗时、压缩前后字节数）
+        self.block_stats = {'blocks': 0, 'decompress_time': 0.0, 'bytes_in': 0, 'bytes_out': 0}
 
     def is_good_log_buffer(self, buffer, offset, count):
         """验证日志缓冲区"""
@@ -135,27 +139,9 @@ class OptimizedXLogDecoder:
             tmpbuffer = buffer[offset+header_len:offset+header_len+length]
 
             try:
-                # 解压缩
-                if magic_start in [MAGIC_COMPRESS_START, MAGIC_COMPRESS_NO_CRYPT_START]:
-                    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
-                    tmpbuffer = decompressor.decompress(bytes(tmpbuffer))
-                elif magic_start == MAGIC_COMPRESS_START1:
-                    decompress_data = bytearray()
-                    tmp = bytearray(tmpbuffer)
-                    while len(tmp) > 0:
-                        single_log_len = struct.unpack_from("H", memoryview(tmp[0:2]))[0]
-                        decompress_data.extend(tmp[2:single_log_len+2])
-                        tmp = tmp[single_log_len+2:]
-                    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
-                    tmpbuffer = decompressor.decompress(bytes(decompress_data))
-
-                # 转换为字符串
-                if isinstance(tmpbuffer, bytes):
-                    results.append(tmpbuffer.decode('utf-8', errors='ignore'))
-                elif isinstance(tmpbuffer, bytearray):
-                    results.append(tmpbuffer.decode('utf-8', errors='ignore'))
-                else:
-                    results.append(str(tmpbuffer))
+                # 解压缩并转换为字符串
+                tmpbuffer = self.decompress_payload(magic_start, tmpbuffer)
+                results.append(tmpbuffer.decode('utf-8', errors='ignore'))
 
             except Exception as e:
                 results.append(f"[F]decompress error: {e}\n")
@@ -164,6 +150,101 @@ class OptimizedXLogDecoder:
 
         return results
 
+    @staticmethod
+    def decompress_payload(magic_start, payload) -> bytes:
+        """按magic类型解压日志块负载，返回原始字节"""
+        if magic_start in [MAGIC_COMPRESS_START, MAGIC_COMPRESS_NO_CRYPT_START]:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return decompressor.decompress(bytes(payload))
+        elif magic_start == MAGIC_COMPRESS_START1:
+            # 分段压缩：每段前2字节为段长度
+            decompress_data = bytearray()
+            view = memoryview(payload)
+            pos = 0
+            while pos < len(view):
+                single_log_len = struct.unpack_from("H", view, pos)[0]
+                decompress_data.extend(view[pos+2:pos+2+single_log_len])
+                pos += single_log_len + 2
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return decompressor.decompress(bytes(decompress_data))
+        return bytes(payload)
+
+    def iter_blocks(self, filepath: str) -> Iterator[Tuple[bytes, int, int]]:
+        """
+        逐块解码xlog文件（流式）
+
+        不生成临时.log文件，每解出一个日志块就产出其原始字节，
+        调用方可以边解码边解析，并按真实的文件偏移计算进度。
+        解码错误与序列号缺失以 "[F]..." 文本行插入输出，与其他解码器一致；
+        上一块未以换行结束时先换行，标记不会拼接到未完成的日志行上。
+
+        Yields:
+            (解压后的字节, 该块在xlog文件中的结束偏移, 文件总大小)
+        """
+        file_size = os.path.getsize(filepath)
+        stats = self.block_stats = {'blocks': 0, 'decompress_time': 0.0, 'bytes_in': 0, 'bytes_out': 0}
+        if file_size == 0:
+            return
+
+        with open(filepath, "rb") as fp:
+            buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                offset = self.get_log_start_pos(buffer, 2)
+                if offset == -1:
+                    return
+
+                lastseq = 0
+                at_line_start = True
+                while offset < file_size:
+                    if not self.is_good_log_buffer(buffer, offset, 1)[0]:
+                        fixpos = self.get_log_start_pos(buffer[offset:], 1)
+                        if fixpos == -1:
+                            break
+                        yield (self._marker_line(f"[F]decode error at offset {offset}", at_line_start),
+                               offset + fixpos, file_size)
+                        at_line_start = True
+                        offset += fixpos
+
+                    magic_start = buffer[offset]
+                    if magic_start in [MAGIC_NO_COMPRESS_START, MAGIC_COMPRESS_START, MAGIC_COMPRESS_START1]:
+                        crypt_key_len = 4
+                    else:
+                        crypt_key_len = 64
+
+                    header_len = 1 + 2 + 1 + 1 + 4 + crypt_key_len
+                    length = struct.unpack_from("I", buffer, offset+header_len-4-crypt_key_len)[0]
+                    seq = struct.unpack_from("H", buffer, offset+header_len-4-crypt_key_len-2-2)[0]
+
+                    if seq != 0 and seq != 1 and lastseq != 0 and seq != (lastseq + 1):
+                        yield (self._marker_line(f"[F]log seq:{lastseq+1}-{seq-1} is missing", at_line_start),
+                               offset, file_size)
+                        at_line_start = True
+                    if seq != 0:
+                        lastseq = seq
+
+                    end = offset + header_len + length + 1
+                    started = time.perf_counter()
+                    try:
+                        data = self.decompress_payload(magic_start, buffer[offset+header_len:offset+header_len+length])
+                    except Exception as e:
+                        data = self._marker_line(f"[F]decompress error: {e}", at_line_start)
+                    stats['decompress_time'] += time.perf_counter() - started
+                    stats['blocks'] += 1
+                    stats['bytes_in'] += length
+                    stats['bytes_out'] += len(data)
+
+                    offset = end
+                    if data:
+                        at_line_start = data.endswith(b"\n")
+                    yield (data, offset, file_size)
+            finally:
+                buffer.close()
+
+    @staticmethod
+    def _marker_line(text: str, at_line_start: bool) -> bytes:
+        """生成 "[F]..." 标记行（前一块留有未完成的行时先换行）"""
+        return (text if at_line_start else "\n" + text).encode() + b"\n"
+
     def decode_file_parallel(self, filepath: str, progress_callback=None) -> List[str]:
         """并行解码文件"""
         if not os.path.exists(filepath):
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+合成Mars xlog写入器 - 生成可重复的测试/基准数据
+
+支持的magic（均为本仓库解码器可解的无加密格式）：
+- MAGIC_NO_COMPRESS_START (0x03)          不压缩，4字节key
+- MAGIC_COMPRESS_START (0x04)             整块压缩，4字节key
+- MAGIC_COMPRESS_START1 (0x05)            分段压缩（每段2字节长度前缀），4字节key
+- MAGIC_NO_COMPRESS_NO_CRYPT_START (0x08) 不压缩，64字节key
+- MAGIC_COMPRESS_NO_CRYPT_START (0x09)    整块压缩，64字节key
+
+加密格式（0x06/0x07）需要ECDH密钥解密，解码器不支持，因此不生成。
+
+可注入两类异常：
+- 序列号缺失：跳过若干seq，解码器输出 "[F]...log seq:a-b is missing"
+- 损坏数据：在块之间插入垃圾字节，解码器需要重新定位块起点
+"""
+
+import datetime
+import random
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC_NO_COMPRESS_START = 0x03
+MAGIC_NO_COMPRESS_START1 = 0x06
+MAGIC_NO_COMPRESS_NO_CRYPT_START = 0x08
+MAGIC_COMPRESS_START = 0x04
+MAGIC_COMPRESS_START1 = 0x05
+MAGIC_COMPRESS_START2 = 0x07
+MAGIC_COMPRESS_NO_CRYPT_START = 0x09
+MAGIC_END = 0x00
+
+# 可生成的magic -> 加密key长度
+SUPPORTED_MAGICS = {
+    MAGIC_NO_COMPRESS_START: 4,
+    MAGIC_COMPRESS_START: 4,
+    MAGIC_COMPRESS_START1: 4,
+    MAGIC_NO_COMPRESS_NO_CRYPT_START: 64,
+    MAGIC_COMPRESS_NO_CRYPT_START: 64,
+}
+
+MAGIC_NAMES = {
+    MAGIC_NO_COMPRESS_START: 'no_compress',
+    MAGIC_COMPRESS_START: 'compress',
+    MAGIC_COMPRESS_START1: 'compress_chunked',
+    MAGIC_NO_COMPRESS_NO_CRYPT_START: 'no_compress_no_crypt',
+    MAGIC_COMPRESS_NO_CRYPT_START: 'compress_no_crypt',
+}
+
+# 垃圾字节中不含任何magic起始值，保证解码器只能在下一个真实块处重新同步
+_GARBAGE_BYTES = bytes(b for b in range(0x10, 0x100))
+
+
+def encode_block(payload: bytes, seq: int, magic: int = MAGIC_COMPRESS_NO_CRYPT_START,
+                 begin_hour: int = 0, end_hour: int = 0, segment_size: int = 4096) -> bytes:
+    """
+    编码一个xlog日志块
+
+    Args:
+        payload: 日志原文（UTF-8字节）
+        seq: 序列号（0-65535）
+        magic: 块类型，见 SUPPORTED_MAGICS
+        begin_hour: 起始小时
+        end_hour: 结束小时
+        segment_size: COMPRESS_START1 分段大小（最大65535）
+
+    Returns:
+        完整的块字节（头 + 负载 + MAGIC_END）
+    """
+    if magic not in SUPPORTED_MAGICS:
+        raise ValueError(f"不支持的magic: 0x{magic:02x}")
+
+    if magic in (MAGIC_NO_COMPRESS_START, MAGIC_NO_COMPRESS_NO_CRYPT_START):
+        data = payload
+    else:
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        data = compressor.compress(payload) + compressor.flush()
+
+        if magic == MAGIC_COMPRESS_START1:
+            segment_size = max(1, min(segment_size, 0xFFFF))
+            data = b''.join(
+                struct.pack('<H', len(data[i:i + segment_size])) + data[i:i + segment_size]
+                for i in range(0, len(data), segment_size)
+            )
+
+    header = struct.pack('<BHBBI', magic, seq & 0xFFFF, begin_hour, end_hour, len(data))
+    return header + b'\x00' * SUPPORTED_MAGICS[magic] + data + bytes([MAGIC_END])
+
+
+_MODULES = ('HY-Default', 'Network', 'Payment', 'Chair', 'mars::stn', 'Login', 'Player')
+_MESSAGES = (
+    'request {n} finished in {ms}ms',
+    '请求 #{n} 完成，耗时 {ms}ms',
+    'cache miss for key user_{n}',
+    '用户 {n} 登录成功',
+    'socket reconnect attempt {n}, last error code {ms}',
+    '订单 {n} 支付失败: 网络超时',
+    'render frame {n} dropped, cost {ms}ms',
+)
+_LEVELS = 'IIIIIIDDWWE'
+_UTC8 = datetime.timezone(datetime.timedelta(hours=8))
+
+
+def generate_log_lines(count: int, seed: int = 0, start_epoch: float = 1760148000.0,
+                       crash_every: int = 0, multiline_every: int = 0) -> Iterator[str]:
+    """
+    生成Mars格式的日志行（确定性）
+
+    Args:
+        count: 日志条数（不含崩溃堆栈与续行）
+        seed: 随机种子
+        start_epoch: 起始时间（UTC秒），按东八区格式化
+        crash_every: 每N条插入一次崩溃日志及堆栈（0表示不插入）
+        multiline_every: 每N条插入一条多行日志（0表示不插入）
+
+    Yields:
+        以换行结尾的日志行
+    """
+    rng = random.Random(seed)
+    now = start_epoch
+    for n in range(count):
+        now += rng.expovariate(50.0)
+        local = datetime.datetime.fromtimestamp(now, _UTC8)
+        stamp = f"{local:%Y-%m-%d} +8.0 {local:%H:%M:%S}.{local.microsecond // 1000:03d}"
+        thread = f"{rng.randint(1000, 1010)}, {rng.randint(1, 40)}{'*' if rng.random() < 0.3 else ''}"
+
+        if crash_every and n and n % crash_every == 0:
+            yield (f"[E][{stamp}][{thread}][<ERROR><HY-Default>][CrashReportManager.m, attachmentForException, 204]"
+                   f"[*** Terminating app due to uncaught exception 'NSRangeException', "
+                   f"reason: 'index {n} beyond bounds'\n")
+            yield "*** First throw call stack:\n"
+            for frame in range(5):
+                yield f"{frame}   CoreFoundation  0x00000001897c{frame:04x} 0x00000001896af000 + {1155820 + frame}\n"
+            continue
+
+        level = rng.choice(_LEVELS)
+        module = rng.choice(_MODULES)
+        message = rng.choice(_MESSAGES).format(n=n, ms=rng.randint(1, 3000))
+        yield f"[{level}][{stamp}][{thread}][{module}][{message}\n"
+
+        if multiline_every and n and n % multiline_every == 0:
+            yield f"  detail: payload size {rng.randint(1, 9999)} bytes\n"
+
+
+@dataclass
+class XLogWriteResult:
+    """写入结果"""
+    path: str
+    magic: int
+    blocks: int = 0
+    lines: int = 0
+    raw_bytes: int = 0                  # 日志原文字节数
+    file_bytes: int = 0                 # xlog文件字节数
+    missing_seqs: List[Tuple[int, int]] = field(default_factory=list)  # 缺失的seq区间
+    corrupt_offsets: List[int] = field(default_factory=list)          # 垃圾字节插入位置
+
+
+class SyntheticXLogWriter:
+    """
+    合成xlog写入器
+
+    使用示例:
+        writer = SyntheticXLogWriter(MAGIC_COMPRESS_START1, seed=1)
+        result = writer.write('test.xlog', generate_log_lines(10000), seq_gaps=2, corrupt_blocks=1)
+    """
+
+    def __init__(self, magic: int = MAGIC_COMPRESS_NO_CRYPT_START, block_bytes: int = 16 * 1024,
+                 seed: int = 0, start_seq: int = 1, segment_size: int = 4096):
+        """
+        Args:
+            magic: 块类型
+            block_bytes: 每块日志原文的目标大小（Mars默认缓冲区约150KB，小块更考验解码开销）
+            seed: 随机种子（决定异常注入位置）
+            start_seq: 起始序列号
+            segment_size: COMPRESS_START1 分段大小
+        """
+        if magic not in SUPPORTED_MAGICS:
+            raise ValueError(f"不支持的magic: 0x{magic:02x}")
+        self.magic = magic
+        self.block_bytes = block_bytes
+        self.seed = seed
+        self.start_seq = start_seq
+        self.segment_size = segment_size
+
+    def iter_payloads(self, lines: Iterable[str]) -> Iterator[Tuple[bytes, int]]:
+        """按目标大小把日志行打包成块负载，产出 (负载, 行数)"""
+        buffer: List[bytes] = []
+        size = 0
+        for line in lines:
+            data = line.encode('utf-8')
+            buffer.append(data)
+            size += len(data)
+            if size >= self.block_bytes:
+                yield b''.join(buffer), len(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b''.join(buffer), len(buffer)
+
+    def write(self, path: str, lines: Iterable[str], seq_gaps: int = 0,
+              corrupt_blocks: int = 0) -> XLogWriteResult:
+        """
+        写入xlog文件
+
+        Args:
+            path: 输出路径
+            lines: 日志行（以换行结尾）
+            seq_gaps: 注入的序列号缺失次数
+            corrupt_blocks: 注入的垃圾数据段数
+
+        Returns:
+            XLogWriteResult
+        """
+        payloads = list(self.iter_payloads(lines))
+        rng = random.Random(self.seed)
+        # 第一个块之前与前两块之间不注入，保证解码器能找到起点（需连续两个好块）
+        candidates = range(2, len(payloads))
+        gap_at = set(rng.sample(candidates, min(seq_gaps, len(candidates))))
+        corrupt_at = set(rng.sample(candidates, min(corrupt_blocks, len(candidates))))
+
+        result = XLogWriteResult(path=path, magic=self.magic)
+        seq = self.start_seq
+        with open(path, 'wb') as f:
+            for index, (payload, line_count) in enumerate(payloads):
+                if index in gap_at:
+                    skipped = rng.randint(1, 5)
+                    result.missing_seqs.append((seq, seq + skipped - 1))
+                    seq += skipped
+                if index in corrupt_at:
+                    result.corrupt_offsets.append(f.tell())
+                    f.write(bytes(rng.choice(_GARBAGE_BYTES) for _ in range(rng.randint(8, 64))))
+
+                f.write(encode_block(payload, seq, self.magic, segment_size=self.segment_size))
+                result.blocks += 1
+                result.lines += line_count
+                result.raw_bytes += len(payload)
+                seq = seq + 1 if seq < 0xFFFF else 1
+
+            result.file_bytes = f.tell()
+        return result
+
+
+def write_synthetic_xlog(path: str, magic: int = MAGIC_COMPRESS_NO_CRYPT_START,
+                         target_bytes: Optional[int] = None, lines: Optional[int] = None,
+                         seed: int = 0, seq_gaps: int = 0, corrupt_blocks: int = 0,
+                         block_bytes: int = 16 * 1024) -> XLogWriteResult:
+    """
+    生成一个合成xlog文件
+
+    Args:
+        path: 输出路径
+        magic: 块类型
+        target_bytes: 日志原文目标大小（与lines二选一）
+        lines: 日志条数
+        seed: 随机种子
+        seq_gaps: 序列号缺失次数
+        corrupt_blocks: 垃圾数据段数
+        block_bytes: 每块原文大小
+
+    Returns:
+        XLogWriteResult
+    """
+    if lines is None:
+        # 平均每行约90字节
+        lines = max(1, (target_bytes or 1024 * 1024) // 90)
+
+    writer = SyntheticXLogWriter(magic, block_bytes=block_bytes, seed=seed)
+    return writer.write(
+        path,
+        generate_log_lines(lines, seed=seed, crash_every=5000, multiline_every=200),
+        seq_gaps=seq_gaps,
+        corrupt_blocks=corrupt_blocks
+    )
+
+
+def magics_by_name(names: Sequence[str]) -> List[int]:
+    """按名称解析magic列表（'all' 表示全部）"""
+    if not names or 'all' in names:
+        return list(SUPPORTED_MAGICS)
+    lookup = {name: magic for magic, name in MAGIC_NAMES.items()}
+    return [lookup[name] for name in names]
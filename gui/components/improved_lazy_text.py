@@ -8,7 +8,7 @@
 
 import tkinter as tk
 from tkinter import ttk
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 
 
 class ImprovedLazyText(tk.Frame):
@@ -41,6 +41,7 @@ class ImprovedLazyText(tk.Frame):
 
         # 状态变量
         self.current_index = 0
+        self.loaded_lines = 0  # 已加载数据占用的控件行数（多行数据项占多行）
         self.data: List[Any] = []
         self.is_loading = False
         self._pending_load = False
@@ -170,6 +171,7 @@ class ImprovedLazyText(tk.Frame):
         """
         self.data = data_list
         self.current_index = 0
+        self.loaded_lines = 0
 
         if clear:
             self._clear_text()
@@ -269,6 +271,7 @@ class ImprovedLazyText(tk.Frame):
             full_text = ''.join(text_parts)
             insert_index = self.text.index('end')
             self.text.insert(insert_index, full_text)
+            self.loaded_lines += full_text.count('\n')
 
             # 批量添加标签 - 合并连续相同标签
             if tag_ranges:
@@ -324,11 +327,33 @@ class ImprovedLazyText(tk.Frame):
         if self.current_index < len(self.data):
             self._load_batch(self.batch_size)
 
+    def load_until(self, count: int):
+        """
+        确保前count条数据已加载（跳转到尚未加载的位置前调用）
+
+        Args:
+            count: 需要加载的数据条数
+        """
+        if count > self.current_index:
+            self._load_batch(count - self.current_index + self.batch_size)
+
+    def visible_line_range(self) -> Tuple[int, int]:
+        """
+        当前可见的行号范围（从1开始，含两端，不超过已加载数据占用的行数）
+
+        Returns:
+            (首行, 末行)
+        """
+        first = int(self.text.index("@0,0").split('.')[0])
+        last = int(self.text.index(f"@0,{self.text.winfo_height()}").split('.')[0])
+        return first, min(last, self.loaded_lines)
+
     def clear(self):
         """清空所有内容和数据"""
         self._clear_text()
         self.data = []
         self.current_index = 0
+        self.loaded_lines = 0
 
     # ========== 代理Text组件的方法 ==========
 
@@ -48,6 +48,7 @@ try:
     from modules.log_indexer import IndexedFilterSearchManager, LogIndexer
     from modules.push_tab import PushTestTab
     from modules.sandbox_tab import SandboxBrowserTab
+    from modules.session_profiler import profiled
     from modules.stream_loader import EnhancedFileOperations, StreamLoader
 except ImportError:
     # 绝对导入（从项目根目录运行时）
@@ -58,6 +59,7 @@ except ImportError:
     from gui.modules.log_indexer import IndexedFilterSearchManager, LogIndexer
     from gui.modules.push_tab import PushTestTab
     from gui.modules.sandbox_tab import SandboxBrowserTab
+    from gui.modules.session_profiler import profiled
     from gui.modules.stream_loader import EnhancedFileOperations, StreamLoader
 
 # 导入原有组件
@@ -169,6 +171,7 @@ class MarsLogAnalyzerPro(OriginalMarsLogAnalyzerPro):
             complete_callback=complete_callback
         )
 
+    @profiled('apply_global_filter', category='filter')
     def apply_global_filter(self):
         """使用模块化的过滤功能（阶段二优化：使用索引）"""
         if not self.log_entries:
@@ -8,6 +8,7 @@ import queue
 import re
 import sys
 import threading
+import time
 import tkinter as tk
 from collections import Counter, defaultdict
 from datetime import datetime
@@ -35,9 +36,21 @@ except ImportError:
 
 # 导入模块化的数据模型（统一使用，避免重复定义）
 try:
-    from modules.data_models import FileGroup, LogEntry
+    from modules.data_models import FileGroup, LogEntry, LogEntryList
+    from modules.error_bursts import TimeHistogram, detect_error_bursts
+    from modules.log_display import DisplayedLogRows, build_display_items
+    from modules.module_health import ModuleHealthAggregator
+    from modules.session_profiler import get_session_profiler, profiled
+    from modules.template_miner import TemplateMiner
+    from modules.timeline_merge import merge_timelines
 except ImportError:
-    from gui.modules.data_models import FileGroup, LogEntry
+    from gui.modules.data_models import FileGroup, LogEntry, LogEntryList
+    from gui.modules.error_bursts import TimeHistogram, detect_error_bursts
+    from gui.modules.log_display import DisplayedLogRows, build_display_items
+    from gui.modules.module_health import ModuleHealthAggregator
+    from gui.modules.session_profiler import get_session_profiler, profiled
+    from gui.modules.template_miner import TemplateMiner
+    from gui.modules.timeline_merge import merge_timelines
 
 
 # 设置中文字体
@@ -75,13 +88,19 @@ class MarsLogAnalyzerPro:
         # 快速解码器
         self.fast_decoder = FastXLogDecoder(max_workers=4)
 
+        # 会话性能分析器（解码/解析/索引/过滤/渲染各阶段耗时）
+        self.profiler = get_session_profiler()
+
         # 数据存储
         self.file_groups = {}  # 文件分组 {base_name: FileGroup}
         self.current_group = None  # 当前选中的文件组
         self.log_entries = []  # 当前显示的LogEntry对象列表
         self.filtered_entries = []  # 过滤后的条目
+        self.displayed_rows = DisplayedLogRows()  # 日志查看器实际渲染的行（导航/搜索按此换算行号）
         self.modules_data = defaultdict(list)  # 按模块分组的数据
         self.analysis_results = {}
+        self.time_histogram = None  # 时间直方图（analyze_logs后可用）
+        self.error_bursts = []  # 检测到的错误突增
         self.current_module_entries = []  # 当前模块的日志条目
         self.current_module_name = None  # 当前选中的模块名称
         self.ignore_module_selection = False  # 标记是否忽略模块选择事件
@@ -175,6 +194,8 @@ class MarsLogAnalyzerPro:
         self.progress_bar = ttk.Progressbar(file_frame, mode='indeterminate')
         self.progress_bar.grid(row=2, column=1, columnspan=4, sticky=(tk.W, tk.E), pady=5)
 
+        ttk.Button(file_frame, text="性能分析", command=self.show_profiler_panel).grid(row=2, column=5, padx=5, pady=5)
+
         # 创建Notebook（标签页）
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
@@ -633,7 +654,12 @@ class MarsLogAnalyzerPro:
         """加载文件组的日志"""
         self.progress_var.set(f"正在加载 {len(group.entries)} 条日志...")
 
-        self.log_entries = group.entries.copy()
+        # 派生数据（模块聚合、时间直方图、检索索引）缓存在会话日志列表上，
+        # 重新加载时释放旧列表的缓存（其他组件可能仍引用旧列表）
+        previous = self.log_entries
+        self.log_entries = LogEntryList(group.entries)
+        if isinstance(previous, LogEntryList):
+            previous.clear_derived()
         self.filtered_entries = self.log_entries.copy()
 
         # 重新分析
@@ -1191,19 +1217,28 @@ class MarsLogAnalyzerPro:
             def update_progress(progress, msg):
                 self.progress_var.set(f"{msg} - {progress:.1f}%")
 
-            results = self.fast_decoder.decode_files_batch(
-                list(all_files_map.keys()),
-                update_progress
-            )
-
-            # 处理解析结果
+            with self.profiler.span('decode_batch', category='decode', files=len(all_files_map)):
+                results = self.fast_decoder.decode_files_batch(
+                    list(all_files_map.keys()),
+                    update_progress
+                )
+            for filepath, stats in self.fast_decoder.file_stats.items():
+                if filepath in all_files_map:
+                    self.profiler.record('decode_file', stats['decode_time'], category='decode',
+                                         file=os.path.basename(filepath),
+                                         bytes=stats['bytes'], lines=stats['lines'])
+
+            # 处理解析结果（按文件收集，稍后按组合并）
+            file_entries = {}  # {filepath: [LogEntry]}
             for filepath, result in results.items():
-                group = all_files_map[filepath]
-
                 if result['error']:
                     self.log_queue.put(("error", f"解析文件 {os.path.basename(filepath)} 失败: {result['error']}"))
                 else:
-                    # 处理解析后的日志，合并多行日志
+                    # 阶段1（line_merge）：解码行 lines -> 每条日志的原始文本 merged_texts
+                    # 阶段2（build_entries）：merged_texts -> LogEntry 列表 file_entries[filepath]
+                    # 两阶段分别计时
+                    merge_started = time.perf_counter()
+                    merged_texts = []
                     lines = result['lines']
                     i = 0
                     while i < len(lines):
@@ -1258,31 +1293,46 @@ class MarsLogAnalyzerPro:
                                     full_line += '\n' + next_line
                                     j += 1
 
-                            # 如果有崩溃堆栈，只创建主崩溃日志（不含堆栈），然后为每个堆栈行单独创建LogEntry
+                            # 有崩溃堆栈时，主崩溃日志只包含崩溃信息本身（不含堆栈），
+                            # 每个堆栈行各自作为一条日志文本
                             if crash_stack_lines:
-                                # 主崩溃日志只包含崩溃信息本身，不包含堆栈
-                                entry = LogEntry(full_line, os.path.basename(filepath))
-                                group.entries.append(entry)
-
-                                # 为每个堆栈行单独创建LogEntry
-                                for stack_line in crash_stack_lines:
-                                    stack_entry = LogEntry(stack_line, os.path.basename(filepath))
-                                    group.entries.append(stack_entry)
+                                merged_texts.append(full_line)
+                                merged_texts.extend(crash_stack_lines)
                             else:
-                                # 普通日志，直接创建条目
-                                entry = LogEntry(full_line, os.path.basename(filepath))
-                                group.entries.append(entry)
+                                # 普通日志（含合并后的续行）
+                                merged_texts.append(full_line)
 
                             i = j
                         else:
                             # 非标准格式
-                            entry = LogEntry(line, os.path.basename(filepath))
-                            group.entries.append(entry)
+                            merged_texts.append(line)
                             i += 1
 
-            # 后处理：优化崩溃日志的识别
+                    build_started = time.perf_counter()
+                    source_file = os.path.basename(filepath)
+                    built_entries = file_entries[filepath] = [LogEntry(text, source_file) for text in merged_texts]
+                    build_done = time.perf_counter()
+
+                    self.profiler.record('line_merge', build_started - merge_started, category='parse',
+                                         start=merge_started, file=source_file, lines=len(lines))
+                    self.profiler.record('build_entries', build_done - build_started, category='parse',
+                                         start=build_started, file=source_file, entries=len(built_entries))
+
+            # 组装各文件组：合并模式下多文件按时间k路归并，否则按文件顺序拼接
             for group in self.file_groups.values():
-                self.post_process_crash_logs(group)
+                streams = [file_entries[f] for f in group.files if f in file_entries]
+                if self.merge_files_var.get() and len(streams) > 1:
+                    with self.profiler.span('timeline_merge', category='parse', files=len(streams)) as args:
+                        group.entries = list(merge_timelines(streams))
+                        args['entries'] = len(group.entries)
+                else:
+                    for stream in streams:
+                        group.entries.extend(stream)
+
+            # 后处理：优化崩溃日志的识别
+            with self.profiler.span('post_process_crash_logs', category='parse'):
+                for group in self.file_groups.values():
+                    self.post_process_crash_logs(group)
 
 
             # 加载第一个组
@@ -1302,50 +1352,43 @@ class MarsLogAnalyzerPro:
         finally:
             self.progress_bar.stop()
 
+    @profiled('analyze_logs', category='analyze')
     def analyze_logs(self):
         """分析日志内容"""
-        log_levels = Counter()
-        time_distribution = defaultdict(int)
-        module_stats = Counter()
+        # 级别、模块、模块-级别统计、崩溃日志与按小时分布由共享聚合器单遍完成
+        # （AI诊断复用同一份结果）
+        health = ModuleHealthAggregator.of(self.log_entries)
+        log_levels = Counter(health.levels)
+        module_stats = health.module_counts()
         module_level_stats = defaultdict(Counter)
         self.modules_data.clear()
+        for module, stats in health.modules.items():
+            self.modules_data[module] = list(stats.entries)
+            module_level_stats[module] = Counter(stats.levels)
+        time_distribution = dict(health.hour_counts)
 
         # 遇到崩溃日志自动创建Crash模块
-        crash_entries = []
-
-        for entry in self.log_entries:
-            # 统计级别
-            log_levels[entry.level] += 1
+        crash_entries = list(health.flagged_crashes)
 
-            # 统计模块
-            module_stats[entry.module] += 1
-            self.modules_data[entry.module].append(entry)
-
-            # 收集崩溃日志
-            if entry.is_crash or entry.level == 'CRASH':
-                crash_entries.append(entry)
-
-            # 统计模块-级别
-            module_level_stats[entry.module][entry.level] += 1
-
-            # 提取时间分布
-            if entry.timestamp:
-                hour_match = re.search(r'(\d{2}):\d{2}:\d{2}', entry.timestamp)
-                if hour_match:
-                    hour = hour_match.group(1)
-                    time_distribution[f"{hour}:00"] += 1
+        # 崩溃模板（只在去重时挖掘）
+        crash_templates = []
 
         # 确保Crash模块存在（如果有崩溃日志）
         if crash_entries and 'Crash' not in self.modules_data:
-            # 去重：基于时间戳+内容前100字符
+            # 崩溃日志按模板聚类（只在地址、数字上不同的崩溃归为一类）
+            # 无时间戳的堆栈行按原文区分，避免同模板的不同栈帧被合并
+            crash_miner = TemplateMiner()
+            crash_keys = [
+                (entry.timestamp, crash_miner.add(entry).template_id) if entry.timestamp else (None, entry.raw_line)
+                for entry in crash_entries
+            ]
+            crash_templates = [t.to_dict() for t in crash_miner.top()]
+
+            # 去重：同一时间戳下属于同一模板的崩溃只保留一条
             seen_crashes = set()
             dedup_crash_entries = []
 
-            for entry in crash_entries:
-                # 创建唯一键
-                content_key = entry.content[:100] if entry.content else entry.raw_line[:100]
-                key = (entry.timestamp, content_key)
-
+            for entry, key in zip(crash_entries, crash_keys):
                 if key not in seen_crashes:
                     seen_crashes.add(key)
                     dedup_crash_entries.append(entry)
@@ -1360,13 +1403,19 @@ class MarsLogAnalyzerPro:
             for entry in dedup_crash_entries:
                 module_level_stats['Crash'][entry.level] += 1
 
+        # 每秒/每分钟直方图与错误突增（跳转目标，AI分析只看这些时间窗口）
+        self.time_histogram = TimeHistogram.of(self.log_entries)
+        self.error_bursts = detect_error_bursts(self.log_entries, histogram=self.time_histogram)
+
         self.analysis_results = {
             'total_lines': len(self.log_entries),
             'log_levels': dict(log_levels),
             'time_distribution': dict(time_distribution),
+            'error_bursts': [burst.to_dict() for burst in self.error_bursts],
             'module_stats': dict(module_stats),
             'module_level_stats': {k: dict(v) for k, v in module_level_stats.items()},
             'modules': list(self.modules_data.keys()),
+            'crash_templates': crash_templates,
             'current_group': self.current_group.base_name if self.current_group else ""
         }
 
@@ -1394,31 +1443,36 @@ class MarsLogAnalyzerPro:
         # 更新模块列表框
         self.module_listbox.delete(0, tk.END)
         for module in sorted_modules:
-            entries = self.modules_data[module]
-            # 统计各级别数量
-            count_stats = Counter(e.level for e in entries)
-            total_count = len(entries)
-
-            # 构建显示文本
-            display_text = f"{module} ({total_count}条"
-
-            # 优先显示崩溃数
-            if count_stats.get('CRASH', 0) > 0:
-                display_text += f", {count_stats['CRASH']}崩溃"
-            # 其次是错误数
-            elif count_stats.get('ERROR', 0) > 0:
-                display_text += f", {count_stats['ERROR']}E"
-            # 最后是警告数
-            if count_stats.get('WARNING', 0) > 0:
-                display_text += f", {count_stats['WARNING']}W"
-
-            display_text += ")"
-            self.module_listbox.insert(tk.END, display_text)
+            self.module_listbox.insert(tk.END, self._module_display_text(module))
 
         # 恢复之前选中的模块
         if self.current_module_name:
             self.restore_module_selection()
 
+    def _module_display_text(self, module):
+        """模块列表项文本（级别计数取自分析结果，不再逐条统计）"""
+        level_stats = self.analysis_results.get('module_level_stats', {})
+        count_stats = level_stats.get(module)
+        if count_stats is None:
+            count_stats = Counter(e.level for e in self.modules_data[module])
+        total_count = len(self.modules_data[module])
+
+        # 构建显示文本
+        display_text = f"{module} ({total_count}条"
+
+        # 优先显示崩溃数
+        if count_stats.get('CRASH', 0) > 0:
+            display_text += f", {count_stats['CRASH']}崩溃"
+        # 其次是错误数
+        elif count_stats.get('ERROR', 0) > 0:
+            display_text += f", {count_stats['ERROR']}E"
+        # 最后是警告数
+        if count_stats.get('WARNING', 0) > 0:
+            display_text += f", {count_stats['WARNING']}W"
+
+        display_text += ")"
+        return display_text
+
     def filter_module_list(self):
         """根据搜索框过滤模块列表"""
         search_text = self.module_list_search_var.get().lower().strip()
@@ -1438,41 +1492,10 @@ class MarsLogAnalyzerPro:
         # 清空列表框
         self.module_listbox.delete(0, tk.END)
 
-        # 如果搜索框为空，显示所有模块
-        if not search_text:
-            for module in sorted_modules:
-                entries = self.modules_data[module]
-                count_stats = Counter(e.level for e in entries)
-                total_count = len(entries)
-
-                display_text = f"{module} ({total_count}条"
-                if count_stats.get('CRASH', 0) > 0:
-                    display_text += f", {count_stats['CRASH']}崩溃"
-                elif count_stats.get('ERROR', 0) > 0:
-                    display_text += f", {count_stats['ERROR']}E"
-                if count_stats.get('WARNING', 0) > 0:
-                    display_text += f", {count_stats['WARNING']}W"
-                display_text += ")"
-
-                self.module_listbox.insert(tk.END, display_text)
-        else:
-            # 过滤包含搜索文本的模块
-            for module in sorted_modules:
-                if search_text in module.lower():
-                    entries = self.modules_data[module]
-                    count_stats = Counter(e.level for e in entries)
-                    total_count = len(entries)
-
-                    display_text = f"{module} ({total_count}条"
-                    if count_stats.get('CRASH', 0) > 0:
-                        display_text += f", {count_stats['CRASH']}崩溃"
-                    elif count_stats.get('ERROR', 0) > 0:
-                        display_text += f", {count_stats['ERROR']}E"
-                    if count_stats.get('WARNING', 0) > 0:
-                        display_text += f", {count_stats['WARNING']}W"
-                    display_text += ")"
-
-                    self.module_listbox.insert(tk.END, display_text)
+        # 如果搜索框为空，显示所有模块；否则只显示包含搜索文本的模块
+        for module in sorted_modules:
+            if not search_text or search_text in module.lower():
+                self.module_listbox.insert(tk.END, self._module_display_text(module))
 
         # 如果当前选中的模块仍在过滤后的列表中，恢复选择
         if self.current_module_name:
@@ -1551,6 +1574,7 @@ class MarsLogAnalyzerPro:
         thread.daemon = True
         thread.start()
 
+    @profiled('render', category='render', count_arg='entries')
     def display_logs(self, entries):
         """显示日志条目"""
         # 更新统计信息
@@ -1569,64 +1593,11 @@ class MarsLogAnalyzerPro:
         else:
             self.log_stats_var.set("无日志数据")
 
-        # 使用懒加载显示日志
+        # 使用懒加载显示日志，同时记录每个显示项对应的日志条目与控件行号
         self.log_text.clear()
-        log_data = []
-
-        # 处理崩溃日志分组
-        i = 0
-        while i < len(entries):
-            entry = entries[i]
-            item = {}
-
-            # 如果是崩溃日志，显示完整内容
-            if entry.is_crash:
-                item['prefix'] = "🔴 [CRASH] "
-                item['prefix_tag'] = "CRASH"
-                # 崩溃日志可能包含多行，确保完整显示
-                if '\n' in entry.raw_line:
-                    # 多行崩溃日志，保持格式
-                    item['text'] = entry.raw_line + '\n'
-                else:
-                    item['text'] = entry.raw_line + '\n'
-                item['tag'] = 'CRASH'
-                log_data.append(item)
-
-                # 查找后续的独立堆栈信息条目
-                i += 1
-                while i < len(entries) and (entries[i].is_stacktrace or entries[i].module == 'Crash'):
-                    if entries[i].level == 'CRASH' or entries[i].is_stacktrace:
-                        stack_item = {
-                            'prefix': "  ↳ ",
-                            'prefix_tag': "STACKTRACE",
-                            'text': entries[i].raw_line + '\n',
-                            'tag': 'STACKTRACE'
-                        }
-                        log_data.append(stack_item)
-                    i += 1
-                continue
-
-            # 添加模块标记
-            if entry.module == 'mars':
-                item['prefix'] = f"[{entry.module}] "
-                item['prefix_tag'] = "MODULE_MARS"
-            elif entry.module == 'HY-Default':
-                item['prefix'] = f"[{entry.module}] "
-                item['prefix_tag'] = "MODULE_DEFAULT"
-
-            # 如果是合并模式，显示来源文件
-            if self.merge_files_var.get() and self.current_group and len(self.current_group.files) > 1:
-                if 'prefix' in item:
-                    item['prefix'] += f"[{entry.source_file}] "
-                else:
-                    item['prefix'] = f"[{entry.source_file}] "
-                    item['prefix_tag'] = "DEBUG"
-
-            item['text'] = entry.raw_line + '\n'
-            item['tag'] = entry.level
-            log_data.append(item)
-            i += 1
-
+        show_source_file = bool(self.merge_files_var.get() and self.current_group
+                                and len(self.current_group.files) > 1)
+        log_data, self.displayed_rows = build_display_items(entries, show_source_file)
         self.log_text.set_data(log_data)
 
     def update_statistics(self):
@@ -1639,6 +1610,7 @@ class MarsLogAnalyzerPro:
         # 图表功能已移除，此方法暂时保留为空以避免调用错误
         pass
 
+    @profiled('filter_logs', category='filter')
     def filter_logs(self, start_time=None, end_time=None):
         """过滤日志（支持时间范围）"""
         level = self.level_var.get()
@@ -1677,6 +1649,7 @@ class MarsLogAnalyzerPro:
 
         self.display_logs(self.filtered_entries)
 
+    @profiled('search_logs', category='filter')
     def search_logs(self):
         """搜索日志（支持正则表达式）"""
         keyword = self.search_var.get()
@@ -1887,6 +1860,14 @@ class MarsLogAnalyzerPro:
                         percentage = count / self.analysis_results['total_lines'] * 100 if self.analysis_results['total_lines'] > 0 else 0
                         f.write(f"{module:30s}: {count:6d} ({percentage:.1f}%)\n")
 
+                    if self.analysis_results.get('error_bursts'):
+                        f.write("\n错误突增:\n")
+                        f.write("-" * 40 + "\n")
+                        for burst in self.analysis_results['error_bursts']:
+                            modules = ", ".join(str(m) for m in burst['modules'])
+                            f.write(f"{burst['start']} (+{burst['duration']:.0f}s): "
+                                    f"{burst['errors']}/{burst['total']} 错误, 第{burst['line']}行, 模块: {modules}\n")
+
                     if self.analysis_results.get('time_distribution'):
                         f.write("\n时间分布:\n")
                         f.write("-" * 40 + "\n")
@@ -4459,6 +4440,14 @@ except Exception as e:
         module_name = module_text.split(' (')[0]
         self.ai_analyze_module(module_name)
 
+    def show_profiler_panel(self):
+        """显示会话性能分析面板"""
+        try:
+            from modules.profiler_panel import ProfilerPanel
+        except ImportError:
+            from gui.modules.profiler_panel import ProfilerPanel
+        ProfilerPanel(self.root, self.profiler)
+
     def show_module_statistics(self, module_name):
         """显示模块统计信息"""
         # 获取该模块的所有日志
@@ -6,10 +6,11 @@ AI助手面板主控制器
 """
 
 import threading
+import time
 import tkinter as tk
 from datetime import datetime
 from tkinter import messagebox, ttk
-from typing import Optional
+from typing import Optional, Tuple
 
 
 def safe_import_ai_diagnosis():
@@ -38,6 +39,9 @@ def safe_import_ai_diagnosis():
 class AIAssistantPanel:
     """AI助手面板主控制器"""
 
+    # 流式输出时刷新聊天面板的最小间隔（秒），避免每个片段都触发一次重绘
+    STREAM_FLUSH_INTERVAL = 0.05
+
     def __init__(self, parent, main_app):
         """
         初始化AI助手面板
@@ -58,6 +62,9 @@ class AIAssistantPanel:
         # 停止标志
         self.stop_flag = False
 
+        # 当前流式请求的取消事件（停止按钮置位后立即断开连接）
+        self.cancel_event: Optional[threading.Event] = None
+
         # Token累计统计
         self.total_input_tokens = 0
         self.total_output_tokens = 0
@@ -68,6 +75,9 @@ class AIAssistantPanel:
         # Token优化器（延迟初始化）
         self._token_optimizer = None
 
+        # 问答会话（日志上下文与历史问答作为稳定前缀，追问时可命中提供方缓存）
+        self.prompt_session = None
+
         # 评分记录（用于收集用户反馈）
         self.ratings = []
 
@@ -96,9 +106,11 @@ class AIAssistantPanel:
                 claude_path = config.get('claude_path', '')
 
                 # 固定使用Claude Code,传递claude_path
-                self._ai_client = AIClientFactory.create(
+                # 经全局调度器转发: 限制并发、限流并合并重复请求
+                self._ai_client = AIClientFactory.create_scheduled(
                     service='ClaudeCode',
-                    claude_path=claude_path
+                    claude_path=claude_path,
+                    persistent=config.get('claude_persistent', True)
                 )
             except Exception as e:
                 messagebox.showerror(
@@ -128,6 +140,25 @@ class AIAssistantPanel:
                     return None
         return self._token_optimizer
 
+    def count_tokens(self, text: str) -> int:
+        """
+        文本的token数
+
+        使用Token优化器的计数器（与优化后提示词的 estimated_tokens 同一口径），
+        优化器不可用时使用默认计数器。
+        """
+        optimizer = self.token_optimizer
+        if optimizer is not None:
+            return optimizer.counter.count(text)
+        try:
+            from ai_diagnosis.token_counter import count_tokens
+        except ImportError:
+            try:
+                from modules.ai_diagnosis.token_counter import count_tokens
+            except ImportError:
+                from gui.modules.ai_diagnosis.token_counter import count_tokens
+        return count_tokens(text)
+
     def create_widgets(self):
         """创建并组装UI组件"""
         from .ui.toolbar_panel import ToolbarPanel
@@ -203,8 +234,86 @@ class AIAssistantPanel:
     def stop_processing(self):
         """停止AI处理"""
         self.stop_flag = True
+        if self.cancel_event is not None:
+            self.cancel_event.set()
         self.set_status("正在取消...")
-        self.chat_panel.append_chat("system", "用户已取消操作")
+        # 流式输出中由stream_response在结束消息后提示，避免插入到正在输出的消息中间
+        if not self.chat_panel.is_streaming:
+            self.chat_panel.append_chat("system", "用户已取消操作")
+
+    def stream_response(self, prompt: str) -> Tuple[str, bool]:
+        """
+        流式获取AI响应并增量显示到聊天面板（在工作线程中调用）
+
+        片段按 STREAM_FLUSH_INTERVAL 合并后交给UI线程追加；结束（完成、停止或出错）时
+        统一调用 end_stream 重新渲染日志链接并写入对话历史。
+
+        Args:
+            prompt: 提示词
+
+        Returns:
+            (已收到的响应文本, 是否被用户停止)
+        """
+        root = self.main_app.root
+        cancel_event = self.cancel_event = threading.Event()
+        if self.stop_flag:
+            cancel_event.set()
+
+        root.after(0, self.chat_panel.begin_stream, "assistant")
+        parts, pending = [], []
+        last_flush = time.monotonic()
+        try:
+            for chunk in self.ai_client.ask_stream(prompt, cancel_event=cancel_event):
+                if cancel_event.is_set():
+                    break
+                parts.append(chunk)
+                pending.append(chunk)
+                now = time.monotonic()
+                if now - last_flush >= self.STREAM_FLUSH_INTERVAL:
+                    root.after(0, self.chat_panel.append_stream, ''.join(pending))
+                    pending = []
+                    last_flush = now
+        finally:
+            stopped = cancel_event.is_set()
+            root.after(0, self.chat_panel.end_stream, ''.join(pending), "\n（已停止）" if stopped and parts else "")
+            if stopped:
+                root.after(0, self.chat_panel.append_chat, "system", "用户已取消操作")
+            self.cancel_event = None
+
+        return ''.join(parts), stopped
+
+    def map_reduce_prompt(self, optimizer, entries, question: str):
+        """
+        分段摘要超大会话，返回最终分析提示词（在工作线程中调用）
+
+        摘要请求以批量优先级经调度器并行执行，进度显示在状态栏；用户停止时返回None。
+        """
+        if not self.ai_client:
+            return None
+
+        root = self.main_app.root
+        cancel_event = self.cancel_event = threading.Event()
+        if self.stop_flag:
+            cancel_event.set()
+
+        def on_progress(stage, done, total):
+            root.after(0, self.set_status, f"🧩 {stage}: {done}/{total}")
+
+        try:
+            summarizer = optimizer.create_map_reduce(self.ai_client)
+            result = summarizer.build_prompt(entries, question, cancel_event=cancel_event,
+                                             progress_callback=on_progress)
+        finally:
+            self.cancel_event = None
+
+        if result.cancelled:
+            root.after(0, self.chat_panel.append_chat, "system", "用户已取消操作")
+            return None
+
+        root.after(0, self.chat_panel.append_chat, "system",
+                   f"日志超出单次分析预算，已分{len(result.chunks)}段摘要"
+                   f"（缓存复用{result.cache_hits}段，新请求{result.requests}次）")
+        return optimizer.optimize_for_map_reduce(entries, result)
 
     def show_prompt_selector(self):
         """显示Prompt选择器（委托给PromptPanel）"""
@@ -281,6 +390,9 @@ class AIAssistantPanel:
                 # 检查是否有日志
                 has_logs = hasattr(self.main_app, 'log_entries') and self.main_app.log_entries
 
+                # 是否使用会话提示词（回答完成后记入会话历史）
+                use_session = False
+
                 # 简单问候或没有日志时，使用简化提示词
                 simple_greetings = ['你好', 'hello', 'hi', '嗨', '您好']
                 is_greeting = question.lower().strip() in simple_greetings
@@ -293,8 +405,8 @@ class AIAssistantPanel:
                     else:
                         prompt += "这是一个简单的问候，请友好地回复并简要介绍你可以提供的帮助。"
 
-                    # 估算token数（粗略估计：中文1字=1token，英文4字符=1token）
-                    estimated_tokens = len(prompt.replace(' ', '')) + len(prompt.split()) // 4
+                    # 估算token数（与完整模式同一计数器）
+                    estimated_tokens = self.count_tokens(prompt)
                 else:
                     # 完整模式：使用Token优化器
                     optimizer = self.token_optimizer
@@ -305,11 +417,25 @@ class AIAssistantPanel:
                     # 获取当前日志
                     current_logs = self.main_app.filtered_entries if hasattr(self.main_app, 'filtered_entries') and self.main_app.filtered_entries else self.main_app.log_entries
 
-                    # 优化交互式问答提示词
-                    optimized = optimizer.optimize_for_interactive_qa(
-                        current_logs,
-                        user_question=question
-                    )
+                    if config.get('map_reduce', True) and optimizer.needs_map_reduce(current_logs):
+                        # 超大会话：分段摘要后再回答（摘要有缓存，追问时复用）
+                        optimized = self.map_reduce_prompt(optimizer, current_logs, question)
+                        if optimized is None:
+                            return
+                    else:
+                        # 优化交互式问答提示词（系统指令与日志上下文在前，追问只改变末尾）
+                        # 全量日志与过滤索引对齐时复用其词索引做相关日志检索
+                        filter_manager = getattr(self.main_app, 'filter_manager', None)
+                        indexer = getattr(filter_manager, 'indexer', None)
+                        if self.prompt_session is None:
+                            self.prompt_session = optimizer.create_prompt_session()
+                        optimized = optimizer.optimize_for_session_qa(
+                            current_logs,
+                            user_question=question,
+                            session=self.prompt_session,
+                            indexer=indexer if current_logs is self.main_app.log_entries else None
+                        )
+                        use_session = True
 
                     # 检查token预算
                     within_budget, message = optimizer.check_budget(optimized.estimated_tokens)
@@ -335,19 +461,19 @@ class AIAssistantPanel:
                     self.main_app.root.after(0, self.chat_panel.append_chat, "system", "AI服务初始化失败")
                     return
 
-                response = self.ai_client.ask(prompt)
+                # 流式显示结果（停止时保留已收到的部分）
+                response, stopped = self.stream_response(prompt)
+                if use_session and not stopped and response:
+                    self.prompt_session.record(question, response)
 
-                # 估算响应token数
-                response_tokens = len(response.replace(' ', '')) + len(response.split()) // 4
+                # 估算响应token数（与输入同一计数器）
+                response_tokens = self.count_tokens(response)
                 total_tokens = estimated_tokens + response_tokens
 
                 # 累加Token统计
                 self.total_input_tokens += estimated_tokens
                 self.total_output_tokens += response_tokens
 
-                # 显示结果
-                self.main_app.root.after(0, self.chat_panel.append_chat, "assistant", response)
-
                 # 更新token统计
                 if show_token_usage:
                     session_total = self.total_input_tokens + self.total_output_tokens
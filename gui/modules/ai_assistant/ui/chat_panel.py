@@ -27,6 +27,9 @@ class ChatPanel(ttk.Frame):
         self.search_var = None
         self.search_result_var = None
 
+        # 正在流式输出的消息 {'role', 'timestamp', 'parts'}，None表示没有
+        self._stream = None
+
         self.create_widgets()
 
     def create_widgets(self):
@@ -125,11 +128,22 @@ class ChatPanel(ttk.Frame):
 
         # 更新UI
         self.chat_text.config(state=tk.NORMAL)
+        self._insert_header(role, timestamp)
+
+        # 解析消息中的日志引用并创建可点击链接
+        if role == "assistant":
+            self._insert_message_with_links(message)
+        else:
+            # 普通消息
+            self.chat_text.insert(tk.END, f"{message}\n\n", "content")
+
+        self.chat_text.config(state=tk.DISABLED)
+        self.chat_text.see(tk.END)  # 滚动到底部
 
-        # 添加时间戳
+    def _insert_header(self, role: str, timestamp: str):
+        """插入时间戳与角色标签"""
         self.chat_text.insert(tk.END, f"[{timestamp}] ", "timestamp")
 
-        # 添加角色标签
         role_labels = {
             "user": "用户",
             "assistant": "AI助手",
@@ -138,15 +152,77 @@ class ChatPanel(ttk.Frame):
         label = role_labels.get(role, role)
         self.chat_text.insert(tk.END, f"{label}: ", role)
 
-        # 解析消息中的日志引用并创建可点击链接
-        if role == "assistant":
-            self._insert_message_with_links(message)
-        else:
-            # 普通消息
-            self.chat_text.insert(tk.END, f"{message}\n\n", "content")
+    @property
+    def is_streaming(self) -> bool:
+        """是否有消息正在流式输出"""
+        return self._stream is not None
+
+    def begin_stream(self, role: str = "assistant"):
+        """
+        开始一条流式消息：先写入时间戳和角色，正文随后由append_stream追加
+
+        Args:
+            role: 角色
+        """
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self._stream = {'role': role, 'timestamp': timestamp, 'parts': []}
 
+        self.chat_text.config(state=tk.NORMAL)
+        self.chat_text.mark_set("stream_header", "end-1c")
+        self.chat_text.mark_gravity("stream_header", tk.LEFT)
+        self._insert_header(role, timestamp)
+        self.chat_text.mark_set("stream_body", "end-1c")
+        self.chat_text.mark_gravity("stream_body", tk.LEFT)
         self.chat_text.config(state=tk.DISABLED)
-        self.chat_text.see(tk.END)  # 滚动到底部
+        self.chat_text.see(tk.END)
+
+    def append_stream(self, text: str):
+        """
+        追加流式消息片段（纯文本，结束时再解析日志链接）
+
+        Args:
+            text: 新到达的文本片段
+        """
+        if self._stream is None or not text:
+            return
+        self._stream['parts'].append(text)
+
+        self.chat_text.config(state=tk.NORMAL)
+        self.chat_text.insert(tk.END, text, "content")
+        self.chat_text.config(state=tk.DISABLED)
+        self.chat_text.see(tk.END)
+
+    def end_stream(self, text: str = "", suffix: str = ""):
+        """
+        结束流式消息：用带日志链接的完整渲染替换已显示的纯文本，并记入对话历史
+
+        Args:
+            text: 最后一批尚未显示的片段
+            suffix: 附加在消息末尾的说明（如"已停止"）
+        """
+        if self._stream is None:
+            return
+        stream, self._stream = self._stream, None
+        message = ''.join(stream['parts']) + text + suffix
+
+        self.chat_text.config(state=tk.NORMAL)
+        if message:
+            self.chat_text.delete("stream_body", "end-1c")
+            if stream['role'] == "assistant":
+                self._insert_message_with_links(message)
+            else:
+                self.chat_text.insert(tk.END, f"{message}\n\n", "content")
+            self.panel.chat_history.append({
+                'role': stream['role'],
+                'message': message,
+                'timestamp': stream['timestamp']
+            })
+        else:
+            # 没有收到任何内容（如请求失败），移除消息头
+            self.chat_text.delete("stream_header", "end-1c")
+        self.chat_text.mark_unset("stream_header", "stream_body")
+        self.chat_text.config(state=tk.DISABLED)
+        self.chat_text.see(tk.END)
 
     def _insert_message_with_links(self, message: str):
         """
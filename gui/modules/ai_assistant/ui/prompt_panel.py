@@ -209,10 +209,8 @@ class PromptPanel:
                     self.panel.main_app.root.after(0, self.panel.chat_panel.append_chat, "system", "AI服务初始化失败")
                     return
 
-                response = self.panel.ai_client.ask(formatted_prompt)
-
-                # 显示结果
-                self.panel.main_app.root.after(0, self.panel.chat_panel.append_chat, "assistant", response)
+                # 流式显示结果
+                self.panel.stream_response(formatted_prompt)
 
             except Exception as e:
                 error_msg = f"分析失败: {str(e)}"
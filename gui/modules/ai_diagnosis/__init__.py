@@ -27,6 +27,13 @@ from .ai_client import (
     OllamaClient,
     OpenAIClient,
 )
+from .ai_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AIRequestScheduler,
+    ScheduledAIClient,
+    get_global_scheduler,
+)
 from .config import AIConfig
 
 __all__ = [
@@ -36,5 +43,10 @@ __all__ = [
     "OpenAIClient",
     "OllamaClient",
     "ClaudeCodeClient",
+    "AIRequestScheduler",
+    "ScheduledAIClient",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_BATCH",
+    "get_global_scheduler",
     "AIConfig",
 ]
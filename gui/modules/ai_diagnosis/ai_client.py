@@ -7,13 +7,16 @@ AI客户端抽象层
 - Ollama本地模型
 - Claude Code代理（推荐）
 
-所有客户端实现统一的ask()接口，便于切换。
+所有客户端实现统一的ask()接口，便于切换；ask_stream()以生成器形式
+逐段返回响应（首字延迟更低），可通过cancel_event随时取消。
 """
 
+import json
 import logging
 import os
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Dict, Iterator, List, Optional
 
 from ..exceptions import (
     AIDiagnosisError,
@@ -21,11 +24,28 @@ from ..exceptions import (
     handle_exceptions,
     get_global_error_collector
 )
+from .streaming import CancelWatcher, iter_anthropic_text, iter_http_lines, iter_sse
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
 
+def _anthropic_payload(prompt: str) -> Dict:
+    """messages.create的消息参数；分段提示词（CachedPrompt）带缓存断点标记"""
+    to_anthropic = getattr(prompt, 'to_anthropic', None)
+    if to_anthropic is not None:
+        return to_anthropic()
+    return {"messages": [{"role": "user", "content": prompt}]}
+
+
+def _openai_messages(prompt: str) -> List[Dict]:
+    """chat.completions的消息列表；分段提示词把系统指令放在最前（前缀自动缓存）"""
+    to_openai_messages = getattr(prompt, 'to_openai_messages', None)
+    if to_openai_messages is not None:
+        return to_openai_messages()
+    return [{"role": "user", "content": prompt}]
+
+
 class AIClient(ABC):
     """AI客户端抽象基类"""
 
@@ -46,6 +66,27 @@ class AIClient(ABC):
             TimeoutError: 当请求超时时
         """
 
+    def ask_stream(self, prompt: str, cancel_event: Optional[threading.Event] = None,
+                   **kwargs) -> Iterator[str]:
+        """
+        流式发送提示词，逐段返回响应文本
+
+        默认实现一次性返回ask()的完整结果，支持流式的后端应覆盖此方法。
+        调用方停止迭代（或关闭生成器）即结束请求；cancel_event置位时
+        后端会立即关闭连接/结束进程，阻塞中的读取也会返回。
+
+        Args:
+            prompt: 提示词内容
+            cancel_event: 取消事件（可选）
+            **kwargs: 与ask()相同的其他参数
+
+        Yields:
+            响应文本片段（按顺序拼接即完整响应）
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        yield self.ask(prompt, **kwargs)
+
 
 class ClaudeClient(AIClient):
     """Claude API客户端（直接调用）"""
@@ -105,6 +146,51 @@ class ClaudeClient(AIClient):
         Returns:
             Claude的响应文本
         """
+        self._validate_prompt(prompt)
+
+        try:
+            message = self.client.messages.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **_anthropic_payload(prompt)
+            )
+            return message.content[0].text
+        except Exception as e:
+            raise self._api_error(e)
+
+    def ask_stream(self, prompt: str, cancel_event: Optional[threading.Event] = None,
+                   max_tokens: int = 4096, temperature: float = 1.0) -> Iterator[str]:
+        """
+        流式请求Claude API（SSE），逐段返回文本
+
+        Args:
+            prompt: 提示词
+            cancel_event: 取消事件（可选）
+            max_tokens: 最大Token数
+            temperature: 温度参数（0-1）
+        """
+        self._validate_prompt(prompt)
+
+        try:
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **_anthropic_payload(prompt)
+            ) as stream:
+                with CancelWatcher(cancel_event, stream.close) as watcher:
+                    for text in stream.text_stream:
+                        if watcher.cancelled:
+                            break
+                        yield text
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            raise self._api_error(e)
+
+    def _validate_prompt(self, prompt: str):
+        """检查提示词非空且不超长"""
         if not prompt or not prompt.strip():
             raise AIDiagnosisError(
                 message="提示词不能为空",
@@ -122,53 +208,48 @@ class ClaudeClient(AIClient):
                 severity=ErrorSeverity.MEDIUM
             )
 
-        try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                messages=[{"role": "user", "content": prompt}]
+    def _api_error(self, e: Exception) -> AIDiagnosisError:
+        """按错误信息归类API调用异常"""
+        if isinstance(e, AIDiagnosisError):
+            return e
+
+        error_msg = str(e)
+        if "rate" in error_msg.lower() or "quota" in error_msg.lower():
+            return AIDiagnosisError(
+                message="API调用频率限制或配额不足",
+                ai_service="Claude",
+                request_type="问答",
+                user_message="API调用频率过高，请稍后重试或检查配额",
+                cause=e,
+                severity=ErrorSeverity.MEDIUM
+            )
+        elif "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
+            return AIDiagnosisError(
+                message="API认证失败",
+                ai_service="Claude",
+                request_type="问答",
+                user_message="API Key无效，请检查配置",
+                cause=e,
+                severity=ErrorSeverity.HIGH
+            )
+        elif "timeout" in error_msg.lower():
+            return AIDiagnosisError(
+                message="请求超时",
+                ai_service="Claude",
+                request_type="问答",
+                user_message="AI服务响应超时，请稍后重试",
+                cause=e,
+                severity=ErrorSeverity.MEDIUM
+            )
+        else:
+            return AIDiagnosisError(
+                message=f"Claude API调用失败: {error_msg}",
+                ai_service="Claude",
+                request_type="问答",
+                user_message="AI服务暂时不可用，请稍后重试",
+                cause=e,
+                severity=ErrorSeverity.MEDIUM
             )
-            return message.content[0].text
-        except Exception as e:
-            # 分析具体错误类型
-            error_msg = str(e)
-            if "rate" in error_msg.lower() or "quota" in error_msg.lower():
-                raise AIDiagnosisError(
-                    message="API调用频率限制或配额不足",
-                    ai_service="Claude",
-                    request_type="问答",
-                    user_message="API调用频率过高，请稍后重试或检查配额",
-                    cause=e,
-                    severity=ErrorSeverity.MEDIUM
-                )
-            elif "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
-                raise AIDiagnosisError(
-                    message="API认证失败",
-                    ai_service="Claude",
-                    request_type="问答",
-                    user_message="API Key无效，请检查配置",
-                    cause=e,
-                    severity=ErrorSeverity.HIGH
-                )
-            elif "timeout" in error_msg.lower():
-                raise AIDiagnosisError(
-                    message="请求超时",
-                    ai_service="Claude",
-                    request_type="问答",
-                    user_message="AI服务响应超时，请稍后重试",
-                    cause=e,
-                    severity=ErrorSeverity.MEDIUM
-                )
-            else:
-                raise AIDiagnosisError(
-                    message=f"Claude API调用失败: {error_msg}",
-                    ai_service="Claude",
-                    request_type="问答",
-                    user_message="AI服务暂时不可用，请稍后重试",
-                    cause=e,
-                    severity=ErrorSeverity.MEDIUM
-                )
 
 
 class OpenAIClient(AIClient):
@@ -210,12 +291,43 @@ class OpenAIClient(AIClient):
             response = self.client.chat.completions.create(
                 model=self.model,
                 temperature=temperature,
-                messages=[{"role": "user", "content": prompt}]
+                messages=_openai_messages(prompt)
             )
             return response.choices[0].message.content
         except Exception as e:
             raise RuntimeError(f"OpenAI API调用失败: {str(e)}")
 
+    def ask_stream(self, prompt: str, cancel_event: Optional[threading.Event] = None,
+                   temperature: float = 1.0) -> Iterator[str]:
+        """
+        流式请求OpenAI API（SSE），逐段返回文本
+
+        Args:
+            prompt: 提示词
+            cancel_event: 取消事件（可选）
+            temperature: 温度参数（0-2）
+        """
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                temperature=temperature,
+                messages=_openai_messages(prompt),
+                stream=True
+            )
+            with CancelWatcher(cancel_event, stream.close) as watcher:
+                for chunk in stream:
+                    if watcher.cancelled:
+                        break
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        yield content
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            raise RuntimeError(f"OpenAI API调用失败: {str(e)}")
+
 
 class OllamaClient(AIClient):
     """Ollama本地模型客户端（完全免费）"""
@@ -284,6 +396,39 @@ class OllamaClient(AIClient):
         except Exception as e:
             raise RuntimeError(f"Ollama调用失败: {str(e)}")
 
+    def ask_stream(self, prompt: str, cancel_event: Optional[threading.Event] = None,
+                   temperature: float = 0.8) -> Iterator[str]:
+        """
+        流式请求Ollama（每行一个JSON对象），逐段返回文本
+
+        Args:
+            prompt: 提示词
+            cancel_event: 取消事件（可选）
+            temperature: 温度参数（0-1）
+        """
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "options": {
+                "temperature": temperature
+            }
+        }
+        try:
+            for line in iter_http_lines(f"{self.base_url}/api/generate", payload,
+                                        timeout=120, cancel_event=cancel_event):
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get('error'):
+                    raise RuntimeError(data['error'])
+                if data.get('response'):
+                    yield data['response']
+                if data.get('done'):
+                    break
+        except Exception as e:
+            raise RuntimeError(f"Ollama调用失败: {str(e)}")
+
 
 class ClaudeCodeClient(AIClient):
     """
@@ -292,17 +437,18 @@ class ClaudeCodeClient(AIClient):
     利用现有的Claude Code连接，无需额外API Key。
     """
 
-    def __init__(self, claude_path: str = ""):
+    def __init__(self, claude_path: str = "", persistent: bool = False):
         """
         初始化并检测可用的连接方式
 
         Args:
             claude_path: claude命令的完整路径（可选，留空自动检测）
+            persistent: 是否使用预热的claude进程（不支持时自动回退为单次调用）
         """
         # 延迟导入，避免循环依赖
         from .claude_code_client import ClaudeCodeProxyClient
 
-        self.proxy_client = ClaudeCodeProxyClient(claude_path=claude_path)
+        self.proxy_client = ClaudeCodeProxyClient(claude_path=claude_path, persistent=persistent)
 
         # 检测可用性
         if not self.proxy_client.is_available():
@@ -329,6 +475,21 @@ class ClaudeCodeClient(AIClient):
         except Exception as e:
             raise RuntimeError(f"Claude Code代理调用失败: {str(e)}")
 
+    def ask_stream(self, prompt: str, cancel_event: Optional[threading.Event] = None,
+                   **kwargs) -> Iterator[str]:
+        """
+        通过Claude Code流式发送请求（逐段读取CLI输出）
+
+        Args:
+            prompt: 提示词
+            cancel_event: 取消事件（可选，置位后结束claude进程）
+            **kwargs: 其他参数
+        """
+        try:
+            yield from self.proxy_client.ask_stream(prompt, cancel_event=cancel_event)
+        except Exception as e:
+            raise RuntimeError(f"Claude Code代理调用失败: {str(e)}")
+
 
 class AIClientFactory:
     """AI客户端工厂"""
@@ -337,7 +498,8 @@ class AIClientFactory:
     def create(service: str = "ClaudeCode",
                api_key: Optional[str] = None,
                model: Optional[str] = None,
-               claude_path: str = "") -> AIClient:
+               claude_path: str = "",
+               persistent: bool = False) -> AIClient:
         """
         创建AI客户端实例
 
@@ -346,6 +508,7 @@ class AIClientFactory:
             api_key: API密钥（Claude Code不需要）
             model: 模型名称（Claude Code不需要）
             claude_path: claude命令的完整路径（可选）
+            persistent: Claude Code是否使用预热的常驻进程
 
         Returns:
             AIClient实例
@@ -362,7 +525,7 @@ class AIClientFactory:
             >>> client = AIClientFactory.create("ClaudeCode", claude_path="/path/to/claude")
         """
         if service == "ClaudeCode":
-            return ClaudeCodeClient(claude_path=claude_path)
+            return ClaudeCodeClient(claude_path=claude_path, persistent=persistent)
 
         elif service == "Claude":
             # 尝试从环境变量获取API Key
@@ -403,6 +566,37 @@ class AIClientFactory:
                 f"支持的服务: ClaudeCode, Claude, OpenAI, Ollama"
             )
 
+    @staticmethod
+    def get_scheduler():
+        """
+        获取全局AI请求调度器
+
+        所有经调度器的请求共享并发上限、按后端限流与重复请求合并。
+        """
+        from .ai_scheduler import get_global_scheduler
+        return get_global_scheduler()
+
+    @staticmethod
+    def create_scheduled(service: str = "ClaudeCode", priority: Optional[int] = None,
+                         **kwargs) -> AIClient:
+        """
+        创建经全局调度器转发的客户端
+
+        Args:
+            service: 服务类型（同create）
+            priority: 调度优先级（默认交互式，批量任务使用 PRIORITY_BATCH）
+            **kwargs: 传给create的其他参数
+
+        Example:
+            >>> client = AIClientFactory.create_scheduled("ClaudeCode")
+            >>> batch = client.with_priority(PRIORITY_BATCH)
+        """
+        from .ai_scheduler import PRIORITY_INTERACTIVE, ScheduledAIClient
+        client = AIClientFactory.create(service, **kwargs)
+        return ScheduledAIClient(
+            client, AIClientFactory.get_scheduler(),
+            priority=PRIORITY_INTERACTIVE if priority is None else priority)
+
     @staticmethod
     def auto_detect() -> AIClient:
         """
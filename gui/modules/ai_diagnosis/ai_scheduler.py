@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI请求调度器
+
+替代各处 threading.Thread(target=_ask) 的即发即弃调用:
+1. 有界工作线程池: 同时进行的AI请求数不超过 max_workers
+2. 按后端的令牌桶限流: 避免连续触发后端的频率限制
+3. 进行中请求合并: 相同提示词 (AnalysisCache._compute_hash 归一化后相同) 只发送一次,
+   后来的调用方共享同一结果; 流式调用方会先收到已输出的片段再继续接收
+4. 优先级: 交互式请求 (聊天、右键分析) 先于批量请求 (分块摘要等) 出队
+5. 失败重试: 频率限制、超时、5xx等可重试错误按指数退避重试
+   (已向调用方输出片段后不再重试,避免重复内容)
+
+使用示例:
+    scheduler = get_global_scheduler()
+    future = scheduler.submit(client, prompt, priority=PRIORITY_BATCH)
+    text = future.result()
+
+    for chunk in scheduler.stream(client, prompt, cancel_event=cancel_event):
+        print(chunk, end='')
+
+    # 或通过工厂获得已接入调度器的客户端
+    client = AIClientFactory.create_scheduled("ClaudeCode")
+"""
+
+import heapq
+import itertools
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .ai_client import AIClient
+    from .analysis_cache import AnalysisCache
+except ImportError:
+    from ai_client import AIClient
+    from analysis_cache import AnalysisCache
+
+logger = logging.getLogger(__name__)
+
+# 优先级 (数值越小越先执行)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+DEFAULT_MAX_WORKERS = 3
+DEFAULT_MAX_RETRIES = 2
+
+# 各后端默认限流: 客户端类名 -> (每分钟请求数, 突发容量); None表示不限流 (本地模型)
+DEFAULT_RATE_LIMITS: Dict[str, Optional[Tuple[float, int]]] = {
+    'ClaudeCodeClient': (20, 3),
+    'ClaudeClient': (50, 5),
+    'OpenAIClient': (60, 5),
+    'OllamaClient': None,
+}
+
+# 可重试错误的特征 (频率限制、超时、服务端过载/5xx)
+_RETRYABLE_PATTERN = re.compile(
+    r'\b(?:429|5\d\d)\b|rate.?limit|overloaded|timeout|timed out|temporarily|超时|频率')
+
+
+def is_retryable(error: BaseException) -> bool:
+    """判断错误是否值得重试 (输入错误、认证失败等重试也不会成功)"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, (ValueError, TypeError, KeyError)):
+        return False
+    cause = getattr(error, 'cause', None) or error.__cause__
+    return bool(_RETRYABLE_PATTERN.search(f"{error} {cause or ''}".lower()))
+
+
+class TokenBucket:
+    """
+    令牌桶限流器 (线程安全)
+
+    以 rate 个/秒的速度补充令牌,最多积累 capacity 个,允许短时突发。
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量 (突发请求数)
+        """
+        if rate <= 0:
+            raise ValueError("rate必须大于0")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """尝试取一个令牌; 成功返回0,否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, cancel_event: Optional[threading.Event] = None) -> bool:
+        """阻塞直到取得令牌; cancel_event置位时返回False"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class _Job:
+    """调度中的一个请求 (可能被多个调用方共享)"""
+
+    __slots__ = ('key', 'client', 'backend', 'prompt', 'kwargs', 'priority',
+                 'chunks', 'listeners', 'started', 'finished', 'cancel_event')
+
+    def __init__(self, key, client: AIClient, backend: str, prompt: str, kwargs: Dict, priority: int):
+        self.key = key
+        self.client = client
+        self.backend = backend
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self.priority = priority
+        self.chunks: List[str] = []           # 已输出的片段 (供后加入的调用方补发)
+        self.listeners: List[Callable] = []   # listener(kind, value): ('chunk', text) / ('end', error)
+        self.started = False
+        self.finished = False
+        self.cancel_event = threading.Event()  # 所有调用方都离开时置位,中止后端请求
+
+
+class AIRequestScheduler:
+    """
+    AI请求调度器
+
+    所有请求在内部统一按流式执行 (后端未实现流式时 ask_stream 一次性返回),
+    submit() 的Future在结束时拿到拼接后的完整文本。
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 rate_limits: Optional[Dict[str, Optional[Tuple[float, int]]]] = None,
+                 poll_interval: float = 0.05):
+        """
+        Args:
+            max_workers: 最大并发请求数
+            max_retries: 可重试错误的最大重试次数
+            backoff_base: 首次重试等待秒数 (之后每次翻倍,带随机抖动)
+            backoff_max: 单次等待上限
+            rate_limits: 覆盖默认限流配置 {后端名: (每分钟请求数, 突发容量) 或 None}
+            poll_interval: 流式调用方检查取消事件的间隔
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+
+        self._rate_limits = dict(DEFAULT_RATE_LIMITS)
+        self._rate_limits.update(rate_limits or {})
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, int, _Job]] = []
+        self._seq = itertools.count()
+        self._inflight: Dict[tuple, _Job] = {}
+        self._workers: List[threading.Thread] = []
+        self._active = 0
+        self._shutdown = False
+
+        self.stats = {
+            'submitted': 0,   # 调用方请求数
+            'coalesced': 0,   # 合并到进行中请求的次数
+            'executed': 0,    # 实际发往后端的请求数
+            'retries': 0,
+            'failed': 0,
+            'cancelled': 0,
+        }
+
+    # ========== 配置 ==========
+
+    def set_rate_limit(self, backend: str, per_minute: Optional[float], burst: int = 1):
+        """设置后端限流 (per_minute为None表示不限流)"""
+        with self._cond:
+            self._rate_limits[backend] = (per_minute, burst) if per_minute else None
+            self._buckets.pop(backend, None)
+
+    def _bucket(self, backend: str) -> Optional[TokenBucket]:
+        with self._cond:
+            if backend not in self._buckets:
+                limit = self._rate_limits.get(backend)
+                self._buckets[backend] = TokenBucket(limit[0] / 60.0, limit[1]) if limit else None
+            return self._buckets[backend]
+
+    # ========== 提交 ==========
+
+    def submit(self, client: AIClient, prompt: str, priority: int = PRIORITY_INTERACTIVE,
+               backend: Optional[str] = None, coalesce: bool = True, **kwargs) -> Future:
+        """
+        提交请求,返回完整响应文本的Future
+
+        Future.cancel() 在结果返回前有效; 共享同一请求的调用方全部取消后才中止后端请求。
+        """
+        future: Future = Future()
+        parts: List[str] = []
+
+        def listener(kind, value):
+            if kind == 'chunk':
+                parts.append(value)
+                return
+            if future.done():
+                return
+            try:
+                if value is not None:
+                    future.set_exception(value)
+                else:
+                    future.set_result(''.join(parts))
+            except InvalidStateError:
+                pass  # 与cancel()竞争,调用方已放弃
+
+        job = self._enqueue(client, prompt, priority, backend, coalesce, kwargs, listener)
+        future.add_done_callback(lambda f: f.cancelled() and self._unsubscribe(job, listener))
+        return future
+
+    def ask(self, client: AIClient, prompt: str, priority: int = PRIORITY_INTERACTIVE,
+            timeout: Optional[float] = None, **kwargs) -> str:
+        """同步请求 (阻塞等待结果)"""
+        return self.submit(client, prompt, priority=priority, **kwargs).result(timeout)
+
+    def stream(self, client: AIClient, prompt: str, priority: int = PRIORITY_INTERACTIVE,
+               backend: Optional[str] = None, cancel_event: Optional[threading.Event] = None,
+               coalesce: bool = True, **kwargs) -> Iterator[str]:
+        """
+        流式请求 (生成器)
+
+        排队期间与输出期间都响应cancel_event; 停止迭代或cancel_event置位即离开,
+        没有其他调用方共享时中止后端请求并释放工作线程。
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            return
+
+        events: 'queue.Queue' = queue.Queue()
+        listener = lambda kind, value: events.put((kind, value))
+        job = self._enqueue(client, prompt, priority, backend, coalesce, kwargs, listener)
+        try:
+            while True:
+                try:
+                    kind, value = events.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    continue
+                if kind == 'end':
+                    if value is not None:
+                        raise value
+                    return
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                yield value
+        finally:
+            self._unsubscribe(job, listener)
+
+    def _enqueue(self, client: AIClient, prompt: str, priority: int, backend: Optional[str],
+                 coalesce: bool, kwargs: Dict, listener: Callable) -> _Job:
+        """创建或合并请求,并登记监听者"""
+        backend = backend or type(client).__name__
+        key = (backend, AnalysisCache._compute_hash(prompt), repr(sorted(kwargs.items())))
+
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("AI请求调度器已关闭")
+            self.stats['submitted'] += 1
+
+            job = self._inflight.get(key) if coalesce else None
+            if job is not None:
+                self.stats['coalesced'] += 1
+                if priority < job.priority and not job.started:
+                    # 提升优先级: 压入新的堆项,旧项出队时因优先级不符被跳过
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job))
+                    self._cond.notify()
+            else:
+                job = _Job(key, client, backend, prompt, kwargs, priority)
+                if coalesce:
+                    self._inflight[key] = job
+                heapq.heappush(self._heap, (priority, next(self._seq), job))
+                self._cond.notify()
+
+            # 补发已输出的片段后再登记,保证片段顺序
+            for chunk in job.chunks:
+                listener('chunk', chunk)
+            job.listeners.append(listener)
+            self._ensure_workers()
+        return job
+
+    def _unsubscribe(self, job: _Job, listener: Callable):
+        """调用方离开; 最后一个离开时中止请求"""
+        with self._cond:
+            if listener in job.listeners:
+                job.listeners.remove(listener)
+            if job.listeners or job.finished or job.cancel_event.is_set():
+                return
+            job.cancel_event.set()
+            self.stats['cancelled'] += 1
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+    # ========== 执行 ==========
+
+    def _ensure_workers(self):
+        """按需启动工作线程 (调用时需持有锁)"""
+        idle = len(self._workers) - self._active
+        if idle < len(self._heap) and len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"ai-scheduler-{len(self._workers)}")
+            self._workers.append(worker)
+            worker.start()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                priority, _, job = heapq.heappop(self._heap)
+                if job.started or priority != job.priority:
+                    continue
+                job.started = True
+                if job.cancel_event.is_set():
+                    continue
+                self._active += 1
+                self._ensure_workers()
+            try:
+                self._run(job)
+            finally:
+                with self._cond:
+                    self._active -= 1
+
+    def _run(self, job: _Job):
+        """执行请求: 限流 -> 调用后端 -> 可重试错误退避重试"""
+        attempt = 0
+        bucket = self._bucket(job.backend)
+        while True:
+            if job.cancel_event.is_set():
+                self._finish(job)
+                return
+            if bucket is not None and not bucket.acquire(job.cancel_event):
+                continue
+
+            try:
+                with self._cond:
+                    self.stats['executed'] += 1
+                for chunk in job.client.ask_stream(job.prompt, cancel_event=job.cancel_event, **job.kwargs):
+                    if job.cancel_event.is_set():
+                        break
+                    if chunk:
+                        self._publish(job, chunk)
+                self._finish(job)
+                return
+            except Exception as e:
+                if job.chunks or attempt >= self.max_retries or not is_retryable(e):
+                    self._finish(job, e)
+                    return
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                attempt += 1
+                with self._cond:
+                    self.stats['retries'] += 1
+                logger.info(f"AI请求失败,{delay:.1f}秒后第{attempt}次重试: {e}")
+                job.cancel_event.wait(delay)
+
+    def _publish(self, job: _Job, chunk: str):
+        with self._cond:
+            job.chunks.append(chunk)
+            for listener in job.listeners:
+                listener('chunk', chunk)
+
+    def _finish(self, job: _Job, error: Optional[BaseException] = None):
+        with self._cond:
+            job.finished = True
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            if error is not None:
+                self.stats['failed'] += 1
+            listeners = list(job.listeners)
+            job.listeners.clear()
+        # 结束通知在锁外调用 (Future回调中可能再次提交请求)
+        for listener in listeners:
+            listener('end', error)
+
+    # ========== 状态 ==========
+
+    def get_stats(self) -> Dict[str, int]:
+        """调度统计 (含当前排队与执行中的请求数)"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['queued'] = sum(1 for priority, _, job in self._heap
+                                  if not job.started and priority == job.priority)
+            stats['active'] = self._active
+            stats['inflight'] = len(self._inflight)
+            return stats
+
+    def shutdown(self):
+        """停止调度 (排队中的请求不再执行,进行中的请求被取消)"""
+        with self._cond:
+            self._shutdown = True
+            pending = [job for _, _, job in self._heap] + list(self._inflight.values())
+            self._heap.clear()
+            self._cond.notify_all()
+        for job in pending:
+            job.cancel_event.set()
+            if not job.started:
+                self._finish(job, RuntimeError("AI请求调度器已关闭"))
+
+
+class ScheduledAIClient(AIClient):
+    """
+    经调度器转发的AI客户端
+
+    与普通 AIClient 接口一致,可以直接替换面板中的客户端;
+    未定义的属性转发给被包装的客户端。
+    """
+
+    def __init__(self, client: AIClient, scheduler: Optional[AIRequestScheduler] = None,
+                 priority: int = PRIORITY_INTERACTIVE, backend: Optional[str] = None):
+        self.client = client
+        self.scheduler = scheduler or get_global_scheduler()
+        self.priority = priority
+        self.backend = backend or type(client).__name__
+
+    def ask(self, prompt: str, **kwargs) -> str:
+        return self.scheduler.submit(self.client, prompt, priority=self.priority,
+                                     backend=self.backend, **kwargs).result()
+
+    def ask_stream(self, prompt: str, cancel_event: Optional[threading.Event] = None,
+                   **kwargs) -> Iterator[str]:
+        return self.scheduler.stream(self.client, prompt, priority=self.priority, backend=self.backend,
+                                     cancel_event=cancel_event, **kwargs)
+
+    def submit(self, prompt: str, **kwargs) -> Future:
+        """异步提交,返回Future"""
+        return self.scheduler.submit(self.client, prompt, priority=self.priority,
+                                     backend=self.backend, **kwargs)
+
+    def with_priority(self, priority: int) -> 'ScheduledAIClient':
+        """同一后端、不同优先级的客户端 (如批量摘要使用 PRIORITY_BATCH)"""
+        return ScheduledAIClient(self.client, self.scheduler, priority, self.backend)
+
+    def __getattr__(self, name):
+        if name == 'client':
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+# 全局调度器实例
+_global_scheduler: Optional[AIRequestScheduler] = None
+_global_lock = threading.Lock()
+
+
+def get_global_scheduler() -> AIRequestScheduler:
+    """获取全局调度器 (单例模式,所有窗口共享并发与限流额度)"""
+    global _global_scheduler
+    with _global_lock:
+        if _global_scheduler is None:
+            _global_scheduler = AIRequestScheduler()
+        return _global_scheduler
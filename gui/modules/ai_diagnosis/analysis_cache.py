@@ -8,8 +8,8 @@ AI分析结果缓存系统
 核心功能:
 1. 基于日志内容哈希的智能缓存
 2. LRU淘汰策略 (最近最少使用)
-3. 持久化存储 (JSON格式)
-4. 相似日志匹配 (模糊查找)
+3. 持久化存储 (SQLite WAL逐条写入,多窗口共享; JSON用于导入导出)
+4. 相似日志匹配 (模糊查找, MinHash + LSH分桶索引)
 5. 缓存统计与管理
 """
 
@@ -21,6 +21,16 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any
 from dataclasses import dataclass, asdict, field
 
+try:
+    from .cache_store import SQLiteCacheStore
+    from .minhash_lsh import LSHIndex, MinHasher, jaccard, tokenize
+except ImportError:
+    from cache_store import SQLiteCacheStore
+    from minhash_lsh import LSHIndex, MinHasher, jaccard, tokenize
+
+# 阈值不低于此值时使用LSH候选（此时漏检概率 < 0.1%），更低的阈值退回全量扫描
+LSH_MIN_THRESHOLD = 0.7
+
 
 @dataclass
 class CacheEntry:
@@ -33,6 +43,7 @@ class CacheEntry:
     hit_count: int = 0              # 命中次数
     last_accessed: datetime = field(default_factory=datetime.now)  # 最后访问时间
     metadata: Dict = field(default_factory=dict)  # 额外元数据
+    signature: List[int] = field(default_factory=list)  # query_text的MinHash签名
 
     def to_dict(self) -> Dict:
         """转换为字典 (用于JSON序列化)"""
@@ -66,25 +77,41 @@ class AnalysisCache:
             # 保存到缓存
             cache.put("分析这条日志...", result, problem_type="崩溃")
 
-        # 持久化
+        # 持久化: 指定store_path后每次put立即写入SQLite,无需手动保存
+        cache = AnalysisCache(max_size=100, store_path="ai_cache.db")
+
+        # 导出为JSON
         cache.save_to_file("ai_cache.json")
     """
 
-    def __init__(self, max_size: int = 200, cache_file: str = None):
+    def __init__(self, max_size: int = 200, cache_file: str = None, store_path: str = None):
         """
         初始化缓存管理器
 
         Args:
-            max_size: 最大缓存条目数 (LRU淘汰)
-            cache_file: 持久化文件路径 (可选)
+            max_size: 内存中最大缓存条目数 (LRU淘汰)
+            cache_file: JSON缓存文件路径 (可选,初始化时导入)
+            store_path: SQLite存储路径 (可选,逐条持久化,多进程共享)
         """
         self.max_size = max_size
         self.cache_file = cache_file
 
+        # 持久化存储: 内存LRU在前,存储在后;启动时不加载,首次查询时再加载最近条目
+        self.store: Optional[SQLiteCacheStore] = SQLiteCacheStore(store_path) if store_path else None
+        self._loaded = self.store is None
+
         # 使用OrderedDict实现LRU缓存
         # key: query_hash, value: CacheEntry
         self.cache: OrderedDict[str, CacheEntry] = OrderedDict()
 
+        # 相似查找索引: 词集合与LSH分桶只在条目加入时计算一次
+        self._hasher = MinHasher()
+        self._lsh = LSHIndex(num_perm=self._hasher.num_perm)
+        self._tokens: Dict[str, frozenset] = {}
+        # LRU顺序号（越小越久未用），用于相似度并列时与全量扫描保持同样的选择
+        self._order: Dict[str, int] = {}
+        self._order_seq = 0
+
         # 统计信息
         self.stats = {
             'total_queries': 0,
@@ -113,14 +140,24 @@ class AnalysisCache:
         # 计算查询哈希
         query_hash = self._compute_hash(query)
 
-        # 精确匹配
-        if query_hash in self.cache:
-            entry = self.cache[query_hash]
+        self._ensure_loaded()
+
+        # 精确匹配 (内存未命中时查存储,可能由其他窗口写入)
+        entry = self.cache.get(query_hash)
+        if entry is None and self.store is not None:
+            row = self.store.get(query_hash)
+            if row is not None:
+                entry = CacheEntry(**row)
+                self._insert(entry)
+
+        if entry is not None:
             entry.hit_count += 1
             entry.last_accessed = datetime.now()
 
             # 移动到末尾 (LRU)
             self.cache.move_to_end(query_hash)
+            self._touch(query_hash)
+            self._persist_hit(entry)
 
             self.stats['cache_hits'] += 1
             return entry.ai_response
@@ -131,6 +168,7 @@ class AnalysisCache:
             if similar_entry:
                 similar_entry.hit_count += 1
                 similar_entry.last_accessed = datetime.now()
+                self._persist_hit(similar_entry)
                 self.stats['cache_hits'] += 1
                 return similar_entry.ai_response
 
@@ -159,14 +197,11 @@ class AnalysisCache:
             metadata=metadata
         )
 
-        # 添加到缓存
-        self.cache[query_hash] = entry
-        self.cache.move_to_end(query_hash)
-
-        # LRU淘汰
-        if len(self.cache) > self.max_size:
-            evicted_key, _ = self.cache.popitem(last=False)
-            self.stats['evictions'] += 1
+        # 添加到缓存 (签名在建索引时计算,随条目一起写入存储)
+        self._ensure_loaded()
+        self._insert(entry)
+        if self.store is not None:
+            self.store.put(entry)
 
     def invalidate(self, query: str):
         """
@@ -178,10 +213,18 @@ class AnalysisCache:
         query_hash = self._compute_hash(query)
         if query_hash in self.cache:
             del self.cache[query_hash]
+            self._unindex(query_hash)
+        if self.store is not None:
+            self.store.delete(query_hash)
 
     def clear(self):
         """清空缓存"""
         self.cache.clear()
+        self._lsh.clear()
+        self._tokens.clear()
+        self._order.clear()
+        if self.store is not None:
+            self.store.clear()
         self.stats['evictions'] += len(self.cache)
 
     def cleanup_expired(self, max_age_hours: int = 24):
@@ -201,13 +244,18 @@ class AnalysisCache:
 
         for key in expired_keys:
             del self.cache[key]
+            self._unindex(key)
             self.stats['evictions'] += 1
 
-        return len(expired_keys)
+        removed = len(expired_keys)
+        if self.store is not None:
+            # 存储中可能还有未加载到内存的过期条目
+            removed = max(removed, self.store.delete_older_than(now - timedelta(hours=max_age_hours)))
+        return removed
 
     def save_to_file(self, filepath: str = None):
         """
-        持久化缓存到文件
+        导出缓存到JSON文件 (有存储时导出存储中的全部条目)
 
         Args:
             filepath: 文件路径 (如果为None,使用初始化时的cache_file)
@@ -221,20 +269,20 @@ class AnalysisCache:
                 'version': '1.0',
                 'saved_at': datetime.now().isoformat(),
                 'stats': self.stats,
-                'entries': [entry.to_dict() for entry in self.cache.values()]
+                'entries': [entry.to_dict() for entry in self._all_entries()]
             }
 
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
 
-            print(f"✓ 缓存已保存: {len(self.cache)}条 → {filepath}")
+            print(f"✓ 缓存已保存: {len(data['entries'])}条 → {filepath}")
 
         except Exception as e:
             print(f"✗ 保存缓存失败: {e}")
 
     def load_from_file(self, filepath: str):
         """
-        从文件加载缓存
+        从JSON文件加载缓存 (有存储时同时导入存储)
 
         Args:
             filepath: 文件路径
@@ -249,9 +297,12 @@ class AnalysisCache:
 
             # 加载缓存条目
             if 'entries' in data:
-                for entry_dict in data['entries']:
-                    entry = CacheEntry.from_dict(entry_dict)
-                    self.cache[entry.query_hash] = entry
+                self._ensure_loaded()
+                entries = [CacheEntry.from_dict(entry_dict) for entry_dict in data['entries']]
+                for entry in entries:
+                    self._insert(entry)
+                if self.store is not None:
+                    self.store.put_many(entries)
 
             print(f"✓ 缓存已加载: {len(self.cache)}条 ← {filepath}")
 
@@ -270,17 +321,21 @@ class AnalysisCache:
                 'hit_rate': 命中率,
                 'size': 当前缓存大小,
                 'evictions': 淘汰次数,
+                'persisted': 存储中的条目数 (仅有存储时),
             }
         """
         total = self.stats['total_queries']
         hits = self.stats['cache_hits']
         hit_rate = (hits / total * 100) if total > 0 else 0
 
-        return {
+        result = {
             **self.stats,
             'hit_rate': f"{hit_rate:.1f}%",
             'size': len(self.cache),
         }
+        if self.store is not None:
+            result['persisted'] = self.store.count()
+        return result
 
     def get_top_queries(self, limit: int = 10) -> List[Dict]:
         """
@@ -292,6 +347,7 @@ class AnalysisCache:
         Returns:
             [{query, hit_count, problem_type}] 列表
         """
+        self._ensure_loaded()
         sorted_entries = sorted(
             self.cache.values(),
             key=lambda e: e.hit_count,
@@ -305,11 +361,13 @@ class AnalysisCache:
             'last_accessed': entry.last_accessed.isoformat(),
         } for entry in sorted_entries[:limit]]
 
-    def _compute_hash(self, text: str) -> str:
+    @staticmethod
+    def _compute_hash(text: str) -> str:
         """
         计算文本哈希
 
         使用SHA256并截断为16位,平衡性能和冲突率。
+        (静态方法: 请求调度器也用它作为合并重复请求的键)
         """
         # 归一化: 去除空白、转小写
         normalized = ''.join(text.split()).lower()
@@ -322,7 +380,11 @@ class AnalysisCache:
 
     def _find_similar(self, query: str, threshold: float) -> Optional[CacheEntry]:
         """
-        查找相似查询 (简单实现,基于共同词数量)
+        查找相似查询 (基于词集合的Jaccard相似度)
+
+        阈值 >= LSH_MIN_THRESHOLD 时只校验LSH候选,否则扫描全部条目;
+        两种路径都按精确Jaccard判定,返回相似度最高且 >= threshold 的条目,
+        并列时取最久未使用的条目 (与按LRU顺序扫描的结果一致)。
 
         Args:
             query: 查询文本
@@ -331,40 +393,104 @@ class AnalysisCache:
         Returns:
             相似的缓存条目,如果不存在返回None
         """
-        query_words = set(query.lower().split())
-
-        best_match = None
-        best_score = 0.0
-
-        for entry in self.cache.values():
-            entry_words = set(entry.query_text.lower().split())
+        query_words = tokenize(query)
+        if not query_words:
+            return None
 
-            # 计算Jaccard相似度
-            intersection = len(query_words & entry_words)
-            union = len(query_words | entry_words)
+        if threshold >= LSH_MIN_THRESHOLD:
+            keys = self._lsh.query(self._hasher.signature(query_words))
+        else:
+            keys = self.cache.keys()
 
-            if union == 0:
+        best_key = None
+        best_rank = (0.0, 0)
+        for key in keys:
+            similarity = jaccard(query_words, self._tokens[key])
+            if similarity < threshold or similarity == 0.0:
                 continue
+            rank = (similarity, -self._order[key])
+            if rank > best_rank:
+                best_rank = rank
+                best_key = key
+
+        return self.cache[best_key] if best_key is not None else None
+
+    def close(self):
+        """关闭持久化存储"""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def _ensure_loaded(self):
+        """首次使用时从存储加载最近访问的 max_size 条到内存"""
+        if self._loaded:
+            return
+        self._loaded = True
+        for row in self.store.recent(self.max_size):
+            entry = CacheEntry(**row)
+            if entry.query_hash not in self.cache:
+                self._insert(entry)
+
+    def _insert(self, entry: CacheEntry):
+        """放入内存LRU并建立索引;超出上限时淘汰最久未用条目 (存储中保留)"""
+        self.cache[entry.query_hash] = entry
+        self.cache.move_to_end(entry.query_hash)
+        self._index_entry(entry)
 
-            similarity = intersection / union
-
-            if similarity >= threshold and similarity > best_score:
-                best_score = similarity
-                best_match = entry
+        if len(self.cache) > self.max_size:
+            evicted_key, _ = self.cache.popitem(last=False)
+            self._unindex(evicted_key)
+            self.stats['evictions'] += 1
 
-        return best_match
+    def _persist_hit(self, entry: CacheEntry):
+        """把命中计数写回存储"""
+        if self.store is not None:
+            self.store.touch(entry.query_hash, entry.hit_count, entry.last_accessed)
+
+    def _all_entries(self) -> List[CacheEntry]:
+        """全部条目:有存储时以存储为准 (内存中的命中计数更新)"""
+        if self.store is None:
+            return list(self.cache.values())
+        entries = []
+        for row in self.store.iter_entries():
+            entries.append(self.cache.get(row['query_hash']) or CacheEntry(**row))
+        return entries
+
+    def _index_entry(self, entry: CacheEntry):
+        """为条目建立相似查找索引 (签名缺失或参数不符时重新计算)"""
+        words = frozenset(tokenize(entry.query_text))
+        if len(entry.signature) != self._hasher.num_perm:
+            entry.signature = self._hasher.signature(words)
+        self._tokens[entry.query_hash] = words
+        self._lsh.insert(entry.query_hash, entry.signature)
+        self._touch(entry.query_hash)
+
+    def _unindex(self, query_hash: str):
+        """移除条目的相似查找索引"""
+        self._lsh.remove(query_hash)
+        self._tokens.pop(query_hash, None)
+        self._order.pop(query_hash, None)
+
+    def _touch(self, query_hash: str):
+        """记录条目移动到LRU末尾"""
+        self._order_seq += 1
+        self._order[query_hash] = self._order_seq
 
 
 # 全局缓存实例 (可选)
 _global_cache: Optional[AnalysisCache] = None
 
 
-def get_global_cache(cache_file: str = None) -> AnalysisCache:
+def get_global_cache(cache_file: str = None, store_path: str = None) -> AnalysisCache:
     """
     获取全局缓存实例 (单例模式)
 
+    默认使用临时目录下的SQLite存储,多个分析器窗口共享同一份缓存。
+    旧版本的JSON缓存文件在存储为空时自动导入一次,导入后重命名为 .migrated。
+
     Args:
-        cache_file: 缓存文件路径 (首次调用时设置)
+        cache_file: 旧版JSON缓存文件路径 (首次调用时设置)
+        store_path: SQLite存储路径 (首次调用时设置)
 
     Returns:
         全局缓存实例
@@ -373,13 +499,21 @@ def get_global_cache(cache_file: str = None) -> AnalysisCache:
 
     if _global_cache is None:
         # 默认缓存文件路径
-        if cache_file is None:
+        if cache_file is None or store_path is None:
             import tempfile
             cache_dir = os.path.join(tempfile.gettempdir(), 'xinyu_devtools')
             os.makedirs(cache_dir, exist_ok=True)
-            cache_file = os.path.join(cache_dir, 'ai_analysis_cache.json')
+            cache_file = cache_file or os.path.join(cache_dir, 'ai_analysis_cache.json')
+            store_path = store_path or os.path.join(cache_dir, 'ai_analysis_cache.db')
+
+        _global_cache = AnalysisCache(max_size=200, store_path=store_path)
 
-        _global_cache = AnalysisCache(max_size=200, cache_file=cache_file)
+        if os.path.exists(cache_file) and _global_cache.store.count() == 0:
+            _global_cache.load_from_file(cache_file)
+            try:
+                os.replace(cache_file, cache_file + '.migrated')
+            except OSError:
+                pass
 
     return _global_cache
 
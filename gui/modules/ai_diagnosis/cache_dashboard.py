@@ -311,6 +311,7 @@ class CacheDashboard(tk.Toplevel):
 命中率: {stats['hit_rate']}
 
 当前缓存大小: {stats['size']}
+持久化条目: {stats.get('persisted', '-')}
 淘汰次数: {stats['evictions']}
 
 === 性能指标 ===
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI分析缓存的持久化存储 (SQLite WAL)
+
+替代整文件 json.dump 的保存方式:
+1. 每次 put 只写一行 (INSERT OR REPLACE),命中时只更新命中计数
+2. WAL模式: 读写互不阻塞,多个分析器窗口(多进程)可以共享同一个缓存文件
+3. 启动时不读取全部条目,由 AnalysisCache 按需加载最近使用的部分
+
+存储层只处理行数据 (dict),不依赖 CacheEntry,避免与 analysis_cache 循环导入。
+"""
+
+import json
+import os
+import sqlite3
+import struct
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+# 持久化条目上限 (超出时按最后访问时间淘汰最旧的)
+DEFAULT_MAX_ENTRIES = 5000
+
+_COLUMNS = ('query_hash', 'query_text', 'ai_response', 'problem_type',
+            'timestamp', 'hit_count', 'last_accessed', 'metadata', 'signature')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    query_hash    TEXT PRIMARY KEY,
+    query_text    TEXT NOT NULL,
+    ai_response   TEXT NOT NULL,
+    problem_type  TEXT NOT NULL DEFAULT '',
+    timestamp     REAL NOT NULL,
+    hit_count     INTEGER NOT NULL DEFAULT 0,
+    last_accessed REAL NOT NULL,
+    metadata      TEXT NOT NULL DEFAULT '{}',
+    signature     BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_accessed ON entries(last_accessed);
+CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp);
+"""
+
+_INSERT_SQL = (f"INSERT OR REPLACE INTO entries ({', '.join(_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(_COLUMNS))})")
+
+
+def _pack_signature(signature: List[int]) -> Optional[bytes]:
+    if not signature:
+        return None
+    return struct.pack(f'<{len(signature)}I', *signature)
+
+
+def _unpack_signature(blob: Optional[bytes]) -> List[int]:
+    if not blob:
+        return []
+    return list(struct.unpack(f'<{len(blob) // 4}I', blob))
+
+
+def _entry_values(entry) -> tuple:
+    """CacheEntry -> 按 _COLUMNS 顺序的行数据"""
+    return (
+        entry.query_hash,
+        entry.query_text,
+        entry.ai_response,
+        entry.problem_type,
+        entry.timestamp.timestamp(),
+        entry.hit_count,
+        entry.last_accessed.timestamp(),
+        json.dumps(entry.metadata, ensure_ascii=False, default=str),
+        _pack_signature(entry.signature),
+    )
+
+
+class SQLiteCacheStore:
+    """
+    基于SQLite WAL的缓存存储
+
+    使用示例:
+        store = SQLiteCacheStore("ai_cache.db")
+        store.put(entry)
+        row = store.get(entry.query_hash)
+        store.touch(entry.query_hash, entry.hit_count, entry.last_accessed)
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, timeout: float = 5.0):
+        """
+        打开(或创建)存储
+
+        Args:
+            path: 数据库文件路径
+            max_entries: 持久化条目上限 (打开时清理超出部分)
+            timeout: 其他进程持有写锁时的等待秒数
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # 自动提交模式: 每条语句就是一个事务,写入后立即对其他进程可见
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        self.prune()
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        return {
+            'query_hash': row['query_hash'],
+            'query_text': row['query_text'],
+            'ai_response': row['ai_response'],
+            'problem_type': row['problem_type'],
+            'timestamp': datetime.fromtimestamp(row['timestamp']),
+            'hit_count': row['hit_count'],
+            'last_accessed': datetime.fromtimestamp(row['last_accessed']),
+            'metadata': json.loads(row['metadata'] or '{}'),
+            'signature': _unpack_signature(row['signature']),
+        }
+
+    def put(self, entry):
+        """写入(或覆盖)一个条目 (CacheEntry或具有相同属性的对象)"""
+        values = _entry_values(entry)
+        with self._lock:
+            self._conn.execute(_INSERT_SQL, values)
+
+    def put_many(self, entries: List):
+        """在一个事务中批量写入 (导入旧JSON缓存时使用)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(_INSERT_SQL, [_entry_values(entry) for entry in entries])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, query_hash: str) -> Optional[Dict]:
+        """按哈希读取条目,不存在返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM entries WHERE query_hash = ?", (query_hash,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def touch(self, query_hash: str, hit_count: int, last_accessed: datetime):
+        """更新命中计数与最后访问时间"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET hit_count = ?, last_accessed = ? WHERE query_hash = ?",
+                (hit_count, last_accessed.timestamp(), query_hash))
+
+    def delete(self, query_hash: str):
+        """删除条目"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE query_hash = ?", (query_hash,))
+
+    def delete_older_than(self, cutoff: datetime) -> int:
+        """删除创建时间早于cutoff的条目,返回删除数量"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM entries WHERE timestamp < ?", (cutoff.timestamp(),))
+            return cursor.rowcount
+
+    def clear(self):
+        """删除全部条目"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def recent(self, limit: int) -> List[Dict]:
+        """最近访问的limit个条目,按最后访问时间升序 (最旧在前,便于按LRU顺序放入内存)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM entries ORDER BY last_accessed DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_dict(row) for row in reversed(rows)]
+
+    def iter_entries(self) -> Iterator[Dict]:
+        """按最后访问时间升序遍历全部条目"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM entries ORDER BY last_accessed").fetchall()
+        for row in rows:
+            yield self._row_to_dict(row)
+
+    def count(self) -> int:
+        """持久化条目数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def prune(self, max_entries: Optional[int] = None) -> int:
+        """按最后访问时间淘汰超出上限的条目,返回删除数量"""
+        limit = self.max_entries if max_entries is None else max_entries
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE query_hash IN ("
+                "SELECT query_hash FROM entries ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+                (limit,))
+            return cursor.rowcount
+
+    def close(self):
+        """关闭连接"""
+        with self._lock:
+            self._conn.close()
@@ -11,11 +11,20 @@ Claude Code代理客户端
 优先级：HTTP API > CLI调用 > MCP
 """
 
+import codecs
 import os
 import shutil
 import subprocess
 import tempfile
-from typing import List, Optional
+import threading
+from typing import Iterator, List, Optional
+
+try:
+    from .claude_code_worker import STREAM_JSON_ARGS, ClaudeCodeWorkerError, ClaudeCodeWorkerPool
+    from .streaming import CancelWatcher, iter_anthropic_text, iter_http_lines, iter_sse
+except ImportError:
+    from claude_code_worker import STREAM_JSON_ARGS, ClaudeCodeWorkerError, ClaudeCodeWorkerPool
+    from streaming import CancelWatcher, iter_anthropic_text, iter_http_lines, iter_sse
 
 
 class ClaudeCodeProxyClient:
@@ -23,15 +32,21 @@ class ClaudeCodeProxyClient:
     Claude Code代理客户端
 
     通过现有的Claude Code会话进行AI交互，无需额外API Key。
+    常驻模式（persistent=True）下使用预热的claude进程，进程启动与初始化不计入提问耗时；
+    每次提问使用全新的进程（全新的对话），不会带上之前的提问。
+    常驻进程不可用时自动回退为单次调用。
     """
 
-    def __init__(self, timeout: int = 60, claude_path: str = ""):
+    def __init__(self, timeout: int = 60, claude_path: str = "", persistent: bool = False,
+                 pool_size: int = 2):
         """
         初始化Claude Code代理客户端
 
         Args:
             timeout: 请求超时时间（秒）
             claude_path: claude命令的完整路径（可选，留空自动检测）
+            persistent: 是否使用预热的常驻进程
+            pool_size: 常驻进程数（含预热中的进程）
 
         Example:
             >>> client = ClaudeCodeProxyClient()
@@ -42,6 +57,10 @@ class ClaudeCodeProxyClient:
         self.temp_files = []  # 跟踪临时文件，用于清理
         self._claude_cmd = None  # 存储检测到的命令名
         self.custom_claude_path = claude_path  # 用户指定的路径
+        self.persistent = persistent
+        self.pool_size = pool_size
+        self._pool: Optional[ClaudeCodeWorkerPool] = None
+        self._pool_lock = threading.Lock()
 
     def is_available(self) -> bool:
         """
@@ -137,8 +156,11 @@ class ClaudeCodeProxyClient:
             >>> response = client.ask("分析这个日志文件", context_files=["error.log"])
             >>> print(response)
         """
-        # 方式1: 尝试通过CLI调用
         try:
+            # 方式1: 常驻进程
+            if self.persistent:
+                return ''.join(self.ask_stream(prompt, context_files)).strip()
+            # 方式2: 单次CLI调用
             return self._ask_via_cli(prompt, context_files)
         except Exception as e:
             raise RuntimeError(f"Claude Code调用失败: {str(e)}")
@@ -154,46 +176,14 @@ class ClaudeCodeProxyClient:
         Returns:
             响应文本
         """
-        # 确保已检测到可用命令
-        if not self._claude_cmd:
-            if not self.is_available():
-                raise RuntimeError(
-                    "找不到claude或claude-code命令。请确保：\n"
-                    "1. Claude Code已正确安装\n"
-                    "2. claude命令在系统PATH中\n"
-                    "3. 您正在Claude Code会话中运行"
-                )
+        self._ensure_command()
 
         try:
-            # 构建完整提示词
-            full_prompt = prompt
-            if context_files:
-                context_content = []
-                for file_path in context_files:
-                    if os.path.exists(file_path):
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                                context_content.append(f"## 文件: {file_path}\n```\n{content}\n```\n")
-                        except Exception as e:
-                            print(f"警告: 无法读取上下文文件 {file_path}: {e}")
-
-                if context_content:
-                    full_prompt = '\n'.join(context_content) + '\n\n' + prompt
+            full_prompt = self._build_prompt(prompt, context_files)
 
             # 构建命令 - 使用 -p/--print 模式
             cmd = [self._claude_cmd, '-p']
-
-            # 获取环境变量（关键:传递完整的PATH）
-            env = os.environ.copy()
-
-            # 如果通过nvm安装,确保NODE路径在PATH中
-            if '.nvm' in self._claude_cmd:
-                nvm_bin = os.path.dirname(self._claude_cmd)
-                if 'PATH' in env:
-                    env['PATH'] = f"{nvm_bin}:{env['PATH']}"
-                else:
-                    env['PATH'] = nvm_bin
+            env = self._build_env()
 
             # 执行命令，通过stdin传递提示词
             result = subprocess.run(
@@ -230,6 +220,169 @@ class ClaudeCodeProxyClient:
                 "3. 您正在Claude Code会话中运行"
             )
 
+    def ask_stream(self, prompt: str, context_files: Optional[List[str]] = None,
+                   cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        流式提问：输出一到达就逐段返回，不等待请求结束
+
+        常驻模式下上下文文件以路径传递；常驻进程在输出任何内容前失败时回退为单次调用，
+        从未成功响应过（CLI不支持stream-json协议）则关闭常驻模式。
+
+        Args:
+            prompt: 提示词内容
+            context_files: 可选的上下文文件路径列表
+            cancel_event: 取消事件（可选，置位后结束claude进程）
+
+        Raises:
+            RuntimeError: 当调用失败时
+            TimeoutError: 当请求超时时
+        """
+        if self.persistent:
+            pool = self._get_pool()
+            yielded = False
+            try:
+                for chunk in pool.stream(prompt, context_files, timeout=self.timeout, cancel_event=cancel_event):
+                    yielded = True
+                    yield chunk
+                return
+            except ClaudeCodeWorkerError as e:
+                if yielded:
+                    raise RuntimeError(str(e))
+                if not pool.responded:
+                    print(f"⚠️  Claude常驻进程不可用，改为单次调用: {e}")
+                    self.persistent = False
+                    self.close()
+
+        yield from self._stream_via_cli(prompt, context_files, cancel_event)
+
+    def _stream_via_cli(self, prompt: str, context_files: Optional[List[str]] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """启动单次 claude -p 进程流式读取输出"""
+        self._ensure_command()
+        full_prompt = self._build_prompt(prompt, context_files)
+
+        try:
+            process = subprocess.Popen(
+                [self._claude_cmd, '-p'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=self._build_env()
+            )
+        except FileNotFoundError:
+            raise RuntimeError(f"找不到{self._claude_cmd}命令，请检查Claude Code安装")
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        with CancelWatcher(cancel_event, process.kill, timeout=self.timeout) as watcher:
+            try:
+                # 提示词一次写完后关闭stdin，claude才会开始处理
+                process.stdin.write(full_prompt.encode('utf-8'))
+                process.stdin.close()
+
+                fd = process.stdout.fileno()
+                while True:
+                    data = os.read(fd, 4096)
+                    if not data:
+                        break
+                    text = decoder.decode(data)
+                    if text:
+                        yield text
+                tail = decoder.decode(b'', final=True)
+                if tail:
+                    yield tail
+
+                returncode = process.wait()
+            except (BrokenPipeError, OSError):
+                if not (watcher.cancelled or watcher.timed_out):
+                    raise
+                returncode = process.wait()
+            finally:
+                # 调用方提前结束迭代时也要结束进程
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                stderr = process.stderr.read().decode('utf-8', errors='replace')
+                process.stdout.close()
+                process.stderr.close()
+
+        if watcher.timed_out:
+            raise TimeoutError(f"Claude响应超时（{self.timeout}秒）")
+        if watcher.cancelled:
+            return
+        if returncode != 0:
+            raise RuntimeError(
+                f"Claude返回错误码 {returncode}\n"
+                f"错误信息: {stderr[:200] if stderr else '(空)'}"
+            )
+
+    def _get_pool(self) -> ClaudeCodeWorkerPool:
+        """延迟创建常驻进程池（环境变量只在启动进程时复制一次）"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._ensure_command()
+                cmd = self._claude_cmd
+                self._pool = ClaudeCodeWorkerPool(
+                    lambda context_dir: [cmd, '-p', '--add-dir', context_dir, *STREAM_JSON_ARGS],
+                    env=self._build_env(),
+                    size=self.pool_size
+                )
+            return self._pool
+
+    def health_check(self) -> dict:
+        """常驻进程池状态（回收不健康的空闲进程）"""
+        if self._pool is None:
+            return {'idle': 0, 'busy': 0}
+        return self._pool.health_check()
+
+    def close(self):
+        """关闭常驻进程"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+
+    def _ensure_command(self):
+        """确保已检测到可用命令"""
+        if not self._claude_cmd:
+            if not self.is_available():
+                raise RuntimeError(
+                    "找不到claude或claude-code命令。请确保：\n"
+                    "1. Claude Code已正确安装\n"
+                    "2. claude命令在系统PATH中\n"
+                    "3. 您正在Claude Code会话中运行"
+                )
+
+    def _build_prompt(self, prompt: str, context_files: Optional[List[str]] = None) -> str:
+        """把上下文文件内容拼接到提示词前"""
+        full_prompt = prompt
+        if context_files:
+            context_content = []
+            for file_path in context_files:
+                if os.path.exists(file_path):
+                    try:
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            content = f.read()
+                            context_content.append(f"## 文件: {file_path}\n```\n{content}\n```\n")
+                    except Exception as e:
+                        print(f"警告: 无法读取上下文文件 {file_path}: {e}")
+
+            if context_content:
+                full_prompt = '\n'.join(context_content) + '\n\n' + prompt
+        return full_prompt
+
+    def _build_env(self) -> dict:
+        """子进程环境变量（关键:传递完整的PATH）"""
+        env = os.environ.copy()
+
+        # 如果通过nvm安装,确保NODE路径在PATH中
+        if '.nvm' in self._claude_cmd:
+            nvm_bin = os.path.dirname(self._claude_cmd)
+            if 'PATH' in env:
+                env['PATH'] = f"{nvm_bin}:{env['PATH']}"
+            else:
+                env['PATH'] = nvm_bin
+        return env
+
     def _create_temp_file(self, content: str, suffix: str = '.txt') -> str:
         """
         创建临时文件
@@ -281,8 +434,10 @@ class ClaudeCodeProxyClient:
             self._cleanup_temp_file(file_path)
 
     def __del__(self):
-        """析构函数，自动清理临时文件"""
+        """析构函数，自动清理临时文件与常驻进程"""
         self.cleanup_all()
+        if getattr(self, '_pool', None) is not None:
+            self._pool.close()
 
 
 class ClaudeCodeHTTPClient:
@@ -354,6 +509,29 @@ class ClaudeCodeHTTPClient:
         except Exception as e:
             raise RuntimeError(f"HTTP请求失败: {str(e)}")
 
+    def ask_stream(self, prompt: str, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        通过HTTP API流式请求（Anthropic Messages SSE格式）
+
+        Args:
+            prompt: 提示词
+            cancel_event: 取消事件（可选）
+        """
+        payload = {
+            "model": "claude-3-5-sonnet-20241022",
+            "max_tokens": 4096,
+            "stream": True,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+        try:
+            lines = iter_http_lines(f"{self.base_url}/v1/messages", payload,
+                                    timeout=self.timeout, cancel_event=cancel_event)
+            yield from iter_anthropic_text(iter_sse(lines))
+        except Exception as e:
+            raise RuntimeError(f"HTTP请求失败: {str(e)}")
+
 
 # 便捷函数
 def create_claude_code_client(timeout: int = 60) -> ClaudeCodeProxyClient:
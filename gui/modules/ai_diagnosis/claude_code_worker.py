@@ -0,0 +1,485 @@
+"""
+Claude Code常驻工作进程
+
+每次提问都启动一个新的 `claude -p` 进程时，进程启动与初始化的耗时往往超过
+短问题本身的响应时间。本模块提前启动claude进程并让其在后台完成初始化，
+通过stdin/stdout上的stream-json协议处理请求：
+
+- ClaudeCodeWorker: 一个常驻进程，一次处理一个请求（逐行JSON输入/输出）
+- ClaudeCodeWorkerPool: 预热进程池。一个stream-json进程就是一段对话，
+  后续请求会带上之前的所有轮次，因此单次请求各自使用一个全新的预热进程，
+  用完即结束并在后台预热替补；取用时做健康检查，进程退出或空闲过久时重建
+- ClaudeCodeConversation: 显式的多轮对话，各轮固定在同一进程上（由进程保留历史），
+  调用方每轮只发送新的内容
+
+大段上下文（上下文文件、超长提示词）写入池的上下文目录，请求中只传文件路径，
+由claude通过Read工具按需读取，不再整段内联到提示词中。
+
+协议（claude -p --input-format stream-json --output-format stream-json）:
+    输入: {"type": "user", "message": {"role": "user", "content": [{"type": "text", "text": ...}]}}
+    输出: {"type": "stream_event", "event": {...content_block_delta...}}   增量文本
+          {"type": "assistant", "message": {"content": [{"type": "text", ...}]}}  整段文本
+          {"type": "result", "is_error": false, "result": ...}             本次请求结束
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    from .streaming import CancelWatcher
+except ImportError:
+    from streaming import CancelWatcher
+
+# 常驻模式的命令行参数
+STREAM_JSON_ARGS = [
+    '--input-format', 'stream-json',
+    '--output-format', 'stream-json',
+    '--verbose',
+    '--include-partial-messages',
+    '--allowedTools', 'Read',
+]
+
+DEFAULT_POOL_SIZE = 2
+# 空闲超过该秒数的进程在下次取用时重建（避免长时间闲置的会话状态过旧）
+DEFAULT_MAX_IDLE = 600
+# 超过该字符数的提示词改为写入上下文文件，只传文件路径
+DEFAULT_INLINE_LIMIT = 20000
+
+
+class ClaudeCodeWorkerError(RuntimeError):
+    """常驻进程无法启动或未按stream-json协议响应（调用方可回退为单次调用）"""
+
+
+class ClaudeCodeWorker:
+    """单个常驻claude进程"""
+
+    def __init__(self, command: List[str], env: Optional[Dict[str, str]] = None,
+                 max_idle: float = DEFAULT_MAX_IDLE):
+        """
+        Args:
+            command: 启动命令（含 -p 与stream-json参数）
+            env: 子进程环境变量
+            max_idle: 空闲多少秒后回收
+        """
+        self.command = command
+        self.env = env
+        self.max_idle = max_idle
+        self.requests = 0  # 已发送的轮次（进程内对话的长度）
+        self.responded = False  # 是否成功完成过请求（用于判断协议是否可用）
+        self.last_used = time.monotonic()
+        self.process: Optional[subprocess.Popen] = None
+        self._stderr = None
+
+    def start(self) -> 'ClaudeCodeWorker':
+        """启动进程"""
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+                env=self.env
+            )
+        except OSError as e:
+            self._stderr.close()
+            raise ClaudeCodeWorkerError(f"无法启动Claude常驻进程: {e}")
+        self.last_used = time.monotonic()
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def fresh(self) -> bool:
+        """是否尚未处理过请求（进程内没有对话历史）"""
+        return self.requests == 0
+
+    def is_healthy(self) -> bool:
+        """健康检查：进程存活、未空闲过久"""
+        return self.alive and time.monotonic() - self.last_used < self.max_idle
+
+    def request(self, prompt: str, timeout: Optional[float] = None,
+                cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        发送一个请求，逐段返回响应文本
+
+        超时或取消时结束进程（进程无法中途放弃当前请求，由池负责重建）。
+
+        Raises:
+            TimeoutError: 请求超时
+            RuntimeError: claude返回错误结果
+            ClaudeCodeWorkerError: 进程退出或输出不符合协议
+        """
+        if not self.alive:
+            raise ClaudeCodeWorkerError("Claude常驻进程未运行")
+
+        self.requests += 1
+        message = {'type': 'user', 'message': {'role': 'user', 'content': [{'type': 'text', 'text': prompt}]}}
+        finished = False
+        with CancelWatcher(cancel_event, self.kill, timeout=timeout) as watcher:
+            try:
+                self.process.stdin.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.process.stdin.flush()
+
+                streamed = False
+                for line in iter(self.process.stdout.readline, b''):
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    kind = event.get('type')
+                    if kind == 'stream_event':
+                        delta = event.get('event', {}).get('delta', {})
+                        if delta.get('type') == 'text_delta' and delta.get('text'):
+                            streamed = True
+                            yield delta['text']
+                    elif kind == 'assistant' and not streamed:
+                        for block in event.get('message', {}).get('content', []):
+                            if block.get('type') == 'text' and block.get('text'):
+                                yield block['text']
+                    elif kind == 'result':
+                        finished = True
+                        self.responded = True
+                        if event.get('is_error'):
+                            raise RuntimeError(f"Claude返回错误: {event.get('result') or event.get('subtype')}")
+                        return
+            except (BrokenPipeError, OSError):
+                if not (watcher.cancelled or watcher.timed_out):
+                    raise ClaudeCodeWorkerError(f"Claude常驻进程通信失败: {self.stderr_tail()}")
+            finally:
+                self.last_used = time.monotonic()
+                # 未读到result就结束（取消、超时、调用方提前停止迭代）时进程状态不可复用
+                if not finished:
+                    self.kill()
+
+        if watcher.timed_out:
+            raise TimeoutError(f"Claude响应超时（{round(timeout, 1)}秒）")
+        if watcher.cancelled:
+            return
+        raise ClaudeCodeWorkerError(f"Claude常驻进程意外退出: {self.stderr_tail() or '(无错误输出)'}")
+
+    def stderr_tail(self, limit: int = 200) -> str:
+        """读取错误输出的末尾部分"""
+        if self._stderr is None or self._stderr.closed:
+            return ''
+        try:
+            self._stderr.seek(0)
+            return self._stderr.read().decode('utf-8', errors='replace')[-limit:].strip()
+        except (OSError, ValueError):
+            return ''
+
+    def kill(self):
+        """立即结束进程（等待回收，避免随后的健康检查仍看到存活）"""
+        if self.alive:
+            self.process.kill()
+            self.process.wait()
+
+    def close(self, wait: float = 2.0):
+        """关闭stdin让进程自然退出，超时后强制结束"""
+        if self.process is None:
+            return
+        try:
+            if self.alive:
+                self.process.stdin.close()
+                self.process.wait(wait)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        finally:
+            if self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+            for stream in (self.process.stdin, self.process.stdout):
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+            if self._stderr is not None:
+                self._stderr.close()
+
+
+class ClaudeCodeWorkerPool:
+    """
+    预热进程池
+
+    单次请求（stream/ask）各自使用一个全新的进程，请求之间不共享对话历史；
+    进程的启动与初始化在请求之前于后台完成。需要多轮对话时使用 conversation()。
+
+    使用示例:
+        pool = ClaudeCodeWorkerPool(lambda ctx_dir: [claude, '-p', '--add-dir', ctx_dir, *STREAM_JSON_ARGS])
+        for chunk in pool.stream("分析这个日志", context_files=["crash.log"], timeout=60):
+            print(chunk, end='')
+
+        with pool.conversation() as conversation:
+            conversation.ask("这段日志里有哪些崩溃？")
+            conversation.ask("第一个崩溃的原因是什么？")  # 进程内保留上一轮
+        pool.close()
+    """
+
+    def __init__(self, command_factory: Callable[[str], List[str]], env: Optional[Dict[str, str]] = None,
+                 size: int = DEFAULT_POOL_SIZE, max_idle: float = DEFAULT_MAX_IDLE,
+                 inline_limit: int = DEFAULT_INLINE_LIMIT):
+        """
+        Args:
+            command_factory: 根据上下文目录生成启动命令
+            env: 子进程环境变量（只在启动进程时复制一次）
+            size: 最大进程数（含预热中的空闲进程）
+            max_idle: 进程空闲回收秒数
+            inline_limit: 提示词超过该字符数时改为文件引用
+        """
+        self.command_factory = command_factory
+        self.env = env
+        self.size = max(1, size)
+        self.max_idle = max_idle
+        self.inline_limit = inline_limit
+        self.context_dir = tempfile.mkdtemp(prefix='xinyu_claude_ctx_')
+
+        self._cond = threading.Condition()
+        self._idle: List[ClaudeCodeWorker] = []  # 预热完成、尚未处理过请求的进程
+        self._busy = 0  # 使用中与启动中的进程数
+        self._closed = False
+        self.responded = False  # 是否有进程成功完成过请求（否则视为CLI不支持常驻协议）
+        self.stats = {'started': 0, 'recycled': 0, 'retired': 0, 'requests': 0}
+
+    # ========== 请求 ==========
+
+    def stream(self, prompt: str, context_files: Optional[List[str]] = None,
+               timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        使用一个全新的预热进程处理单次请求，逐段返回响应
+
+        请求结束后进程退出（不把本次对话带给后续请求），并在后台预热替补进程。
+        等待空闲进程的时间计入超时。
+        """
+        started = time.monotonic()
+        worker = self._checkout(timeout, cancel_event)
+        try:
+            remaining = None if timeout is None else max(0.1, timeout - (time.monotonic() - started))
+            yield from self._request(worker, prompt, context_files, remaining, cancel_event)
+        finally:
+            self._checkin(worker)
+
+    def ask(self, prompt: str, context_files: Optional[List[str]] = None,
+            timeout: Optional[float] = None) -> str:
+        """同步请求"""
+        return ''.join(self.stream(prompt, context_files, timeout)).strip()
+
+    def conversation(self, timeout: Optional[float] = None,
+                     cancel_event: Optional[threading.Event] = None) -> 'ClaudeCodeConversation':
+        """
+        开始一段多轮对话（占用一个进程直到对话关闭）
+
+        Args:
+            timeout: 等待空闲进程的超时
+            cancel_event: 等待期间的取消事件
+        """
+        return ClaudeCodeConversation(self, self._checkout(timeout, cancel_event))
+
+    def _request(self, worker: ClaudeCodeWorker, prompt: str, context_files: Optional[List[str]],
+                 timeout: Optional[float], cancel_event: Optional[threading.Event]) -> Iterator[str]:
+        """在指定进程上发送一轮请求，结束后删除本轮的上下文文件"""
+        refs: List[str] = []
+        try:
+            message = self._build_message(prompt, context_files, refs)
+            with self._cond:
+                self.stats['requests'] += 1
+            yield from worker.request(message, timeout=timeout, cancel_event=cancel_event)
+        finally:
+            if worker.responded:
+                self.responded = True
+            for path in refs:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _build_message(self, prompt: str, context_files: Optional[List[str]], refs: List[str]) -> str:
+        """把上下文文件与超长提示词放入上下文目录，消息中只保留文件路径"""
+        paths = []
+        for file_path in context_files or []:
+            if os.path.exists(file_path):
+                paths.append(self._place(file_path, refs))
+
+        if len(prompt) > self.inline_limit:
+            path = os.path.join(self.context_dir, f"prompt_{uuid.uuid4().hex}.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(prompt)
+            refs.append(path)
+            prompt = "完整的请求内容较长，已保存在下面的文件中。请先读取该文件，再按其中的要求回答。"
+            paths.insert(0, path)
+
+        if not paths:
+            return prompt
+        listing = '\n'.join(f"- {path}" for path in paths)
+        return f"{prompt}\n\n【上下文文件（请使用Read工具读取）】\n{listing}"
+
+    def _place(self, file_path: str, refs: List[str]) -> str:
+        """让文件出现在上下文目录中（优先硬链接，不复制内容）"""
+        target = os.path.join(self.context_dir, f"{uuid.uuid4().hex[:8]}_{os.path.basename(file_path)}")
+        try:
+            os.link(file_path, target)
+        except OSError:
+            shutil.copyfile(file_path, target)
+        refs.append(target)
+        return target
+
+    # ========== 进程管理 ==========
+
+    def _checkout(self, timeout: Optional[float], cancel_event: Optional[threading.Event]) -> ClaudeCodeWorker:
+        """取用一个全新的进程（优先使用预热完成的空闲进程）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Claude常驻进程池已关闭")
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.fresh and worker.is_healthy():
+                        self._busy += 1
+                        return worker
+                    self._recycle(worker)
+                if self._busy < self.size:
+                    self._busy += 1
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RuntimeError("请求已取消")
+                wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+                if wait <= 0:
+                    raise TimeoutError("等待Claude常驻进程超时")
+                self._cond.wait(wait)
+
+        # 在锁外启动新进程
+        try:
+            return self._start_worker()
+        except Exception:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, worker: ClaudeCodeWorker):
+        """归还进程：处理过请求的进程带有对话历史，结束后预热替补"""
+        with self._cond:
+            self._busy -= 1
+            if worker.fresh and worker.is_healthy() and not self._closed:
+                self._idle.append(worker)
+                self._cond.notify()
+                return
+            if worker.alive:
+                self.stats['retired'] += 1
+                worker.close(wait=0.5)
+            else:
+                self._recycle(worker)
+            self._cond.notify()
+        self._prewarm()
+
+    def _prewarm(self):
+        """在有空位时启动一个进程，让其初始化与下一个请求之前的空闲时间重叠"""
+        with self._cond:
+            if self._closed or self._idle or self._busy >= self.size:
+                return
+            self._busy += 1
+        try:
+            worker = self._start_worker()
+        except Exception:
+            worker = None
+        with self._cond:
+            self._busy -= 1
+            if worker is not None:
+                if self._closed:
+                    worker.close(wait=0)
+                else:
+                    self._idle.append(worker)
+            self._cond.notify()
+
+    def _start_worker(self) -> ClaudeCodeWorker:
+        worker = ClaudeCodeWorker(self.command_factory(self.context_dir), self.env, self.max_idle).start()
+        with self._cond:
+            self.stats['started'] += 1
+        return worker
+
+    def _recycle(self, worker: ClaudeCodeWorker):
+        self.stats['recycled'] += 1
+        worker.close(wait=0.5)
+
+    def health_check(self) -> Dict[str, int]:
+        """回收不健康的空闲进程，返回池状态"""
+        with self._cond:
+            healthy = []
+            for worker in self._idle:
+                if worker.is_healthy():
+                    healthy.append(worker)
+                else:
+                    self._recycle(worker)
+            self._idle = healthy
+            return {'idle': len(self._idle), 'busy': self._busy, **self.stats}
+
+    def close(self):
+        """关闭所有进程并删除上下文目录"""
+        with self._cond:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in workers:
+            worker.close()
+        shutil.rmtree(self.context_dir, ignore_errors=True)
+
+
+class ClaudeCodeConversation:
+    """
+    显式的多轮对话
+
+    各轮请求固定在同一进程上，由claude进程保留之前的轮次；调用方每轮只发送新的内容。
+    对话关闭后进程退出，不会被其他请求复用。
+    """
+
+    def __init__(self, pool: ClaudeCodeWorkerPool, worker: ClaudeCodeWorker):
+        self.pool = pool
+        self.worker = worker
+        self.closed = False
+
+    @property
+    def turns(self) -> int:
+        """已发送的轮次"""
+        return self.worker.requests
+
+    def stream(self, prompt: str, context_files: Optional[List[str]] = None,
+               timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        发送下一轮，逐段返回响应
+
+        Raises:
+            ClaudeCodeWorkerError: 对话已关闭或进程已结束（超时/取消后对话历史不可恢复）
+        """
+        if self.closed or not self.worker.alive:
+            raise ClaudeCodeWorkerError("Claude对话已结束")
+        yield from self.pool._request(self.worker, prompt, context_files, timeout, cancel_event)
+
+    def ask(self, prompt: str, context_files: Optional[List[str]] = None,
+            timeout: Optional[float] = None) -> str:
+        """同步发送下一轮"""
+        return ''.join(self.stream(prompt, context_files, timeout)).strip()
+
+    def close(self):
+        """结束对话并归还进程"""
+        if not self.closed:
+            self.closed = True
+            self.pool._checkin(self.worker)
+
+    def __enter__(self) -> 'ClaudeCodeConversation':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
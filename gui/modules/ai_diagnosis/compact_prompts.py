@@ -4,6 +4,11 @@
 通过精简提示词，减少无效token消耗，保留关键指导内容。
 """
 
+try:
+    from .token_counter import get_token_counter
+except ImportError:
+    from token_counter import get_token_counter
+
 
 class CompactPromptTemplates:
     """精简版提示词模板库"""
@@ -100,6 +105,33 @@ class CompactPromptTemplates:
 2. 引用具体日志：[{{timestamp}}] / #行号 / @模块
 3. 简明扼要，分点说明
 
+**回答**："""
+
+    # ==================== 会话问答（前缀稳定版）====================
+    # 按稳定性排序：系统指令 | 日志上下文 | 历史问答 | 本次问题；前三部分作为可缓存前缀，
+    # 不得包含随问题变化的内容
+    QA_SESSION_SYSTEM = """你是iOS/Android日志分析专家，回答用户关于日志的问题。
+
+**要求**：
+1. 基于日志回答，不要臆测
+2. 引用具体日志：[时间戳] / #行号 / @模块
+3. 简明扼要，分点说明
+
+"""
+
+    QA_SESSION_CONTEXT = """**会话日志上下文**：
+{log_summary}
+
+"""
+
+    QA_SESSION_TURN = """**历史问题**：{question}
+**历史回答**：{answer}
+
+"""
+
+    QA_SESSION_QUESTION = """{related_logs}**用户问题**：
+{user_question}
+
 **回答**："""
 
     # ==================== 智能搜索（精简版）====================
@@ -121,6 +153,43 @@ class CompactPromptTemplates:
 
 保持简洁。"""
 
+    # ==================== 分段摘要（map-reduce）====================
+    CHUNK_SUMMARY_COMPACT = """提取以下日志片段的关键信息（片段: {chunk_label}）：
+
+{log_summary}
+
+**输出**（不超过15行）：
+- 关键事件与异常，引用 [{{timestamp}}] / @模块
+- 错误/警告的模式与次数
+- 可能与其他时间段或模块相关的线索
+
+只陈述日志中的事实，不给修复建议。"""
+
+    MERGE_SUMMARIES_COMPACT = """合并以下{count}个相邻日志片段的摘要：
+
+{summaries}
+
+**输出**（不超过20行）：
+- 保留所有崩溃、高频错误及其时间/模块引用
+- 合并重复的现象，注明次数
+- 标出跨片段的因果线索
+
+只陈述事实，不给修复建议。"""
+
+    MAP_REDUCE_FINAL_COMPACT = """以下是完整日志会话按{split_desc}分为{chunk_count}段后的逐段摘要（覆盖 {entry_count} 条日志）：
+
+{summaries}
+
+**用户问题**：
+{user_question}
+
+**要求**：
+1. 综合各段摘要回答，指出问题首次出现的时间段与演变过程
+2. 引用具体日志：[{{timestamp}}] / @模块
+3. 简明扼要，分点说明
+
+**回答**："""
+
     # ==================== 模板格式化方法 ====================
 
     @classmethod
@@ -159,6 +228,28 @@ class CompactPromptTemplates:
             search_query=search_query
         )
 
+    @classmethod
+    def format_chunk_summary(cls, chunk_label: str, log_summary: str) -> str:
+        """格式化分段摘要提示词"""
+        return cls.CHUNK_SUMMARY_COMPACT.format(chunk_label=chunk_label, log_summary=log_summary)
+
+    @classmethod
+    def format_merge_summaries(cls, summaries: str, count: int) -> str:
+        """格式化摘要合并提示词（分段过多时的中间层）"""
+        return cls.MERGE_SUMMARIES_COMPACT.format(summaries=summaries, count=count)
+
+    @classmethod
+    def format_map_reduce_final(cls, summaries: str, user_question: str, split_desc: str,
+                                chunk_count: int, entry_count: int) -> str:
+        """格式化分段摘要的最终分析提示词"""
+        return cls.MAP_REDUCE_FINAL_COMPACT.format(
+            summaries=summaries,
+            user_question=user_question,
+            split_desc=split_desc,
+            chunk_count=chunk_count,
+            entry_count=entry_count
+        )
+
 
 # Token估算工具
 def estimate_prompt_tokens(template: str, **kwargs) -> int:
@@ -172,9 +263,12 @@ def estimate_prompt_tokens(template: str, **kwargs) -> int:
     Returns:
         预估token数
     """
-    filled_template = template.format(**kwargs)
-    # 保守估计：2字符 = 1 token
-    return len(filled_template) // 2
+    counter = get_token_counter()
+    if not kwargs:
+        # 已填充的提示词：直接计数
+        return counter.count(template)
+    # 模板固定部分按模板缓存，只对参数计数
+    return counter.count_template(template, **kwargs)
 
 
 # 使用示例和对比
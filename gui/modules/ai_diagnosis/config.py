@@ -24,6 +24,7 @@ class AIConfig:
         # AI服务配置 - 固定使用Claude Code
         "ai_service": "ClaudeCode",  # 仅支持ClaudeCode
         "claude_path": "",            # claude命令路径（可选，留空自动检测）
+        "claude_persistent": True,    # 预热claude进程，提问时不必等待进程启动
 
         # 功能开关
         "auto_detect": False,         # 关闭自动检测（只有一个选项）
@@ -34,6 +35,7 @@ class AIConfig:
         "max_tokens": 10000,          # 日志摘要最大Token数
         "timeout": 60,                # 请求超时时间（秒）
         "context_size": "标准",       # 上下文大小：简化/标准/详细
+        "map_reduce": True,           # 日志远超预算时分段摘要后再分析
 
         # UI配置
         "show_ai_panel": True,        # 显示AI助手面板
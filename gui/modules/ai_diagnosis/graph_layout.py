@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题链路图布局
+
+分层布局（Sugiyama）:
+1. 去环: DFS找出回边并反向,保证分层时图无环
+2. 分层: 最长路径分层 (根节点在第0层,边总是指向更深的层)
+3. 跨层边拆分: 跨越多层的边在中间层插入虚拟节点,作为连线的折点
+4. 减少交叉: 上下交替的重心排序 (barycenter),保留交叉数最少的排列
+5. 坐标: 按层内顺序等距排列,各层居中对齐
+
+布局结果与图结构绑定缓存,同一张图 (节点与连接不变) 只计算一次;
+计算不依赖Tk,可以在后台线程中进行。
+
+SpatialIndex 按网格记录节点与连线的包围盒,用于只绘制可见区域。
+"""
+
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+# 布局参数 (缩放为1时的画布坐标)
+LAYER_SPACING = 120  # 层间距
+NODE_SPACING = 110  # 同层节点间距
+MARGIN = 100  # 画布边距
+
+# 重心排序的最大轮数 (一轮 = 自上而下 + 自下而上各一次)
+MAX_SWEEPS = 12
+
+# 缓存的布局数 (满了整体清空)
+LAYOUT_CACHE_SIZE = 16
+
+
+@dataclass
+class GraphLayout:
+    """布局结果"""
+    positions: Dict[int, Tuple[float, float]]  # 节点中心坐标
+    edges: List[Tuple[int, int, List[Tuple[float, float]]]]  # (起点, 终点, 折线点列,含两端)
+    layers: List[List[int]]  # 各层节点 (按排列顺序,不含虚拟节点)
+    width: float  # 布局宽度
+    height: float  # 布局高度
+    crossings: int = 0  # 相邻层之间的连线交叉数
+    reversed_edges: Set[Tuple[int, int]] = field(default_factory=set)  # 为去环而反向的边
+
+
+def graph_signature(graph: Mapping[int, Sequence[int]]) -> Tuple:
+    """图结构签名 (节点与连接相同则签名相同)"""
+    return tuple(sorted((node, tuple(related)) for node, related in graph.items()))
+
+
+def _break_cycles(nodes: List[int], succ: Dict[int, List[int]]) -> Set[Tuple[int, int]]:
+    """迭代DFS找出回边 (指向DFS栈中节点的边)"""
+    state: Dict[int, int] = {}  # 1: 在栈中, 2: 已完成
+    back_edges = set()
+    for root in nodes:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(succ[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                child_state = state.get(child)
+                if child_state == 1:
+                    back_edges.add((node, child))
+                elif child_state is None:
+                    state[child] = 1
+                    stack.append((child, iter(succ[child])))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return back_edges
+
+
+def _assign_layers(nodes: List[int], edges: List[Tuple[int, int]]) -> Dict[int, int]:
+    """最长路径分层 (Kahn拓扑序)"""
+    succ = defaultdict(list)
+    indegree = {node: 0 for node in nodes}
+    for u, v in edges:
+        succ[u].append(v)
+        indegree[v] += 1
+
+    layer = {node: 0 for node in nodes}
+    queue = [node for node in nodes if indegree[node] == 0]
+    head = 0
+    while head < len(queue):
+        node = queue[head]
+        head += 1
+        for child in succ[node]:
+            if layer[node] + 1 > layer[child]:
+                layer[child] = layer[node] + 1
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    return layer
+
+
+def count_crossings(upper: Sequence, lower: Sequence, edges: Iterable[Tuple[Hashable, Hashable]]) -> int:
+    """
+    两层之间的连线交叉数 (按上层位置排序后统计下层位置的逆序对, O(E log V))
+
+    Args:
+        upper: 上层节点顺序
+        lower: 下层节点顺序
+        edges: (上层节点, 下层节点)
+    """
+    upper_pos = {node: i for i, node in enumerate(upper)}
+    lower_pos = {node: i for i, node in enumerate(lower)}
+    sequence = [pos for _, pos in sorted((upper_pos[u], lower_pos[v]) for u, v in edges)]
+
+    # 树状数组统计逆序对
+    size = len(lower)
+    tree = [0] * (size + 1)
+    crossings = 0
+    for seen, position in enumerate(sequence):
+        # 已加入的位置中大于position的个数
+        i = position + 1
+        not_greater = 0
+        while i > 0:
+            not_greater += tree[i]
+            i -= i & -i
+        crossings += seen - not_greater
+        i = position + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+def _total_crossings(order: List[List], down: List[List[Tuple]]) -> int:
+    return sum(count_crossings(order[i], order[i + 1], down[i]) for i in range(len(order) - 1))
+
+
+def _barycenter_sort(layer: List, neighbors: Dict, fixed_pos: Dict) -> List:
+    """按相邻层邻居位置的平均值排序 (没有邻居的节点保持原位置)"""
+    keyed = []
+    for i, node in enumerate(layer):
+        adjacent = neighbors.get(node)
+        if adjacent:
+            keyed.append((sum(fixed_pos[n] for n in adjacent) / len(adjacent), i, node))
+        else:
+            keyed.append((float(i), i, node))
+    keyed.sort()
+    return [node for _, _, node in keyed]
+
+
+def _minimize_crossings(order: List[List], down: List[List[Tuple]]) -> Tuple[List[List], int]:
+    """上下交替的重心排序,返回交叉数最少的排列"""
+    ups = []  # ups[i]: 第i+1层节点 -> 第i层邻居
+    downs = []  # downs[i]: 第i层节点 -> 第i+1层邻居
+    for edges in down:
+        up_map, down_map = defaultdict(list), defaultdict(list)
+        for u, v in edges:
+            down_map[u].append(v)
+            up_map[v].append(u)
+        ups.append(up_map)
+        downs.append(down_map)
+
+    best = [list(layer) for layer in order]
+    best_crossings = _total_crossings(best, down)
+    current = [list(layer) for layer in order]
+
+    for _ in range(MAX_SWEEPS):
+        if best_crossings == 0:
+            break
+        for i in range(1, len(current)):
+            fixed = {node: k for k, node in enumerate(current[i - 1])}
+            current[i] = _barycenter_sort(current[i], ups[i - 1], fixed)
+        for i in range(len(current) - 2, -1, -1):
+            fixed = {node: k for k, node in enumerate(current[i + 1])}
+            current[i] = _barycenter_sort(current[i], downs[i], fixed)
+
+        crossings = _total_crossings(current, down)
+        if crossings < best_crossings:
+            best = [list(layer) for layer in current]
+            best_crossings = crossings
+        else:
+            break
+
+    return best, best_crossings
+
+
+def compute_layout(graph: Mapping[int, Sequence[int]]) -> GraphLayout:
+    """
+    计算分层布局
+
+    Args:
+        graph: 节点ID -> 关联 (下游) 节点ID列表; 指向不存在节点的连接被忽略
+    """
+    nodes = list(graph.keys())
+    succ: Dict[int, List[int]] = {}
+    edges: List[Tuple[int, int]] = []
+    for node in nodes:
+        targets = []
+        for related in graph[node]:
+            if related in graph and related != node and related not in targets:
+                targets.append(related)
+                edges.append((node, related))
+        succ[node] = targets
+
+    reversed_edges = _break_cycles(nodes, succ)
+    dag_edges = [(v, u) if (u, v) in reversed_edges else (u, v) for u, v in edges]
+    layer_of = _assign_layers(nodes, dag_edges)
+
+    layer_count = max(layer_of.values()) + 1 if nodes else 0
+    order: List[List] = [[] for _ in range(layer_count)]
+    for node in nodes:
+        order[layer_of[node]].append(node)
+
+    # 拆分跨层边: 每条边变成相邻层之间的若干段,中间点为虚拟节点
+    down: List[List[Tuple]] = [[] for _ in range(max(layer_count - 1, 0))]
+    chains: List[Tuple[int, int, List]] = []
+    dummy_count = 0
+    for u, v in edges:
+        a, b = (v, u) if (u, v) in reversed_edges else (u, v)
+        chain = [a]
+        for level in range(layer_of[a] + 1, layer_of[b]):
+            dummy = ('dummy', dummy_count)
+            dummy_count += 1
+            order[level].append(dummy)
+            chain.append(dummy)
+        chain.append(b)
+        for offset, (x, y) in enumerate(zip(chain, chain[1:])):
+            down[layer_of[a] + offset].append((x, y))
+        if (u, v) in reversed_edges:
+            chain.reverse()
+        chains.append((u, v, chain))
+
+    order, crossings = _minimize_crossings(order, down)
+
+    # 坐标: 层内等距,各层以最宽层为基准居中
+    widest = max((len(layer) for layer in order), default=0)
+    width = max(widest - 1, 0) * NODE_SPACING + 2 * MARGIN
+    coords: Dict = {}
+    for level, layer in enumerate(order):
+        y = MARGIN + level * LAYER_SPACING
+        start = (width - (len(layer) - 1) * NODE_SPACING) / 2
+        for i, node in enumerate(layer):
+            coords[node] = (start + i * NODE_SPACING, y)
+
+    return GraphLayout(
+        positions={node: coords[node] for node in nodes},
+        edges=[(u, v, [coords[point] for point in chain]) for u, v, chain in chains],
+        layers=[[node for node in layer if node in graph] for layer in order],
+        width=width,
+        height=max(layer_count - 1, 0) * LAYER_SPACING + 2 * MARGIN,
+        crossings=crossings,
+        reversed_edges=reversed_edges
+    )
+
+
+# ========== 布局缓存 ==========
+
+_layout_cache: Dict[Tuple, GraphLayout] = {}
+_layout_lock = threading.Lock()
+
+
+def get_layout(graph: Mapping[int, Sequence[int]]) -> GraphLayout:
+    """获取布局 (同一图结构复用缓存结果; 可在后台线程调用)"""
+    key = graph_signature(graph)
+    layout = _layout_cache.get(key)
+    if layout is None:
+        layout = compute_layout(graph)
+        with _layout_lock:
+            if len(_layout_cache) >= LAYOUT_CACHE_SIZE:
+                _layout_cache.clear()
+            _layout_cache[key] = layout
+    return layout
+
+
+def cached_layout(graph: Mapping[int, Sequence[int]]) -> Optional[GraphLayout]:
+    """已缓存的布局 (未计算过时返回None,不触发计算)"""
+    return _layout_cache.get(graph_signature(graph))
+
+
+# ========== 可见区域查询 ==========
+
+class SpatialIndex:
+    """
+    均匀网格空间索引
+
+    按包围盒把对象登记到覆盖的网格中,查询时只检查与视口相交的网格。
+    """
+
+    def __init__(self, cell_size: float = 400):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[Hashable]] = defaultdict(list)
+        self.bounds: Dict[Hashable, Tuple[float, float, float, float]] = {}
+
+    def _cells(self, x0: float, y0: float, x1: float, y1: float):
+        size = self.cell_size
+        for cx in range(int(x0 // size), int(x1 // size) + 1):
+            for cy in range(int(y0 // size), int(y1 // size) + 1):
+                yield cx, cy
+
+    def insert(self, key: Hashable, bbox: Tuple[float, float, float, float]):
+        """登记对象 (bbox: x0, y0, x1, y1)"""
+        self.bounds[key] = bbox
+        for cell in self._cells(*bbox):
+            self.cells[cell].append(key)
+
+    def query(self, bbox: Tuple[float, float, float, float]) -> Set[Hashable]:
+        """与bbox相交的对象"""
+        x0, y0, x1, y1 = bbox
+        found = set()
+        bounds = self.bounds
+        for cell in self._cells(x0, y0, x1, y1):
+            for key in self.cells.get(cell, ()):
+                if key in found:
+                    continue
+                bx0, by0, bx1, by1 = bounds[key]
+                if bx0 <= x1 and bx1 >= x0 and by0 <= y1 and by1 >= y0:
+                    found.add(key)
+        return found
+
+    @classmethod
+    def for_layout(cls, layout: GraphLayout, node_radius: float, cell_size: float = 400) -> 'SpatialIndex':
+        """为布局中的节点 ('node', id) 与连线 ('edge', 序号) 建立索引"""
+        index = cls(cell_size)
+        for node, (x, y) in layout.positions.items():
+            index.insert(('node', node), (x - node_radius, y - node_radius, x + node_radius, y + node_radius))
+        for i, (_, _, points) in enumerate(layout.edges):
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            index.insert(('edge', i), (min(xs), min(ys), max(xs), max(ys)))
+        return index
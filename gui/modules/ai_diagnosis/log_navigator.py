@@ -11,20 +11,33 @@ AI驱动的日志导航器
 3. 问题链路追踪 (问题A → 问题B → 根因C)
 4. 一键跳转到相关日志位置
 5. 导航历史记录 (支持前进/后退)
+6. 按正则在日志数据上搜索 (只高亮可见行)
+
+行号均指日志控件中的行号: 查看器显示的是过滤、崩溃分组后的行 (DisplayedLogRows),
+条目在会话日志列表中的位置需先换算到显示行。
 """
 
+from bisect import bisect_left, bisect_right
 from typing import List, Dict, Optional, Tuple, Set
 from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 import re
 
+try:
+    from log_display import DisplayedLogRows
+except ImportError:
+    try:
+        from modules.log_display import DisplayedLogRows
+    except ImportError:
+        from gui.modules.log_display import DisplayedLogRows
+
 
 @dataclass
 class LogLocation:
     """日志位置信息"""
     line_number: int        # 行号
-    entry_index: int        # 条目索引
+    entry_index: int        # 显示行索引
     entry: object           # 日志条目对象
     timestamp: str          # 时间戳
     highlight_text: str = "" # 高亮文本
@@ -66,18 +79,29 @@ class LogNavigator:
         # 导航历史: 后退/前进
         navigator.go_back()
         navigator.go_forward()
+
+        # 按正则搜索全部显示行 (不限于已加载到控件的行), 依次跳转
+        navigator.find_logs_by_pattern(r"timeout|refused")
+        navigator.next_match()
+
+        # 跳转到会话日志中的某条日志 (换算为其显示行)
+        navigator.jump_to_log_entry(entry)
     """
 
-    def __init__(self, log_text_widget, all_entries: List = None):
+    def __init__(self, log_text_widget, all_entries=None, entries_provider=None):
         """
         初始化导航器
 
         Args:
             log_text_widget: tkinter Text控件 (日志显示区域)
-            all_entries: 所有日志条目列表 (可选)
+            all_entries: 控件显示的行 (DisplayedLogRows, 或一条日志一行的条目列表, 可选)
+            entries_provider: 返回当前显示行的函数 (可选, 重新显示日志后自动跟随)
         """
         self.log_widget = log_text_widget
-        self.all_entries = all_entries or []
+        self.entries_provider = entries_provider
+        self._source = None
+        self.rows = DisplayedLogRows()
+        self.all_entries: List = self.rows.entries
 
         # 导航历史 (支持前进/后退)
         self.history = deque(maxlen=50)  # 最多保存50个历史位置
@@ -90,8 +114,25 @@ class LogNavigator:
         self.problem_graph: Dict[int, NavigationNode] = {}
         self.next_node_id = 0
 
+        # 模式搜索结果 (升序的条目索引) 与当前可见范围内已高亮的行
+        self.search_matches: List[int] = []
+        self.search_tag = "related_log"
+        self.match_cursor = -1
+        self._highlighted_matches: List[int] = []
+        self._highlight_pending = False
+
+        # 搜索用的行偏移索引: 全部显示行拼接的文本 + 各行起始偏移
+        # (保留建立索引时的显示行对象本身, 按身份比较; 旧对象释放后id可能被新对象复用)
+        self._search_text = ""
+        self._line_starts: List[int] = []
+        self._search_rows = None
+        self._search_size = 0
+
+        self.set_entries(all_entries if all_entries is not None else [])
+
         # 高亮标签配置
         self._setup_highlight_tags()
+        self._bind_scroll_events()
 
     def _setup_highlight_tags(self):
         """设置高亮标签样式"""
@@ -110,7 +151,46 @@ class LogNavigator:
         except:
             pass  # 如果widget未ready,忽略
 
-    def jump_to_line(self, line_number: int, reason: str = "", highlight: bool = True) -> bool:
+    def _bind_scroll_events(self):
+        """视图滚动后重新高亮可见范围内的搜索结果"""
+        text = getattr(self.log_widget, 'text', self.log_widget)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>", "<ButtonRelease-1>", "<KeyRelease>", "<Configure>"):
+            try:
+                text.bind(sequence, self._schedule_highlight, add="+")
+            except:
+                pass
+
+    def _rows(self) -> DisplayedLogRows:
+        """当前显示行 (提供了entries_provider时以其为准)"""
+        if self.entries_provider is not None:
+            source = self.entries_provider()
+            if source is not None and source is not self._source:
+                self.set_entries(source)
+        if isinstance(self._source, list) and len(self._source) != len(self.rows):
+            # 普通条目列表在原处追加后重新映射 (保留搜索结果)
+            self.rows = DisplayedLogRows.from_entries(self._source)
+            self.all_entries = self.rows.entries
+        return self.rows
+
+    def set_entries(self, all_entries):
+        """
+        更新显示行 (重新显示或切换日志后调用), 清除旧的搜索结果
+
+        Args:
+            all_entries: DisplayedLogRows, 或一条日志一行显示的条目列表
+        """
+        # 先按旧的显示行取消高亮
+        self.clear_search()
+        self._source = all_entries if all_entries is not None else []
+        if isinstance(self._source, list):
+            self.rows = DisplayedLogRows.from_entries(self._source)
+        else:
+            # DisplayedLogRows（log_display 可能以不同模块名导入，不按类型判断）
+            self.rows = self._source
+        self.all_entries = self.rows.entries
+
+    def jump_to_line(self, line_number: int, reason: str = "", highlight: bool = True,
+                     record_history: bool = True) -> bool:
         """
         跳转到指定行号
 
@@ -118,6 +198,7 @@ class LogNavigator:
             line_number: 目标行号 (从1开始)
             reason: 跳转原因 (显示在状态栏)
             highlight: 是否高亮显示
+            record_history: 是否记入导航历史 (后退/前进时为False)
 
         Returns:
             是否成功跳转
@@ -125,7 +206,7 @@ class LogNavigator:
         try:
             # 记录到历史
             current_pos = self.get_current_position()
-            if current_pos != line_number:
+            if record_history and current_pos != line_number:
                 # 清理未来的历史 (如果从历史中间跳转)
                 while self.history_index < len(self.history) - 1:
                     self.history.pop()
@@ -141,6 +222,9 @@ class LogNavigator:
             if highlight:
                 self._highlight_current_line(line_number)
 
+            if self.search_matches:
+                self.highlight_visible_matches()
+
             return True
 
         except Exception as e:
@@ -149,21 +233,53 @@ class LogNavigator:
 
     def jump_to_entry(self, entry_index: int, reason: str = "") -> bool:
         """
-        跳转到指定日志条目
+        跳转到指定显示行
 
         Args:
-            entry_index: 条目索引 (在all_entries中的位置)
+            entry_index: 显示行索引 (在all_entries中的位置)
             reason: 跳转原因
 
         Returns:
             是否成功跳转
         """
-        if not self.all_entries or entry_index >= len(self.all_entries):
+        rows = self._rows()
+        if not 0 <= entry_index < len(rows):
             return False
 
-        # 在Text控件中查找对应行 (简化实现,假设行号=索引+1)
-        line_number = entry_index + 1
-        return self.jump_to_line(line_number, reason)
+        # 懒加载控件按显示项加载, 先加载到该行
+        self._ensure_loaded(entry_index + 1)
+        return self.jump_to_line(rows.line_of_row(entry_index), reason)
+
+    def jump_to_log_entry(self, entry, reason: str = "") -> bool:
+        """
+        跳转到会话日志中的某条日志 (未显示时不跳转)
+
+        Args:
+            entry: 日志条目对象
+            reason: 跳转原因
+
+        Returns:
+            是否成功跳转
+        """
+        row = self._rows().row_of_entry(entry)
+        if row is None:
+            return False
+        return self.jump_to_entry(row, reason)
+
+    def line_of_entry(self, entry) -> Optional[int]:
+        """日志条目所在的控件行号 (被过滤掉、未显示时为None)"""
+        rows = self._rows()
+        row = rows.row_of_entry(entry)
+        return rows.line_of_row(row) if row is not None else None
+
+    def _ensure_loaded(self, count: int):
+        """懒加载控件中目标行尚未加载时, 先加载前count个显示项"""
+        load_until = getattr(self.log_widget, 'load_until', None)
+        if load_until is not None:
+            try:
+                load_until(count)
+            except:
+                pass
 
     def mark_critical_logs(self, line_numbers: List[int], tag: str = "critical_log"):
         """
@@ -211,22 +327,23 @@ class LogNavigator:
             problem_type: 问题类型 (崩溃/内存/网络等)
             description: 问题描述
             ai_analysis: AI分析结果
-            entry_index: 条目索引 (可选)
+            entry_index: 显示行索引 (可选, 默认为行号所在的显示行)
 
         Returns:
             节点ID
         """
         # 获取日志条目
+        rows = self._rows()
+        if entry_index is None and rows:
+            entry_index = rows.row_of_line(line_number)
         entry = None
-        if entry_index is not None and self.all_entries:
-            entry = self.all_entries[entry_index]
-        elif line_number > 0 and self.all_entries:
-            entry = self.all_entries[min(line_number - 1, len(self.all_entries) - 1)]
+        if entry_index is not None and 0 <= entry_index < len(rows):
+            entry = rows.entries[entry_index]
 
         # 创建位置信息
         location = LogLocation(
             line_number=line_number,
-            entry_index=entry_index or (line_number - 1),
+            entry_index=entry_index if entry_index is not None else line_number - 1,
             entry=entry,
             timestamp=getattr(entry, 'timestamp', ''),
             reason=f"{problem_type}: {description}"
@@ -313,7 +430,7 @@ class LogNavigator:
         if self.history_index > 0:
             self.history_index -= 1
             line_num = self.history[self.history_index]
-            self.jump_to_line(line_num, reason="后退", highlight=True)
+            self.jump_to_line(line_num, reason="后退", highlight=True, record_history=False)
             return True
         return False
 
@@ -327,7 +444,7 @@ class LogNavigator:
         if self.history_index < len(self.history) - 1:
             self.history_index += 1
             line_num = self.history[self.history_index]
-            self.jump_to_line(line_num, reason="前进", highlight=True)
+            self.jump_to_line(line_num, reason="前进", highlight=True, record_history=False)
             return True
         return False
 
@@ -343,39 +460,172 @@ class LogNavigator:
         except:
             return 1
 
-    def find_logs_by_pattern(self, pattern: str, tag: str = "related_log") -> List[int]:
+    def find_logs_by_pattern(self, pattern: str, tag: str = "related_log", flags: int = 0) -> List[int]:
         """
-        根据正则模式查找并标记日志
+        根据正则模式查找日志, 并标记其中当前可见的行
+
+        在全部显示行上搜索 (包括尚未加载到控件的行), 结果保存在 search_matches 中,
+        可用 next_match()/previous_match() 依次跳转; 滚动后自动高亮新出现的匹配行。
 
         Args:
             pattern: 正则表达式模式
             tag: 高亮标签
+            flags: 正则标志 (如 re.IGNORECASE)
 
         Returns:
             匹配的行号列表
         """
-        matched_lines = []
+        self.clear_search()
         try:
-            # 在Text控件中搜索
-            start_pos = "1.0"
-            while True:
-                pos = self.log_widget.search(pattern, start_pos, stopindex="end", regexp=True)
-                if not pos:
-                    break
+            matches = self.find_entries_by_pattern(pattern, flags)
+        except re.error as e:
+            print(f"搜索失败: {e}")
+            return []
 
-                line_num = int(pos.split('.')[0])
-                matched_lines.append(line_num)
+        self.search_matches = matches
+        self.search_tag = tag
+        self.highlight_visible_matches()
+        return [self._line_of(index) for index in matches]
 
-                # 高亮该行
-                self.mark_critical_logs([line_num], tag=tag)
+    def find_entries_by_pattern(self, pattern: str, flags: int = 0) -> List[int]:
+        """
+        在全部显示行上按正则搜索
 
-                # 移动到下一行
-                start_pos = f"{line_num + 1}.0"
+        按行拼接的显示文本 (含前缀) 只在显示行变化时重建; 编译后的正则在拼接文本上扫描,
+        每命中一行就跳到下一行的起始位置继续, 同一行只计一次。
 
-        except Exception as e:
-            print(f"搜索失败: {e}")
+        Args:
+            pattern: 正则表达式模式
+            flags: 正则标志
+
+        Returns:
+            匹配的显示行索引 (升序)
+
+        Raises:
+            re.error: 正则表达式无效
+        """
+        regex = re.compile(pattern, flags | re.MULTILINE)
+        text, starts = self._search_index()
+        matches = []
+        count = len(starts)
+        pos = 0
+        while True:
+            match = regex.search(text, pos)
+            if match is None:
+                break
+            index = bisect_right(starts, match.start()) - 1
+            if index >= count:
+                break
+            matches.append(index)
+            pos = starts[index + 1] if index + 1 < count else len(text) + 1
+            if pos > len(text):
+                break
+        return matches
+
+    def _search_index(self) -> Tuple[str, List[int]]:
+        """显示行对应的拼接文本与各行起始偏移 (显示行不变时复用)"""
+        rows = self._rows()
+        if rows is not self._search_rows or len(rows) != self._search_size:
+            starts = []
+            offset = 0
+            for text in rows.texts:
+                starts.append(offset)
+                offset += len(text) + 1
+            self._search_text = "\n".join(rows.texts)
+            self._line_starts = starts
+            self._search_rows = rows
+            self._search_size = len(rows)
+        return self._search_text, self._line_starts
+
+    def clear_search(self):
+        """清除搜索结果及其高亮"""
+        self._unhighlight_matches()
+        self.search_matches = []
+        self.match_cursor = -1
+
+    def next_match(self) -> bool:
+        """跳转到下一个搜索结果 (记入导航历史)"""
+        return self._jump_to_match(1)
+
+    def previous_match(self) -> bool:
+        """跳转到上一个搜索结果 (记入导航历史)"""
+        return self._jump_to_match(-1)
+
+    def _jump_to_match(self, step: int) -> bool:
+        if not self.search_matches:
+            return False
+        if self.match_cursor < 0:
+            # 从当前位置所在的显示行开始找
+            current = self._rows().row_of_line(self.get_current_position())
+            if step > 0:
+                cursor = bisect_right(self.search_matches, current)
+            else:
+                cursor = bisect_left(self.search_matches, current) - 1
+        else:
+            cursor = self.match_cursor + step
+        cursor %= len(self.search_matches)
+        self.match_cursor = cursor
+        return self.jump_to_entry(self.search_matches[cursor], reason="搜索结果")
+
+    def highlight_visible_matches(self):
+        """只为当前可见范围内的搜索结果添加高亮, 移出视图的行取消高亮"""
+        self._highlight_pending = False
+        self._unhighlight_matches()
+        visible = self._visible_line_range()
+        if visible is None or visible[1] < visible[0] or not self.search_matches:
+            return
+
+        rows = self._rows()
+        first, last = rows.row_of_line(visible[0]), rows.row_of_line(visible[1])
+        lo = bisect_left(self.search_matches, first)
+        hi = bisect_right(self.search_matches, last)
+        highlighted = self.search_matches[lo:hi]
+        for index in highlighted:
+            line_num = self._line_of(index)
+            try:
+                self.log_widget.tag_add(self.search_tag, f"{line_num}.0", f"{line_num}.end")
+            except:
+                pass
+        self._highlighted_matches = highlighted
+
+    def _unhighlight_matches(self):
+        for index in self._highlighted_matches:
+            line_num = self._line_of(index)
+            try:
+                self.log_widget.tag_remove(self.search_tag, f"{line_num}.0", f"{line_num}.end")
+            except:
+                pass
+        self._highlighted_matches = []
+
+    def _schedule_highlight(self, event=None):
+        """滚动事件合并为一次空闲时的重新高亮"""
+        if not self.search_matches or self._highlight_pending:
+            return
+        self._highlight_pending = True
+        try:
+            self.log_widget.after_idle(self.highlight_visible_matches)
+        except:
+            self._highlight_pending = False
+
+    def _visible_line_range(self) -> Optional[Tuple[int, int]]:
+        """
+        当前可见的行号范围 (从1开始, 含两端)
+
+        优先使用控件提供的 visible_line_range(); 否则按Text控件的窗口坐标换算。
+        """
+        provider = getattr(self.log_widget, 'visible_line_range', None)
+        try:
+            if provider is not None:
+                return provider()
+            first = int(self.log_widget.index("@0,0").split('.')[0])
+            last = int(self.log_widget.index(f"@0,{self.log_widget.winfo_height()}").split('.')[0])
+            return first, last
+        except:
+            return None
 
-        return matched_lines
+    def _line_of(self, entry_index: int) -> int:
+        """显示行索引对应的控件行号"""
+        return self.rows.line_of_row(entry_index)
 
     def _highlight_current_line(self, line_number: int):
         """高亮当前行"""
@@ -401,6 +651,7 @@ class LogNavigator:
             {
                 'history_size': 历史记录数量,
                 'marked_lines': 标记的行数,
+                'search_matches': 搜索结果数量,
                 'problem_nodes': 问题节点数量,
                 'current_position': 当前位置,
             }
@@ -408,6 +659,7 @@ class LogNavigator:
         return {
             'history_size': len(self.history),
             'marked_lines': len(self.marked_lines),
+            'search_matches': len(self.search_matches),
             'problem_nodes': len(self.problem_graph),
             'current_position': self.get_current_position(),
         }
@@ -506,6 +758,6 @@ class AIAnalysisParser:
 
 
 # 便捷函数
-def create_navigator(log_widget, all_entries: List = None) -> LogNavigator:
+def create_navigator(log_widget, all_entries=None) -> LogNavigator:
     """创建日志导航器"""
     return LogNavigator(log_widget, all_entries)
@@ -9,19 +9,22 @@
 - 隐私信息过滤
 """
 
+import copy
 import re
-from collections import Counter
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 
 # 导入LogEntry数据模型
 try:
     from data_models import LogEntry
+    from module_health import ModuleHealthAggregator, is_crash_log
 except ImportError:
     try:
         from modules.data_models import LogEntry
+        from modules.module_health import ModuleHealthAggregator, is_crash_log
     except ImportError:
         from gui.modules.data_models import LogEntry
+        from gui.modules.module_health import ModuleHealthAggregator, is_crash_log
 
 
 @dataclass
@@ -37,11 +40,12 @@ class CrashInfo:
 @dataclass
 class ErrorPattern:
     """错误模式结构"""
-    signature: str  # 错误签名（前50字符）
+    signature: str  # 错误签名（日志模板，变量部分为 <*>）
     count: int
     first_occurrence: str
     last_occurrence: str
     sample_logs: List[LogEntry]
+    template_id: int = 0  # 所属模板ID
 
 
 class PrivacyFilter:
@@ -73,6 +77,23 @@ class PrivacyFilter:
         (r'\b\d{17}[\dXx]\b', 'IDCARD_***'),
     ]
 
+    # 各规则的前置条件（与PATTERNS一一对应）：字母/符号为小写关键词，其余为正则。
+    # 原文不满足前置条件时该规则不可能命中，直接跳过。替换文本（XXX_***）不含
+    # 关键词与数字，不会让后续规则由不可能命中变为可能命中，因此输出与逐条替换一致
+    TRIGGERS = [
+        'token', 'api', 'secret', 'password', 'pwd',
+        'user', 'uid', 'device', 'openid',
+        r'\d{11}', '@',
+        r'\d\.\d{1,3}\.\d',
+        r'\d{11}',
+    ]
+
+    # 忽略大小写匹配时与ASCII字母等价、但lower()后不是该字母的字符（İ ı ſ）
+    _CASE_SPECIALS = '\u0130\u0131\u017f'
+
+    # 过滤结果缓存上限（按文本缓存，重复日志行只过滤一次）
+    CACHE_SIZE = 50000
+
     def __init__(self, enabled: bool = True):
         """
         初始化过滤器
@@ -85,31 +106,61 @@ class PrivacyFilter:
             (re.compile(pattern, re.IGNORECASE), replacement)
             for pattern, replacement in self.PATTERNS
         ]
+        self._triggers = [
+            trigger if trigger.isalpha() or trigger == '@' else re.compile(trigger)
+            for trigger in self.TRIGGERS
+        ]
+        self._cache: Dict[str, str] = {}
 
     def filter(self, text: str) -> str:
         """过滤文本中的敏感信息"""
-        if not self.enabled:
+        if not self.enabled or not text:
             return text
 
-        filtered_text = text
-        for pattern, replacement in self.compiled_patterns:
-            filtered_text = pattern.sub(replacement, filtered_text)
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
 
+        filtered_text = text
+        if text.isascii() or not any(c in text for c in self._CASE_SPECIALS):
+            # 关键词在小写原文中查找；正则前置条件在原文上只扫描一次
+            lowered = text.lower()
+            found: Dict[str, bool] = {}
+            for (pattern, replacement), trigger in zip(self.compiled_patterns, self._triggers):
+                if isinstance(trigger, str):
+                    if trigger not in lowered:
+                        continue
+                else:
+                    hit = found.get(trigger.pattern)
+                    if hit is None:
+                        hit = found[trigger.pattern] = trigger.search(text) is not None
+                    if not hit:
+                        continue
+                filtered_text = pattern.sub(replacement, filtered_text)
+        else:
+            # 忽略大小写匹配把这些字符视为 i/s，lower()却不会，逐条替换
+            for pattern, replacement in self.compiled_patterns:
+                filtered_text = pattern.sub(replacement, filtered_text)
+
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[text] = filtered_text
         return filtered_text
 
     def filter_log_entries(self, entries: List[LogEntry]) -> List[LogEntry]:
-        """批量过滤日志条目"""
+        """批量过滤日志条目（返回副本，内容相同的条目共享过滤结果）"""
         if not self.enabled:
             return entries
 
         filtered = []
         for entry in entries:
-            filtered_entry = LogEntry(
-                timestamp=entry.timestamp,
-                level=entry.level,
-                module=entry.module,
-                content=self.filter(entry.content)
-            )
+            content = self.filter(entry.content)
+            if content is entry.content or content == entry.content:
+                filtered.append(entry)
+                continue
+            filtered_entry = copy.copy(entry)
+            filtered_entry.content = content
+            filtered_entry.raw_line = self.filter(entry.raw_line)
             filtered.append(filtered_entry)
 
         return filtered
@@ -146,56 +197,22 @@ class LogPreprocessor:
 
     def _is_crash_log(self, entry: LogEntry) -> bool:
         """判断是否为崩溃日志"""
-        if entry.module == "Crash":
-            return True
-
-        crash_keywords = [
-            'crash', 'exception', 'signal', 'segmentation fault',
-            '崩溃', '异常', 'fatal error', 'abort', 'terminated'
-        ]
-
-        content_lower = entry.content.lower()
-        return any(keyword in content_lower for keyword in crash_keywords)
+        return is_crash_log(entry)
 
     def extract_error_patterns(self, entries: List[LogEntry],
                               top_n: int = 10) -> List[ErrorPattern]:
-        """识别高频错误模式"""
-        error_logs = [e for e in entries if e.level == "ERROR"]
-
-        if not error_logs:
-            return []
-
-        signatures = {}
-        for log in error_logs:
-            signature = log.content[:50].strip()
-
-            if signature not in signatures:
-                signatures[signature] = {
-                    'count': 0,
-                    'first': log.timestamp,
-                    'last': log.timestamp,
-                    'samples': []
-                }
-
-            signatures[signature]['count'] += 1
-            signatures[signature]['last'] = log.timestamp
-
-            if len(signatures[signature]['samples']) < 3:
-                signatures[signature]['samples'].append(log)
-
-        patterns = []
-        for sig, data in signatures.items():
-            pattern = ErrorPattern(
-                signature=sig,
-                count=data['count'],
-                first_occurrence=data['first'],
-                last_occurrence=data['last'],
-                sample_logs=data['samples']
+        """识别高频错误模式（按日志模板聚类，只在ID/数字/地址上不同的错误归为一类）"""
+        return [
+            ErrorPattern(
+                signature=template.template,
+                count=template.count,
+                first_occurrence=template.first_timestamp,
+                last_occurrence=template.last_timestamp,
+                sample_logs=template.samples,
+                template_id=template.template_id
             )
-            patterns.append(pattern)
-
-        patterns.sort(key=lambda p: p.count, reverse=True)
-        return patterns[:top_n]
+            for template in ModuleHealthAggregator.of(entries).error_patterns(top_n)
+        ]
 
     def summarize_logs(self, entries: List[LogEntry],
                       max_tokens: int = 10000) -> str:
@@ -259,23 +276,17 @@ class LogPreprocessor:
                 'levels': {}
             }
 
-        crashes = sum(1 for e in entries if self._is_crash_log(e))
-        errors = sum(1 for e in entries if e.level == "ERROR")
-        warnings = sum(1 for e in entries if e.level == "WARNING")
-
-        module_counter = Counter(e.module for e in entries)
-        level_counter = Counter(e.level for e in entries)
-
+        health = ModuleHealthAggregator.of(entries)
         time_range = f"{entries[0].timestamp} ~ {entries[-1].timestamp}"
 
         return {
             'total': len(entries),
-            'crashes': crashes,
-            'errors': errors,
-            'warnings': warnings,
+            'crashes': health.crashes,
+            'errors': health.levels.get("ERROR", 0),
+            'warnings': health.levels.get("WARNING", 0),
             'time_range': time_range,
-            'modules': dict(module_counter.most_common(10)),
-            'levels': dict(level_counter)
+            'modules': dict(health.top_modules(10)),
+            'levels': dict(health.levels)
         }
 
     # ========== Mars模块感知功能（新增） ==========
@@ -292,7 +303,7 @@ class LogPreprocessor:
         Returns:
             指定模块的日志列表
         """
-        return [e for e in entries if e.module == module]
+        return ModuleHealthAggregator.of(entries).module_entries(module)
 
     def get_module_health(self, entries: List[LogEntry]) -> Dict[str, Dict]:
         """
@@ -312,36 +323,7 @@ class LogPreprocessor:
                 }
             }
         """
-        module_stats = {}
-
-        # 获取所有模块
-        modules = set(e.module for e in entries)
-
-        for module in modules:
-            module_logs = self.extract_module_specific_logs(entries, module)
-
-            error_count = sum(1 for e in module_logs if e.level == "ERROR")
-            warning_count = sum(1 for e in module_logs if e.level == "WARNING")
-            crash_count = sum(1 for e in module_logs if self._is_crash_log(e))
-
-            # 计算健康分数 (0-1)
-            total = len(module_logs)
-            if total == 0:
-                health_score = 1.0
-            else:
-                # 崩溃权重最高(10)，错误次之(5)，警告最低(1)
-                penalty = (crash_count * 10 + error_count * 5 + warning_count * 1) / total
-                health_score = max(0, 1 - penalty / 10)
-
-            module_stats[module] = {
-                'total': total,
-                'errors': error_count,
-                'warnings': warning_count,
-                'crashes': crash_count,
-                'health_score': round(health_score, 2)
-            }
-
-        return module_stats
+        return ModuleHealthAggregator.of(entries).module_health()
 
     def get_unhealthy_modules(self, entries: List[LogEntry],
                              threshold: float = 0.7) -> List[str]:
@@ -355,15 +337,5 @@ class LogPreprocessor:
         Returns:
             不健康模块名称列表，按健康分数升序排列（最不健康的在前）
         """
-        health_stats = self.get_module_health(entries)
-
-        unhealthy = [
-            (module, stats['health_score'])
-            for module, stats in health_stats.items()
-            if stats['health_score'] < threshold
-        ]
-
-        # 按健康分数升序排序（最不健康的在前）
-        unhealthy.sort(key=lambda x: x[1])
+        return ModuleHealthAggregator.of(entries).unhealthy_modules(threshold)
 
-        return [module for module, score in unhealthy]
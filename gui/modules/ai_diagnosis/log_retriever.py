@@ -0,0 +1,240 @@
+"""
+问答相关日志检索
+
+交互式问答时，按用户问题从日志中检索最相关的行，而不是对整个会话统一采样：
+1. 问题分词（英文词直接使用，常见中文问题词扩展为日志中常用的英文词）
+2. 在日志词索引上做BM25排序
+3. 按日志级别（崩溃/错误/警告）和时间接近度（问题中提到的时间或崩溃时间附近）加权
+4. 按分数依次选取，直到用完token预算，最后按行号顺序输出
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+try:
+    from data_models import LogEntry, cached_derived
+except ImportError:
+    try:
+        from modules.data_models import LogEntry, cached_derived
+    except ImportError:
+        from gui.modules.data_models import LogEntry, cached_derived
+
+try:
+    from modules.log_indexer import LogIndexer
+except ImportError:
+    from gui.modules.log_indexer import LogIndexer
+
+try:
+    from .token_counter import TokenCounter, get_token_counter
+except ImportError:
+    from token_counter import TokenCounter, get_token_counter
+
+# 中文问题词 -> 日志中常见的英文词
+QUERY_EXPANSIONS: Dict[str, List[str]] = {
+    '崩溃': ['crash', 'exception', 'signal', 'abort', 'fatal'],
+    '闪退': ['crash', 'exception', 'signal', 'abort'],
+    '异常': ['exception', 'error'],
+    '错误': ['error', 'failed', 'fail'],
+    '报错': ['error', 'failed', 'exception'],
+    '失败': ['failed', 'fail', 'error'],
+    '超时': ['timeout', 'timed'],
+    '网络': ['network', 'http', 'socket', 'connection'],
+    '连接': ['connect', 'connection', 'socket'],
+    '请求': ['request', 'http'],
+    '内存': ['memory', 'oom', 'malloc', 'leak'],
+    '卡顿': ['anr', 'slow', 'lag', 'stuck', 'block'],
+    '性能': ['slow', 'cost', 'duration', 'fps'],
+    '登录': ['login', 'auth', 'token'],
+    '支付': ['pay', 'payment', 'order'],
+    '数据库': ['db', 'database', 'sql', 'sqlite'],
+    '播放': ['play', 'player'],
+    '启动': ['launch', 'start', 'init'],
+}
+
+# 不参与检索的英文常用词
+STOP_WORDS = {
+    'the', 'is', 'a', 'an', 'in', 'on', 'at', 'to', 'for', 'of', 'and', 'or',
+    'why', 'what', 'how', 'when', 'where', 'which', 'does', 'did', 'do', 'was', 'are',
+    'log', 'logs',
+}
+
+# 级别加权
+LEVEL_BOOST = {'FATAL': 2.0, 'CRASH': 2.0, 'ERROR': 1.6, 'WARNING': 1.25}
+
+# 时间接近度加权: 分数 × (1 + TIME_BOOST × e^(-Δt / TIME_SCALE))
+TIME_BOOST = 0.5
+TIME_SCALE = 60.0
+
+# 参与加权的BM25候选行数上限
+MAX_CANDIDATES = 2000
+# 作为时间锚点的崩溃行数上限
+MAX_ANCHORS = 50
+# 单行最大字符数
+MAX_LINE_CHARS = 300
+
+_TIME_OF_DAY = re.compile(r'(?<!\d)(\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?(?!\d)')
+_QUERY_WORD = re.compile(r'[a-zA-Z0-9_]+')
+
+
+def _time_of_day(text: Optional[str]) -> Optional[float]:
+    """提取一天中的秒数（用于与问题中提到的时间比较）"""
+    if not text:
+        return None
+    match = _TIME_OF_DAY.search(text)
+    if not match:
+        return None
+    hours, minutes, seconds, fraction = match.groups()
+    value = int(hours) * 3600 + int(minutes) * 60 + int(seconds or 0)
+    if fraction:
+        value += float(f"0.{fraction}")
+    return float(value)
+
+
+@dataclass
+class RetrievedLine:
+    """检索到的日志行"""
+    line_number: int  # 在日志列表中的位置（从0开始）
+    entry: LogEntry
+    score: float
+    text: str  # 发送给AI的格式化文本
+
+
+class LogRetriever:
+    """
+    问答日志检索器
+
+    使用示例:
+        retriever = LogRetriever(entries, indexer)
+        lines = retriever.retrieve("为什么10:05登录超时?", token_budget=1500)
+    """
+
+    def __init__(self, entries: List[LogEntry], indexer: Optional[LogIndexer] = None,
+                 token_counter: Optional[TokenCounter] = None):
+        """
+        Args:
+            entries: 日志条目列表
+            indexer: 基于同一列表建立的索引器（可选；不对齐时为该列表单独建立词索引）
+            token_counter: token计数器（None时使用默认计数器）
+        """
+        self.entries = entries
+        self.counter = token_counter or get_token_counter()
+        if indexer is not None and indexer.is_ready and indexer.total_entries == len(entries):
+            self.indexer = indexer
+        else:
+            self.indexer = None
+
+    def _ensure_index(self) -> LogIndexer:
+        if self.indexer is None:
+            self.indexer = _private_index(self.entries)
+        return self.indexer
+
+    # ========== 查询解析 ==========
+
+    def query_terms(self, question: str) -> List[str]:
+        """问题中的检索词（英文词 + 中文问题词的扩展）"""
+        terms = []
+        for word in _QUERY_WORD.findall(question.lower()):
+            if len(word) >= 2 and word not in STOP_WORDS:
+                terms.append(word)
+        for keyword, expansions in QUERY_EXPANSIONS.items():
+            if keyword in question:
+                terms.extend(expansions)
+        return list(dict.fromkeys(terms))
+
+    def time_anchors(self, question: str) -> List[float]:
+        """时间锚点：问题中提到的时间；没有则使用崩溃日志的时间"""
+        anchors = [_time_of_day(match.group()) for match in _TIME_OF_DAY.finditer(question)]
+        if anchors:
+            return anchors
+
+        indexer = self._ensure_index()
+        crash_lines = set(indexer.module_index.get('Crash', ()))
+        crash_lines.update(indexer.level_index.get('FATAL', ()))
+        anchors = []
+        for i in sorted(crash_lines)[:MAX_ANCHORS]:
+            if i < len(self.entries):
+                value = _time_of_day(self.entries[i].timestamp)
+                if value is not None:
+                    anchors.append(value)
+        return anchors
+
+    # ========== 检索 ==========
+
+    def score(self, question: str) -> Dict[int, float]:
+        """BM25分数经级别与时间接近度加权后的 {行号: 分数}"""
+        terms = self.query_terms(question)
+        if not terms:
+            return {}
+        bm25 = self._ensure_index().bm25_scores(terms)
+        if not bm25:
+            return {}
+
+        candidates = sorted(bm25.items(), key=lambda item: -item[1])[:MAX_CANDIDATES]
+        anchors = self.time_anchors(question)
+        scores = {}
+        for i, base in candidates:
+            if i >= len(self.entries):
+                continue
+            entry = self.entries[i]
+            value = base * LEVEL_BOOST.get(entry.level, 1.0)
+            if anchors:
+                seconds = _time_of_day(entry.timestamp)
+                if seconds is not None:
+                    distance = min(abs(seconds - anchor) for anchor in anchors)
+                    value *= 1 + TIME_BOOST * math.exp(-distance / TIME_SCALE)
+            scores[i] = value
+        return scores
+
+    def retrieve(self, question: str, token_budget: int, max_lines: int = 200) -> List[RetrievedLine]:
+        """
+        检索与问题相关的日志行
+
+        Args:
+            question: 用户问题
+            token_budget: 检索结果可用的token数
+            max_lines: 最多返回的行数
+
+        Returns:
+            按行号排序的检索结果（无检索词或无命中时为空列表）
+        """
+        scores = self.score(question)
+        selected = []
+        used = 0
+        for i, value in sorted(scores.items(), key=lambda item: (-item[1], item[0])):
+            text = self.format_line(i, self.entries[i])
+            cost = self.counter.count(text) + 1
+            if used + cost > token_budget:
+                continue
+            selected.append(RetrievedLine(i, self.entries[i], value, text))
+            used += cost
+            if len(selected) >= max_lines:
+                break
+        selected.sort(key=lambda line: line.line_number)
+        return selected
+
+    @staticmethod
+    def format_line(line_number: int, entry: LogEntry) -> str:
+        """#行号 [时间] 级别 @模块: 内容"""
+        timestamp = entry.timestamp.split()[-1] if entry.timestamp else "N/A"
+        content = (entry.content or entry.raw_line or '').strip()
+        if len(content) > MAX_LINE_CHARS:
+            content = content[:MAX_LINE_CHARS] + "..."
+        return f"#{line_number + 1} [{timestamp}] {entry.level} @{entry.module}: {content}"
+
+
+def _build_private_index(entries: List[LogEntry]) -> LogIndexer:
+    indexer = LogIndexer(index_trigrams=False)
+    if entries:
+        indexer.build_index(entries)
+    return indexer
+
+
+def _private_index(entries: List[LogEntry]) -> LogIndexer:
+    """
+    为没有对齐全局索引的日志列表建立只含词索引（不含Trigram）的索引器
+
+    会话日志列表（LogEntryList）上缓存并随列表释放，列表修改后重新建立；普通列表不缓存。
+    """
+    return cached_derived(entries, _build_private_index, _build_private_index)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段摘要 (map-reduce) - 超出Token预算的大日志分析
+
+单次压缩 (SmartLogCompressor.compress) 只能把整个会话采样到一个预算内,
+百万行级别的会话大部分内容到不了模型。本模块改为分层处理:
+1. 切分 (split): 按时间窗口或模块把会话切成不超过 max_chunks 段
+2. 映射 (map): 每段压缩到 chunk_tokens 后交给AI做事实摘要,
+   以批量优先级经调度器并行执行
+3. 归约 (reduce): 摘要拼接超出 reduce_tokens 时分组合并(可多层),
+   最后生成带用户问题的最终分析提示词
+
+每段/每组的摘要以提示词内容哈希缓存在 AnalysisCache 中,
+重新分析或对同一会话追问时直接复用,只有最终问答需要重新请求。
+
+使用示例:
+    summarizer = MapReduceSummarizer(ai_client)
+    result = summarizer.build_prompt(entries, "为什么启动变慢?")
+    for chunk in ai_client.ask_stream(result.prompt):
+        ...
+"""
+
+import concurrent.futures
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from data_models import LogEntry
+except ImportError:
+    try:
+        from modules.data_models import LogEntry
+    except ImportError:
+        from gui.modules.data_models import LogEntry
+
+try:
+    from .ai_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, ScheduledAIClient, get_global_scheduler
+    from .analysis_cache import AnalysisCache, get_global_cache
+    from .compact_prompts import CompactPromptTemplates
+    from .smart_compressor import SmartLogCompressor, estimate_tokens
+except ImportError:
+    from ai_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, ScheduledAIClient, get_global_scheduler
+    from analysis_cache import AnalysisCache, get_global_cache
+    from compact_prompts import CompactPromptTemplates
+    from smart_compressor import SmartLogCompressor, estimate_tokens
+
+SPLIT_BY_TIME = 'time'
+SPLIT_BY_MODULE = 'module'
+
+DEFAULT_MAX_CHUNKS = 24
+DEFAULT_CHUNK_TOKENS = 3000
+DEFAULT_REDUCE_TOKENS = 3000
+
+# 中间合并最多层数 (超过后截断,避免摘要不收敛时无限合并)
+MAX_REDUCE_LEVELS = 3
+
+# 缓存条目的问题类型标记 (便于在缓存面板中区分)
+CACHE_PROBLEM_TYPE = "分段摘要"
+
+_SPLIT_DESC = {SPLIT_BY_TIME: "时间窗口", SPLIT_BY_MODULE: "模块"}
+
+
+@dataclass
+class LogChunk:
+    """切分后的一段日志"""
+    label: str                 # 时间范围或模块名
+    entries: List[LogEntry]
+
+
+@dataclass
+class ChunkSummary:
+    """一段日志(或一组摘要)的AI摘要"""
+    label: str
+    summary: str
+    entry_count: int
+    cached: bool = False
+
+
+@dataclass
+class MapReduceResult:
+    """分段摘要结果"""
+    prompt: str                            # 最终分析提示词
+    chunks: List[ChunkSummary] = field(default_factory=list)
+    levels: int = 0                        # 中间合并层数
+    cache_hits: int = 0                    # 命中缓存的摘要数
+    requests: int = 0                      # 实际发出的摘要请求数
+    cancelled: bool = False
+
+    @property
+    def estimated_tokens(self) -> int:
+        return estimate_tokens(self.prompt)
+
+
+def _time_label(entries: List[LogEntry]) -> str:
+    first = entries[0].timestamp or "N/A"
+    last = entries[-1].timestamp or "N/A"
+    return first if first == last else f"{first} ~ {last}"
+
+
+def split_by_count(entries: List[LogEntry], max_chunks: int) -> List[LogChunk]:
+    """按条数均分 (无时间戳时使用)"""
+    if not entries:
+        return []
+    size = -(-len(entries) // max(1, max_chunks))
+    return [LogChunk(_time_label(entries[i:i + size]), entries[i:i + size])
+            for i in range(0, len(entries), size)]
+
+
+def split_by_time(entries: List[LogEntry], max_chunks: int = DEFAULT_MAX_CHUNKS) -> List[LogChunk]:
+    """
+    按等长时间窗口切分
+
+    窗口长度 = 会话时长 / max_chunks,空窗口跳过; 无时间戳的条目(如堆栈行)
+    跟随前一条进入同一窗口。全部条目都没有时间戳时按条数均分。
+    """
+    values = []
+    last = None
+    for entry in entries:
+        value = entry.timestamp_value
+        if value is not None:
+            last = value
+        values.append(last)
+
+    known = [v for v in values if v is not None]
+    if not known:
+        return split_by_count(entries, max_chunks)
+
+    start = min(known)
+    window = max((max(known) - start) / max(1, max_chunks), 1.0)
+
+    chunks: List[LogChunk] = []
+    current: List[LogEntry] = []
+    current_slot = None
+    for entry, value in zip(entries, values):
+        slot = 0 if value is None else min(int((value - start) // window), max_chunks - 1)
+        if current and slot != current_slot:
+            chunks.append(LogChunk(_time_label(current), current))
+            current = []
+        current.append(entry)
+        current_slot = slot
+    if current:
+        chunks.append(LogChunk(_time_label(current), current))
+    return chunks
+
+
+def split_by_module(entries: List[LogEntry], max_chunks: int = DEFAULT_MAX_CHUNKS) -> List[LogChunk]:
+    """按模块切分: 条目最多的 max_chunks-1 个模块各占一段,其余合为一段"""
+    counter = Counter(entry.module or "Unknown" for entry in entries)
+    if len(counter) <= max_chunks:
+        top = set(counter)
+    else:
+        top = {module for module, _ in counter.most_common(max_chunks - 1)}
+
+    groups: Dict[str, List[LogEntry]] = {}
+    for entry in entries:
+        module = entry.module or "Unknown"
+        groups.setdefault(module if module in top else "其他模块", []).append(entry)
+
+    ordered = sorted(groups.items(), key=lambda item: (item[0] == "其他模块", -len(item[1])))
+    return [LogChunk(f"@{module}" if module != "其他模块" else module, group)
+            for module, group in ordered]
+
+
+class MapReduceSummarizer:
+    """分段摘要器"""
+
+    def __init__(self, client, cache: Optional[AnalysisCache] = None, scheduler=None,
+                 max_chunks: int = DEFAULT_MAX_CHUNKS,
+                 chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                 reduce_tokens: int = DEFAULT_REDUCE_TOKENS):
+        """
+        Args:
+            client: AI客户端 (普通客户端或ScheduledAIClient,摘要请求统一以批量优先级调度)
+            cache: 摘要缓存 (默认全局缓存)
+            scheduler: 调度器 (默认沿用client的调度器或全局调度器)
+            max_chunks: 最大分段数
+            chunk_tokens: 每段日志压缩后的token上限
+            reduce_tokens: 最终提示词中摘要部分的token上限
+        """
+        if isinstance(client, ScheduledAIClient):
+            self.batch_client = client.with_priority(PRIORITY_BATCH)
+        else:
+            self.batch_client = ScheduledAIClient(client, scheduler or get_global_scheduler(), PRIORITY_BATCH)
+        self.cache = cache if cache is not None else get_global_cache()
+        self.max_chunks = max_chunks
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.compressor = SmartLogCompressor(max_tokens=chunk_tokens)
+
+    def split(self, entries: List[LogEntry], split: str = SPLIT_BY_TIME) -> List[LogChunk]:
+        """切分会话"""
+        if split == SPLIT_BY_MODULE:
+            return split_by_module(entries, self.max_chunks)
+        return split_by_time(entries, self.max_chunks)
+
+    def build_prompt(self, entries: List[LogEntry], question: str = "", split: str = SPLIT_BY_TIME,
+                     cancel_event: Optional[threading.Event] = None,
+                     progress_callback: Optional[Callable[[str, int, int], None]] = None) -> MapReduceResult:
+        """
+        执行 map + 分层 reduce,返回最终分析提示词 (最终问答由调用方流式发送)
+
+        Args:
+            entries: 会话全部日志
+            question: 用户问题 (为空时做问题总结)
+            split: SPLIT_BY_TIME / SPLIT_BY_MODULE
+            cancel_event: 取消事件,置位后未完成的摘要请求被取消
+            progress_callback: progress_callback(阶段, 已完成, 总数)
+        """
+        result = MapReduceResult(prompt="")
+        chunks = self.split(entries, split)
+
+        # map: 每段压缩后摘要
+        prompts = [CompactPromptTemplates.format_chunk_summary(
+                       chunk.label, self.compressor.compress(chunk.entries).summary)
+                   for chunk in chunks]
+        summaries = self._summarize_all(prompts, result, "分段摘要", cancel_event, progress_callback)
+        if summaries is None:
+            result.cancelled = True
+            return result
+        result.chunks = [ChunkSummary(chunk.label, text, len(chunk.entries), cached)
+                         for chunk, (text, cached) in zip(chunks, summaries)]
+
+        # reduce: 摘要过长时分组合并
+        sections = [(summary.label, summary.summary) for summary in result.chunks]
+        while self._sections_tokens(sections) > self.reduce_tokens and len(sections) > 1:
+            if result.levels >= MAX_REDUCE_LEVELS:
+                break
+            groups = self._pack_groups(sections)
+            prompts = [CompactPromptTemplates.format_merge_summaries(self._join_sections(group), len(group))
+                       for group in groups]
+            merged = self._summarize_all(prompts, result, f"合并摘要(第{result.levels + 1}层)",
+                                         cancel_event, progress_callback)
+            if merged is None:
+                result.cancelled = True
+                return result
+            sections = [(self._group_label(group, split), text) for group, (text, _) in zip(groups, merged)]
+            result.levels += 1
+
+        body = self._join_sections(sections)
+        if estimate_tokens(body) > self.reduce_tokens:
+            body = self.compressor.truncate_to_tokens(body, self.reduce_tokens)
+
+        result.prompt = CompactPromptTemplates.format_map_reduce_final(
+            summaries=body,
+            user_question=question or "总结整个会话中的关键问题，按严重程度排序",
+            split_desc=_SPLIT_DESC.get(split, split),
+            chunk_count=len(chunks),
+            entry_count=len(entries)
+        )
+        return result
+
+    def analyze(self, entries: List[LogEntry], question: str = "", split: str = SPLIT_BY_TIME,
+                cancel_event: Optional[threading.Event] = None,
+                progress_callback: Optional[Callable[[str, int, int], None]] = None) -> Optional[str]:
+        """同步完成分段摘要与最终分析 (最终问答使用交互式优先级); 取消时返回None"""
+        result = self.build_prompt(entries, question, split, cancel_event, progress_callback)
+        if result.cancelled:
+            return None
+        return self.batch_client.with_priority(PRIORITY_INTERACTIVE).ask(result.prompt)
+
+    # ========== 内部方法 ==========
+
+    def _summarize_all(self, prompts: List[str], result: MapReduceResult, stage: str,
+                       cancel_event: Optional[threading.Event],
+                       progress_callback: Optional[Callable]) -> Optional[List[Tuple[str, bool]]]:
+        """并行摘要一批提示词 (先查缓存),返回 [(摘要, 是否命中缓存)],取消时返回None"""
+        outputs: List[Optional[Tuple[str, bool]]] = [None] * len(prompts)
+        pending: Dict[concurrent.futures.Future, int] = {}
+
+        for i, prompt in enumerate(prompts):
+            cached = self.cache.get(prompt, similarity_threshold=1.0)
+            if cached is not None:
+                outputs[i] = (cached, True)
+                result.cache_hits += 1
+            else:
+                pending[self.batch_client.submit(prompt)] = i
+                result.requests += 1
+
+        total = len(prompts)
+        done_count = total - len(pending)
+        if progress_callback:
+            progress_callback(stage, done_count, total)
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, timeout=0.1,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                for future in pending:
+                    future.cancel()
+                return None
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    text = future.result().strip()
+                except Exception:
+                    for other in pending:
+                        other.cancel()
+                    raise
+                self.cache.put(prompts[i], text, problem_type=CACHE_PROBLEM_TYPE)
+                outputs[i] = (text, False)
+                done_count += 1
+                if progress_callback:
+                    progress_callback(stage, done_count, total)
+
+        return outputs
+
+    @staticmethod
+    def _join_sections(sections: List[Tuple[str, str]]) -> str:
+        return '\n\n'.join(f"### {label}\n{text}" for label, text in sections)
+
+    def _sections_tokens(self, sections: List[Tuple[str, str]]) -> int:
+        return estimate_tokens(self._join_sections(sections))
+
+    @staticmethod
+    def _group_label(group: List[Tuple[str, str]], split: str) -> str:
+        """合并组的标签: 时间切分取首尾时间范围,模块切分列出模块"""
+        if len(group) == 1:
+            return group[0][0]
+        if split == SPLIT_BY_MODULE:
+            return '、'.join(label for label, _ in group)
+        first = group[0][0].split(' ~ ')[0]
+        last = group[-1][0].split(' ~ ')[-1]
+        return f"{first} ~ {last}"
+
+    def _pack_groups(self, sections: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        """按顺序把相邻摘要装入不超过 chunk_tokens 的组 (每组至少两段,保证逐层收敛)"""
+        groups: List[List[Tuple[str, str]]] = []
+        current: List[Tuple[str, str]] = []
+        for section in sections:
+            if len(current) >= 2 and self._sections_tokens(current + [section]) > self.chunk_tokens:
+                groups.append(current)
+                current = []
+            current.append(section)
+        if current:
+            if len(current) == 1 and groups:
+                groups[-1].append(current[0])
+            else:
+                groups.append(current)
+        return groups
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash签名与LSH分桶索引
+
+用于在大量缓存查询中快速找出Jaccard相似度较高的候选：
+1. MinHash: 对词集合做 num_perm 次随机置换取最小值，两个签名相同位置相等的比例
+   是两个集合Jaccard相似度的无偏估计
+2. LSH分桶: 签名切成 bands 段、每段 rows 个值，任一段完全相同即成为候选。
+   相似度为 s 的两个集合成为候选的概率为 1 - (1 - s^rows)^bands
+
+候选只用于缩小范围，最终是否命中仍由调用方按精确Jaccard判断。
+词哈希使用SHAKE-128而不是内置hash()，签名在不同进程间稳定，可以随条目持久化。
+"""
+
+import hashlib
+import struct
+from typing import Dict, Iterable, List, Set, Tuple
+
+# 默认参数：128个置换 = 32段 x 4行
+# 相似度0.7时成为候选的概率 > 99.9%，0.3时约23%，0.1时约0.3%
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+
+_MAX_HASH = (1 << 32) - 1
+_SEED = 1
+
+
+def tokenize(text: str) -> Set[str]:
+    """与相似查找一致的分词：小写后按空白切分"""
+    return set(text.lower().split())
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """精确Jaccard相似度（两个空集返回0）"""
+    union = len(a | b)
+    if union == 0:
+        return 0.0
+    return len(a & b) / union
+
+
+class MinHasher:
+    """
+    MinHash签名生成器
+
+    每个词用 SHAKE-128 一次生成 num_perm 个32位哈希值，第 i 个值作为第 i 个哈希函数
+    的结果，相比逐个计算 (a*x+b) mod p 快一个数量级；输出只取决于种子与词本身，
+    任何进程中都得到相同签名。
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = _SEED):
+        self.num_perm = num_perm
+        self._salt = seed.to_bytes(4, 'little')
+        self._unpack = struct.Struct(f'<{num_perm}I').unpack
+
+    def _token_hashes(self, token: str) -> Tuple[int, ...]:
+        digest = hashlib.shake_128(self._salt + token.encode('utf-8')).digest(4 * self.num_perm)
+        return self._unpack(digest)
+
+    def signature(self, tokens: Iterable[str]) -> List[int]:
+        """计算词集合的签名（空集合返回全最大值签名）"""
+        rows = [self._token_hashes(token) for token in set(tokens)]
+        if not rows:
+            return [_MAX_HASH] * self.num_perm
+        return list(map(min, zip(*rows)))
+
+
+class LSHIndex:
+    """
+    LSH分桶索引
+
+    使用示例:
+        index = LSHIndex()
+        index.insert(key, signature)
+        candidates = index.query(signature)
+        index.remove(key)
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm({num_perm}) 必须能被 bands({bands}) 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # 每段一个桶表: 段内容 -> key集合
+        self._tables: List[Dict[Tuple[int, ...], Set[str]]] = [{} for _ in range(bands)]
+        # key -> 各段内容（用于删除）
+        self._keys: Dict[str, List[Tuple[int, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def candidate_probability(self, similarity: float) -> float:
+        """相似度为 similarity 的两个集合成为候选的概率"""
+        return 1.0 - (1.0 - similarity ** self.rows) ** self.bands
+
+    def _band_keys(self, signature: List[int]) -> List[Tuple[int, ...]]:
+        if len(signature) != self.num_perm:
+            raise ValueError(f"签名长度 {len(signature)} 与索引 num_perm {self.num_perm} 不一致")
+        r = self.rows
+        return [tuple(signature[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def insert(self, key: str, signature: List[int]):
+        """加入（或替换）一个key的签名"""
+        if key in self._keys:
+            self.remove(key)
+        band_keys = self._band_keys(signature)
+        for table, band in zip(self._tables, band_keys):
+            table.setdefault(band, set()).add(key)
+        self._keys[key] = band_keys
+
+    def remove(self, key: str):
+        """移除一个key（不存在时忽略）"""
+        band_keys = self._keys.pop(key, None)
+        if band_keys is None:
+            return
+        for table, band in zip(self._tables, band_keys):
+            bucket = table.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[band]
+
+    def query(self, signature: List[int]) -> Set[str]:
+        """返回至少有一段与签名相同的所有key"""
+        candidates: Set[str] = set()
+        for table, band in zip(self._tables, self._band_keys(signature)):
+            bucket = table.get(band)
+            if bucket:
+                candidates |= bucket
+        return candidates
+
+    def clear(self):
+        """清空索引"""
+        for table in self._tables:
+            table.clear()
+        self._keys.clear()
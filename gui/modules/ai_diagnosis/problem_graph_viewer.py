@@ -9,20 +9,44 @@
 1. 问题节点可视化 (Canvas绘制)
 2. 关系连线 (箭头表示因果)
 3. 节点点击跳转
-4. 自动布局算法
-5. 缩放和拖动
+4. 自动布局算法 (分层 + 交叉最小化,后台计算并缓存,见 graph_layout)
+5. 缩放和拖动 (Canvas整体变换,只绘制可见区域,按缩放切换细节层次)
 """
 
+import threading
 import tkinter as tk
 from tkinter import ttk, font as tkfont
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Set
 import math
 
+try:
+    from .graph_layout import GraphLayout, SpatialIndex, cached_layout, get_layout
+except ImportError:
+    from graph_layout import GraphLayout, SpatialIndex, cached_layout, get_layout
+
+
+# 节点半径 (缩放为1时)
+NODE_RADIUS = 40
+
+# 细节层次: 缩放低于该值时只显示问题类型,再低则只画圆点和细线
+LOD_COMPACT_ZOOM = 0.9
+LOD_DOT_ZOOM = 0.6
+
+# 可见区域外额外绘制的边距 (画布坐标),减少平移时的补绘次数
+VIEWPORT_MARGIN = 200
+
+# 平移/滚动后补绘可见节点的延迟 (毫秒)
+RENDER_DELAY_MS = 30
+
 
 class ProblemGraphViewer(tk.Toplevel):
     """
     问题链路图查看器
 
+    布局在后台线程计算并按图结构缓存; 只绘制可见区域内的节点与连线
+    (平移、滚动时补绘新进入视口的部分); 缩放使用Canvas整体变换,
+    并按缩放级别切换细节层次,不重新绘制。
+
     使用示例:
         viewer = ProblemGraphViewer(parent, navigator)
         viewer.show()
@@ -42,9 +66,22 @@ class ProblemGraphViewer(tk.Toplevel):
         self.title("问题链路图 - Problem Graph")
         self.geometry("800x600")
 
-        # 节点位置缓存 {node_id: (x, y)}
+        # 节点位置缓存 {node_id: (x, y)} (缩放为1时的坐标)
         self.node_positions: Dict[int, Tuple[float, float]] = {}
 
+        # 当前布局与可见区域索引
+        self.layout: Optional[GraphLayout] = None
+        self.spatial_index: Optional[SpatialIndex] = None
+
+        # 已绘制的对象 ('node', id) / ('edge', 序号)
+        self._drawn: Set[Tuple[str, int]] = set()
+
+        # 布局版本 (丢弃过期的后台布局结果)
+        self._layout_generation = 0
+
+        # 待执行的补绘
+        self._render_job = None
+
         # 选中的节点
         self.selected_node: Optional[int] = None
 
@@ -95,8 +132,9 @@ class ProblemGraphViewer(tk.Toplevel):
         )
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        h_scrollbar.config(command=self.canvas.xview)
-        v_scrollbar.config(command=self.canvas.yview)
+        # 滚动后补绘新进入视口的节点
+        h_scrollbar.config(command=lambda *args: self._scroll(self.canvas.xview, *args))
+        v_scrollbar.config(command=lambda *args: self._scroll(self.canvas.yview, *args))
 
         # 详情面板
         detail_frame = ttk.LabelFrame(self, text="节点详情", padding="10")
@@ -107,7 +145,7 @@ class ProblemGraphViewer(tk.Toplevel):
 
     def _setup_bindings(self):
         """设置事件绑定"""
-        # 点击节点
+        # 点击节点 (所有节点共用一个绑定,按当前项的标签确定节点)
         self.canvas.tag_bind("node", "<Button-1>", self._on_node_click)
 
         # 双击跳转
@@ -121,22 +159,28 @@ class ProblemGraphViewer(tk.Toplevel):
         self.canvas.bind("<ButtonPress-2>", self._start_pan)  # 中键按下
         self.canvas.bind("<B2-Motion>", self._do_pan)          # 中键拖动
 
+        # 滚轮滚动、窗口大小变化后补绘
+        self.canvas.bind("<MouseWheel>", self._on_mouse_wheel)
+        self.canvas.bind("<Configure>", lambda e: self._schedule_render())
+
     def refresh(self):
         """刷新图谱"""
         # 清空画布
         self.canvas.delete("all")
+        self._drawn.clear()
         self.node_positions.clear()
+        self.layout = None
+        self.spatial_index = None
 
         if not self.navigator or not self.navigator.problem_graph:
+            self._layout_generation += 1
             self._draw_empty_state()
+            self._update_stats()
             return
 
-        # 自动布局
+        # 自动布局 (已缓存时立即绘制,否则在后台计算)
         self.auto_layout()
 
-        # 绘制
-        self._draw_graph()
-
         # 更新统计
         self._update_stats()
 
@@ -150,107 +194,203 @@ class ProblemGraphViewer(tk.Toplevel):
             justify=tk.CENTER
         )
 
-    def _draw_graph(self):
-        """绘制问题图谱"""
-        graph = self.navigator.problem_graph
+    # ========== 布局 ==========
 
-        # 1. 绘制连线 (先画,这样节点会在上层)
-        for node_id, node in graph.items():
-            if node_id not in self.node_positions:
-                continue
+    def auto_layout(self):
+        """自动布局 (分层布局 + 交叉最小化,后台计算,按图结构缓存)"""
+        if not self.navigator or not self.navigator.problem_graph:
+            return
 
-            x1, y1 = self.node_positions[node_id]
+        # 在UI线程复制图结构,后台线程只读取副本
+        structure = {node_id: list(node.related_nodes)
+                     for node_id, node in self.navigator.problem_graph.items()}
 
-            for related_id in node.related_nodes:
-                if related_id not in self.node_positions:
-                    continue
+        self._layout_generation += 1
+        generation = self._layout_generation
 
-                x2, y2 = self.node_positions[related_id]
+        layout = cached_layout(structure)
+        if layout is not None:
+            self._apply_layout(generation, layout)
+            return
 
-                # 绘制箭头 (从node_id → related_id)
-                self._draw_arrow(x1, y1, x2, y2)
+        self.canvas.delete("all")
+        self._drawn.clear()
+        self.canvas.create_text(
+            400, 300,
+            text=f"正在计算布局 ({len(structure)} 个节点)...",
+            font=("Arial", 12),
+            fill="gray",
+            tags="pending"
+        )
 
-        # 2. 绘制节点
-        for node_id, node in graph.items():
-            if node_id not in self.node_positions:
-                continue
+        def _compute():
+            result = get_layout(structure)
+            try:
+                self.after(0, self._apply_layout, generation, result)
+            except (RuntimeError, tk.TclError):
+                pass  # 窗口已关闭
 
-            x, y = self.node_positions[node_id]
+        threading.Thread(target=_compute, daemon=True).start()
+
+    def _apply_layout(self, generation: int, layout: GraphLayout):
+        """应用布局结果并绘制可见部分"""
+        if generation != self._layout_generation:
+            return  # 期间图已变化,等待更新的布局
+
+        self.layout = layout
+        self.node_positions = dict(layout.positions)
+        self.spatial_index = SpatialIndex.for_layout(layout, NODE_RADIUS)
+
+        self.canvas.delete("all")
+        self._drawn.clear()
+        self._update_scrollregion()
+        self._render_visible()
 
-            # 节点颜色 (根据问题类型)
-            color = self._get_node_color(node.problem_type)
+        if self.selected_node in self.node_positions:
+            self._draw_highlight(self.selected_node)
+
+    def _update_scrollregion(self):
+        if self.layout is None:
+            return
+        zoom = self.zoom_level
+        self.canvas.config(scrollregion=(0, 0, self.layout.width * zoom, self.layout.height * zoom))
+
+    # ========== 绘制 (只绘制可见区域) ==========
+
+    def _visible_rect(self) -> Tuple[float, float, float, float]:
+        """可见区域 (缩放为1时的坐标,含边距)"""
+        canvas = self.canvas
+        width = max(canvas.winfo_width(), 1)
+        height = max(canvas.winfo_height(), 1)
+        zoom = self.zoom_level
+        x0 = (canvas.canvasx(0) - VIEWPORT_MARGIN) / zoom
+        y0 = (canvas.canvasy(0) - VIEWPORT_MARGIN) / zoom
+        x1 = (canvas.canvasx(width) + VIEWPORT_MARGIN) / zoom
+        y1 = (canvas.canvasy(height) + VIEWPORT_MARGIN) / zoom
+        return x0, y0, x1, y1
+
+    def _schedule_render(self):
+        """合并短时间内的多次滚动,稍后补绘"""
+        if self._render_job is not None:
+            return
+
+        def _run():
+            self._render_job = None
+            self._render_visible()
+
+        self._render_job = self.after(RENDER_DELAY_MS, _run)
+
+    def _render_visible(self):
+        """绘制进入可见区域、尚未绘制的节点与连线"""
+        if self.spatial_index is None or not self.navigator:
+            return
+
+        pending = self.spatial_index.query(self._visible_rect()) - self._drawn
+        if not pending:
+            return
 
-            # 绘制节点
-            self._draw_node(node_id, x, y, node.problem_type, node.description, color)
+        graph = self.navigator.problem_graph
+        for kind, key in pending:
+            if kind == 'edge':
+                self._draw_edge(key)
+            elif key in graph:
+                node = graph[key]
+                self._draw_node(key, *self.node_positions[key], node.problem_type,
+                                node.description, self._get_node_color(node.problem_type))
+        self._drawn |= pending
+
+        # 连线在节点下方
+        self.canvas.tag_lower("edge")
+        self._apply_lod()
 
     def _draw_node(self, node_id: int, x: float, y: float, problem_type: str, description: str, color: str):
-        """绘制单个节点"""
-        radius = 40 * self.zoom_level
+        """绘制单个节点 (x, y 为缩放为1时的坐标)"""
+        zoom = self.zoom_level
+        x, y = x * zoom, y * zoom
+        radius = NODE_RADIUS * zoom
+        tags = ("graph", "node", f"node_{node_id}")
 
         # 圆形节点
-        circle = self.canvas.create_oval(
+        self.canvas.create_oval(
             x - radius, y - radius,
             x + radius, y + radius,
             fill=color,
             outline="black",
             width=2,
-            tags=("node", f"node_{node_id}")
+            tags=tags + ("node_shape",)
         )
 
         # 问题类型标签
-        type_text = self.canvas.create_text(
-            x, y - 10,
+        self.canvas.create_text(
+            x, y - 10 * zoom,
             text=problem_type,
-            font=("Arial", int(10 * self.zoom_level), "bold"),
+            font=self._type_font(),
             fill="white",
-            tags=("node", f"node_{node_id}")
+            tags=tags + ("label_type",)
         )
 
         # 行号
         line_num = self.navigator.problem_graph[node_id].location.line_number
-        line_text = self.canvas.create_text(
-            x, y + 10,
+        self.canvas.create_text(
+            x, y + 10 * zoom,
             text=f"行{line_num}",
-            font=("Arial", int(8 * self.zoom_level)),
+            font=self._line_font(),
             fill="white",
-            tags=("node", f"node_{node_id}")
+            tags=tags + ("label_line",)
         )
 
-        # 存储节点ID (用于点击事件)
-        self.canvas.tag_bind(f"node_{node_id}", "<Button-1>", lambda e, nid=node_id: self._on_node_click_with_id(nid))
-        self.canvas.tag_bind(f"node_{node_id}", "<Double-Button-1>", lambda e, nid=node_id: self._on_node_double_click_with_id(nid))
-
-    def _draw_arrow(self, x1: float, y1: float, x2: float, y2: float):
-        """绘制箭头 (从点1到点2)"""
-        # 计算方向
-        dx = x2 - x1
-        dy = y2 - y1
-        length = math.sqrt(dx**2 + dy**2)
-
-        if length == 0:
-            return
-
-        # 单位向量
-        ux = dx / length
-        uy = dy / length
+    def _draw_edge(self, index: int):
+        """绘制连线 (沿布局折线,两端让出节点半径)"""
+        _, _, points = self.layout.edges[index]
+        zoom = self.zoom_level
+        points = [(x * zoom, y * zoom) for x, y in points]
 
-        # 缩短箭头,不覆盖节点
-        radius = 40 * self.zoom_level
-        start_x = x1 + ux * radius
-        start_y = y1 + uy * radius
-        end_x = x2 - ux * radius
-        end_y = y2 - uy * radius
+        radius = NODE_RADIUS * zoom
+        points[0] = self._shorten(points[0], points[1], radius)
+        points[-1] = self._shorten(points[-1], points[-2], radius)
 
-        # 绘制箭头
         self.canvas.create_line(
-            start_x, start_y,
-            end_x, end_y,
+            *[c for point in points for c in point],
             arrow=tk.LAST,
             width=2,
             fill="gray",
-            smooth=True
+            smooth=len(points) > 2,
+            tags=("graph", "edge")
         )
 
+    @staticmethod
+    def _shorten(point: Tuple[float, float], toward: Tuple[float, float], distance: float) -> Tuple[float, float]:
+        """把端点沿连线方向移动distance (不覆盖节点)"""
+        dx = toward[0] - point[0]
+        dy = toward[1] - point[1]
+        length = math.sqrt(dx ** 2 + dy ** 2)
+        if length == 0:
+            return point
+        step = min(distance, length / 2)
+        return point[0] + dx / length * step, point[1] + dy / length * step
+
+    # ========== 细节层次 ==========
+
+    def _type_font(self):
+        return ("Arial", max(int(10 * self.zoom_level), 1), "bold")
+
+    def _line_font(self):
+        return ("Arial", max(int(8 * self.zoom_level), 1))
+
+    def _apply_lod(self):
+        """按缩放级别切换标签显示与连线粗细 (按标签整体设置,不逐项重绘)"""
+        zoom = self.zoom_level
+        canvas = self.canvas
+        show_type = zoom >= LOD_DOT_ZOOM
+        show_line = zoom >= LOD_COMPACT_ZOOM
+
+        canvas.itemconfigure("label_type", state=tk.NORMAL if show_type else tk.HIDDEN,
+                             font=self._type_font())
+        canvas.itemconfigure("label_line", state=tk.NORMAL if show_line else tk.HIDDEN,
+                             font=self._line_font())
+        canvas.itemconfigure("node_shape", width=2 if show_type else 1)
+        canvas.itemconfigure("edge", width=2 if show_type else 1)
+
     def _get_node_color(self, problem_type: str) -> str:
         """根据问题类型返回节点颜色"""
         color_map = {
@@ -265,74 +405,37 @@ class ProblemGraphViewer(tk.Toplevel):
         }
         return color_map.get(problem_type, "#34495e")  # 默认深灰
 
-    def auto_layout(self):
-        """自动布局算法 (简单的分层布局)"""
-        if not self.navigator or not self.navigator.problem_graph:
-            return
-
-        graph = self.navigator.problem_graph
-
-        # 1. 查找根节点 (没有入边的节点)
-        all_nodes = set(graph.keys())
-        has_incoming = set()
-        for node in graph.values():
-            has_incoming.update(node.related_nodes)
-
-        root_nodes = all_nodes - has_incoming
-
-        # 2. 分层 (BFS)
-        layers: List[List[int]] = []
-        visited = set()
-        current_layer = list(root_nodes)
-
-        while current_layer:
-            layers.append(current_layer[:])
-            visited.update(current_layer)
-
-            # 下一层
-            next_layer = []
-            for node_id in current_layer:
-                if node_id in graph:
-                    for related_id in graph[node_id].related_nodes:
-                        if related_id not in visited:
-                            next_layer.append(related_id)
-
-            current_layer = next_layer
-
-        # 3. 计算位置
-        canvas_width = 800
-        canvas_height = 600
-        layer_height = 120  # 层间距
-
-        for level, layer in enumerate(layers):
-            y = 100 + level * layer_height
-            num_nodes = len(layer)
-
-            # 水平分布
-            if num_nodes == 1:
-                x_positions = [canvas_width / 2]
-            else:
-                spacing = min(canvas_width * 0.8 / (num_nodes - 1), 200)
-                start_x = (canvas_width - spacing * (num_nodes - 1)) / 2
-                x_positions = [start_x + i * spacing for i in range(num_nodes)]
-
-            for i, node_id in enumerate(layer):
-                self.node_positions[node_id] = (x_positions[i], y)
-
-        # 更新滚动区域
-        if layers:
-            max_y = 100 + len(layers) * layer_height + 100
-            self.canvas.config(scrollregion=(0, 0, canvas_width, max_y))
-
     def zoom_in(self):
         """放大"""
-        self.zoom_level = min(self.zoom_level * 1.2, 3.0)
-        self.refresh()
+        self._zoom(min(self.zoom_level * 1.2, 3.0))
 
     def zoom_out(self):
         """缩小"""
-        self.zoom_level = max(self.zoom_level / 1.2, 0.5)
-        self.refresh()
+        self._zoom(max(self.zoom_level / 1.2, 0.2))
+
+    def _zoom(self, zoom: float):
+        """以视口中心为基准缩放 (Canvas整体变换,不重新绘制)"""
+        if zoom == self.zoom_level:
+            return
+        canvas = self.canvas
+        factor = zoom / self.zoom_level
+
+        # 缩放前视口中心 (缩放为1时的坐标)
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        center_x = canvas.canvasx(width / 2) / self.zoom_level
+        center_y = canvas.canvasy(height / 2) / self.zoom_level
+
+        canvas.scale("graph", 0, 0, factor, factor)
+        self.zoom_level = zoom
+        self._apply_lod()
+
+        if self.layout is not None:
+            self._update_scrollregion()
+            total_w = max(self.layout.width * zoom, 1)
+            total_h = max(self.layout.height * zoom, 1)
+            canvas.xview_moveto(max(center_x * zoom - width / 2, 0) / total_w)
+            canvas.yview_moveto(max(center_y * zoom - height / 2, 0) / total_h)
+        self._render_visible()
 
     def clear_graph(self):
         """清除图谱"""
@@ -344,35 +447,50 @@ class ProblemGraphViewer(tk.Toplevel):
                 self.navigator.next_node_id = 0
             self.refresh()
 
+    def _node_at_current(self) -> Optional[int]:
+        """鼠标所在节点的ID (从当前项的 node_<id> 标签解析)"""
+        for tag in self.canvas.gettags("current"):
+            if tag.startswith("node_") and tag[5:].isdigit():
+                return int(tag[5:])
+        return None
+
     def _on_node_click(self, event):
         """节点点击事件"""
-        # 由具体节点的binding处理
-        pass
+        node_id = self._node_at_current()
+        if node_id is not None:
+            self._on_node_click_with_id(node_id)
 
     def _on_node_click_with_id(self, node_id: int):
         """点击节点 (带ID)"""
         self.selected_node = node_id
 
         # 高亮选中节点
+        self._draw_highlight(node_id)
+
+        # 显示详情
+        self._show_node_details(node_id)
+
+    def _draw_highlight(self, node_id: int):
+        """高亮选中节点"""
         self.canvas.delete("highlight")
         if node_id in self.node_positions:
             x, y = self.node_positions[node_id]
-            radius = 45 * self.zoom_level
+            zoom = self.zoom_level
+            radius = (NODE_RADIUS + 5) * zoom
 
             self.canvas.create_oval(
-                x - radius, y - radius,
-                x + radius, y + radius,
+                x * zoom - radius, y * zoom - radius,
+                x * zoom + radius, y * zoom + radius,
                 outline="blue",
                 width=3,
-                tags="highlight"
+                tags=("graph", "highlight")
             )
 
-        # 显示详情
-        self._show_node_details(node_id)
-
     def _on_node_double_click(self, event):
         """节点双击事件"""
-        pass
+        node_id = self._node_at_current()
+        if node_id is not None:
+            self._on_node_double_click_with_id(node_id)
 
     def _on_node_double_click_with_id(self, node_id: int):
         """双击节点 (带ID) - 跳转到日志"""
@@ -431,14 +549,25 @@ AI分析:
         self.canvas.scan_mark(event.x, event.y)
 
     def _do_pan(self, event):
-        """拖动画布"""
+        """拖动画布 (补绘新进入视口的节点)"""
         self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self._schedule_render()
+
+    def _scroll(self, view, *args):
+        """滚动条滚动"""
+        view(*args)
+        self._schedule_render()
+
+    def _on_mouse_wheel(self, event):
+        """滚轮滚动"""
+        self.canvas.yview_scroll(-1 if event.delta > 0 else 1, "units")
+        self._schedule_render()
 
     def _show_message(self, message: str):
         """显示临时消息"""
         # 在画布顶部显示消息
-        msg_id = self.canvas.create_text(
-            400, 20,
+        self.canvas.create_text(
+            self.canvas.canvasx(max(self.canvas.winfo_width(), 800) / 2), self.canvas.canvasy(20),
             text=message,
             font=("Arial", 12, "bold"),
             fill="green",
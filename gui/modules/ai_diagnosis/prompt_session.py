@@ -0,0 +1,278 @@
+"""
+前缀稳定的会话提示词
+
+交互式问答的追问会重复发送整段压缩日志。本模块把提示词拆成按稳定性排序的分段：
+
+    系统指令（固定） | 会话日志上下文（日志不变则不变） | 历史问答（只追加） | 本次问题（变化）
+
+前面的分段构成可缓存的前缀：支持提示词缓存的后端（Anthropic）在分段末尾加
+cache_control 标记，按前缀自动缓存的后端（OpenAI）只需保持前缀字节不变；
+追问时只有新增的历史与本次问题需要按全价处理。
+
+CachedPrompt 是 str 的子类，可以原样经过调度器、响应缓存等只接受文本的环节；
+不认识分段的后端直接把它当作普通文本发送。
+
+PrefixCacheMockClient 是本地模拟后端，按前缀哈希模拟提供方的缓存读写，
+用于验证追问时前缀保持稳定。
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .ai_client import AIClient
+    from .compact_prompts import CompactPromptTemplates
+    from .token_counter import TokenCounter, get_token_counter
+except ImportError:
+    from ai_client import AIClient
+    from compact_prompts import CompactPromptTemplates
+    from token_counter import TokenCounter, get_token_counter
+
+
+# 分段类型（按稳定性从高到低）
+SEGMENT_SYSTEM = "system"
+SEGMENT_CONTEXT = "context"
+SEGMENT_HISTORY = "history"
+SEGMENT_QUESTION = "question"
+
+# Anthropic单次请求最多4个缓存断点
+MAX_CACHE_BREAKPOINTS = 4
+
+# 查找缓存时从断点向前回溯的分段边界数
+CACHE_LOOKBACK_SEGMENTS = 20
+
+
+@dataclass(frozen=True)
+class PromptSegment:
+    """提示词分段"""
+    text: str  # 分段文本（包含与下一分段之间的分隔）
+    kind: str  # 分段类型（SEGMENT_*）
+    cache: bool = False  # 是否在分段末尾设置缓存断点
+
+
+class CachedPrompt(str):
+    """
+    带缓存断点的分段提示词
+
+    字符串值为各分段按顺序拼接的完整文本。
+    """
+
+    segments: Tuple[PromptSegment, ...]
+
+    def __new__(cls, segments: List[PromptSegment]):
+        prompt = super().__new__(cls, ''.join(segment.text for segment in segments))
+        prompt.segments = tuple(segments)
+        return prompt
+
+    @property
+    def prefix(self) -> str:
+        """最后一个缓存断点之前的文本（可缓存前缀）"""
+        points = self.breakpoints()
+        return self[:points[-1]] if points else ""
+
+    @property
+    def prefix_hash(self) -> str:
+        """可缓存前缀的哈希（同一会话的追问应保持不变或只向后延长）"""
+        return hashlib.sha1(self.prefix.encode('utf-8')).hexdigest()
+
+    def segment_ends(self) -> List[int]:
+        """各分段结束位置（字符偏移）"""
+        ends = []
+        position = 0
+        for segment in self.segments:
+            position += len(segment.text)
+            ends.append(position)
+        return ends
+
+    def breakpoints(self) -> List[int]:
+        """各缓存断点在完整文本中的位置（字符偏移，只保留最后 MAX_CACHE_BREAKPOINTS 个）"""
+        return self._marked()[1]
+
+    def _marked(self) -> Tuple[List[int], List[int]]:
+        """保留的缓存断点：(分段序号, 结束位置)"""
+        marked = [(i, end) for i, (segment, end) in enumerate(zip(self.segments, self.segment_ends()))
+                  if segment.cache][-MAX_CACHE_BREAKPOINTS:]
+        return [i for i, _ in marked], [end for _, end in marked]
+
+    def to_anthropic(self) -> Dict:
+        """
+        转换为Anthropic messages.create的参数
+
+        系统指令放入system，其余分段作为同一条用户消息的多个文本块；
+        设置了缓存断点的分段带 cache_control 标记。
+        """
+        marked = set(self._marked()[0])
+        system, content = [], []
+        for i, segment in enumerate(self.segments):
+            if not segment.text:
+                continue
+            block = {"type": "text", "text": segment.text}
+            if i in marked:
+                block["cache_control"] = {"type": "ephemeral"}
+            (system if segment.kind == SEGMENT_SYSTEM else content).append(block)
+
+        payload = {"messages": [{"role": "user", "content": content}]}
+        if system:
+            payload["system"] = system
+        return payload
+
+    def to_openai_messages(self) -> List[Dict]:
+        """转换为OpenAI消息列表（系统指令在前，前缀自动缓存，无需标记）"""
+        system = ''.join(s.text for s in self.segments if s.kind == SEGMENT_SYSTEM)
+        user = ''.join(s.text for s in self.segments if s.kind != SEGMENT_SYSTEM)
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": user})
+        return messages
+
+
+class PromptSession:
+    """
+    前缀稳定的问答会话
+
+    同一份日志上下文上的多次提问共享前缀：上下文只在日志变化时更新，
+    历史问答只追加（超出轮数时整体丢弃最早的轮次，前缀随之重建一次）。
+    """
+
+    # 保留的历史问答轮数
+    MAX_HISTORY_TURNS = 6
+
+    # 历史回答保留的最大字符数
+    MAX_ANSWER_CHARS = 1500
+
+    def __init__(self, system_prompt: str = CompactPromptTemplates.QA_SESSION_SYSTEM,
+                 max_history_turns: int = MAX_HISTORY_TURNS):
+        """
+        Args:
+            system_prompt: 固定的系统指令
+            max_history_turns: 保留的历史问答轮数
+        """
+        self.system_prompt = system_prompt
+        self.max_history_turns = max_history_turns
+        self.context = ""
+        self.context_key = None
+        self.context_source = None  # 生成上下文的日志列表（按身份比较，不用id）
+        self.history: List[str] = []
+
+    def has_context(self, key, source=None) -> bool:
+        """当前上下文是否基于key（及同一个source对象）对应的日志"""
+        return (self.context_key is not None and self.context_key == key
+                and self.context_source is source)
+
+    def set_context(self, log_summary: str, key=None, source=None) -> bool:
+        """
+        设置会话日志上下文（内容变化时清空历史）
+
+        Args:
+            log_summary: 日志摘要
+            key: 日志状态的键（如长度与修改版本）
+            source: 生成摘要的日志列表（会话持有其引用，has_context按身份比较）
+
+        Returns:
+            上下文是否发生变化
+        """
+        context = CompactPromptTemplates.QA_SESSION_CONTEXT.format(log_summary=log_summary)
+        self.context_key = key
+        self.context_source = source
+        if context == self.context:
+            return False
+        self.context = context
+        self.history = []
+        return True
+
+    def record(self, question: str, answer: str):
+        """追加一轮问答（回答过长时截断）"""
+        answer = answer.strip()
+        if len(answer) > self.MAX_ANSWER_CHARS:
+            answer = answer[:self.MAX_ANSWER_CHARS] + "…"
+        self.history.append(CompactPromptTemplates.QA_SESSION_TURN.format(
+            question=question.strip(), answer=answer))
+        if len(self.history) > self.max_history_turns:
+            # 整体丢弃最早的一半，避免每轮都改变前缀
+            self.history = self.history[-(self.max_history_turns // 2 or 1):]
+
+    def reset(self):
+        """清空上下文与历史"""
+        self.context = ""
+        self.context_key = None
+        self.context_source = None
+        self.history = []
+
+    def build(self, question: str, related_logs: str = "") -> CachedPrompt:
+        """
+        构建本次提问的提示词
+
+        Args:
+            question: 用户问题
+            related_logs: 与本次问题相关的日志（放在可变部分）
+        """
+        segments = [PromptSegment(self.system_prompt, SEGMENT_SYSTEM, cache=True)]
+        if self.context:
+            segments.append(PromptSegment(self.context, SEGMENT_CONTEXT, cache=True))
+        for i, turn in enumerate(self.history):
+            # 只在最后一轮历史处设置断点，前面的轮次由上一次请求的断点覆盖
+            segments.append(PromptSegment(turn, SEGMENT_HISTORY, cache=i == len(self.history) - 1))
+        segments.append(PromptSegment(
+            CompactPromptTemplates.QA_SESSION_QUESTION.format(
+                related_logs=related_logs, user_question=question),
+            SEGMENT_QUESTION
+        ))
+        return CachedPrompt(segments)
+
+
+class PrefixCacheMockClient(AIClient):
+    """
+    模拟提示词缓存的本地后端
+
+    按缓存断点处的前缀哈希记录缓存（与提供方一致：命中最长的已缓存前缀，
+    其后到最后一个断点之间的内容写入缓存），每次请求的用量记录在 usage 中。
+    普通字符串提示词没有断点，全部按输入计。
+    """
+
+    def __init__(self, responder: Optional[Callable[[str], str]] = None,
+                 token_counter: Optional[TokenCounter] = None):
+        """
+        Args:
+            responder: 根据提示词生成回答（默认返回固定文本）
+            token_counter: token计数器（None时使用默认计数器）
+        """
+        self.responder = responder or (lambda prompt: "已收到")
+        self.counter = token_counter or get_token_counter()
+        self.usage: List[Dict[str, int]] = []
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    def ask(self, prompt: str, **kwargs) -> str:
+        self._account(prompt)
+        return self.responder(prompt)
+
+    def _account(self, prompt: str) -> Dict[str, int]:
+        """记录一次请求的缓存读写与输入token"""
+        text = str(prompt)
+        breakpoints = prompt.breakpoints() if isinstance(prompt, CachedPrompt) else []
+        written = breakpoints[-1] if breakpoints else 0
+        # 与提供方一致：从最后一个断点向前回溯各分段边界查找已缓存的前缀
+        boundaries = [end for end in prompt.segment_ends() if end <= written][-CACHE_LOOKBACK_SEGMENTS:] \
+            if breakpoints else []
+
+        def digest(end):
+            return hashlib.sha1(text[:end].encode('utf-8')).hexdigest()
+
+        with self._lock:
+            hit = 0
+            for end in reversed(boundaries):
+                if digest(end) in self._cached_prefixes:
+                    hit = end
+                    break
+            self._cached_prefixes.update(digest(end) for end in breakpoints)
+
+        usage = {
+            'cache_read_tokens': self.counter.count(text[:hit]),
+            'cache_write_tokens': self.counter.count(text[hit:written]) if written > hit else 0,
+            'input_tokens': self.counter.count(text[max(hit, written):]),
+        }
+        self.usage.append(usage)
+        return usage
@@ -5,17 +5,27 @@
 目标：将任意大小的日志压缩到2000-4000 tokens以内。
 """
 
-from collections import Counter
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 try:
     from data_models import LogEntry
+    from module_health import ModuleHealthAggregator
+    from template_miner import TemplateMiner
 except ImportError:
     try:
         from modules.data_models import LogEntry
+        from modules.module_health import ModuleHealthAggregator
+        from modules.template_miner import TemplateMiner
     except ImportError:
         from gui.modules.data_models import LogEntry
+        from gui.modules.module_health import ModuleHealthAggregator
+        from gui.modules.template_miner import TemplateMiner
+
+try:
+    from .token_counter import TokenCounter, count_tokens, get_token_counter
+except ImportError:
+    from token_counter import TokenCounter, count_tokens, get_token_counter
 
 
 @dataclass
@@ -30,19 +40,23 @@ class CompressedLog:
 class SmartLogCompressor:
     """智能日志压缩器"""
 
-    # Token预估: 1 token ≈ 4个英文字符 ≈ 1.5个中文字符
+    # 粗略字符预估（只用于不值得分词的快速判断，如是否需要分块）
     # 保守估计: 1 token ≈ 2个字符（混合中英文）
     CHARS_PER_TOKEN = 2
 
-    def __init__(self, max_tokens: int = 3000):
+    TRUNCATION_MARK = "\n...\n[摘要已截断以控制长度]"
+
+    def __init__(self, max_tokens: int = 3000, token_counter: Optional[TokenCounter] = None):
         """
         初始化压缩器
 
         Args:
             max_tokens: 目标最大token数（默认3000，留有余地）
+            token_counter: token计数器（None时使用默认计数器）
         """
         self.max_tokens = max_tokens
         self.max_chars = max_tokens * self.CHARS_PER_TOKEN
+        self.counter = token_counter or get_token_counter()
 
     def compress(self, entries: List[LogEntry]) -> CompressedLog:
         """
@@ -108,15 +122,16 @@ class SmartLogCompressor:
         # 合并摘要
         summary = '\n'.join(summary_parts)
 
-        # 第四步：检查长度，必要时进一步截断
-        if len(summary) > self.max_chars:
-            summary = self._truncate_summary(summary, self.max_chars)
+        # 第四步：检查token数，必要时按行截断
+        estimated_tokens = self.counter.count(summary)
+        if estimated_tokens > self.max_tokens:
+            summary = self.truncate_to_tokens(summary, self.max_tokens)
+            estimated_tokens = self.counter.count(summary)
 
-        # 计算压缩比和预估token
+        # 计算压缩比
         original_size = sum(len(e.content) for e in entries)
         compressed_size = len(summary)
         compression_ratio = compressed_size / original_size if original_size > 0 else 1.0
-        estimated_tokens = compressed_size // self.CHARS_PER_TOKEN
 
         return CompressedLog(
             summary=summary,
@@ -149,12 +164,10 @@ class SmartLogCompressor:
     def _compute_statistics(self, entries: List[LogEntry],
                            categorized: Dict[str, List[LogEntry]]) -> Dict:
         """计算统计信息"""
-        # 模块统计
-        module_counter = Counter(e.module for e in entries)
-        top_modules = module_counter.most_common(5)
-
-        # 级别统计
-        level_counter = Counter(e.level for e in entries)
+        # 模块与级别统计（与模块列表、预处理器共用同一份聚合结果）
+        health = ModuleHealthAggregator.of(entries)
+        top_modules = health.top_modules(5)
+        level_counter = health.levels
 
         # 时间范围
         time_range = f"{entries[0].timestamp} ~ {entries[-1].timestamp}" if len(entries) > 1 else entries[0].timestamp
@@ -207,34 +220,17 @@ class SmartLogCompressor:
 
     def _deduplicate_logs(self, logs: List[LogEntry], max_samples: int = 10) -> List:
         """
-        去重日志（基于内容签名）
+        去重日志（基于日志模板）
 
-        相同错误只保留一个样本，但记录出现次数
+        只在ID、数字、地址上不同的日志视为同一条，只保留首个样本并记录出现次数
         返回: List of (log, count) tuples
         """
-        # 使用前50个字符作为签名
-        signature_map = {}
-
+        miner = TemplateMiner(max_samples=1)
         for log in logs:
-            signature = log.content[:50].strip()
-            if signature not in signature_map:
-                signature_map[signature] = {
-                    'log': log,
-                    'count': 0
-                }
-            signature_map[signature]['count'] += 1
+            miner.add(log)
 
         # 按出现次数排序，保留最高频的
-        sorted_items = sorted(signature_map.items(),
-                             key=lambda x: x[1]['count'],
-                             reverse=True)
-
-        # 返回(log, count)元组列表
-        result = []
-        for i, (sig, data) in enumerate(sorted_items[:max_samples]):
-            result.append((data['log'], data['count']))
-
-        return result
+        return [(template.samples[0], template.count) for template in miner.top(max_samples)]
 
     def _sample_logs(self, logs: List[LogEntry], max_samples: int = 5) -> List[LogEntry]:
         """均匀采样日志"""
@@ -256,7 +252,44 @@ class SmartLogCompressor:
         if last_newline > max_chars * 0.8:  # 至少保留80%
             truncated = truncated[:last_newline]
 
-        return truncated + "\n...\n[摘要已截断以控制长度]"
+        return truncated + self.TRUNCATION_MARK
+
+    def truncate_to_tokens(self, summary: str, max_tokens: int) -> str:
+        """
+        按token预算截断摘要（整行保留）
+
+        逐行累加缓存的行token数，超出预算前停止；
+        单行超出剩余预算时按字符比例截断该行。
+
+        Args:
+            summary: 摘要文本
+            max_tokens: token预算（含截断标记）
+
+        Returns:
+            截断后的文本（未超出预算时原样返回）
+        """
+        counter = self.counter
+        if counter.count(summary) <= max_tokens:
+            return summary
+
+        budget = max_tokens - counter.count(self.TRUNCATION_MARK)
+        kept = []
+        used = 0
+        for line in summary.split('\n'):
+            # 换行符按1个token计
+            cost = counter.count(line) + 1
+            if used + cost > budget:
+                remaining = budget - used - 1
+                if not kept and remaining > 0:
+                    chars = max(1, len(line) * remaining // cost)
+                    while chars > 1 and counter.count(line[:chars]) > remaining:
+                        chars = chars * 3 // 4
+                    kept.append(line[:chars])
+                break
+            kept.append(line)
+            used += cost
+
+        return '\n'.join(kept) + self.TRUNCATION_MARK
 
 
 class FocusedCompressor(SmartLogCompressor):
@@ -337,8 +370,8 @@ class FocusedCompressor(SmartLogCompressor):
             entries: 日志条目
             module: 目标模块名
         """
-        # 只保留目标模块的日志
-        module_logs = [e for e in entries if e.module == module]
+        # 只保留目标模块的日志（直接取聚合器中的模块日志）
+        module_logs = ModuleHealthAggregator.of(entries).module_entries(module)
 
         if not module_logs:
             return CompressedLog(
@@ -362,8 +395,7 @@ def estimate_tokens(text: str) -> int:
     Returns:
         预估的token数量
     """
-    # 简单估算：2个字符 ≈ 1 token（保守估计）
-    return len(text) // 2
+    return count_tokens(text)
 
 
 def format_token_budget(used_tokens: int, max_tokens: int) -> str:
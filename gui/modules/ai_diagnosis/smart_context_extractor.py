@@ -11,13 +11,21 @@
 3. 关键日志优先级排序 (错误、警告、关键模块)
 4. 跨模块关联分析 (同线程、时间窗口内)
 5. Token优化压缩 (保留核心信息)
+6. 错误突增窗口的上下文提取 (只分析异常时间段)
 """
 
-from typing import List, Tuple, Dict, Optional, Set
+from typing import List, Tuple, Dict, Optional, Set, Pattern
 from enum import Enum
 from collections import defaultdict
+import heapq
+import math
 import re
 
+try:
+    from .token_counter import count_tokens
+except ImportError:
+    from token_counter import count_tokens
+
 
 class ProblemType(Enum):
     """问题类型枚举"""
@@ -30,6 +38,12 @@ class ProblemType(Enum):
     UNKNOWN = "未知"            # 未分类
 
 
+# 关键词索引命中行数超过该值时视为常见词，不参与关联日志评分
+MAX_KEYWORD_POSTINGS = 20000
+# 字符串目标的定位结果缓存上限
+TEXT_POSITION_CACHE_SIZE = 256
+
+
 class SmartContextExtractor:
     """
     智能日志上下文提取器
@@ -133,6 +147,22 @@ class SmartContextExtractor:
             },
         }
 
+        # 每种问题类型的规则合并为一个忽略大小写的正则，检测时每类只扫描一次
+        self._type_matchers: Dict[ProblemType, Pattern] = {
+            ptype: re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
+            for ptype, patterns in self.problem_patterns.items()
+        }
+        self._keyword_matchers: Dict[Tuple[str, ...], List[Pattern]] = {}
+        self._priority_matcher = re.compile(r'crash|exception|fatal', re.IGNORECASE)
+
+        # 条目对象 → 位置（按对象身份，首次定位时建立，条目列表追加时增量补充，
+        # 换成另一个列表或列表变短时重建）
+        self._positions: Dict[int, int] = {}
+        self._positions_list: Optional[list] = None
+        self._positions_built = 0
+        self._text_positions: Dict[str, Optional[int]] = {}
+        self._text_positions_key: Tuple[int, int] = (0, 0)
+
     def extract_context(self, target_entry, max_tokens: int = 8000) -> Dict:
         """
         智能提取日志上下文
@@ -197,23 +227,50 @@ class SmartContextExtractor:
 
         return optimized
 
+    def extract_burst_contexts(self, bursts: List, max_tokens: int = 8000, max_bursts: int = 3) -> List[Dict]:
+        """
+        提取错误突增窗口的上下文
+
+        按z-score选取最显著的几次突增, 以每次突增的第一条错误日志为目标提取上下文,
+        Token预算在各窗口间平分。
+
+        Args:
+            bursts: 突增列表 (ErrorBurst, 见 error_bursts.detect_error_bursts)
+            max_tokens: 总Token限制
+            max_bursts: 最多分析的突增数
+
+        Returns:
+            上下文字典列表 (按时间排序, 每项额外包含 'burst')
+        """
+        selected = sorted(
+            (burst for burst in bursts if 0 <= burst.first_error_index < len(self.all_entries)),
+            key=lambda burst: -burst.peak_z
+        )[:max_bursts]
+        selected.sort(key=lambda burst: burst.start_time)
+        if not selected:
+            return []
+
+        budget = max_tokens // len(selected)
+        contexts = []
+        for burst in selected:
+            context = self.extract_context(self.all_entries[burst.first_error_index], max_tokens=budget)
+            context['burst'] = burst
+            contexts.append(context)
+        return contexts
+
     def _detect_problem_type(self, entry) -> ProblemType:
         """检测问题类型"""
         content = self._get_entry_content(entry)
         level = self._get_entry_level(entry)
 
         # 检查是否崩溃
-        for pattern in self.problem_patterns[ProblemType.CRASH]:
-            if re.search(pattern, content, re.IGNORECASE):
-                return ProblemType.CRASH
+        if self._type_matchers[ProblemType.CRASH].search(content):
+            return ProblemType.CRASH
 
         # 检查其他类型
-        for ptype, patterns in self.problem_patterns.items():
-            if ptype == ProblemType.CRASH:
-                continue
-            for pattern in patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    return ptype
+        for ptype, matcher in self._type_matchers.items():
+            if ptype != ProblemType.CRASH and matcher.search(content):
+                return ptype
 
         # 根据日志级别判断
         if level in ['ERROR', 'FATAL']:
@@ -235,6 +292,7 @@ class SmartContextExtractor:
         if not logs:
             return logs
 
+        keyword_matchers = self._get_keyword_matchers(config.get('filter_keywords', []))
         scored_logs = []
         for log in logs:
             score = 0
@@ -249,11 +307,11 @@ class SmartContextExtractor:
                 score += 10
 
             # 关键词分数
-            content = self._get_entry_content(log)
-            keywords = config.get('filter_keywords', [])
-            for keyword in keywords:
-                if re.search(keyword, content, re.IGNORECASE):
-                    score += 20
+            if keyword_matchers:
+                content = self._get_entry_content(log)
+                for matcher in keyword_matchers:
+                    if matcher.search(content):
+                        score += 20
 
             scored_logs.append((score, log))
 
@@ -261,14 +319,24 @@ class SmartContextExtractor:
         scored_logs.sort(key=lambda x: x[0], reverse=True)
         return [log for _, log in scored_logs]
 
+    def _get_keyword_matchers(self, keywords: List[str]) -> List[Pattern]:
+        """按关键词组合缓存编译后的正则"""
+        key = tuple(keywords)
+        matchers = self._keyword_matchers.get(key)
+        if matchers is None:
+            matchers = [re.compile(keyword, re.IGNORECASE) for keyword in keywords]
+            self._keyword_matchers[key] = matchers
+        return matchers
+
     def _find_related_logs(self, target_entry, target_idx: int, config: Dict) -> List:
         """
         利用索引查找相关日志
 
         策略:
         1. 提取目标日志的关键词
-        2. 使用索引快速查找包含这些关键词的其他日志
-        3. 按时间距离和相似度排序
+        2. 直接读取索引中各关键词的行号集合，按关键词稀有度（IDF）累加评分，
+           命中行数过多的常见词不参与评分
+        3. 取评分最高（同分时距目标最近）的10条，按时间顺序返回
         """
         if not self.indexer or not self.indexer.is_ready:
             return []
@@ -280,21 +348,43 @@ class SmartContextExtractor:
         if not keywords:
             return []
 
-        # 使用索引搜索
-        related_indices = set()
-        for keyword in keywords[:5]:  # 限制关键词数量
-            indices = self.indexer.search(keyword)
-            related_indices.update(indices)
+        total = max(len(self.all_entries), 1)
+        postings_list = []
+        for keyword in dict.fromkeys(k.lower() for k in keywords[:5]):  # 限制关键词数量
+            postings = self._keyword_postings(keyword)
+            if postings:
+                postings_list.append(postings)
+        if not postings_list:
+            return []
 
         # 排除目标本身和已在上下文中的日志
-        context_range = set(range(max(0, target_idx - 50), min(len(self.all_entries), target_idx + 50)))
-        related_indices -= context_range
-        related_indices.discard(target_idx)
-
-        # 转换为日志条目并排序
-        related_logs = [self.all_entries[i] for i in sorted(related_indices)[:10]]
-
-        return related_logs
+        low, high = max(0, target_idx - 50), min(len(self.all_entries), target_idx + 50)
+
+        def distance(i):
+            return abs(i - target_idx)
+
+        scores: Dict[int, float] = defaultdict(float)
+        rare = [postings for postings in postings_list if len(postings) <= MAX_KEYWORD_POSTINGS]
+        if rare:
+            for postings in rare:
+                weight = math.log(total / len(postings)) + 1.0
+                for i in postings:
+                    scores[i] += weight
+            candidates = [i for i in scores if not low <= i < high]
+            top = heapq.nsmallest(10, candidates, key=lambda i: (-scores[i], distance(i)))
+        else:
+            # 全是常见词：只用最稀有的一个，取距离最近的
+            postings = min(postings_list, key=len)
+            top = heapq.nsmallest(10, (i for i in postings if not low <= i < high), key=distance)
+
+        return [self.all_entries[i] for i in sorted(top) if i < len(self.all_entries)]
+
+    def _keyword_postings(self, keyword: str) -> Set[int]:
+        """关键词的行号集合（精确词直接引用索引，不复制；否则走索引的模糊搜索）"""
+        word_index = getattr(self.indexer, 'word_index', None)
+        if word_index is not None and keyword in word_index:
+            return word_index[keyword]
+        return self.indexer.search(keyword) or set()
 
     def _extract_keywords(self, content: str) -> List[str]:
         """
@@ -326,17 +416,13 @@ class SmartContextExtractor:
         """
         优化上下文以控制Token数量
 
-        粗略估算: 1 token ≈ 0.75个汉字 ≈ 1个英文词
+        每行的token数按内容缓存，同一行出现在多个上下文中只分词一次
         """
-        # 粗略计算当前Token数
-        def estimate_tokens(text):
-            return len(text) // 3  # 粗略估算
-
         current_tokens = sum([
-            estimate_tokens(self._get_entry_content(context_data['target'])),
-            sum(estimate_tokens(self._get_entry_content(e)) for e in context_data.get('context_before', [])),
-            sum(estimate_tokens(self._get_entry_content(e)) for e in context_data.get('context_after', [])),
-            sum(estimate_tokens(self._get_entry_content(e)) for e in context_data.get('related_logs', [])),
+            count_tokens(self._get_entry_content(context_data['target'])),
+            sum(count_tokens(self._get_entry_content(e)) for e in context_data.get('context_before', [])),
+            sum(count_tokens(self._get_entry_content(e)) for e in context_data.get('context_after', [])),
+            sum(count_tokens(self._get_entry_content(e)) for e in context_data.get('related_logs', [])),
         ])
 
         # 如果超出限制,逐步减少
@@ -378,7 +464,7 @@ class SmartContextExtractor:
 
         # 检查是否包含关键词
         content = self._get_entry_content(entry)
-        if re.search(r'crash|exception|fatal', content, re.IGNORECASE):
+        if self._priority_matcher.search(content):
             score += 20
 
         return min(100, score)
@@ -400,16 +486,89 @@ class SmartContextExtractor:
 
     def _find_entry_index(self, target_entry) -> Optional[int]:
         """查找日志在列表中的索引"""
+        if isinstance(target_entry, str):
+            return self._find_text_index(target_entry)
+
+        # 列表未变化时查不到即不在列表中，不重建位置表
+        position = self._lookup_position(target_entry)
+        if position is not None:
+            return position
+
+        # 不在列表中的等值对象（如副本）；未自定义相等比较的对象只可能按身份相等
+        if type(target_entry).__eq__ is object.__eq__:
+            return None
         try:
             return self.all_entries.index(target_entry)
         except ValueError:
-            # 如果是字符串,尝试内容匹配
-            if isinstance(target_entry, str):
-                for i, entry in enumerate(self.all_entries):
-                    if target_entry in self._get_entry_content(entry):
-                        return i
             return None
 
+    def reset_positions(self):
+        """条目列表被原地修改（替换、插入、删除）后调用，下次定位时重建位置表"""
+        self._positions.clear()
+        self._positions_list = None
+        self._positions_built = 0
+
+    def _lookup_position(self, target_entry) -> Optional[int]:
+        """按对象身份查位置；换成另一个列表或列表变短时重建，有追加时补充位置表"""
+        entries = self.all_entries
+        if entries is not self._positions_list or self._positions_built > len(entries):
+            self.reset_positions()
+            self._positions_list = entries
+        for i in range(self._positions_built, len(entries)):
+            self._positions.setdefault(id(entries[i]), i)
+        self._positions_built = len(entries)
+
+        position = self._positions.get(id(target_entry))
+        if position is not None and position < len(entries) and entries[position] is target_entry:
+            return position
+        return None
+
+    def _find_text_index(self, text: str) -> Optional[int]:
+        """
+        查找内容包含该文本的第一条日志
+
+        索引可用时，先用文本中完整的词（两侧都不在文本边缘）求行号交集缩小范围再逐条确认
+        """
+        snapshot = (id(self.all_entries), len(self.all_entries))
+        if self._text_positions_key != snapshot:
+            self._text_positions.clear()
+            self._text_positions_key = snapshot
+        if text in self._text_positions:
+            position = self._text_positions[text]
+            if position is None or (position < len(self.all_entries)
+                                    and text in self._get_entry_content(self.all_entries[position])):
+                return position
+
+        candidates = None
+        word_index = getattr(self.indexer, 'word_index', None)
+        # 仅ASCII文本：索引对小写化后的内容分词，非ASCII字符小写化可能改变相邻词
+        if (word_index is not None and text.isascii() and self.indexer.is_ready
+                and getattr(self.indexer, 'total_entries', -1) == len(self.all_entries)):
+            for match in re.finditer(r'[a-zA-Z0-9_]+', text):
+                if match.start() == 0 or match.end() == len(text):
+                    continue
+                postings = word_index.get(match.group().lower(), set())
+                candidates = set(postings) if candidates is None else candidates & postings
+                if not candidates:
+                    break
+
+        position = None
+        if candidates is None:
+            for i, entry in enumerate(self.all_entries):
+                if text in self._get_entry_content(entry):
+                    position = i
+                    break
+        else:
+            for i in sorted(candidates):
+                if i < len(self.all_entries) and text in self._get_entry_content(self.all_entries[i]):
+                    position = i
+                    break
+
+        if len(self._text_positions) >= TEXT_POSITION_CACHE_SIZE:
+            self._text_positions.clear()
+        self._text_positions[text] = position
+        return position
+
     def _create_empty_context(self, target_entry, problem_type: ProblemType) -> Dict:
         """创建空上下文"""
         return {
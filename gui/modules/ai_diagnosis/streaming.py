@@ -0,0 +1,191 @@
+"""
+AI流式响应工具
+
+各AI客户端的 ask_stream() 共用的底层工具：
+- CancelWatcher: 后台监视取消事件/超时，触发时关闭连接或结束子进程，
+  使阻塞在网络读取上的生成器立即结束
+- iter_http_lines: 基于标准库http.client的流式POST，逐行返回响应体
+  （NDJSON与SSE都是按行传输，无需requests等第三方库）
+- iter_sse / iter_anthropic_text: 解析Server-Sent Events与Anthropic消息流
+"""
+
+import json
+import socket
+import threading
+import time
+import http.client
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class CancelWatcher:
+    """
+    取消/超时监视器
+
+    使用示例:
+        with CancelWatcher(cancel_event, response.close, timeout=60) as watcher:
+            for chunk in response:
+                yield chunk
+        if watcher.timed_out:
+            raise TimeoutError(...)
+    """
+
+    def __init__(self, cancel_event: Optional[threading.Event], on_cancel: Callable[[], None],
+                 timeout: Optional[float] = None, poll_interval: float = 0.05):
+        """
+        Args:
+            cancel_event: 取消事件（可选，置位后触发on_cancel）
+            on_cancel: 触发时调用（关闭连接、结束进程等）
+            timeout: 总超时秒数（可选）
+            poll_interval: 检查间隔（秒）
+        """
+        self.cancel_event = cancel_event
+        self.on_cancel = on_cancel
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.reason: Optional[str] = None  # 'cancelled' / 'timeout'
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason == 'cancelled' or bool(self.cancel_event and self.cancel_event.is_set())
+
+    @property
+    def timed_out(self) -> bool:
+        return self.reason == 'timeout'
+
+    def __enter__(self) -> 'CancelWatcher':
+        if self.cancel_event is not None or self.timeout:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._done.set()
+        return False
+
+    def _run(self):
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        while not self._done.wait(self.poll_interval):
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                self.reason = 'cancelled'
+            elif deadline is not None and time.monotonic() >= deadline:
+                self.reason = 'timeout'
+            else:
+                continue
+            try:
+                self.on_cancel()
+            except Exception:
+                pass  # 关闭失败不影响调用方结束迭代
+            return
+
+
+def _shutdown_socket(sock: Optional[socket.socket]):
+    """关闭套接字（shutdown可以唤醒阻塞在recv上的读取线程）"""
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def iter_http_lines(url: str, payload: Dict, headers: Optional[Dict[str, str]] = None,
+                    timeout: float = 120, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+    """
+    发送JSON POST请求并逐行返回响应体（不含换行符）
+
+    Args:
+        url: 请求地址（http/https）
+        payload: JSON请求体
+        headers: 额外请求头
+        timeout: 单次读取的超时秒数
+        cancel_event: 取消事件，置位后立即关闭连接并结束迭代
+
+    Raises:
+        RuntimeError: HTTP状态码 >= 400
+    """
+    parts = urlsplit(url)
+    conn_cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    conn = conn_cls(parts.hostname, parts.port, timeout=timeout)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+
+    request_headers = {'Content-Type': 'application/json', 'Accept': 'text/event-stream, application/x-ndjson'}
+    request_headers.update(headers or {})
+
+    # 响应不保持连接时getresponse()会把conn.sock置空，因此在发送请求后先保存套接字
+    sockets = []
+    response = None
+    with CancelWatcher(cancel_event, lambda: _shutdown_socket(sockets[0] if sockets else None)) as watcher:
+        try:
+            conn.request('POST', path, body=json.dumps(payload).encode('utf-8'), headers=request_headers)
+            sockets.append(conn.sock)
+            response = conn.getresponse()
+            if response.status >= 400:
+                body = response.read(500).decode('utf-8', errors='replace')
+                raise RuntimeError(f"HTTP {response.status}: {body}")
+
+            while not watcher.cancelled:
+                line = response.readline()
+                if not line:
+                    break
+                yield line.decode('utf-8', errors='replace').rstrip('\r\n')
+        except (OSError, http.client.HTTPException):
+            # 取消时关闭连接导致的读取错误属于正常结束
+            if not watcher.cancelled:
+                raise
+        finally:
+            if response is not None:
+                response.close()
+            conn.close()
+
+
+def iter_sse(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    解析Server-Sent Events
+
+    Yields:
+        (event, data)，未指定event时为 'message'；多行data以换行连接
+    """
+    event = 'message'
+    data = []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, '\n'.join(data)
+            event, data = 'message', []
+        elif line.startswith(':'):
+            continue
+        else:
+            field, _, value = line.partition(':')
+            if value.startswith(' '):
+                value = value[1:]
+            if field == 'event':
+                event = value
+            elif field == 'data':
+                data.append(value)
+    if data:
+        yield event, '\n'.join(data)
+
+
+def iter_anthropic_text(events: Iterable[Tuple[str, str]]) -> Iterator[str]:
+    """
+    从Anthropic Messages流式事件中提取文本增量
+
+    Raises:
+        RuntimeError: 收到error事件
+    """
+    for event, data in events:
+        if event == 'error':
+            try:
+                message = json.loads(data).get('error', {}).get('message', data)
+            except ValueError:
+                message = data
+            raise RuntimeError(f"流式响应错误: {message}")
+        if event != 'content_block_delta':
+            if event == 'message_stop':
+                return
+            continue
+        delta = json.loads(data).get('delta', {})
+        if delta.get('type') == 'text_delta' and delta.get('text'):
+            yield delta['text']
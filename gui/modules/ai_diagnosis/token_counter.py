@@ -0,0 +1,253 @@
+"""
+Token计数器
+
+为提示词预算提供统一、可替换的token计数：
+- 本地安装了tiktoken且编码文件可用时，使用真实的BPE分词计数
+- 否则使用中英文分别计价的估算模型（权重按cl100k_base计数校准，只用于预算控制）
+
+计数结果按文本缓存：同一条日志、同一段格式化文本只分词一次；
+模板的固定部分按模板缓存，只对填入的参数计数。
+"""
+
+import math
+import re
+import string
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+# tiktoken是可选依赖，不可用时使用估算模型
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+
+class TokenCounter(ABC):
+    """
+    Token计数器基类（带缓存）
+
+    子类实现 _count(text)；count() 负责缓存。
+    """
+
+    name = "base"
+
+    # 缓存的文本数（满了整体清空，日志行与提示词片段大量重复，命中率很高）
+    CACHE_SIZE = 50000
+
+    def __init__(self):
+        self._cache: Dict[str, int] = {}
+        self._templates: Dict[str, Tuple[int, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """文本的token数"""
+        if not text:
+            return 0
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+        tokens = self._count(text)
+        with self._lock:
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.clear()
+            self._cache[text] = tokens
+        return tokens
+
+    def count_template(self, template: str, **kwargs) -> int:
+        """
+        填充后的模板token数
+
+        模板的固定文字按模板缓存，参数值按文本缓存；
+        片段边界处的合并误差在±1/参数以内。
+
+        Raises:
+            ValueError: 模板中的占位符没有对应的参数
+        """
+        parsed = self._templates.get(template)
+        if parsed is None:
+            literal_tokens = 0
+            fields = []
+            for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+                literal_tokens += self.count(literal)
+                if field_name is not None:
+                    fields.append(field_name)
+            parsed = (literal_tokens, fields)
+            with self._lock:
+                self._templates[template] = parsed
+
+        literal_tokens, fields = parsed
+        formatter = string.Formatter()
+        tokens = literal_tokens
+        for name in fields:
+            try:
+                value, _ = formatter.get_field(name, (), kwargs)
+            except (KeyError, IndexError, AttributeError) as e:
+                raise ValueError(f"模板参数缺失: {{{name}}}") from e
+            tokens += self.count(str(value))
+        return tokens
+
+    def clear_cache(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+            self._templates.clear()
+
+    @abstractmethod
+    def _count(self, text: str) -> int:
+        """文本的实际token数（不经缓存）"""
+
+
+class TiktokenCounter(TokenCounter):
+    """基于tiktoken的BPE计数器"""
+
+    name = "tiktoken"
+
+    def __init__(self, encoding):
+        super().__init__()
+        self.encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def _count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+# 估算模型的预分词：英文字母串、数字串、中日韩字符、全角符号、空白、其他符号
+_PIECE_PATTERN = re.compile(
+    r'(?P<letters>[A-Za-z]+)'
+    r'|(?P<digits>\d+)'
+    r'|(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff])'
+    r'|(?P<wide>[\u3000-\u303f\uff00-\uffef])'
+    r'|(?P<space>\s+)'
+    r'|(?P<other>.)',
+    re.DOTALL
+)
+
+
+class HeuristicCounter(TokenCounter):
+    """
+    中英文分别计价的估算模型
+
+    按BPE分词器的常见切分规律计价：
+    - 英文字母串：每串 letter_run，每个字母再加 letter
+    - 数字：每3位一组，每组 digit_group
+    - 中日韩字符：每字 cjk（常用汉字多为1个token，生僻字2~3个）
+    - 全角标点：每个 wide
+    - 空白：单个空格并入后一个词；含换行或多个空格的空白串计 space
+    - 其他符号：每个 other
+
+    DEFAULT_WEIGHTS 由 tools/calibrate_token_counter.py 对 tests/data/token_calibration.json
+    中的180条样本（Mars日志行、多行日志片段、崩溃堆栈、内置提示词模板、用户问题）
+    按 tiktoken cl100k_base 的真实计数做非负最小二乘拟合得到：
+    平均相对误差4.5%，90%的样本在9.1%以内，单条误差不超过 max(4, 20%)，总量误差0.4%。
+    其他分词器（如中文按词切分的模型）误差会更大，可传入 weights 覆盖，
+    或用 set_token_counter() 接入真实分词器。
+    """
+
+    name = "heuristic"
+
+    DEFAULT_WEIGHTS = {
+        'letter_run': 0.235,
+        'letter': 0.19,
+        'digit_group': 1.536,
+        'cjk': 1.009,
+        'wide': 2.003,
+        'space': 0.73,
+        'other': 0.403,
+    }
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.weights = dict(self.DEFAULT_WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+
+    def features(self, text: str) -> Dict[str, int]:
+        """文本的计价特征"""
+        letters = letter_runs = digit_groups = cjk = wide = spaces = other = 0
+        for match in _PIECE_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == 'letters':
+                letter_runs += 1
+                letters += match.end() - match.start()
+            elif kind == 'cjk':
+                cjk += 1
+            elif kind == 'digits':
+                digit_groups += -(-(match.end() - match.start()) // 3)
+            elif kind == 'space':
+                piece = match.group()
+                if piece != ' ':
+                    spaces += 1
+            elif kind == 'wide':
+                wide += 1
+            else:
+                other += 1
+        return {
+            'letter_run': letter_runs,
+            'letter': letters,
+            'digit_group': digit_groups,
+            'cjk': cjk,
+            'wide': wide,
+            'space': spaces,
+            'other': other,
+        }
+
+    def _count(self, text: str) -> int:
+        weights = self.weights
+        value = sum(weights[key] * count for key, count in self.features(text).items())
+        return max(1, math.ceil(value))
+
+
+# ========== 全局计数器 ==========
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+_default_counter: Optional[TokenCounter] = None
+
+
+def _load_tiktoken(model: Optional[str]) -> Optional[TokenCounter]:
+    """加载本地可用的tiktoken编码（编码文件不可用时返回None，不联网重试）"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        if model and model.lower().startswith("gpt"):
+            try:
+                return TiktokenCounter(tiktoken.encoding_for_model(model))
+            except KeyError:
+                pass
+        return TiktokenCounter(tiktoken.get_encoding("cl100k_base"))
+    except Exception:
+        return None
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """
+    获取模型对应的token计数器（同一模型复用，缓存随计数器共享）
+
+    Args:
+        model: 模型名称（None时返回默认计数器）
+    """
+    if model is None and _default_counter is not None:
+        return _default_counter
+
+    key = (model or "").lower()
+    counter = _counters.get(key)
+    if counter is None:
+        with _counters_lock:
+            counter = _counters.get(key)
+            if counter is None:
+                counter = _load_tiktoken(model) or HeuristicCounter()
+                _counters[key] = counter
+    return counter
+
+
+def set_token_counter(counter: Optional[TokenCounter]):
+    """替换默认计数器（接入其他分词器；None恢复自动选择）"""
+    global _default_counter
+    _default_counter = counter
+
+
+def count_tokens(text: str) -> int:
+    """使用默认计数器计算文本token数"""
+    return get_token_counter().count(text)
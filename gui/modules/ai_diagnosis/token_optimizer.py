@@ -17,10 +17,12 @@ except ImportError:
 
 try:
     from .compact_prompts import CompactPromptTemplates
-    from .smart_compressor import FocusedCompressor, SmartLogCompressor, estimate_tokens
+    from .smart_compressor import FocusedCompressor, SmartLogCompressor
+    from .token_counter import get_token_counter
 except ImportError:
     from compact_prompts import CompactPromptTemplates
-    from smart_compressor import FocusedCompressor, SmartLogCompressor, estimate_tokens
+    from smart_compressor import FocusedCompressor, SmartLogCompressor
+    from token_counter import get_token_counter
 
 
 @dataclass
@@ -62,6 +64,12 @@ class TokenOptimizer:
         "qwen2": 32768,  # Qwen 2 (Ollama)
     }
 
+    # 原始日志超过日志预算的倍数时改用分段摘要
+    MAP_REDUCE_FACTOR = 10
+
+    # 交互式问答中会话概要占日志预算的比例（其余用于与问题相关的日志）
+    QA_OVERVIEW_RATIO = 0.4
+
     # 默认token预算分配
     DEFAULT_BUDGETS = {
         "claude": TokenBudget(
@@ -99,8 +107,11 @@ class TokenOptimizer:
         """
         self.model = model
         self.budget = self._get_budget_for_model(model)
-        self.compressor = SmartLogCompressor(max_tokens=self.budget.max_logs)
-        self.focused_compressor = FocusedCompressor(max_tokens=self.budget.max_logs)
+        # 按模型选择计数器（有本地分词器时精确计数），压缩器与检索共用其缓存
+        self.counter = get_token_counter(model)
+        self.compressor = SmartLogCompressor(max_tokens=self.budget.max_logs, token_counter=self.counter)
+        self.focused_compressor = FocusedCompressor(max_tokens=self.budget.max_logs, token_counter=self.counter)
+        self._qa_overview = None
 
     def _get_budget_for_model(self, model: str) -> TokenBudget:
         """根据模型获取token预算"""
@@ -139,7 +150,7 @@ class TokenOptimizer:
 
         return OptimizedPrompt(
             prompt=prompt,
-            estimated_tokens=estimate_tokens(prompt),
+            estimated_tokens=self.counter.count(prompt),
             log_summary=compressed.summary,
             template_name="crash_analysis_compact",
             compression_ratio=compressed.compression_ratio
@@ -152,7 +163,7 @@ class TokenOptimizer:
 
         return OptimizedPrompt(
             prompt=prompt,
-            estimated_tokens=estimate_tokens(prompt),
+            estimated_tokens=self.counter.count(prompt),
             log_summary=compressed.summary,
             template_name="performance_analysis_compact",
             compression_ratio=compressed.compression_ratio
@@ -165,7 +176,7 @@ class TokenOptimizer:
 
         return OptimizedPrompt(
             prompt=prompt,
-            estimated_tokens=estimate_tokens(prompt),
+            estimated_tokens=self.counter.count(prompt),
             log_summary=compressed.summary,
             template_name="issue_summary_compact",
             compression_ratio=compressed.compression_ratio
@@ -180,22 +191,31 @@ class TokenOptimizer:
 
         return OptimizedPrompt(
             prompt=prompt,
-            estimated_tokens=estimate_tokens(prompt),
+            estimated_tokens=self.counter.count(prompt),
             log_summary=log_text,
             template_name="error_explanation_compact",
             compression_ratio=1.0
         )
 
     def optimize_for_interactive_qa(self, entries: List[LogEntry],
-                                    user_question: str) -> OptimizedPrompt:
-        """为交互式问答优化提示词"""
-        # 根据问题类型选择压缩策略
-        if "崩溃" in user_question or "crash" in user_question.lower():
-            compressed = self.focused_compressor.compress_for_crash_analysis(entries)
-        elif "性能" in user_question or "慢" in user_question:
-            compressed = self.focused_compressor.compress_for_performance_analysis(entries)
-        else:
-            compressed = self.compressor.compress(entries)
+                                    user_question: str, indexer=None) -> OptimizedPrompt:
+        """
+        为交互式问答优化提示词
+
+        优先按问题检索相关日志（BM25 + 级别/时间加权），以概要 + 相关日志的形式提供；
+        问题中没有可检索的词或没有命中时，退回按问题类型整体压缩。
+
+        Args:
+            entries: 日志条目列表
+            user_question: 用户问题
+            indexer: 基于同一列表建立的LogIndexer（可选，用于复用已有词索引）
+        """
+        retrieved = self._retrieve_for_question(entries, user_question, indexer)
+        if retrieved:
+            return self._optimize_with_retrieval(entries, user_question, retrieved)
+
+        compressed = self._compress_for_question(self.compressor, self.focused_compressor,
+                                                 entries, user_question)
 
         prompt = CompactPromptTemplates.format_interactive_qa(
             compressed.summary,
@@ -204,12 +224,101 @@ class TokenOptimizer:
 
         return OptimizedPrompt(
             prompt=prompt,
-            estimated_tokens=estimate_tokens(prompt),
+            estimated_tokens=self.counter.count(prompt),
             log_summary=compressed.summary,
             template_name="interactive_qa_compact",
             compression_ratio=compressed.compression_ratio
         )
 
+    @staticmethod
+    def _compress_for_question(compressor, focused_compressor, entries, user_question):
+        """根据问题类型选择压缩策略"""
+        if "崩溃" in user_question or "crash" in user_question.lower():
+            return focused_compressor.compress_for_crash_analysis(entries)
+        elif "性能" in user_question or "慢" in user_question:
+            return focused_compressor.compress_for_performance_analysis(entries)
+        return compressor.compress(entries)
+
+    def _retrieve_for_question(self, entries, user_question, indexer):
+        """检索与问题相关的日志（占日志预算的 1 - QA_OVERVIEW_RATIO）"""
+        if not entries or not user_question:
+            return []
+        # 延迟导入：检索依赖日志索引器，其他分析场景无需加载
+        try:
+            from .log_retriever import LogRetriever
+        except ImportError:
+            from log_retriever import LogRetriever
+
+        budget = int(self.budget.max_logs * (1 - self.QA_OVERVIEW_RATIO))
+        return LogRetriever(entries, indexer, self.counter).retrieve(user_question, token_budget=budget)
+
+    def _overview_compressors(self):
+        """问答概要使用的小预算压缩器（占日志预算的 QA_OVERVIEW_RATIO）"""
+        if self._qa_overview is None:
+            overview_tokens = int(self.budget.max_logs * self.QA_OVERVIEW_RATIO)
+            self._qa_overview = (SmartLogCompressor(max_tokens=overview_tokens, token_counter=self.counter),
+                                 FocusedCompressor(max_tokens=overview_tokens, token_counter=self.counter))
+        return self._qa_overview
+
+    @staticmethod
+    def _format_retrieved(retrieved) -> List[str]:
+        lines = [f"【与问题相关的日志】({len(retrieved)}条，#为行号)"]
+        lines.extend(line.text for line in retrieved)
+        return lines
+
+    def _optimize_with_retrieval(self, entries, user_question, retrieved) -> OptimizedPrompt:
+        """概要（按问题类型压缩的小预算版本） + 检索到的相关日志"""
+        overview = self._compress_for_question(*self._overview_compressors(), entries, user_question)
+
+        lines = [overview.summary, ""] + self._format_retrieved(retrieved)
+        summary = "\n".join(lines)
+
+        prompt = CompactPromptTemplates.format_interactive_qa(summary, user_question)
+        original_size = sum(len(e.content or '') for e in entries)
+        return OptimizedPrompt(
+            prompt=prompt,
+            estimated_tokens=self.counter.count(prompt),
+            log_summary=summary,
+            template_name="interactive_qa_retrieval",
+            compression_ratio=len(summary) / original_size if original_size > 0 else 1.0
+        )
+
+    def optimize_for_session_qa(self, entries: List[LogEntry], user_question: str,
+                                session, indexer=None) -> OptimizedPrompt:
+        """
+        为同一会话中的连续提问优化提示词（前缀稳定，便于提供方缓存）
+
+        会话日志上下文只用通用压缩生成（不随问题类型变化），日志不变时复用；
+        与问题相关的日志和问题本身放在提示词末尾。追问时前缀保持不变，
+        只有新增的历史问答与本次问题需要按全价处理。
+
+        Args:
+            entries: 日志条目列表
+            user_question: 用户问题
+            session: PromptSession（保存上下文与历史问答）
+            indexer: 基于同一列表建立的LogIndexer（可选）
+        """
+        # 同一列表对象、长度与修改版本（LogEntryList）都不变时复用上下文；
+        # 列表重建（如重新过滤）后重新压缩，摘要相同时会话历史保留
+        key = (len(entries), getattr(entries, 'version', None))
+        if not session.has_context(key, entries):
+            overview = self._overview_compressors()[0].compress(entries)
+            session.set_context(overview.summary, key, entries)
+
+        retrieved = self._retrieve_for_question(entries, user_question, indexer)
+        related = "\n".join(self._format_retrieved(retrieved)) + "\n\n" if retrieved else ""
+        prompt = session.build(user_question, related)
+
+        original_size = sum(len(e.content or '') for e in entries)
+        log_size = len(session.context) + len(related)
+        return OptimizedPrompt(
+            prompt=prompt,
+            estimated_tokens=self.counter.count(prompt),
+            log_summary=session.context + related,
+            template_name="interactive_qa_session",
+            compression_ratio=log_size / original_size if original_size > 0 else 1.0
+        )
+
     def optimize_for_module_analysis(self, entries: List[LogEntry],
                                      module: str) -> OptimizedPrompt:
         """为特定模块分析优化提示词"""
@@ -220,12 +329,61 @@ class TokenOptimizer:
 
         return OptimizedPrompt(
             prompt=prompt,
-            estimated_tokens=estimate_tokens(prompt),
+            estimated_tokens=self.counter.count(prompt),
             log_summary=compressed.summary,
             template_name="module_analysis_compact",
             compression_ratio=compressed.compression_ratio
         )
 
+    def needs_map_reduce(self, entries: List[LogEntry]) -> bool:
+        """
+        是否应改用分段摘要 (map-reduce)
+
+        原始日志超过日志预算的 MAP_REDUCE_FACTOR 倍时，单次压缩会丢弃绝大部分内容。
+        """
+        limit = self.budget.max_logs * self.MAP_REDUCE_FACTOR * SmartLogCompressor.CHARS_PER_TOKEN
+        total = 0
+        for entry in entries:
+            total += len(entry.content or '')
+            if total > limit:
+                return True
+        return False
+
+    def create_map_reduce(self, client, cache=None):
+        """创建与当前预算匹配的分段摘要器（每段与最终摘要都不超过日志预算）"""
+        # 延迟导入：分段摘要依赖AI客户端与调度器，纯压缩场景无需加载
+        try:
+            from .map_reduce_summarizer import MapReduceSummarizer
+        except ImportError:
+            from map_reduce_summarizer import MapReduceSummarizer
+
+        return MapReduceSummarizer(
+            client,
+            cache=cache,
+            chunk_tokens=self.budget.max_logs,
+            reduce_tokens=self.budget.max_logs
+        )
+
+    def create_prompt_session(self):
+        """创建会话问答使用的前缀稳定提示词会话"""
+        try:
+            from .prompt_session import PromptSession
+        except ImportError:
+            from prompt_session import PromptSession
+
+        return PromptSession()
+
+    def optimize_for_map_reduce(self, entries: List[LogEntry], result) -> OptimizedPrompt:
+        """把分段摘要结果（MapReduceResult）包装为优化后的提示词"""
+        original_size = sum(len(e.content or '') for e in entries)
+        return OptimizedPrompt(
+            prompt=result.prompt,
+            estimated_tokens=self.counter.count(result.prompt),
+            log_summary=result.prompt,
+            template_name="map_reduce_compact",
+            compression_ratio=len(result.prompt) / original_size if original_size > 0 else 1.0
+        )
+
     def check_budget(self, estimated_tokens: int) -> Tuple[bool, str]:
         """
         检查token预算
@@ -188,6 +188,22 @@ class AISettingsDialog:
         )
         context_info_label.grid(row=5, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
 
+        # 分段摘要
+        self.map_reduce_var = tk.BooleanVar(value=self.config.get('map_reduce', True))
+        ttk.Checkbutton(
+            feature_frame,
+            text="日志远超Token预算时分段摘要后再分析（摘要结果会缓存）",
+            variable=self.map_reduce_var
+        ).grid(row=6, column=0, columnspan=2, sticky=tk.W, pady=3)
+
+        # 常驻进程
+        self.claude_persistent_var = tk.BooleanVar(value=self.config.get('claude_persistent', True))
+        ttk.Checkbutton(
+            feature_frame,
+            text="预热Claude进程（减少每次提问的启动耗时）",
+            variable=self.claude_persistent_var
+        ).grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=3)
+
         feature_frame.columnconfigure(0, weight=1)
 
         # ========== 项目代码配置 ==========
@@ -344,6 +360,8 @@ class AISettingsDialog:
             self.max_tokens_var.set(default_config['max_tokens'])
             self.timeout_var.set(default_config['timeout'])
             self.context_size_var.set(default_config['context_size'])
+            self.map_reduce_var.set(default_config['map_reduce'])
+            self.claude_persistent_var.set(default_config['claude_persistent'])
 
     def save_settings(self):
         """保存设置"""
@@ -360,6 +378,8 @@ class AISettingsDialog:
             'max_tokens': self.max_tokens_var.get(),
             'timeout': self.timeout_var.get(),
             'context_size': self.context_size_var.get(),
+            'map_reduce': self.map_reduce_var.get(),
+            'claude_persistent': self.claude_persistent_var.get(),
             'project_dirs': project_dirs
         }
 
@@ -58,6 +58,10 @@ class ContextMenuManager:
 
             # 导航功能 (智能功能)
             if self.smart_features:
+                self.context_menu.add_command(
+                    label="🤖 AI分析错误突增",
+                    command=self.handler.ai_analyze_error_bursts
+                )
                 self.context_menu.add_command(
                     label="📊 查看问题链路图",
                     command=self.handler.show_problem_graph
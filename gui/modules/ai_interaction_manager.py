@@ -23,6 +23,7 @@ try:
     from .ai_diagnosis.smart_context_extractor import SmartContextExtractor
     from .ai_diagnosis.log_navigator import LogNavigator, AIAnalysisParser
     from .ai_diagnosis.analysis_cache import get_global_cache
+    from .error_bursts import detect_error_bursts
     SMART_FEATURES_AVAILABLE = True
 except ImportError:
     SMART_FEATURES_AVAILABLE = False
@@ -73,8 +74,11 @@ class AIInteractionManager:
         try:
             # 初始化日志导航器
             if hasattr(self.app, 'log_text'):
-                all_entries = getattr(self.app, 'log_entries', [])
-                self.navigator = LogNavigator(self.app.log_text, all_entries)
+                # 按查看器实际渲染的行导航（过滤、崩溃分组后行号与log_entries不对应）
+                self.navigator = LogNavigator(
+                    self.app.log_text, getattr(self.app, 'displayed_rows', None),
+                    entries_provider=lambda: getattr(self.app, 'displayed_rows', None)
+                )
                 print("✓ 日志导航器已初始化")
 
             # 初始化分析缓存
@@ -225,14 +229,7 @@ class AIInteractionManager:
             return
 
         # 使用智能上下文提取
-        if SMART_FEATURES_AVAILABLE and self.context_extractor is None:
-            # 延迟初始化上下文提取器
-            all_entries = getattr(self.app, 'log_entries', [])
-            indexer = getattr(self.app, 'filter_manager', None)
-            if indexer:
-                indexer = getattr(indexer, 'indexer', None)
-
-            self.context_extractor = SmartContextExtractor(all_entries, indexer)
+        self._get_context_extractor()
 
         # 获取选中日志
         target, context_before, context_after = self.get_selected_log_context()
@@ -253,6 +250,18 @@ class AIInteractionManager:
         self.ai_assistant.chat_panel.question_var.set(question)
         self.ai_assistant.ask_question()
 
+    def _get_context_extractor(self):
+        """当前日志的上下文提取器（延迟初始化，重新加载日志后重建，位置表随提取器复用）"""
+        all_entries = getattr(self.app, 'log_entries', [])
+        if SMART_FEATURES_AVAILABLE and (self.context_extractor is None
+                                         or self.context_extractor.all_entries is not all_entries):
+            indexer = getattr(self.app, 'filter_manager', None)
+            if indexer:
+                indexer = getattr(indexer, 'indexer', None)
+
+            self.context_extractor = SmartContextExtractor(all_entries, indexer)
+        return self.context_extractor
+
     def _build_analysis_question(self, target, context_before, context_after) -> str:
         """构建分析问题（使用智能上下文或传统方式）"""
         # 使用智能上下文提取
@@ -366,6 +375,61 @@ class AIInteractionManager:
         self.ai_assistant.chat_panel.question_var.set(question)
         self.ai_assistant.ask_question()
 
+    def ai_analyze_error_bursts(self):
+        """AI分析错误突增（跳转到最显著的突增，只把突增窗口的上下文交给AI）"""
+        if not SMART_FEATURES_AVAILABLE:
+            messagebox.showinfo("提示", "智能功能未启用")
+            return
+
+        if not self.ai_assistant:
+            self.open_ai_assistant_window()
+            self.app.root.after(200, self._do_ai_analyze_bursts)
+            return
+
+        self._do_ai_analyze_bursts()
+
+    def _do_ai_analyze_bursts(self):
+        """执行错误突增分析"""
+        if not self.ai_assistant:
+            messagebox.showwarning("警告", "AI助手初始化失败")
+            return
+
+        all_entries = getattr(self.app, 'log_entries', [])
+        # 直方图按日志列表缓存（analyze_logs已建立时直接复用）
+        bursts = detect_error_bursts(all_entries)
+        if not bursts:
+            messagebox.showinfo("提示", "未发现错误突增")
+            return
+
+        extractor = self._get_context_extractor()
+        contexts = extractor.extract_burst_contexts(bursts, max_tokens=8000)
+        if not contexts:
+            messagebox.showinfo("提示", "未发现错误突增")
+            return
+
+        # 跳转到最显著的突增并标记各突增的首条错误
+        # （突增位置是log_entries中的索引，经显示行换算为控件行号；被过滤掉的不标记）
+        if self.navigator:
+            peak = max(contexts, key=lambda context: context['burst'].peak_z)['burst']
+            lines = [self.navigator.line_of_entry(all_entries[c['burst'].first_error_index]) for c in contexts]
+            self.navigator.mark_critical_logs([line for line in lines if line is not None])
+            self.navigator.jump_to_log_entry(all_entries[peak.first_error_index], reason="错误突增")
+
+        question = f"日志中检测到 {len(bursts)} 次错误突增，以下是最显著的 {len(contexts)} 次，请分析每次突增的原因及相互关系：\n"
+        for i, context in enumerate(contexts, 1):
+            burst = context['burst']
+            modules = ", ".join(str(module) for module, _ in burst.top_modules)
+            question += (f"\n【突增{i}】{burst.start_label} 持续{burst.duration:.0f}秒，"
+                         f"{burst.errors}条错误/{burst.total}条日志，模块: {modules}\n")
+            question += f"【首条错误】: {self._get_entry_content(context['target'])[:200]}\n"
+            for entry in context['context_before'][-5:]:
+                question += f"[{getattr(entry, 'level', 'INFO')}] {self._get_entry_content(entry)[:150]}\n"
+            for entry in context['context_after'][:3]:
+                question += f"[{getattr(entry, 'level', 'INFO')}] {self._get_entry_content(entry)[:150]}\n"
+
+        self.ai_assistant.chat_panel.question_var.set(question)
+        self.ai_assistant.ask_question()
+
     # ========== 可视化功能 ==========
 
     def show_problem_graph(self):
@@ -2,11 +2,58 @@
 # -*- coding: utf-8 -*-
 """
 数据模型模块
-包含LogEntry日志条目类和FileGroup文件组类
+包含LogEntry日志条目类、LogEntryList会话日志列表和FileGroup文件组类
 """
 
+import calendar
 import re
-from typing import List, Dict, Optional, Any, ClassVar, Pattern, Match
+import threading
+from typing import List, Dict, Optional, Any, Callable, ClassVar, Hashable, Pattern, Match
+
+
+# Mars时间戳格式: 2025-09-15 +8.0 11:05:43.995（时区可省略）
+_TIMESTAMP_PATTERN: Pattern = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})\s+(?:([+\-]?\d+(?:\.\d+)?)\s+)?(\d{2}):(\d{2}):(\d{2})(\.\d+)?'
+)
+
+# 日期+时区 -> 当天0点的UTC秒数（同一会话中日期很少，缓存避免重复计算）
+_day_epoch_cache: Dict[tuple, float] = {}
+
+
+def parse_timestamp_value(timestamp: Optional[str]) -> Optional[float]:
+    """将日志时间戳转换为数值（UTC秒，含毫秒）
+
+    用于跨文件的时间排序和时间桶统计；无法解析时返回None。
+
+    Args:
+        timestamp: 日志时间戳字符串，如 "2025-09-15 +8.0 11:05:43.995"
+
+    Returns:
+        UTC epoch秒数（float）
+    """
+    if not timestamp:
+        return None
+
+    match = _TIMESTAMP_PATTERN.match(timestamp)
+    if not match:
+        return None
+
+    year, month, day, tz, hour, minute, second, fraction = match.groups()
+    day_key = (year, month, day, tz)
+    base = _day_epoch_cache.get(day_key)
+    if base is None:
+        try:
+            base = calendar.timegm((int(year), int(month), int(day), 0, 0, 0))
+        except (ValueError, OverflowError):
+            return None
+        if tz:
+            base -= float(tz) * 3600
+        _day_epoch_cache[day_key] = base
+
+    value = base + int(hour) * 3600 + int(minute) * 60 + int(second)
+    if fraction:
+        value += float(fraction)
+    return value
 
 
 class LogEntry:
@@ -66,6 +113,11 @@ class LogEntry:
         self.is_stacktrace: bool = False  # 是否为堆栈信息
         self.parse()
 
+    @property
+    def timestamp_value(self) -> Optional[float]:
+        """数值时间戳（UTC秒），无时间戳或无法解析时为None"""
+        return parse_timestamp_value(self.timestamp)
+
     def _is_crash_content(self, content: Optional[str], location: str = "") -> bool:
         """检测内容是否包含崩溃信息"""
         if not content:
@@ -267,6 +319,118 @@ class LogEntry:
                 self.content = self.raw_line
 
 
+class LogEntryList(list):
+    """会话日志列表
+
+    在list基础上记录修改版本：末尾追加（append/extend/+=）不改变版本，
+    其他修改（替换、删除、插入、排序等）使版本加一。
+
+    由列表派生的数据（模块聚合、时间直方图、检索索引等）缓存在列表自身上，
+    随列表一起释放；列表修改后按版本失效，只有末尾追加时可以增量更新。
+    切片得到的是普通list，不带缓存。
+    """
+
+    __slots__ = ['version', '_derived', '_derived_lock']
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.version: int = 0
+        self._derived: Dict[Hashable, tuple] = {}
+        self._derived_lock = threading.RLock()
+
+    def derived(self, key: Hashable, build: Callable[[List], Any],
+                extend: Optional[Callable[[Any, List, int], None]] = None) -> Any:
+        """获取派生数据
+
+        Args:
+            key: 派生数据的键（通常为构建它的类或函数）
+            build: build(entries) -> 派生数据
+            extend: extend(派生数据, entries, 起始位置)，只追加时增量更新（None时重新构建）
+
+        Returns:
+            与列表当前内容一致的派生数据
+        """
+        with self._derived_lock:
+            state = self._derived.get(key)
+            if state is not None and state[0] == self.version and state[1] <= len(self):
+                version, size, value = state
+                if size == len(self):
+                    return value
+                if extend is not None:
+                    extend(value, self, size)
+                    self._derived[key] = (version, len(self), value)
+                    return value
+
+            version = self.version
+            value = build(self)
+            self._derived[key] = (version, len(self), value)
+            return value
+
+    def clear_derived(self) -> None:
+        """释放所有派生数据"""
+        with self._derived_lock:
+            self._derived.clear()
+
+    def __reduce__(self):
+        # 序列化/复制时只保留条目，派生数据与锁不随之复制
+        return (LogEntryList, (list(self),))
+
+    def _modified(self) -> None:
+        self.version += 1
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._modified()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._modified()
+
+    def __imul__(self, count):
+        result = super().__imul__(count)
+        self._modified()
+        return result
+
+    def insert(self, index, value) -> None:
+        super().insert(index, value)
+        self._modified()
+
+    def pop(self, index=-1):
+        value = super().pop(index)
+        self._modified()
+        return value
+
+    def remove(self, value) -> None:
+        super().remove(value)
+        self._modified()
+
+    def clear(self) -> None:
+        super().clear()
+        self._modified()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._modified()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._modified()
+
+
+def cached_derived(entries: List, key: Hashable, build: Callable[[List], Any],
+                   extend: Optional[Callable[[Any, List, int], None]] = None) -> Any:
+    """获取日志列表的派生数据
+
+    entries 为 LogEntryList 时使用列表上的缓存，普通列表直接构建（不缓存、不持有引用）。
+    按 derived() 方法判断而不是isinstance：本模块可能以 data_models / gui.modules.data_models
+    两个名字各导入一次。
+    """
+    derived = getattr(entries, 'derived', None)
+    if derived is not None:
+        return derived(key, build, extend)
+    return build(entries)
+
+
 class FileGroup:
     """文件分组类
 
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间直方图与错误突增检测
+
+按时间桶预先统计日志条数，供突增检测与跳转共用：
+- 数值时间戳列（每条日志一个，array('d')，无时间戳的行沿用上一条的时间）
+- 每秒直方图：总数、各级别计数、每桶第一条/最后一条错误日志的位置
+- 每分钟直方图：各模块的总数与错误数
+
+在每秒错误数上做流式EWMA（指数加权均值/方差）z-score检测，连续的异常桶合并为一次突增，
+突增给出跳转位置和涉及的模块，只把这些时间窗口交给上下文提取与AI分析，
+不必逐行扫描整个会话。
+
+未安装NumPy，计数使用标准库array（紧凑、连续存储，与数组列的用法一致）。
+"""
+
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from data_models import cached_derived, parse_timestamp_value
+except ImportError:
+    try:
+        from modules.data_models import cached_derived, parse_timestamp_value
+    except ImportError:
+        from gui.modules.data_models import cached_derived, parse_timestamp_value
+
+# 计为错误的级别
+ERROR_LEVELS = ('ERROR', 'FATAL', 'CRASH')
+
+# 单个直方图的最大桶数（时间跨度过大时自动加大桶宽，避免异常时间戳撑爆内存）
+MAX_BUCKETS = 7 * 24 * 3600
+
+
+def timestamp_column(entries: List) -> array:
+    """
+    日志的数值时间戳列（UTC秒）
+
+    无时间戳的行（堆栈、续行）沿用上一条日志的时间；会话开头没有时间戳的行为NaN。
+    同一秒内的时间戳只解析一次，之后只换算毫秒部分。
+    """
+    column = array('d', bytes(8 * len(entries)))
+    current = math.nan
+    last_head = None
+    last_base = 0.0
+    for i, entry in enumerate(entries):
+        timestamp = entry.timestamp
+        if timestamp:
+            head, dot, fraction = timestamp.rpartition('.')
+            value = None
+            if dot and head == last_head and fraction.isdigit():
+                value = last_base + float('0.' + fraction)
+            else:
+                value = parse_timestamp_value(timestamp)
+                if value is not None and dot and fraction.isdigit():
+                    last_head = head
+                    last_base = value - float('0.' + fraction)
+            if value is not None:
+                current = value
+        column[i] = current
+    return column
+
+
+class TimeHistogram:
+    """
+    日志时间直方图
+
+    使用示例:
+        histogram = TimeHistogram.of(entries)         # LogEntryList未修改时复用
+        histogram.errors()                             # 每秒错误数
+        histogram.level_counts("WARNING", 60)          # 每分钟警告数
+        histogram.module_errors["Network"]             # 每分钟Network错误数
+    """
+
+    def __init__(self, entries: List, bucket_seconds: float = 1.0, module_bucket_seconds: float = 60.0):
+        """
+        Args:
+            entries: 日志条目列表
+            bucket_seconds: 级别直方图的桶宽（秒）
+            module_bucket_seconds: 模块直方图的桶宽（秒）
+        """
+        self.timestamps = timestamp_column(entries)
+        self.monotonic = True
+
+        valid = [value for value in self.timestamps if value == value]
+        if valid:
+            self.start = math.floor(min(valid))
+            span = max(valid) - self.start
+        else:
+            self.start = 0.0
+            span = 0.0
+        self.bucket_seconds = max(bucket_seconds, span / MAX_BUCKETS)
+        self.module_bucket_seconds = max(module_bucket_seconds, self.bucket_seconds)
+
+        size = int(span // self.bucket_seconds) + 1 if valid else 0
+        module_size = int(span // self.module_bucket_seconds) + 1 if valid else 0
+        self.total = array('I', bytes(4 * size))
+        self.levels: Dict[str, array] = {}
+        self.first_error = array('i', [-1]) * size
+        self.last_error = array('i', [-1]) * size
+        self.modules: Dict[Optional[str], array] = {}
+        self.module_errors: Dict[Optional[str], array] = {}
+        self.dated_entries = 0
+
+        self._count(entries, size, module_size)
+
+    @classmethod
+    def of(cls, entries: List) -> 'TimeHistogram':
+        """
+        获取列表对应的直方图
+
+        缓存在会话日志列表（LogEntryList）上并随列表释放，列表有任何修改（包括追加）后重建；
+        普通列表每次重新统计。
+        """
+        return cached_derived(entries, cls, cls)
+
+    def _count(self, entries: List, size: int, module_size: int):
+        start = self.start
+        width = self.bucket_seconds
+        module_width = self.module_bucket_seconds
+        total = self.total
+        levels = self.levels
+        modules = self.modules
+        module_errors = self.module_errors
+        first_error = self.first_error
+        last_error = self.last_error
+        previous = -math.inf
+
+        for i, entry in enumerate(entries):
+            value = self.timestamps[i]
+            if value != value:
+                continue
+            if value < previous:
+                self.monotonic = False
+            previous = value
+            self.dated_entries += 1
+
+            bucket = int((value - start) // width)
+            module_bucket = int((value - start) // module_width)
+            total[bucket] += 1
+
+            level = entry.level
+            counts = levels.get(level)
+            if counts is None:
+                counts = levels[level] = array('I', bytes(4 * size))
+            counts[bucket] += 1
+
+            module = entry.module
+            counts = modules.get(module)
+            if counts is None:
+                counts = modules[module] = array('I', bytes(4 * module_size))
+                module_errors[module] = array('I', bytes(4 * module_size))
+            counts[module_bucket] += 1
+
+            if level in ERROR_LEVELS:
+                module_errors[module][module_bucket] += 1
+                if first_error[bucket] < 0:
+                    first_error[bucket] = i
+                last_error[bucket] = i
+
+    # ========== 查询 ==========
+
+    def __len__(self) -> int:
+        return len(self.total)
+
+    def bucket_time(self, bucket: int, bucket_seconds: Optional[float] = None) -> float:
+        """桶的起始时间（UTC秒）"""
+        return self.start + bucket * (bucket_seconds or self.bucket_seconds)
+
+    def level_counts(self, level: str, bucket_seconds: Optional[float] = None) -> array:
+        """指定级别的每桶计数（可按更大的桶宽重采样）"""
+        counts = self.levels.get(level)
+        if counts is None:
+            counts = array('I', bytes(4 * len(self.total)))
+        return self.resample(counts, bucket_seconds)
+
+    def errors(self, bucket_seconds: Optional[float] = None) -> array:
+        """每桶错误数（ERROR/FATAL/CRASH）"""
+        errors = array('I', bytes(4 * len(self.total)))
+        for level in ERROR_LEVELS:
+            counts = self.levels.get(level)
+            if counts is not None:
+                for i, count in enumerate(counts):
+                    if count:
+                        errors[i] += count
+        return self.resample(errors, bucket_seconds)
+
+    def resample(self, counts: array, bucket_seconds: Optional[float] = None) -> array:
+        """把级别直方图合并为更大的桶（桶宽取最接近的整数倍）"""
+        factor = self._factor(bucket_seconds)
+        if factor == 1:
+            return array(counts.typecode, counts)
+        merged = array(counts.typecode, bytes(counts.itemsize * (-(-len(counts) // factor))))
+        for i, count in enumerate(counts):
+            if count:
+                merged[i // factor] += count
+        return merged
+
+    def _factor(self, bucket_seconds: Optional[float]) -> int:
+        if not bucket_seconds or bucket_seconds <= self.bucket_seconds:
+            return 1
+        return max(1, int(round(bucket_seconds / self.bucket_seconds)))
+
+    def error_positions(self, first_bucket: int, last_bucket: int) -> Tuple[int, int]:
+        """桶范围内（含两端，级别直方图桶号）第一条与最后一条错误日志的位置，没有时为-1"""
+        first = -1
+        last = -1
+        for bucket in range(max(first_bucket, 0), min(last_bucket + 1, len(self.total))):
+            position = self.first_error[bucket]
+            if position >= 0 and (first < 0 or position < first):
+                first = position
+            position = self.last_error[bucket]
+            if position > last:
+                last = position
+        return first, last
+
+    def top_error_modules(self, start_time: float, end_time: float, n: int = 3) -> List[Tuple[str, int]]:
+        """时间范围内错误最多的模块（按模块直方图的桶对齐，分钟级精度）"""
+        first = int((start_time - self.start) // self.module_bucket_seconds)
+        last = int((end_time - self.start) // self.module_bucket_seconds)
+        counter = Counter()
+        for module, counts in self.module_errors.items():
+            total = sum(counts[max(first, 0):last + 1])
+            if total:
+                counter[module] = total
+        return counter.most_common(n)
+
+    def entry_range(self, start_time: float, end_time: float) -> Tuple[int, int]:
+        """
+        时间范围 [start_time, end_time) 内日志的位置范围 [lo, hi)
+
+        时间列单调时二分查找；否则返回覆盖该范围内所有日志的最小区间。
+        """
+        if self.monotonic:
+            # NaN只会出现在开头（第一条带时间戳的日志之前）
+            offset = 0
+            while offset < len(self.timestamps) and self.timestamps[offset] != self.timestamps[offset]:
+                offset += 1
+            lo = bisect_left(self.timestamps, start_time, offset)
+            hi = bisect_left(self.timestamps, end_time, lo)
+            return lo, hi
+
+        lo = hi = -1
+        for i, value in enumerate(self.timestamps):
+            if start_time <= value < end_time:
+                if lo < 0:
+                    lo = i
+                hi = i + 1
+        return (lo, hi) if lo >= 0 else (0, 0)
+
+
+class EWMADetector:
+    """
+    流式EWMA z-score检测器
+
+    维护指数加权均值与方差，对每个新值计算相对于历史的z-score：
+        z = (x - 均值) / max(标准差, min_std)
+    z超过阈值且值不小于min_count时判为异常。第一个值只用于初始化均值，异常值不更新均值与方差。
+    """
+
+    def __init__(self, alpha: float = 0.05, threshold: float = 4.0,
+                 min_count: float = 5, min_std: float = 1.0):
+        """
+        Args:
+            alpha: 平滑系数（越小记忆越长）
+            threshold: z-score阈值
+            min_count: 判为异常的最小值（过滤零星错误）
+            min_std: 标准差下限（避免长期为0时任何错误都被放大）
+        """
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_count = min_count
+        self.min_std = min_std
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, value: float) -> Tuple[bool, float]:
+        """
+        输入一个新值
+
+        Returns:
+            (是否异常, z-score)
+        """
+        self.count += 1
+        if self.count == 1:
+            self.mean = float(value)
+            return False, 0.0
+        diff = value - self.mean
+        z = diff / max(math.sqrt(self.var), self.min_std)
+        anomalous = z >= self.threshold and value >= self.min_count
+        if not anomalous:
+            # 异常值不计入基线，持续的突增不会把自己"学习"成正常水平
+            self.mean += self.alpha * diff
+            self.var = (1 - self.alpha) * (self.var + self.alpha * diff * diff)
+        return anomalous, z
+
+
+@dataclass
+class ErrorBurst:
+    """一次错误突增"""
+    start_time: float               # 起始时间（UTC秒）
+    end_time: float                 # 结束时间（UTC秒，不含）
+    errors: int                     # 窗口内错误数
+    total: int                      # 窗口内日志数
+    peak_z: float                   # 最大z-score
+    first_error_index: int          # 第一条错误日志的位置（跳转目标）
+    last_error_index: int           # 最后一条错误日志的位置
+    start_label: str = ""           # 起始时间戳（取第一条错误日志）
+    top_modules: List[Tuple[str, int]] = field(default_factory=list)  # 错误最多的模块
+
+    @property
+    def duration(self) -> float:
+        """持续时间（秒）"""
+        return self.end_time - self.start_time
+
+    def to_dict(self) -> Dict:
+        """转换为字典（分析结果/报告使用）"""
+        return {
+            'start': self.start_label,
+            'duration': self.duration,
+            'errors': self.errors,
+            'total': self.total,
+            'peak_z': round(self.peak_z, 1),
+            'line': self.first_error_index + 1,
+            'modules': [module for module, _ in self.top_modules],
+        }
+
+
+def detect_error_bursts(entries: List, bucket_seconds: float = 1.0,
+                        detector: Optional[EWMADetector] = None,
+                        merge_gap: int = 2,
+                        histogram: Optional[TimeHistogram] = None) -> List[ErrorBurst]:
+    """
+    检测错误突增
+
+    在每桶错误数上运行EWMA z-score检测；异常桶之间相隔不超过merge_gap个桶时合并为一次突增。
+
+    Args:
+        entries: 日志条目列表
+        bucket_seconds: 检测用的桶宽（秒，按直方图重采样）
+        detector: 检测器（默认 EWMADetector()）
+        merge_gap: 合并相邻异常桶的最大间隔（桶数）
+        histogram: 已建立的直方图（默认 TimeHistogram.of(entries)）
+
+    Returns:
+        按时间排序的突增列表
+    """
+    histogram = histogram or TimeHistogram.of(entries)
+    if not len(histogram):
+        return []
+    detector = detector or EWMADetector()
+    factor = histogram._factor(bucket_seconds)
+    width = histogram.bucket_seconds * factor
+    errors = histogram.errors(width)
+    totals = histogram.resample(histogram.total, width)
+
+    bursts: List[ErrorBurst] = []
+    current = None  # [首桶, 末桶, 最大z]
+    for bucket, count in enumerate(errors):
+        anomalous, z = detector.update(count)
+        if not anomalous:
+            continue
+        if current is not None and bucket - current[1] <= merge_gap + 1:
+            current[1] = bucket
+            current[2] = max(current[2], z)
+        else:
+            if current is not None:
+                bursts.append(_make_burst(histogram, entries, errors, totals, factor, width, *current))
+            current = [bucket, bucket, z]
+    if current is not None:
+        bursts.append(_make_burst(histogram, entries, errors, totals, factor, width, *current))
+    return bursts
+
+
+def _make_burst(histogram: TimeHistogram, entries: List, errors: array, totals: array,
+                factor: int, width: float, first: int, last: int, peak_z: float) -> ErrorBurst:
+    start_time = histogram.bucket_time(first, width)
+    end_time = histogram.bucket_time(last + 1, width)
+    first_index, last_index = histogram.error_positions(first * factor, (last + 1) * factor - 1)
+    return ErrorBurst(
+        start_time=start_time,
+        end_time=end_time,
+        errors=sum(errors[first:last + 1]),
+        total=sum(totals[first:last + 1]),
+        peak_z=peak_z,
+        first_error_index=first_index,
+        last_error_index=last_index,
+        start_label=(entries[first_index].timestamp or "") if first_index >= 0 else "",
+        top_modules=histogram.top_error_modules(start_time, end_time - 1e-9),
+    )
@@ -26,6 +26,7 @@ from .exceptions import (
     handle_exceptions,
     get_global_error_collector
 )
+from .stream_loader import StreamLoader
 
 
 class FileOperations:
@@ -210,41 +211,17 @@ class FileOperations:
                 user_message="指定的路径不是有效文件"
             )
 
-        # 自动检测编码
-        encodings = ['utf-8', 'gb2312', 'gbk', 'gb18030', 'latin-1']
-        last_error = None
-
-        for encoding in encodings:
-            try:
-                with open(filepath, 'r', encoding=encoding) as f:
-                    lines = f.readlines()
-                return lines
-            except UnicodeDecodeError as e:
-                last_error = e
-                continue
-            except Exception as e:
-                raise FileOperationError(
-                    message=f"读取文件失败 (编码: {encoding}): {str(e)}",
-                    filepath=filepath,
-                    operation="文件读取",
-                    user_message=f"读取文件失败: {os.path.basename(filepath)}",
-                    cause=e
-                )
-
-        # 如果所有编码都失败，使用二进制模式
+        # 单次读取：mmap + 分布式采样检测编码 + 分块解码（与StreamLoader共用）
+        loader = StreamLoader()
         try:
-            with open(filepath, 'rb') as f:
-                content = f.read()
-                # 尝试忽略错误解码
-                lines = content.decode('utf-8', errors='ignore').splitlines(keepends=True)
-            return lines
+            return loader.load_lines(filepath)
         except Exception as e:
             raise FileOperationError(
-                message=f"所有编码尝试均失败，最后错误: {str(last_error)}",
+                message=f"读取文件失败: {str(e)}",
                 filepath=filepath,
-                operation="编码检测",
-                user_message=f"文件编码格式不支持: {os.path.basename(filepath)}",
-                cause=last_error or e
+                operation="文件读取",
+                user_message=f"读取文件失败: {os.path.basename(filepath)}",
+                cause=e
             )
 
     @staticmethod
@@ -8,6 +8,11 @@
 import re
 from typing import List, Optional, Pattern, Any
 
+try:
+    from .session_profiler import profiled
+except ImportError:
+    from session_profiler import profiled
+
 
 class FilterSearchManager:
     """过滤和搜索管理器
@@ -156,6 +161,7 @@ class FilterSearchManager:
 
         return True
 
+    @profiled('filter_query', category='filter', count_arg='entries')
     def filter_entries(self, entries: List[Any], level: Optional[str] = None, module: Optional[str] = None,
                    keyword: Optional[str] = None, start_time: Optional[str] = None,
                    end_time: Optional[str] = None, search_mode: str = '普通') -> List[Any]:
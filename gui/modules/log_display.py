@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志查看器显示项
+
+把（过滤后的）日志条目构建为懒加载控件的显示项：
+- 崩溃日志带标记完整显示，其后的堆栈条目缩进合并显示，Crash模块的其他条目不单独显示
+- 指定模块加前缀，合并多文件时加来源文件前缀
+
+同时记录每个显示项对应的日志条目与控件行号（DisplayedLogRows），
+供导航器把会话日志中的条目换算到实际显示的行。
+"""
+
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+
+class DisplayedLogRows:
+    """日志查看器实际渲染的行
+
+    查看器显示的是过滤后的日志，且崩溃日志后的堆栈条目合并显示、Crash模块的其他条目不单独显示，
+    多行日志占多个控件行，因此条目在会话列表中的位置与控件行号并不对应。
+    这里按渲染顺序记录每一行（一条显示项）的日志条目、显示文本（含前缀）与起始控件行号。
+    """
+
+    __slots__ = ['entries', 'texts', 'line_starts', '_next_line', '_rows_by_entry']
+
+    def __init__(self):
+        self.entries: List = []        # 每行对应的日志条目
+        self.texts: List[str] = []     # 每行的显示文本（不含末尾换行）
+        self.line_starts: List[int] = []  # 每行的起始控件行号（从1开始）
+        self._next_line = 1
+        self._rows_by_entry: Dict[int, tuple] = {}  # id(条目) -> (条目, 行)
+
+    @classmethod
+    def from_entries(cls, entries: List) -> 'DisplayedLogRows':
+        """按一条日志一行构建（未经查看器分组的列表）"""
+        rows = cls()
+        for entry in entries:
+            rows.add(entry, getattr(entry, 'raw_line', None) or str(entry))
+        return rows
+
+    def add(self, entry, text: str) -> int:
+        """
+        记录一个渲染行
+
+        Args:
+            entry: 日志条目
+            text: 显示文本（含前缀，可含换行）
+
+        Returns:
+            行索引
+        """
+        row = len(self.entries)
+        text = text[:-1] if text.endswith('\n') else text
+        self.entries.append(entry)
+        self.texts.append(text)
+        self.line_starts.append(self._next_line)
+        self._next_line += text.count('\n') + 1
+        self._rows_by_entry.setdefault(id(entry), (entry, row))
+        return row
+
+    def fold(self, entry, row: int):
+        """记录合并到某行显示的条目（不单独渲染）"""
+        self._rows_by_entry.setdefault(id(entry), (entry, row))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def line_of_row(self, row: int) -> int:
+        """行索引对应的控件行号"""
+        return self.line_starts[row]
+
+    def row_of_line(self, line_number: int) -> int:
+        """控件行号所在的行索引（行号超出时取最近的行）"""
+        return max(bisect_right(self.line_starts, line_number) - 1, 0)
+
+    def row_of_entry(self, entry) -> Optional[int]:
+        """日志条目所在（或合并到）的行索引，未显示时为None"""
+        item = self._rows_by_entry.get(id(entry))
+        return item[1] if item is not None and item[0] is entry else None
+
+
+def build_display_items(entries: List, show_source_file: bool = False) -> Tuple[List[Dict], DisplayedLogRows]:
+    """
+    构建日志查看器的显示项
+
+    Args:
+        entries: 要显示的日志条目（过滤后的列表）
+        show_source_file: 是否显示来源文件前缀（合并多文件时）
+
+    Returns:
+        (显示项列表, 显示行映射)
+    """
+    log_data = []
+    rows = DisplayedLogRows()
+
+    i = 0
+    while i < len(entries):
+        entry = entries[i]
+        item = {}
+
+        # 如果是崩溃日志，显示完整内容（可能包含多行）
+        if entry.is_crash:
+            item['prefix'] = "🔴 [CRASH] "
+            item['prefix_tag'] = "CRASH"
+            item['text'] = entry.raw_line + '\n'
+            item['tag'] = 'CRASH'
+            log_data.append(item)
+            crash_row = rows.add(entry, item['prefix'] + item['text'])
+
+            # 查找后续的独立堆栈信息条目
+            i += 1
+            while i < len(entries) and (entries[i].is_stacktrace or entries[i].module == 'Crash'):
+                if entries[i].level == 'CRASH' or entries[i].is_stacktrace:
+                    stack_item = {
+                        'prefix': "  ↳ ",
+                        'prefix_tag': "STACKTRACE",
+                        'text': entries[i].raw_line + '\n',
+                        'tag': 'STACKTRACE'
+                    }
+                    log_data.append(stack_item)
+                    rows.add(entries[i], stack_item['prefix'] + stack_item['text'])
+                else:
+                    # 不单独显示，跳转时定位到所属的崩溃行
+                    rows.fold(entries[i], crash_row)
+                i += 1
+            continue
+
+        # 添加模块标记
+        if entry.module == 'mars':
+            item['prefix'] = f"[{entry.module}] "
+            item['prefix_tag'] = "MODULE_MARS"
+        elif entry.module == 'HY-Default':
+            item['prefix'] = f"[{entry.module}] "
+            item['prefix_tag'] = "MODULE_DEFAULT"
+
+        # 如果是合并模式，显示来源文件
+        if show_source_file:
+            if 'prefix' in item:
+                item['prefix'] += f"[{entry.source_file}] "
+            else:
+                item['prefix'] = f"[{entry.source_file}] "
+                item['prefix_tag'] = "DEBUG"
+
+        item['text'] = entry.raw_line + '\n'
+        item['tag'] = entry.level
+        log_data.append(item)
+        rows.add(entry, item.get('prefix', '') + item['text'])
+        i += 1
+
+    return log_data, rows
@@ -8,6 +8,7 @@
 - Trigram索引：支持模糊搜索和部分匹配
 - 增量更新：支持动态添加日志时更新索引
 - 后台构建：不阻塞UI的异步索引构建
+- BM25排序：按关键词稀有度与行长度为日志行打分（AI问答检索相关日志）
 
 性能目标：
 - 100万条日志索引构建时间 < 3秒
@@ -15,9 +16,11 @@
 - 内存开销 < 原数据的20%
 """
 
+import math
 import re
 import threading
 import time
+from array import array
 from collections import defaultdict
 from typing import Callable, Dict, List, Optional, Set
 
@@ -28,6 +31,7 @@ from .exceptions import (
     handle_exceptions,
     get_global_error_collector
 )
+from .session_profiler import profiled
 
 
 class LogIndexer:
@@ -46,7 +50,13 @@ class LogIndexer:
         results = indexer.search("ERROR")
     """
 
-    def __init__(self):
+    def __init__(self, index_trigrams: bool = True):
+        """
+        Args:
+            index_trigrams: 是否建立Trigram索引（只做词检索/BM25排序时可关闭，构建更快）
+        """
+        self.index_trigrams = index_trigrams
+
         # 词索引：{词: {行号集合}}
         self.word_index: Dict[str, Set[int]] = defaultdict(set)
 
@@ -63,6 +73,10 @@ class LogIndexer:
         # 时间范围索引（可选，用于时间范围快速过滤）
         self.time_index: Dict[str, Set[int]] = defaultdict(set)  # {日期: {行号}}
 
+        # 每行的词数（BM25长度归一化），按行号存放
+        self.doc_lengths = array('I')
+        self._total_length = 0
+
         # 索引状态
         self.is_building = False
         self.is_ready = False
@@ -75,6 +89,7 @@ class LogIndexer:
         self._stop_flag = False
 
     @handle_exceptions(IndexingError, reraise=True)
+    @profiled('index_build', category='index', count_arg='entries')
     def build_index(self, entries: List, progress_callback: Optional[Callable[[int, int], None]] = None):
         """
         构建索引（同步方法）
@@ -116,6 +131,7 @@ class LogIndexer:
             self.module_index.clear()
             self.level_index.clear()
             self.time_index.clear()
+            self._reset_lengths()
 
             # 批量构建索引
             batch_size = 1000
@@ -207,11 +223,12 @@ class LogIndexer:
         content = entry.content or entry.raw_line
         if content:
             words = self._tokenize(content.lower())
+            self._set_doc_length(line_number, len(words))
             for word in words:
                 self.word_index[word].add(line_number)
 
                 # 构建trigram索引（用于模糊搜索）
-                if len(word) >= 3:
+                if self.index_trigrams and len(word) >= 3:
                     for i in range(len(word) - 2):
                         trigram = word[i:i+3]
                         self.trigram_index[trigram].add(line_number)
@@ -232,6 +249,21 @@ class LogIndexer:
                 date = date_match.group(1)
                 self.time_index[date].add(line_number)
 
+    def _set_doc_length(self, line_number: int, length: int):
+        """记录行的词数（行号超出时补零扩展）"""
+        if line_number == len(self.doc_lengths):
+            self.doc_lengths.append(length)
+            self._total_length += length
+            return
+        if line_number > len(self.doc_lengths):
+            self.doc_lengths.extend([0] * (line_number + 1 - len(self.doc_lengths)))
+        self._total_length += length - self.doc_lengths[line_number]
+        self.doc_lengths[line_number] = length
+
+    def _reset_lengths(self):
+        self.doc_lengths = array('I')
+        self._total_length = 0
+
     def _tokenize(self, text: str) -> List[str]:
         """
         分词函数
@@ -311,6 +343,55 @@ class LogIndexer:
                 cause=e
             )
 
+    def bm25_scores(self, terms: List[str], k1: float = 1.2, b: float = 0.75,
+                    min_candidates: int = 1000) -> Dict[int, float]:
+        """
+        BM25评分（词索引只记录是否出现，词频按1计；日志行很短，同一词很少重复）
+
+        稀有词先累加得到候选行；候选行已足够多时，比候选集还大的常见词只对候选行
+        判断是否包含，避免遍历百万级的行号集合。
+
+        Args:
+            terms: 查询词（会转为小写，重复词只计一次）
+            k1: 词频饱和参数
+            b: 长度归一化参数
+            min_candidates: 候选行达到该数量后，常见词不再引入新行
+
+        Returns:
+            {行号: 分数}，只包含至少命中一个查询词的行
+        """
+        if not self.is_ready or not terms:
+            return {}
+
+        postings_list = []
+        for term in dict.fromkeys(t.lower() for t in terms):
+            postings = self.word_index.get(term)
+            if postings:
+                postings_list.append(postings)
+        if not postings_list:
+            return {}
+        postings_list.sort(key=len)
+
+        total = max(self.total_entries, 1)
+        avg_length = self._total_length / total if self._total_length else 1.0
+        lengths = self.doc_lengths
+        length_count = len(lengths)
+        scores: Dict[int, float] = {}
+
+        for postings in postings_list:
+            df = len(postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            numerator = idf * (k1 + 1)
+            if len(scores) >= min_candidates and df > len(scores):
+                targets = [i for i in scores if i in postings]
+            else:
+                targets = postings
+            for i in targets:
+                length = lengths[i] if i < length_count else avg_length
+                scores[i] = scores.get(i, 0.0) + numerator / (1 + k1 * (1 - b + b * length / avg_length))
+
+        return scores
+
     def search_by_module(self, module: str) -> Set[int]:
         """
         按模块搜索
@@ -371,6 +452,8 @@ class LogIndexer:
                      self.level_index, self.time_index]:
             for key in list(index.keys()):
                 index[key].discard(line_number)
+        if line_number < len(self.doc_lengths):
+            self._set_doc_length(line_number, 0)
 
         self.total_entries = max(0, self.total_entries - 1)
 
@@ -381,6 +464,7 @@ class LogIndexer:
         self.module_index.clear()
         self.level_index.clear()
         self.time_index.clear()
+        self._reset_lengths()
         self.is_ready = False
         self.total_entries = 0
 
@@ -437,6 +521,7 @@ class IndexedFilterSearchManager:
         """
         self.indexer.build_index_async(entries, progress_callback, complete_callback)
 
+    @profiled('filter_query_indexed', category='filter', count_arg='entries')
     def filter_entries_with_index(self, entries: List, level=None, module=None,
                                   keyword=None, start_time=None, end_time=None,
                                   search_mode='普通') -> List:
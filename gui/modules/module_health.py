@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模块健康度聚合
+
+单遍扫描日志，按模块累计级别计数、崩溃数与错误模板计数，供以下场景共用：
+- 主窗口日志分析（模块列表、崩溃日志收集、按小时分布）
+- LogPreprocessor 的模块健康分析与错误模式识别
+- SmartLogCompressor 的统计头部
+- TokenOptimizer 的模块分析（直接取模块日志，不再全量过滤）
+
+聚合器缓存在会话日志列表（LogEntryList）上，随列表释放：同一列表追加新日志后
+再次获取时只扫描新增部分，其他修改（替换、删除、排序）后重新聚合。普通列表不缓存。
+错误模板挖掘较重，首次需要时才对累计的错误日志执行，之后同样增量进行。
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from data_models import cached_derived
+    from template_miner import LogTemplate, TemplateMiner
+except ImportError:
+    try:
+        from modules.data_models import cached_derived
+        from modules.template_miner import LogTemplate, TemplateMiner
+    except ImportError:
+        from gui.modules.data_models import cached_derived
+        from gui.modules.template_miner import LogTemplate, TemplateMiner
+
+# 崩溃关键词（内容小写后匹配）
+CRASH_KEYWORDS = [
+    'crash', 'exception', 'signal', 'segmentation fault',
+    '崩溃', '异常', 'fatal error', 'abort', 'terminated'
+]
+
+# 时间戳中的小时（按小时分布统计）
+_HOUR_PATTERN = re.compile(r'(\d{2}):\d{2}:\d{2}')
+
+
+def is_crash_log(entry) -> bool:
+    """判断是否为崩溃日志（Crash模块或内容包含崩溃关键词）"""
+    if entry.module == "Crash":
+        return True
+    content_lower = (entry.content or '').lower()
+    return any(keyword in content_lower for keyword in CRASH_KEYWORDS)
+
+
+class ModuleStats:
+    """单个模块的累计统计"""
+
+    __slots__ = ['total', 'levels', 'crashes', 'templates', 'entries']
+
+    def __init__(self):
+        self.total = 0
+        self.levels: Counter = Counter()
+        self.crashes = 0
+        self.templates: Counter = Counter()  # 错误模板ID -> 次数
+        self.entries: List = []
+
+    @property
+    def errors(self) -> int:
+        return self.levels.get("ERROR", 0)
+
+    @property
+    def warnings(self) -> int:
+        return self.levels.get("WARNING", 0)
+
+    @property
+    def health_score(self) -> float:
+        """健康分数(0-1)：崩溃权重最高(10)，错误次之(5)，警告最低(1)"""
+        if self.total == 0:
+            return 1.0
+        penalty = (self.crashes * 10 + self.errors * 5 + self.warnings * 1) / self.total
+        return max(0, 1 - penalty / 10)
+
+
+class ModuleHealthAggregator:
+    """
+    模块健康度聚合器
+
+    使用示例:
+        health = ModuleHealthAggregator.of(entries)   # LogEntryList复用，追加后增量更新
+        health.module_health()
+        health.top_modules(5)
+        health.module_entries("Network")
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.levels: Counter = Counter()
+        self.crashes = 0
+        self.modules: Dict[Optional[str], ModuleStats] = {}
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+        self.flagged_crashes: List = []  # 解析时标记为崩溃（is_crash或CRASH级别）的日志
+        self.hour_counts: Counter = Counter()  # "HH:00" -> 日志数
+        self._errors: List = []
+        self._miner: Optional[TemplateMiner] = None
+        self._mined = 0
+        self._lock = threading.Lock()
+
+    # ========== 共享实例 ==========
+
+    @classmethod
+    def of(cls, entries: List) -> 'ModuleHealthAggregator':
+        """
+        获取列表对应的聚合器
+
+        LogEntryList 再次获取时复用：只在末尾追加时增量扫描新增部分，
+        其他修改（替换、删除、排序）则重新聚合；普通列表每次重新聚合。
+        """
+        return cached_derived(entries, cls, cls._build, cls._extend)
+
+    @classmethod
+    def _build(cls, entries: List) -> 'ModuleHealthAggregator':
+        aggregator = cls()
+        aggregator.add_entries(entries)
+        return aggregator
+
+    @staticmethod
+    def _extend(aggregator: 'ModuleHealthAggregator', entries: List, start: int):
+        with aggregator._lock:
+            for i in range(start, len(entries)):
+                aggregator._add(entries[i])
+
+    # ========== 增量聚合 ==========
+
+    def add(self, entry):
+        """加入一条日志"""
+        with self._lock:
+            self._add(entry)
+
+    def add_entries(self, entries: Iterable):
+        """批量加入日志"""
+        with self._lock:
+            for entry in entries:
+                self._add(entry)
+
+    def _add(self, entry):
+        self.total += 1
+
+        level = entry.level
+        self.levels[level] += 1
+
+        stats = self.modules.get(entry.module)
+        if stats is None:
+            stats = self.modules[entry.module] = ModuleStats()
+        stats.total += 1
+        stats.levels[level] += 1
+        stats.entries.append(entry)
+
+        if is_crash_log(entry):
+            stats.crashes += 1
+            self.crashes += 1
+        if level == "ERROR":
+            self._errors.append(entry)
+        if getattr(entry, 'is_crash', False) or level == 'CRASH':
+            self.flagged_crashes.append(entry)
+
+        if entry.timestamp:
+            if self.first_timestamp is None:
+                self.first_timestamp = entry.timestamp
+            self.last_timestamp = entry.timestamp
+            hour_match = _HOUR_PATTERN.search(entry.timestamp)
+            if hour_match:
+                self.hour_counts[f"{hour_match.group(1)}:00"] += 1
+
+    # ========== 查询 ==========
+
+    def module_counts(self) -> Counter:
+        """模块 -> 日志数（按模块首次出现的顺序）"""
+        return Counter({module: stats.total for module, stats in self.modules.items()})
+
+    def top_modules(self, n: Optional[int] = None) -> List:
+        """日志数最多的模块 [(模块, 数量)]"""
+        return self.module_counts().most_common(n)
+
+    def module_entries(self, module: str) -> List:
+        """指定模块的日志（按原顺序，返回副本）"""
+        stats = self.modules.get(module)
+        return list(stats.entries) if stats else []
+
+    def module_health(self) -> Dict[str, Dict]:
+        """各模块健康统计（格式同 LogPreprocessor.get_module_health）"""
+        return {
+            module: {
+                'total': stats.total,
+                'errors': stats.errors,
+                'warnings': stats.warnings,
+                'crashes': stats.crashes,
+                'health_score': round(stats.health_score, 2)
+            }
+            for module, stats in self.modules.items()
+        }
+
+    def unhealthy_modules(self, threshold: float = 0.7) -> List[str]:
+        """健康分数低于阈值的模块，最不健康的在前"""
+        unhealthy = [
+            (module, round(stats.health_score, 2))
+            for module, stats in self.modules.items()
+            if round(stats.health_score, 2) < threshold
+        ]
+        unhealthy.sort(key=lambda x: x[1])
+        return [module for module, _ in unhealthy]
+
+    def error_patterns(self, top_n: Optional[int] = None) -> List[LogTemplate]:
+        """ERROR日志的高频模板（首次调用时挖掘，之后只处理新增错误日志）"""
+        with self._lock:
+            return self._mine().top(top_n)
+
+    def module_templates(self, module: str, top_n: Optional[int] = None) -> List:
+        """指定模块的错误模板计数 [(模板ID, 次数)]"""
+        with self._lock:
+            self._mine()
+            stats = self.modules.get(module)
+            return stats.templates.most_common(top_n) if stats else []
+
+    def _mine(self) -> TemplateMiner:
+        if self._miner is None:
+            self._miner = TemplateMiner()
+        for entry in self._errors[self._mined:]:
+            template = self._miner.add(entry)
+            self.modules[entry.module].templates[template.template_id] += 1
+        self._mined = len(self._errors)
+        return self._miner
@@ -234,43 +234,54 @@ class SourceProcessor:
                 self.whitelist_manager
             )
 
-            def transformer_callback(progress, file_path):
+            # 转换前为整个项目一次性生成符号表（单进程与多进程共用）
+            symbol_table = self.code_transformer.build_symbol_table(self.parsed_files)
+
+            def transformer_callback(done, total, message):
                 # 转换阶段占总进度的10% (50%-60%)
-                total_progress = 0.5 + progress * 0.1
                 if progress_callback:
-                    progress_callback(total_progress, f"转换: {Path(file_path).name}")
+                    progress_callback(0.5 + done / total * 0.1, message)
 
-            # P2性能优化：判断是否使用多进程
-            total_lines = sum(parsed.get('total_lines', 0) for parsed in self.parsed_files.values())
+            def mp_callback(progress, message):
+                if progress_callback:
+                    progress_callback(0.5 + progress * 0.1, message)
 
-            if self.config.parallel_processing and (len(self.parsed_files) >= 4 and total_lines > 50000):
-                # 使用多进程转换器（适用于超大项目）
+            # P2性能优化：判断是否使用多进程
+            mp_transformer = None
+            if self.config.parallel_processing:
                 try:
                     from ..multiprocess_transformer import MultiProcessTransformer
+                    mp_transformer = MultiProcessTransformer(max_workers=max(1, self.config.max_workers // 2))
+                except ImportError as e:
+                    print(f"⚠️ 多进程转换器不可用，使用标准转换器: {e}")
 
-                    print(f"⚡ 启用多进程转换 (总代码行数: {total_lines}, {self.config.max_workers//2}进程)...")
-
-                    mp_transformer = MultiProcessTransformer(max_workers=self.config.max_workers // 2)
-                    self.transform_results = mp_transformer.transform_large_files(
-                        self.parsed_files,
-                        self.name_generator.get_all_mappings(),
-                        callback=transformer_callback
-                    )
+            if mp_transformer and mp_transformer.should_use_multiprocess(self.parsed_files):
+                # 使用多进程转换器（符号表每个进程只传递一次）
+                print(f"⚡ 启用多进程转换 ({len(self.parsed_files)}个文件, {mp_transformer.max_workers}进程)...")
 
-                    # 打印性能统计
-                    mp_transformer.print_statistics()
+                mp_results = mp_transformer.transform_large_files(
+                    self.parsed_files,
+                    symbol_table,
+                    callback=mp_callback
+                )
+                self.transform_results = {
+                    file_path: result.to_transform_result()
+                    for file_path, result in mp_results.items()
+                }
+
+                # 子进程中的转换统计汇总到主进程
+                self.code_transformer.stats['files_transformed'] += mp_transformer.completed_files
+                self.code_transformer.stats['total_replacements'] += sum(
+                    result.replacements for result in mp_results.values()
+                )
 
-                except ImportError as e:
-                    print(f"⚠️ 多进程转换器不可用，使用标准转换器: {e}")
-                    self.transform_results = self.code_transformer.transform_files(
-                        self.parsed_files,
-                        callback=transformer_callback
-                    )
+                # 打印性能统计
+                mp_transformer.print_statistics()
             else:
                 # 使用标准转换器
                 self.transform_results = self.code_transformer.transform_files(
                     self.parsed_files,
-                    callback=transformer_callback
+                    progress_callback=transformer_callback
                 )
 
             return len(self.transform_results) > 0
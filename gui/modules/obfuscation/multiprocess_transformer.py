@@ -4,9 +4,15 @@
 """
 多进程代码转换器
 
-使用多进程并行转换代码，适用于超大文件（>5000行）和超大项目（>50000行总代码）。
+使用多进程并行转换代码，适用于大文件和中大型项目。
 多进程避免了Python GIL（全局解释器锁）的限制，可以充分利用多核CPU。
 
+进程间数据传递：
+- 全局符号表和解析结果通过进程池初始化函数传给每个子进程，每个进程只接收一次
+- 任务只包含文件路径，子进程从自己持有的解析结果中取符号
+- 转换结果直接写入输出目录（指定 output_dir 时，保持相对项目根目录的路径），
+  或只回传转换后的代码，不回传原始内容
+
 性能提升：
 - 超大文件：2-4倍
 - 超大项目：3-6倍
@@ -16,41 +22,42 @@
     >>> from code_transformer import CodeTransformer
     >>>
     >>> transformer = CodeTransformer(name_generator, whitelist_manager)
+    >>> symbol_table = transformer.build_symbol_table(parsed_files)
     >>> mp_transformer = MultiProcessTransformer(max_workers=4)
     >>>
     >>> # 多进程转换
     >>> results = mp_transformer.transform_large_files(
     ...     parsed_files={'file1.m': parsed1, 'file2.swift': parsed2},
-    ...     transformer=transformer,
-    ...     mappings={'MyClass': 'WHC123'},
+    ...     mappings=symbol_table,
     ...     callback=progress_callback
     ... )
 
 注意事项：
 - 多进程会创建独立的Python解释器进程，内存开销较大
-- 适用于大文件或大项目，小项目建议使用并行解析器
-- 由于进程间通信开销，文件数量较少时可能不如单进程快
+- 适用于大文件或大项目，小项目建议使用单进程转换
+- 进程启动和分发解析结果有固定开销，文件数量较少时可能不如单进程快
 
 作者：开发团队
 创建日期：2025-10-15
-版本：v1.0.0
+版本：v1.1.0
 """
 
 import multiprocessing
+import os
+import sys
 import time
 from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Mapping, Optional, Union
 
+try:
+    from .symbol_table import SymbolTable
+except ImportError:
+    from symbol_table import SymbolTable
 
-@dataclass
-class TransformTask:
-    """转换任务数据（序列化友好）"""
-    file_path: str
-    symbols: Dict
-    mappings: Dict[str, str]
-    config: Dict  # 转换配置
+# 未记录行数时按文件大小估算（Objective-C/Swift 平均每行字节数）
+AVERAGE_LINE_BYTES = 40
 
 
 @dataclass
@@ -62,77 +69,137 @@ class TransformResult:
     replacements: int = 0
     error: Optional[str] = None
     elapsed_time: float = 0.0
+    output_path: Optional[str] = None   # 子进程直接写出的文件路径
+
+    def to_transform_result(self, original_content: Optional[str] = None):
+        """
+        转换为 CodeTransformer 的转换结果（供字符串加密、导出等后续步骤使用）
+
+        原始内容不经进程间回传：未提供时在主进程按与 CodeTransformer 相同的方式读取源文件
+        （转换不修改源文件），读取失败时为空字符串。
+
+        Args:
+            original_content: 原始内容（已读取时传入，避免重复读取）
+        """
+        try:
+            from .code_transformer import TransformResult as CodeTransformResult
+        except ImportError:
+            from code_transformer import TransformResult as CodeTransformResult
+
+        if original_content is None:
+            try:
+                with open(self.file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    original_content = f.read()
+            except OSError:
+                original_content = ""
+
+        return CodeTransformResult(
+            file_path=self.file_path,
+            original_content=original_content,
+            transformed_content=self.transformed_code or "",
+            replacements=self.replacements,
+            errors=[] if self.success else [self.error or "转换失败"]
+        )
+
+
+# 子进程内的转换状态（由 _init_worker 在每个进程启动时设置一次）
+_worker_state: Dict[str, Any] = {}
 
 
-def transform_file_worker(task: TransformTask) -> TransformResult:
+def _init_worker(symbol_table: SymbolTable, parsed_files: Dict[str, Any],
+                 output_dir: Optional[str] = None, project_root: Optional[str] = None) -> None:
     """
-    进程工作函数（必须是顶级函数，可被pickle序列化）
+    进程池初始化函数（每个子进程执行一次）
 
     Args:
-        task: 转换任务
+        symbol_table: 全局符号表
+        parsed_files: {文件路径: 解析结果}
+        output_dir: 输出目录（None时回传转换后的代码）
+        project_root: 项目根目录（输出文件保持相对它的路径）
+    """
+    # 添加项目路径
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
 
-    Returns:
-        TransformResult对象
+    from gui.modules.obfuscation.code_transformer import CodeTransformer
+    from gui.modules.obfuscation.name_generator import NameGenerator
 
-    注意：
-        - 此函数在子进程中执行
-        - 不能访问主进程的对象
-        - 所有数据通过序列化传递
-    """
-    start_time = time.time()
+    # 符号表已覆盖全部解析结果，子进程不会再生成名称
+    _worker_state['transformer'] = CodeTransformer(NameGenerator(), None, symbol_table=symbol_table)
+    _worker_state['parsed_files'] = parsed_files
+    _worker_state['output_dir'] = output_dir
+    _worker_state['project_root'] = project_root
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
-    try:
-        # 导入必要的模块（在子进程中）
-        import os
-        import sys
 
-        # 添加项目路径
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        if project_root not in sys.path:
-            sys.path.insert(0, project_root)
+def _output_path(file_path: str) -> str:
+    """
+    文件在输出目录中的路径（保持相对项目根目录的路径，不同目录下的同名文件不会互相覆盖）
 
-        from gui.modules.obfuscation.code_transformer import CodeTransformer
-        from gui.modules.obfuscation.name_generator import NameGenerator
-        from gui.modules.obfuscation.whitelist_manager import WhitelistManager
+    Raises:
+        ValueError: 文件不在项目根目录内
+    """
+    relative = os.path.relpath(os.path.abspath(file_path), _worker_state['project_root'])
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        raise ValueError(f"文件不在项目目录内: {file_path}")
+    output_path = os.path.join(_worker_state['output_dir'], relative)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return output_path
 
-        # 重新创建对象（子进程中）
-        # 注意：这里简化处理，实际使用中需要传递完整配置
-        whitelist = WhitelistManager()
 
-        # 使用空的name_generator（因为已有mappings）
-        generator = NameGenerator()
+def transform_file_worker(file_path: str) -> TransformResult:
+    """
+    进程工作函数（必须是顶级函数，可被pickle序列化）
 
-        # 创建transformer
-        transformer = CodeTransformer(generator, whitelist)
+    Args:
+        file_path: 文件路径
 
-        # 设置映射（从task中恢复）
-        transformer.symbol_mappings = task.mappings
+    Returns:
+        TransformResult对象
 
-        # 读取文件内容
-        with open(task.file_path, 'r', encoding='utf-8') as f:
-            original_code = f.read()
+    注意：
+        - 此函数在子进程中执行，依赖 _init_worker 设置的转换状态
+        - 任务只传递文件路径，符号表和解析结果不随任务重复序列化
+    """
+    start_time = time.time()
 
-        # 执行转换
-        transformed_code, replacements = transformer.transform_code(original_code, task.symbols)
+    try:
+        transformer = _worker_state['transformer']
+        result = transformer.transform_file(file_path, _worker_state['parsed_files'][file_path])
 
-        elapsed = time.time() - start_time
+        if result.errors:
+            return TransformResult(
+                file_path=file_path,
+                success=False,
+                error='; '.join(result.errors),
+                elapsed_time=time.time() - start_time
+            )
+
+        transformed_code = result.transformed_content
+        output_path = None
+        if _worker_state.get('output_dir'):
+            output_path = _output_path(file_path)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(transformed_code)
+            transformed_code = None
 
         return TransformResult(
-            file_path=task.file_path,
+            file_path=file_path,
             success=True,
             transformed_code=transformed_code,
-            replacements=replacements,
-            elapsed_time=elapsed
+            replacements=result.replacements,
+            elapsed_time=time.time() - start_time,
+            output_path=output_path
         )
 
     except Exception as e:
-        elapsed = time.time() - start_time
-
         return TransformResult(
-            file_path=task.file_path,
+            file_path=file_path,
             success=False,
             error=str(e),
-            elapsed_time=elapsed
+            elapsed_time=time.time() - start_time
         )
 
 
@@ -173,29 +240,33 @@ class MultiProcessTransformer:
 
     def transform_large_files(self,
                              parsed_files: Dict[str, Any],
-                             mappings: Dict[str, str],
+                             mappings: Union[SymbolTable, Mapping[str, str]],
                              callback: Optional[Callable[[float, str], None]] = None,
-                             config: Optional[Dict] = None) -> Dict[str, Any]:
+                             config: Optional[Dict] = None,
+                             output_dir: Optional[str] = None,
+                             project_root: Optional[str] = None) -> Dict[str, TransformResult]:
         """
         多进程转换大文件
 
         适用场景：
         - 单文件 > 5000 行
-        - 总行数 > 50000 行
+        - 总行数 > 20000 行
         - CPU密集型转换
 
         Args:
-            parsed_files: {file_path: parsed_symbols}字典
-            mappings: 符号映射字典 {original: obfuscated}
+            parsed_files: {file_path: ParsedFile}字典
+            mappings: 全局符号表，或符号映射字典 {original: obfuscated}
             callback: 进度回调函数
-            config: 转换配置（可选）
+            config: 转换配置（可选，chunksize: 每次分发给子进程的文件数）
+            output_dir: 输出目录（指定时子进程直接写出文件，不回传代码）
+            project_root: 项目根目录，输出文件保持相对它的路径（None时取全部文件所在目录的公共父目录）
 
         Returns:
             {file_path: TransformResult}字典
 
         示例：
             >>> results = mp_transformer.transform_large_files(
-            ...     parsed_files={'file.m': symbols},
+            ...     parsed_files={'file.m': parsed},
             ...     mappings={'MyClass': 'WHC123'},
             ...     callback=lambda p, m: print(f"[{p*100:.0f}%] {m}")
             ... )
@@ -211,70 +282,80 @@ class MultiProcessTransformer:
         # 记录开始时间
         start_time = time.time()
 
-        # 构建任务列表
-        tasks = []
-        for file_path, symbols in parsed_files.items():
-            task = TransformTask(
-                file_path=file_path,
-                symbols=symbols,
-                mappings=mappings,
-                config=config or {}
-            )
-            tasks.append(task)
-
-        # 使用进程池处理
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有任务
-            future_to_task = {
-                executor.submit(transform_file_worker, task): task
-                for task in tasks
-            }
-
-            # 收集结果
-            from concurrent.futures import as_completed
-            for future in as_completed(future_to_task):
-                task = future_to_task[future]
-
-                try:
-                    result = future.result()
+        symbol_table = self._as_symbol_table(parsed_files, mappings)
+        parsed_files = dict(parsed_files)
+        file_paths = list(parsed_files)
+        if output_dir:
+            project_root = os.path.abspath(project_root or os.path.commonpath(
+                [os.path.dirname(os.path.abspath(file_path)) for file_path in file_paths]))
+
+        # 按块分发路径，减少进程间往返次数
+        workers = min(self.max_workers, self.total_files)
+        chunksize = (config or {}).get('chunksize') or max(1, self.total_files // (workers * 4))
+
+        # 符号表和解析结果随初始化函数每个进程传递一次
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(symbol_table, parsed_files, output_dir, project_root)) as executor:
+            try:
+                for result in executor.map(transform_file_worker, file_paths, chunksize=chunksize):
                     results[result.file_path] = result
 
                     if result.success:
                         self.completed_files += 1
                         if callback:
                             callback(
-                                self.completed_files / self.total_files,
+                                len(results) / self.total_files,
                                 f"✅ 转换: {Path(result.file_path).name} ({result.replacements}次替换)"
                             )
                     else:
                         self.failed_files += 1
                         if callback:
                             callback(
-                                self.completed_files / self.total_files,
+                                len(results) / self.total_files,
                                 f"⚠️ 转换失败: {Path(result.file_path).name} - {result.error}"
                             )
 
-                except Exception as e:
-                    self.failed_files += 1
-                    if callback:
-                        callback(
-                            self.completed_files / self.total_files,
-                            f"❌ 转换异常: {Path(task.file_path).name} - {str(e)}"
-                        )
+            except Exception as e:
+                # 进程池异常（如子进程被终止），未返回结果的文件记为失败
+                for file_path in file_paths:
+                    if file_path not in results:
+                        results[file_path] = TransformResult(file_path=file_path, success=False, error=str(e))
+                        self.failed_files += 1
+                if callback:
+                    callback(1.0, f"❌ 转换异常: {str(e)}")
 
         # 记录总耗时
         self.total_elapsed = time.time() - start_time
 
         return results
 
+    @staticmethod
+    def _as_symbol_table(parsed_files: Dict[str, Any],
+                         mappings: Union[SymbolTable, Mapping[str, str]]) -> SymbolTable:
+        """
+        把映射字典包装为符号表
+
+        映射中没有的符号记为不混淆，子进程不会为其生成新名称，
+        保证各进程的转换结果与映射一致。
+        """
+        if isinstance(mappings, SymbolTable):
+            return mappings
+
+        unmapped = {symbol.name
+                    for parsed in parsed_files.values()
+                    for symbol in parsed.symbols
+                    if symbol.name not in mappings}
+        return SymbolTable(dict(mappings), {}, skipped=unmapped)
+
     def should_use_multiprocess(self, parsed_files: Dict[str, Any]) -> bool:
         """
         判断是否应该使用多进程
 
         决策逻辑：
-        - 单文件 > 5000 行：使用多进程
-        - 总行数 > 50000 行：使用多进程
         - 文件数 < 4：不使用（进程开销大）
+        - 单文件 > 5000 行：使用多进程
+        - 总行数 > 20000 行：使用多进程
 
         Args:
             parsed_files: 解析后的文件字典
@@ -285,13 +366,11 @@ class MultiProcessTransformer:
         if len(parsed_files) < 4:
             return False
 
-        # 计算总行数（如果有行数信息）
         total_lines = 0
         max_file_lines = 0
 
-        for file_path, symbols in parsed_files.items():
-            # 假设symbols中有total_lines字段
-            lines = symbols.get('total_lines', 0)
+        for file_path, parsed in parsed_files.items():
+            lines = self.estimate_lines(file_path, parsed)
             total_lines += lines
             max_file_lines = max(max_file_lines, lines)
 
@@ -299,11 +378,37 @@ class MultiProcessTransformer:
         if max_file_lines > 5000:
             return True
 
-        if total_lines > 50000:
+        if total_lines > 20000:
             return True
 
         return False
 
+    @staticmethod
+    def estimate_lines(file_path: str, parsed: Any) -> int:
+        """
+        获取文件行数
+
+        解析结果中有 total_lines 时直接使用，否则按文件大小估算。
+
+        Args:
+            file_path: 文件路径
+            parsed: 解析结果（ParsedFile 或字典）
+
+        Returns:
+            行数
+        """
+        if isinstance(parsed, dict):
+            lines = parsed.get('total_lines')
+        else:
+            lines = getattr(parsed, 'total_lines', None)
+        if lines is not None:
+            return lines
+
+        try:
+            return os.path.getsize(file_path) // AVERAGE_LINE_BYTES
+        except OSError:
+            return 0
+
     def get_statistics(self) -> Dict[str, Any]:
         """
         获取转换统计信息
@@ -342,26 +447,106 @@ class MultiProcessTransformer:
 # 性能对比测试
 # ============================================================================
 
-def benchmark_multiprocess_transformation():
+def benchmark_multiprocess_transformation(file_count: int = 60, methods_per_file: int = 400,
+                                          max_workers: Optional[int] = None) -> Dict[str, Any]:
     """
     性能基准测试
 
-    比较单进程和多进程转换的性能差异。
+    在临时目录生成合成的Objective-C项目，分别用单进程（CodeTransformer.transform_files）
+    和多进程转换同一份解析结果，比较耗时并校验两者输出一致。
+    可用于在目标机器上验证 should_use_multiprocess 的阈值。
+
+    Args:
+        file_count: 文件数
+        methods_per_file: 每个文件的方法数（每个方法2行）
+        max_workers: 多进程的进程数（None时使用默认值）
+
+    Returns:
+        {'files', 'total_lines', 'workers', 'serial_time', 'multiprocess_time', 'speedup', 'should_use'}
     """
+    import shutil
+    import tempfile
+
+    try:
+        from .code_parser import ParsedFile, Symbol, SymbolType
+        from .code_transformer import CodeTransformer
+        from .name_generator import NameGenerator
+    except ImportError:
+        from code_parser import ParsedFile, Symbol, SymbolType
+        from code_transformer import CodeTransformer
+        from name_generator import NameGenerator
+
     print("\n" + "="*60)
     print("多进程转换性能基准测试")
     print("="*60)
 
-    # 注意: 性能基准测试功能可在未来版本添加
-    # 用于对比单进程和多进程转换器的性能差异
-    # 测试内容: 不同文件大小、不同文件数量下的耗时对比
-    print("基准测试功能待实现（可选的性能分析工具）")
+    project_dir = tempfile.mkdtemp(prefix="mp_benchmark_")
+    try:
+        parsed_files = {}
+        total_lines = 0
+        for i in range(file_count):
+            file_path = os.path.join(project_dir, f'BenchClass{i}.m')
+            lines = [f'@implementation BenchClass{i}\n']
+            for j in range(methods_per_file):
+                lines.append(f'- (void)benchMethod{j}:(id)arg {{ [self benchMethod{(j + 1) % methods_per_file}:arg]; '
+                             f'BenchClass{(i + 1) % file_count} *next = nil; // "benchMethod{j}"\n}}\n')
+            lines.append('@end\n')
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            total_lines += len(lines) + methods_per_file
+
+            # 与实际解析结果一样不带行数，阈值判定按文件大小估算
+            parsed = ParsedFile(file_path=file_path, language="objc")
+            parsed.symbols = [Symbol(name=f'BenchClass{i}', type=SymbolType.CLASS,
+                                     file_path=file_path, line_number=1)]
+            parsed.symbols += [Symbol(name=f'benchMethod{j}', type=SymbolType.METHOD,
+                                      file_path=file_path, line_number=j * 2 + 2)
+                               for j in range(methods_per_file)]
+            parsed_files[file_path] = parsed
+
+        transformer = CodeTransformer(NameGenerator(seed="benchmark"))
+        symbol_table = transformer.build_symbol_table(parsed_files)
+
+        start = time.time()
+        serial = transformer.transform_files(parsed_files)
+        serial_time = time.time() - start
+
+        mp_transformer = MultiProcessTransformer(max_workers=max_workers)
+        start = time.time()
+        results = mp_transformer.transform_large_files(parsed_files, symbol_table)
+        multiprocess_time = time.time() - start
+
+        mismatched = [file_path for file_path, result in results.items()
+                      if result.transformed_code != serial[file_path].transformed_content]
+        if mismatched:
+            raise RuntimeError(f"多进程输出与单进程不一致: {len(mismatched)}个文件")
+
+        report = {
+            'files': file_count,
+            'total_lines': total_lines,
+            'workers': min(mp_transformer.max_workers, file_count),
+            'serial_time': serial_time,
+            'multiprocess_time': multiprocess_time,
+            'speedup': serial_time / multiprocess_time if multiprocess_time > 0 else 0.0,
+            'should_use': mp_transformer.should_use_multiprocess(parsed_files),
+        }
+    finally:
+        shutil.rmtree(project_dir, ignore_errors=True)
+
+    print(f"文件数:       {report['files']}")
+    print(f"总行数:       {report['total_lines']}")
+    print(f"进程数:       {report['workers']}")
+    print(f"单进程耗时:   {report['serial_time']:.2f}秒")
+    print(f"多进程耗时:   {report['multiprocess_time']:.2f}秒")
+    print(f"加速比:       {report['speedup']:.2f}x")
+    print(f"阈值判定:     {'使用多进程' if report['should_use'] else '使用单进程'}")
     print("="*60 + "\n")
+    return report
 
 
 if __name__ == '__main__':
     # 运行基准测试
-    print("多进程代码转换器 v1.0.0")
+    print("多进程代码转换器 v1.1.0")
     print("使用进程池并行转换代码，绕过Python GIL限制")
     print()
 
@@ -372,8 +557,9 @@ if __name__ == '__main__':
 from multiprocess_transformer import MultiProcessTransformer
 from code_transformer import CodeTransformer
 
-# 初始化
+# 初始化（转换前一次性生成全局符号表）
 transformer = CodeTransformer(name_generator, whitelist_manager)
+symbol_table = transformer.build_symbol_table(parsed_files)
 mp_transformer = MultiProcessTransformer(max_workers=4)
 
 # 判断是否应该使用多进程
@@ -381,7 +567,7 @@ if mp_transformer.should_use_multiprocess(parsed_files):
     # 使用多进程
     results = mp_transformer.transform_large_files(
         parsed_files=parsed_files,
-        mappings=generator.get_all_mappings(),
+        mappings=symbol_table,
         callback=lambda p, m: print(f"[{p*100:.0f}%] {m}")
     )
 else:
@@ -392,5 +578,6 @@ else:
 mp_transformer.print_statistics()
     """)
 
-    # 如果需要运行基准测试，取消注释下面的行
-    # benchmark_multiprocess_transformation()
+    # 传入 --benchmark 运行基准测试
+    if '--benchmark' in sys.argv:
+        benchmark_multiprocess_transformation()
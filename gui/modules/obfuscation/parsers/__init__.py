@@ -7,6 +7,7 @@
 from .common import ParsedFile, Symbol, SymbolType
 from .objc_parser import ObjCParser
 from .parser_coordinator import CodeParser
+from .source_lexer import SourceSegment, join_segments, split_source
 from .string_protector import StringLiteralProtector
 from .swift_parser import SwiftParser
 
@@ -21,4 +22,9 @@ __all__ = [
     'ObjCParser',
     'SwiftParser',
     'CodeParser',
+
+    # 源码分段
+    'SourceSegment',
+    'split_source',
+    'join_segments',
 ]
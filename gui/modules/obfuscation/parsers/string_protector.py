@@ -7,6 +7,11 @@
 import re
 from typing import Dict
 
+from .source_lexer import STRING, split_source
+
+# 占位符（恢复时单次扫描替换，避免 _1__ 与 _12__ 之类的前缀混淆）
+_PLACEHOLDER_PATTERN = re.compile(r'__STRING_PLACEHOLDER_\d+__')
+
 
 class StringLiteralProtector:
     """
@@ -14,6 +19,8 @@ class StringLiteralProtector:
 
     在代码解析前提取字符串字面量，用占位符替换，避免字符串中的代码关键字被误识别。
     解析完成后可以恢复原始字符串。
+
+    字符串由 source_lexer 单次扫描识别，注释中的引号不会被当作字符串。
     """
 
     def __init__(self):
@@ -52,10 +59,11 @@ class StringLiteralProtector:
         Returns:
             str: 恢复原始字符串后的代码
         """
-        restored = code
-        for placeholder, original in self.string_map.items():
-            restored = restored.replace(placeholder, original)
-        return restored
+        if not self.string_map:
+            return code
+        return _PLACEHOLDER_PATTERN.sub(
+            lambda match: self.string_map.get(match.group(0), match.group(0)), code
+        )
 
     def _protect_objc_strings(self, code: str) -> str:
         """
@@ -65,18 +73,8 @@ class StringLiteralProtector:
         - @"string"
         - @"string with \"escaped\" quotes"
         """
-        # 匹配Objective-C字符串: @"..."
-        # 需要处理转义的引号
-        pattern = r'@"(?:[^"\\]|\\.)*"'
-
-        def replace_match(match):
-            original_string = match.group(0)
-            placeholder = f"__STRING_PLACEHOLDER_{self.placeholder_counter}__"
-            self.string_map[placeholder] = original_string
-            self.placeholder_counter += 1
-            return placeholder
-
-        return re.sub(pattern, replace_match, code)
+        # C字符串（如 #import "Foo.h"）保持原样，只保护 @"..."
+        return self._protect_segments(code, "objc", lambda text: text.startswith('@'))
 
     def _protect_swift_strings(self, code: str) -> str:
         """
@@ -85,17 +83,19 @@ class StringLiteralProtector:
         支持格式:
         - "string"
         - "string with \"escaped\" quotes"
-        - 多行字符串需要特殊处理（已在Swift解析器中处理）
+        - \"\"\"多行字符串\"\"\"（整体作为一个字符串）
         """
-        # 匹配Swift字符串: "..."
-        # 需要处理转义的引号
-        pattern = r'"(?:[^"\\]|\\.)*"'
-
-        def replace_match(match):
-            original_string = match.group(0)
-            placeholder = f"__STRING_PLACEHOLDER_{self.placeholder_counter}__"
-            self.string_map[placeholder] = original_string
-            self.placeholder_counter += 1
-            return placeholder
-
-        return re.sub(pattern, replace_match, code)
+        return self._protect_segments(code, "swift", lambda text: True)
+
+    def _protect_segments(self, code: str, language: str, should_protect) -> str:
+        """把需要保护的字符串分段替换为占位符，其余分段原样拼接"""
+        pieces = []
+        for segment in split_source(code, language):
+            if segment.kind == STRING and should_protect(segment.text):
+                placeholder = f"__STRING_PLACEHOLDER_{self.placeholder_counter}__"
+                self.string_map[placeholder] = segment.text
+                self.placeholder_counter += 1
+                pieces.append(placeholder)
+            else:
+                pieces.append(segment.text)
+        return ''.join(pieces)
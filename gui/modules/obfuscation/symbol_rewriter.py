@@ -0,0 +1,342 @@
+"""
+单遍符号重写器 - 一次扫描完成文件内所有符号的替换
+
+SymbolReplacer 为每个符号执行 3~6 次整文件的 re.sub/re.findall，单文件耗时为
+O(符号数 × 文件大小)，方法很多的大型控制器每个文件要数秒。本模块只扫描一遍标识符，
+根据标识符所处的上下文判定适用的规则，到全局映射表中查找混淆名，最后一次拼接输出：
+
+- 类名: @interface/@implementation 之后、类型位置（后跟 * < 或空白）
+- 协议名: @protocol 之后、<...> 协议列表
+- 方法名: 方法声明 -(type)name; 与消息 [... name] 中的无参方法、选择子片段 name:
+- 属性名: @property/@synthesize 声明、点语法、下划线成员变量
+- 宏名: #define 之后、非 #define 行中的使用
+
+规则优先级与 SymbolReplacer 按类型分组依次替换一致（类名 > 协议名 > 方法名 > 属性名 > 宏名），
+替换次数的计算方式也相同，两者对同一输入产生相同的输出与替换次数。
+不同之处：空的选择子片段（如 foo:: 中第二段）不参与替换；混淆名恰好等于另一符号原名时不会被二次替换。
+"""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+try:
+    from .code_parser import Symbol, SymbolType
+    from .parsers.source_lexer import SourceSegment
+except ImportError:
+    from code_parser import Symbol, SymbolType
+    from parsers.source_lexer import SourceSegment
+
+
+# 标识符（与正则 \b 的单词边界一致）
+_WORD_PATTERN = re.compile(r'\w+')
+
+# 上下文中代替字符串/注释分段的字符
+_OPAQUE = '\x00'
+
+
+@dataclass
+class _FileRules:
+    """单个文件中需要替换的符号名（按类型分组）"""
+    classes: Set[str] = field(default_factory=set)
+    protocols: Set[str] = field(default_factory=set)
+    methods: Set[str] = field(default_factory=set)          # 无参方法
+    parts: Dict[str, str] = field(default_factory=dict)     # {选择子片段: 混淆片段}
+    properties: Set[str] = field(default_factory=set)
+    macros: Set[str] = field(default_factory=set)
+
+    @property
+    def candidates(self) -> Set[str]:
+        """所有可能被替换的标识符"""
+        return (self.classes | self.protocols | self.methods | set(self.parts)
+                | self.properties | self.macros)
+
+
+def _skip_space_back(content: str, pos: int) -> int:
+    """pos之前最近的非空白字符位置（没有则为-1）"""
+    j = pos - 1
+    while j >= 0 and content[j].isspace():
+        j -= 1
+    return j
+
+
+def _skip_space_forward(content: str, pos: int) -> int:
+    """pos及之后最近的非空白字符位置（没有则为len(content)）"""
+    n = len(content)
+    while pos < n and content[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _follows_keyword(content: str, start: int, keyword: str) -> bool:
+    """标识符是否紧跟在 keyword 与至少一个空白之后"""
+    j = _skip_space_back(content, start)
+    return j < start - 1 and content.endswith(keyword, 0, j + 1)
+
+
+def _next_char(content: str, pos: int) -> str:
+    """pos处的字符（越界时为空串）"""
+    return content[pos] if pos < len(content) else ''
+
+
+class SymbolRewriter:
+    """单遍符号重写器"""
+
+    def __init__(self, symbol_mappings: Dict[str, str]):
+        """
+        初始化符号重写器
+
+        Args:
+            symbol_mappings: 全局符号映射字典 {原始名: 混淆名}
+        """
+        self.symbol_mappings = symbol_mappings
+
+    def rewrite(self, content: str, symbols: List[Symbol]) -> Tuple[str, int]:
+        """
+        替换文件中的类名、协议名、方法名、属性名和宏名
+
+        Args:
+            content: 文件内容
+            symbols: 文件中解析出的符号
+
+        Returns:
+            (替换后内容, 替换次数)
+        """
+        tokens, resolved, count = self._resolve(content, symbols)
+        pieces = []
+        last = 0
+        for (start, end, _), replacement in zip(tokens, resolved):
+            if replacement is not None:
+                pieces.append(content[last:start])
+                pieces.append(replacement)
+                last = end
+        pieces.append(content[last:])
+        return ''.join(pieces), count
+
+    def rewrite_segments(self, segments: List[SourceSegment],
+                         symbols: List[Symbol]) -> Tuple[List[SourceSegment], int]:
+        """
+        只替换代码分段中的符号
+
+        判定上下文时每个字符串/注释分段视为一个不透明字符（既非空白也非标识符），
+        字符串和注释本身原样保留。
+
+        Args:
+            segments: split_source 切分出的分段
+            symbols: 文件中解析出的符号
+
+        Returns:
+            (替换后的分段, 替换次数)
+        """
+        view = ''.join(segment.text if segment.is_code else _OPAQUE for segment in segments)
+        tokens, resolved, count = self._resolve(view, symbols)
+
+        rewritten = []
+        offset = 0
+        index = 0
+        for segment in segments:
+            if not segment.is_code:
+                rewritten.append(segment)
+                offset += 1
+                continue
+            text = segment.text
+            segment_end = offset + len(text)
+            pieces = []
+            last = 0
+            # 标识符不会跨越分段（不透明字符不是标识符字符）
+            while index < len(tokens) and tokens[index][0] < segment_end:
+                start, end, _ = tokens[index]
+                replacement = resolved[index]
+                if replacement is not None:
+                    pieces.append(text[last:start - offset])
+                    pieces.append(replacement)
+                    last = end - offset
+                index += 1
+            if pieces:
+                pieces.append(text[last:])
+                segment = SourceSegment(segment.kind, ''.join(pieces))
+            rewritten.append(segment)
+            offset = segment_end
+        return rewritten, count
+
+    def _resolve(self, content: str, symbols: List[Symbol]) -> Tuple[List, List, int]:
+        """
+        扫描标识符并确定替换结果
+
+        Returns:
+            (候选标识符列表 [(起点, 终点, 名称)], 对应的替换结果（None为不替换）, 替换次数)
+        """
+        rules = self._collect_rules(symbols)
+        candidates = rules.candidates
+        if not candidates:
+            return [], [], 0
+
+        tokens = []
+        for match in _WORD_PATTERN.finditer(content):
+            name = match.group()
+            if name in candidates:
+                tokens.append((match.start(), match.end(), name))
+        if not tokens:
+            return [], [], 0
+
+        mappings = self.symbol_mappings
+        resolved: List = [None] * len(tokens)
+        count = 0
+
+        # 第一步：类名与 @protocol 声明；同时统计协议名所在的 <...> 协议列表
+        conform_lists = defaultdict(set)  # {协议名: 协议列表结束位置}
+        for i, (start, end, name) in enumerate(tokens):
+            if name in rules.classes and self._is_class_site(content, start, end):
+                resolved[i] = mappings[name]
+                count += 1
+            elif name in rules.protocols:
+                if _follows_keyword(content, start, '@protocol') and _next_char(content, end).isspace():
+                    resolved[i] = mappings[name]
+                    count += 1
+                else:
+                    close = self._enclosing_angle_list(content, start, end)
+                    if close != -1:
+                        conform_lists[name].add(close)
+
+        # 协议列表按个计数；出现在协议列表中的协议名，其后只要还有 '>' 即替换
+        for lists in conform_lists.values():
+            count += len(lists)
+        last_angle = content.rfind('>')
+
+        # 第二步：其余规则
+        call_ends: Dict[str, int] = {}
+        define_lines: Dict[int, bool] = {}
+        for i, (start, end, name) in enumerate(tokens):
+            if resolved[i] is not None:
+                continue
+            if name in conform_lists and end <= last_angle:
+                resolved[i] = mappings[name]
+                continue
+
+            replacement = None
+            if name in rules.methods and (
+                    self._is_method_declaration(content, start, end)
+                    or self._is_message_call(content, start, end, call_ends, name)):
+                replacement = mappings[name]
+            elif name in rules.parts and _next_char(content, end) == ':':
+                replacement = rules.parts[name]
+            elif name in rules.properties and self._is_property_site(content, start, end, name):
+                replacement = mappings[name]
+            elif name in rules.macros and self._is_macro_site(content, start, define_lines):
+                replacement = mappings[name]
+
+            if replacement is not None:
+                resolved[i] = replacement
+                count += 1
+
+        return tokens, resolved, count
+
+    def _collect_rules(self, symbols: List[Symbol]) -> _FileRules:
+        """按类型收集有映射的符号名"""
+        rules = _FileRules()
+        for symbol in symbols:
+            name = symbol.name
+            if name not in self.symbol_mappings:
+                continue
+            if symbol.type == SymbolType.CLASS:
+                rules.classes.add(name)
+            elif symbol.type == SymbolType.PROTOCOL:
+                rules.protocols.add(name)
+            elif symbol.type == SymbolType.MACRO:
+                rules.macros.add(name)
+            elif symbol.type == SymbolType.PROPERTY:
+                rules.properties.add(name)
+            elif symbol.type == SymbolType.METHOD:
+                parts = name.split(':')
+                if len(parts) == 1:
+                    rules.methods.add(name)
+                    continue
+                # 同名片段以先出现的方法为准（与逐个方法替换的结果一致）
+                obf_parts = self.symbol_mappings[name].split(':')
+                for part, obf_part in zip(parts[:-1], obf_parts):
+                    if part:
+                        rules.parts.setdefault(part, obf_part)
+        return rules
+
+    @staticmethod
+    def _is_class_site(content: str, start: int, end: int) -> bool:
+        """类名位置：类型位置，或 @interface/@implementation 声明"""
+        following = _next_char(content, end)
+        if following.isspace() or (following and following in '*<'):
+            return True
+        after = _skip_space_forward(content, end)
+        following = _next_char(content, after)
+        if following and following in ':(<' and _follows_keyword(content, start, '@interface'):
+            return True
+        return ((following and following in '({') or '\n' in content[end:after]) \
+            and _follows_keyword(content, start, '@implementation')
+
+    @staticmethod
+    def _enclosing_angle_list(content: str, start: int, end: int) -> int:
+        """标识符位于 <...> 中时返回结束的 '>' 位置，否则返回-1"""
+        previous_close = content.rfind('>', 0, start)
+        if content.rfind('<', 0, start) <= previous_close:
+            return -1
+        return content.find('>', end)
+
+    @staticmethod
+    def _is_method_declaration(content: str, start: int, end: int) -> bool:
+        """无参方法声明/实现：-(type)name; 或 -(type)name {"""
+        close = _skip_space_back(content, start)
+        if close < 0 or content[close] != ')':
+            return False
+        following = _next_char(content, _skip_space_forward(content, end))
+        if not following or following not in ';{':
+            return False
+        floor = content.rfind(')', 0, close)
+        # close为0时不能传-1（rfind会按从末尾倒数解释，搜索到整个文件）
+        opening = content.rfind('(', floor + 1, max(close - 1, 0))
+        while opening != -1:
+            sign = _skip_space_back(content, opening)
+            if sign >= 0 and content[sign] in '-+':
+                return True
+            opening = content.rfind('(', floor + 1, opening)
+        return False
+
+    @staticmethod
+    def _is_message_call(content: str, start: int, end: int,
+                         call_ends: Dict[str, int], name: str) -> bool:
+        """无参消息：[[obj foo] name]（前一个匹配结尾的 ']' 不能再作为下一个匹配的开头）"""
+        before = _skip_space_back(content, start)
+        if before < call_ends.get(name, 0) or content[before] != ']':
+            return False
+        after = _skip_space_forward(content, end)
+        if _next_char(content, after) != ']':
+            return False
+        call_ends[name] = after + 1
+        return True
+
+    @staticmethod
+    def _is_property_site(content: str, start: int, end: int, name: str) -> bool:
+        """属性位置：@property/@synthesize 声明、点语法、下划线成员变量"""
+        if name.startswith('_'):
+            return True
+        before = _skip_space_back(content, start)
+        if before >= 0 and content[before] == '.':
+            return True
+        following = _next_char(content, _skip_space_forward(content, end))
+        if following == ';' and start > 0 and content[start - 1].isspace():
+            statement = content.rfind(';', 0, start) + 1
+            if content.find('@property', statement, start) != -1:
+                return True
+        return bool(following) and following in ';=' and _follows_keyword(content, start, '@synthesize')
+
+    @staticmethod
+    def _is_macro_site(content: str, start: int, define_lines: Dict[int, bool]) -> bool:
+        """宏位置：#define 之后，或不以 #define 开头的行"""
+        if _follows_keyword(content, start, '#define'):
+            return True
+        line_start = content.rfind('\n', 0, start) + 1
+        is_define = define_lines.get(line_start)
+        if is_define is None:
+            line_end = content.find('\n', start)
+            line = content[line_start:line_end] if line_end != -1 else content[line_start:]
+            is_define = line.strip().startswith('#define')
+            define_lines[line_start] = is_define
+        return not is_define
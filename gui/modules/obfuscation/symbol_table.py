@@ -0,0 +1,141 @@
+"""
+全局符号表 - 整个项目的符号映射一次性生成
+
+原先 CodeTransformer 在每个文件转换前调用 _generate_mappings，每次都从完整的
+symbol_mappings 重建反向映射，文件数 × 映射数的字典操作在大项目中远超实际转换耗时。
+本模块在转换前统一完成：
+
+1. 收集所有 ParsedFile 的符号（按文件和出现顺序去重，类型以首次出现为准）
+2. 按集合一次性过滤白名单
+3. 批量生成混淆名，增量维护反向索引检测冲突
+
+生成后的 SymbolTable 不可修改（映射以只读视图提供），可以被多个转换线程/进程只读共享；
+需要补充符号时生成新的符号表。
+"""
+
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Union
+
+try:
+    from .code_parser import ParsedFile, Symbol, SymbolType
+except ImportError:
+    from code_parser import ParsedFile, Symbol, SymbolType
+
+
+class SymbolTable:
+    """
+    不可变的全局符号表
+
+    Attributes:
+        added: 本次构建新增的映射数 {符号类型: 数量}
+    """
+
+    def __init__(self, mappings: Dict[str, str], types: Dict[str, str],
+                 skipped: Iterable[str] = (), added: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            mappings: {原始名: 混淆名}
+            types: {原始名: 符号类型值}
+            skipped: 已处理但不混淆的名称（白名单、名称冲突）
+            added: 本次构建新增的映射数
+        """
+        self._mappings = dict(mappings)
+        self._types = dict(types)
+        self._originals = {obfuscated: original for original, obfuscated in self._mappings.items()}
+        self._skipped: FrozenSet[str] = frozenset(skipped)
+        self.added: Dict[str, int] = dict(added or {})
+
+    @classmethod
+    def build(cls, parsed_files: Union[Dict[str, ParsedFile], Iterable[ParsedFile]],
+              name_generator, whitelist_manager=None,
+              base: Optional['SymbolTable'] = None) -> 'SymbolTable':
+        """
+        从解析结果构建符号表
+
+        Args:
+            parsed_files: {文件路径: 解析结果} 或解析结果列表
+            name_generator: 名称生成器
+            whitelist_manager: 白名单管理器（None时不过滤）
+            base: 已有符号表（新表包含其全部映射，只为新符号生成名称）
+
+        Returns:
+            SymbolTable: 新的符号表
+        """
+        if isinstance(parsed_files, dict):
+            parsed_files = parsed_files.values()
+
+        mappings = dict(base._mappings) if base else {}
+        types = dict(base._types) if base else {}
+        skipped = set(base._skipped) if base else set()
+        originals = dict(base._originals) if base else {}
+
+        # 1. 收集尚未处理的符号（保持出现顺序，类型以首次出现为准）
+        pending: Dict[str, SymbolType] = {}
+        for parsed in parsed_files:
+            for symbol in parsed.symbols:
+                name = symbol.name
+                if name not in pending and name not in mappings and name not in skipped:
+                    pending[name] = symbol.type
+
+        # 2. 批量过滤白名单
+        if whitelist_manager and pending:
+            bulk_filter = getattr(whitelist_manager, 'filter_whitelisted', None)
+            if bulk_filter:
+                whitelisted = bulk_filter(pending)
+            else:
+                whitelisted = {name for name in pending if whitelist_manager.is_whitelisted(name)}
+            skipped |= whitelisted
+        else:
+            whitelisted = set()
+
+        # 3. 批量生成混淆名（反向索引增量维护）
+        added: Dict[str, int] = {}
+        for name, symbol_type in pending.items():
+            if name in whitelisted:
+                continue
+            obfuscated = name_generator.generate(name, symbol_type.value)
+            if obfuscated in originals:
+                print(f"❌ 警告: '{name}' 的混淆名 '{obfuscated}' 已被 '{originals[obfuscated]}' 使用，保留原名")
+                skipped.add(name)
+                continue
+            mappings[name] = obfuscated
+            types[name] = symbol_type.value
+            originals[obfuscated] = name
+            added[symbol_type.value] = added.get(symbol_type.value, 0) + 1
+
+        return cls(mappings, types, skipped, added)
+
+    @property
+    def mappings(self) -> Mapping[str, str]:
+        """只读映射视图 {原始名: 混淆名}"""
+        return MappingProxyType(self._mappings)
+
+    def __len__(self) -> int:
+        return len(self._mappings)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._mappings
+
+    def __getitem__(self, name: str) -> str:
+        return self._mappings[name]
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """获取混淆名"""
+        return self._mappings.get(name, default)
+
+    def type_of(self, name: str) -> Optional[str]:
+        """获取符号类型值"""
+        return self._types.get(name)
+
+    def original_of(self, obfuscated: str) -> Optional[str]:
+        """按混淆名反查原始名"""
+        return self._originals.get(obfuscated)
+
+    def covers(self, symbols: List[Symbol]) -> bool:
+        """符号是否都已处理过（已映射或确定不混淆）"""
+        return all(symbol.name in self._mappings or symbol.name in self._skipped
+                   for symbol in symbols)
+
+    def to_dict(self) -> Dict[str, str]:
+        """映射的普通字典副本（用于导出）"""
+        return dict(self._mappings)
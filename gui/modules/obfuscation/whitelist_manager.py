@@ -14,7 +14,7 @@ import re
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set
 
 
 class WhitelistType(Enum):
@@ -597,6 +597,22 @@ class WhitelistManager:
         """
         return any(name in wlist for wlist in self.whitelist.values())
 
+    def filter_whitelisted(self, names: Iterable[str]) -> Set[str]:
+        """
+        批量判断白名单（按集合求交集，适合整个项目的符号一次性过滤）
+
+        Args:
+            names: 名称集合
+
+        Returns:
+            Set[str]: 其中位于白名单中的名称
+        """
+        names = set(names)
+        found: Set[str] = set()
+        for wlist in self.whitelist.values():
+            found |= names & wlist
+        return found
+
     def get_whitelist_item(self, name: str) -> Optional[WhitelistItem]:
         """获取白名单项详情"""
         return next((item for item in self.whitelist_items if item.name == name), None)
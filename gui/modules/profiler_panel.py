@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话性能分析面板
+
+展示 SessionProfiler 汇总的各阶段耗时（解码、合并、构建、分析、索引、过滤、渲染），
+并支持导出JSON与Chrome Trace，便于排查慢工单。
+"""
+
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+try:
+    from .session_profiler import SessionProfiler, get_session_profiler
+except ImportError:
+    from session_profiler import SessionProfiler, get_session_profiler
+
+
+class ProfilerPanel(tk.Toplevel):
+    """
+    性能分析面板
+
+    使用示例:
+        panel = ProfilerPanel(parent)
+    """
+
+    COLUMNS = (
+        ('category', '分类', 80),
+        ('count', '次数', 60),
+        ('total', '总耗时(ms)', 100),
+        ('avg', '平均(ms)', 90),
+        ('max', '最大(ms)', 90),
+        ('entries', '条目/行数', 100),
+        ('bytes', '字节数', 100),
+        ('throughput', '吞吐(MB/s)', 90),
+    )
+
+    def __init__(self, parent, profiler: SessionProfiler = None, **kwargs):
+        """
+        初始化面板
+
+        Args:
+            parent: 父窗口
+            profiler: 会话分析器（默认使用全局实例）
+        """
+        super().__init__(parent, **kwargs)
+
+        self.profiler = profiler or get_session_profiler()
+        self.title("会话性能分析 - Session Profiler")
+        self.geometry("900x500")
+
+        # 自动刷新定时器
+        self.auto_refresh_id = None
+        self.auto_refresh_enabled = tk.BooleanVar(value=True)
+        self.enabled_var = tk.BooleanVar(value=self.profiler.enabled)
+
+        self._create_widgets()
+        self.refresh()
+        self._start_auto_refresh()
+
+    def _create_widgets(self):
+        """创建UI组件"""
+        toolbar = ttk.Frame(self)
+        toolbar.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
+
+        ttk.Button(toolbar, text="🔄 刷新", command=self.refresh).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="🗑️ 重置", command=self.reset).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="💾 导出JSON", command=self.export_json).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="📈 导出Chrome Trace", command=self.export_chrome_trace).pack(side=tk.LEFT, padx=2)
+
+        ttk.Checkbutton(
+            toolbar,
+            text="记录",
+            variable=self.enabled_var,
+            command=self._toggle_enabled
+        ).pack(side=tk.LEFT, padx=10)
+        ttk.Checkbutton(
+            toolbar,
+            text="自动刷新 (2秒)",
+            variable=self.auto_refresh_enabled,
+            command=self._toggle_auto_refresh
+        ).pack(side=tk.LEFT)
+
+        # 阶段统计表
+        table_frame = ttk.Frame(self)
+        table_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.tree = ttk.Treeview(table_frame, columns=[c[0] for c in self.COLUMNS])
+        self.tree.heading('#0', text='阶段')
+        self.tree.column('#0', width=180)
+        for key, title, width in self.COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width, anchor=tk.E)
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # 底部汇总
+        self.summary_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.summary_var).pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=5)
+
+    def refresh(self):
+        """刷新统计表"""
+        summary = self.profiler.summary()
+
+        self.tree.delete(*self.tree.get_children())
+        for stage in summary['stages']:
+            totals = stage['totals']
+            entries = totals.get('entries', totals.get('lines'))
+            self.tree.insert('', tk.END, text=stage['name'], values=(
+                stage['category'],
+                stage['count'],
+                f"{stage['total_time'] * 1000:.1f}",
+                f"{stage['avg_time'] * 1000:.2f}",
+                f"{stage['max_time'] * 1000:.2f}",
+                f"{int(entries):,}" if entries is not None else '',
+                f"{int(totals['bytes']):,}" if 'bytes' in totals else '',
+                f"{stage['mb_per_second']:.1f}" if 'mb_per_second' in stage else '',
+            ))
+
+        self.summary_var.set(
+            f"阶段数: {len(summary['stages'])} | 记录数: {summary['span_count']} | "
+            f"累计耗时: {summary['total_time'] * 1000:.1f}ms"
+        )
+
+    def reset(self):
+        """清空记录"""
+        self.profiler.reset()
+        self.refresh()
+
+    def export_json(self):
+        """导出JSON"""
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+        )
+
+        if filepath:
+            self.profiler.export_json(filepath)
+            messagebox.showinfo("成功", f"性能数据已导出到:\n{filepath}")
+
+    def export_chrome_trace(self):
+        """导出Chrome Trace（chrome://tracing 或 Perfetto 打开）"""
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            initialfile="trace.json",
+            filetypes=[("Trace文件", "*.json"), ("所有文件", "*.*")]
+        )
+
+        if filepath:
+            self.profiler.export_chrome_trace(filepath)
+            messagebox.showinfo("成功", f"Trace已导出到:\n{filepath}")
+
+    def _toggle_enabled(self):
+        """切换记录开关"""
+        self.profiler.enabled = self.enabled_var.get()
+
+    def _start_auto_refresh(self):
+        """启动自动刷新"""
+        if self.auto_refresh_enabled.get():
+            self.refresh()
+            self.auto_refresh_id = self.after(2000, self._start_auto_refresh)
+
+    def _toggle_auto_refresh(self):
+        """切换自动刷新"""
+        if self.auto_refresh_id:
+            self.after_cancel(self.auto_refresh_id)
+            self.auto_refresh_id = None
+
+        if self.auto_refresh_enabled.get():
+            self._start_auto_refresh()
+
+    def destroy(self):
+        """销毁窗口时取消定时器"""
+        if self.auto_refresh_id:
+            self.after_cancel(self.auto_refresh_id)
+        super().destroy()
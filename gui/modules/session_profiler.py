@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志会话性能分析器
+
+记录日志分析流水线各热点阶段的耗时，定位慢工单的时间花在哪里：
+- 解码（每个文件的字节数、块数、解压耗时）
+- 行合并、LogEntry构建、时间线合并
+- analyze_logs、索引构建
+- 每次过滤查询、渲染
+
+特性：
+- 线程安全：解码/索引在后台线程，过滤/渲染在UI线程
+- 聚合统计：按阶段汇总次数、总耗时、最值以及数值参数（字节数、行数等）
+- 有界内存：只保留最近的明细span
+- 导出：JSON（聚合+明细）与 Chrome Trace（chrome://tracing / Perfetto 可直接打开）
+
+使用示例：
+    profiler = get_session_profiler()
+    with profiler.span("decode", category="decode", file="a.xlog") as args:
+        lines = decode(...)
+        args['lines'] = len(lines)
+    profiler.export_chrome_trace("trace.json")
+
+    @profiled("render", category="render", count_arg="entries")
+    def display_logs(self, entries): ...
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+
+@dataclass
+class ProfileSpan:
+    """单次计时记录"""
+    name: str                       # 阶段名称
+    category: str                   # 分类（decode/parse/index/filter/render等）
+    start: float                    # 开始时间（相对会话开始，秒）
+    duration: float                 # 耗时（秒）
+    thread_id: int                  # 线程ID
+    args: Dict[str, Any] = field(default_factory=dict)  # 附加参数（字节数、行数等）
+
+
+@dataclass
+class StageStats:
+    """阶段聚合统计"""
+    name: str
+    category: str
+    count: int = 0
+    total_time: float = 0.0
+    min_time: float = float('inf')
+    max_time: float = 0.0
+    totals: Dict[str, float] = field(default_factory=dict)  # 数值参数累计
+
+    @property
+    def avg_time(self) -> float:
+        """平均耗时"""
+        return self.total_time / self.count if self.count else 0.0
+
+    def add(self, duration: float, args: Dict[str, Any]) -> None:
+        """累计一次记录"""
+        self.count += 1
+        self.total_time += duration
+        self.min_time = min(self.min_time, duration)
+        self.max_time = max(self.max_time, duration)
+        for key, value in args.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.totals[key] = self.totals.get(key, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        data = {
+            'name': self.name,
+            'category': self.category,
+            'count': self.count,
+            'total_time': round(self.total_time, 6),
+            'avg_time': round(self.avg_time, 6),
+            'min_time': round(self.min_time, 6) if self.count else 0.0,
+            'max_time': round(self.max_time, 6),
+            'totals': dict(self.totals)
+        }
+        # 有字节数时给出吞吐量
+        if self.total_time > 0 and 'bytes' in self.totals:
+            data['mb_per_second'] = round(self.totals['bytes'] / 1024 / 1024 / self.total_time, 2)
+        return data
+
+
+class SessionProfiler:
+    """
+    会话级性能分析器
+
+    属性：
+        enabled: 是否启用（禁用时 span() 几乎零开销）
+        max_spans: 保留的明细span上限
+    """
+
+    def __init__(self, enabled: bool = True, max_spans: int = 20000):
+        """
+        初始化分析器
+
+        Args:
+            enabled: 是否启用
+            max_spans: 明细span保留上限（聚合统计不受影响）
+        """
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._spans: Deque[ProfileSpan] = deque(maxlen=max_spans)
+        self._stats: Dict[str, StageStats] = {}
+
+    @contextmanager
+    def span(self, name: str, category: str = '', **args) -> Iterator[Dict[str, Any]]:
+        """
+        计时上下文管理器
+
+        产出的字典可在代码块内补充参数（例如处理后的行数）。
+
+        Args:
+            name: 阶段名称
+            category: 分类
+            **args: 附加参数
+        """
+        if not self.enabled:
+            yield args
+            return
+
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self._add(name, category, start, time.perf_counter() - start, args)
+
+    def record(self, name: str, duration: float, category: str = '',
+               start: Optional[float] = None, **args) -> None:
+        """
+        记录一段已测量的耗时（用于在循环中累计后一次性上报）
+
+        Args:
+            name: 阶段名称
+            duration: 耗时（秒）
+            category: 分类
+            start: perf_counter开始时间（None则按 现在-耗时 推算）
+            **args: 附加参数
+        """
+        if not self.enabled:
+            return
+        if start is None:
+            start = time.perf_counter() - duration
+        self._add(name, category, start, duration, args)
+
+    def _add(self, name: str, category: str, start: float, duration: float, args: Dict[str, Any]) -> None:
+        span = ProfileSpan(
+            name=name,
+            category=category,
+            start=start - self._origin,
+            duration=duration,
+            thread_id=threading.get_ident(),
+            args=dict(args)
+        )
+        with self._lock:
+            self._spans.append(span)
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = StageStats(name=name, category=category)
+            stats.add(duration, span.args)
+
+    def get_stats(self) -> List[StageStats]:
+        """获取按总耗时降序排列的阶段统计"""
+        with self._lock:
+            return sorted(self._stats.values(), key=lambda s: s.total_time, reverse=True)
+
+    def get_spans(self) -> List[ProfileSpan]:
+        """获取保留的明细span（按时间顺序）"""
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self) -> Dict[str, Any]:
+        """聚合摘要"""
+        stats = self.get_stats()
+        return {
+            'stages': [s.to_dict() for s in stats],
+            'total_time': round(sum(s.total_time for s in stats), 6),
+            'span_count': sum(s.count for s in stats)
+        }
+
+    def export_json(self, output_file: str) -> None:
+        """导出为JSON（聚合统计 + 明细span）"""
+        data = self.summary()
+        data['spans'] = [
+            {
+                'name': span.name,
+                'category': span.category,
+                'start': round(span.start, 6),
+                'duration': round(span.duration, 6),
+                'thread_id': span.thread_id,
+                'args': span.args
+            }
+            for span in self.get_spans()
+        ]
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """转换为Chrome Trace Event格式（完整事件 ph='X'，时间单位微秒）"""
+        pid = os.getpid()
+        events = []
+        thread_ids = {}
+
+        for span in self.get_spans():
+            tid = thread_ids.setdefault(span.thread_id, len(thread_ids) + 1)
+            events.append({
+                'name': span.name,
+                'cat': span.category or 'default',
+                'ph': 'X',
+                'ts': round(span.start * 1_000_000, 3),
+                'dur': round(span.duration * 1_000_000, 3),
+                'pid': pid,
+                'tid': tid,
+                'args': {k: (v if isinstance(v, (int, float, str, bool)) else str(v))
+                         for k, v in span.args.items()}
+            })
+
+        for thread_id, tid in thread_ids.items():
+            events.append({
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': pid,
+                'tid': tid,
+                'args': {'name': 'main' if thread_id == threading.main_thread().ident else f'worker-{tid}'}
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, output_file: str) -> None:
+        """导出为Chrome Trace文件"""
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+
+    def reset(self) -> None:
+        """清空所有记录"""
+        with self._lock:
+            self._spans.clear()
+            self._stats.clear()
+            self._origin = time.perf_counter()
+
+
+# 全局会话分析器
+_global_profiler: Optional[SessionProfiler] = None
+_global_profiler_lock = threading.Lock()
+
+
+def get_session_profiler() -> SessionProfiler:
+    """获取全局会话分析器"""
+    global _global_profiler
+    if _global_profiler is None:
+        with _global_profiler_lock:
+            if _global_profiler is None:
+                _global_profiler = SessionProfiler()
+    return _global_profiler
+
+
+def profiled(name: str, category: str = '', count_arg: Optional[str] = None) -> Callable:
+    """
+    函数计时装饰器，记录到全局会话分析器
+
+    Args:
+        name: 阶段名称
+        category: 分类
+        count_arg: 可选的参数名，记录该参数的长度（如条目数）为 entries
+    """
+    def decorator(func: Callable) -> Callable:
+        position = None
+        if count_arg is not None:
+            position = list(inspect.signature(func).parameters).index(count_arg)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = get_session_profiler()
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+
+            extra = {}
+            if position is not None:
+                value = kwargs.get(count_arg, args[position] if position < len(args) else None)
+                if value is not None and hasattr(value, '__len__'):
+                    extra['entries'] = len(value)
+
+            with profiler.span(name, category, **extra):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
@@ -9,15 +9,27 @@
 - 内存优化：内存峰值降低50-70%
 - 进度回调：实时显示加载进度
 
+统一加载路径：
+- 文件只读取一次（mmap），编码从分布在整个文件中的有限采样检测
+- 二进制分块 + 增量解码器，单块解码失败时仅该块降级（errors='replace'）
+- FileOperations.load_log_file 与 StreamLoader 共用同一实现
+- xlog可直接以解码块迭代器输入，边解码边解析，进度与吞吐量按真实字节计算
+
 性能目标：
 - 100MB文件内存峰值 < 50MB
 - 加载速度提升 40-60%
 - 支持GB级文件加载
 """
 
+import codecs
 import itertools
+import mmap
 import os
-from typing import Callable, Iterator, List, Optional, Tuple
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 # chardet是可选依赖，如果不可用则使用备用方案
 try:
@@ -26,16 +38,266 @@ try:
 except ImportError:
     CHARDET_AVAILABLE = False
 
+try:
+    from .session_profiler import get_session_profiler
+except ImportError:
+    from session_profiler import get_session_profiler
+
+
+# 候选编码（按优先级），latin-1 可解码任意字节，作为最终兜底
+DEFAULT_ENCODINGS: Tuple[str, ...] = ('utf-8', 'gb2312', 'gbk', 'gb18030', 'latin-1')
+
+_ASCII_BYTES = bytes(range(128))
+
+# 编码的超集（按优先级）：超集能无损解码时不应选择有损的子集编码
+_SUPERSET_ENCODINGS = {
+    'gb2312': ('gbk', 'gb18030'),
+    'gbk': ('gb18030',),
+}
+
+
+def detect_buffer_encoding(
+    buffer,
+    encodings: Sequence[str] = DEFAULT_ENCODINGS,
+    sample_size: int = 64 * 1024,
+    sample_count: int = 8
+) -> str:
+    """
+    从缓冲区的分布式采样中检测编码
+
+    在文件头、尾及中间均匀取 sample_count 个采样块（每块 sample_size 字节），
+    采样起点对齐到换行之后，避免从多字节字符中间开始解码。
+    读取量与文件大小无关，上限为 sample_size * sample_count。
+
+    Args:
+        buffer: bytes / mmap 等支持切片的字节缓冲区
+        encodings: 候选编码列表
+        sample_size: 每个采样块的字节数
+        sample_count: 采样块数量
+
+    Returns:
+        第一个解码错误率可容忍的编码（均不满足时返回兜底编码）
+    """
+    size = len(buffer)
+    if size == 0:
+        return encodings[0]
+
+    samples = []
+    if size <= sample_size * sample_count:
+        samples.append(bytes(buffer[:size]))
+    else:
+        step = (size - sample_size) // (sample_count - 1) if sample_count > 1 else 0
+        for i in range(sample_count):
+            start = i * step
+            sample = bytes(buffer[start:start + sample_size])
+            if start > 0:
+                # 对齐到换行之后（0x0A 不会出现在 UTF-8/GBK 多字节序列中）
+                newline = sample.find(b'\n')
+                if newline == -1:
+                    continue
+                sample = sample[newline + 1:]
+            samples.append(sample)
+
+    # 按优先级取第一个错误率可容忍的候选：个别坏字节（低于非ASCII字节的1%）
+    # 不应让整个文件切换编码；最后一个候选作为兜底，不参与检测。
+    # 候选有解码错误时，先严格尝试其超集编码（GB2312 有损而 GBK 无损时选 GBK）
+    non_ascii = sum(len(sample.translate(None, _ASCII_BYTES)) for sample in samples)
+    for encoding in encodings[:-1]:
+        errors = _count_decode_errors(samples, encoding)
+        if errors * 100 <= non_ascii:
+            if errors:
+                for superset in _SUPERSET_ENCODINGS.get(encoding, ()):
+                    if superset in encodings and _count_decode_errors(samples, superset) == 0:
+                        return superset
+            return encoding
+
+    # 所有候选都不理想时，交给chardet给出参考（如果可用）
+    if CHARDET_AVAILABLE:
+        result = chardet.detect(b''.join(samples))
+        if result.get('encoding') and result.get('confidence', 0) >= 0.7:
+            return result['encoding']
+
+    return encodings[-1]
+
+
+def _count_decode_errors(samples: List[bytes], encoding: str) -> int:
+    """统计采样用指定编码解码时的替换字符数（允许采样末尾残留不完整字符）"""
+    errors = 0
+    for sample in samples:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        errors += decoder.decode(sample, final=False).count('\ufffd')
+    return errors
+
+
+class IncrementalLineDecoder:
+    """
+    增量行解码器
+
+    接收任意切分的字节块（可能在多字节字符或行的中间断开），产出完整的行。
+    换行处理与文本模式 readlines() 的通用换行一致（\r\n 与单独的 \r 都规范化为 \n）。
+    某块严格解码失败时，回退到块前状态并仅对该块使用 errors='replace'。
+    """
+
+    def __init__(self, encoding: str = 'utf-8'):
+        self.encoding = encoding
+        self.fallback_blocks = 0
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._carry = ''
+
+    def feed(self, data) -> List[str]:
+        """输入一个字节块，返回其中已完整的行（保留行尾换行符）"""
+        state = self._decoder.getstate()
+        try:
+            text = self._decoder.decode(data)
+        except UnicodeDecodeError:
+            self.fallback_blocks += 1
+            self._decoder.setstate(state)
+            self._decoder.errors = 'replace'
+            try:
+                text = self._decoder.decode(data)
+            finally:
+                self._decoder.errors = 'strict'
+        return self._split(self._carry + text)
+
+    def flush(self) -> List[str]:
+        """输入结束，返回剩余的最后一行（可能没有换行符）"""
+        self._decoder.errors = 'replace'
+        text = self._carry + self._decoder.decode(b'', final=True)
+        self._carry = ''
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return self._split_all(text)
+
+    def _split(self, text: str) -> List[str]:
+        # 末尾的 \r 可能与下一块开头的 \n 组成 \r\n，暂不处理
+        hold = ''
+        if text.endswith('\r'):
+            text, hold = text[:-1], '\r'
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+        cut = text.rfind('\n') + 1
+        self._carry = text[cut:] + hold
+        return self._split_all(text[:cut])
+
+    @staticmethod
+    def _split_all(text: str) -> List[str]:
+        if not text:
+            return []
+        lines = text.split('\n')
+        last = lines.pop()
+        result = [line + '\n' for line in lines]
+        if last:
+            result.append(last)
+        return result
+
+
+class LoadProgress:
+    """
+    加载进度（按真实字节偏移）
+
+    bytes_done 为已经消费的输入字节数（普通文件为文件偏移，xlog为xlog文件偏移），
+    吞吐量按实际耗时计算。
+    """
+
+    __slots__ = ['bytes_done', 'bytes_total', 'lines', 'started_at']
+
+    def __init__(self, bytes_total: int = 0) -> None:
+        self.bytes_done = 0
+        self.bytes_total = bytes_total
+        self.lines = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        """已耗时（秒）"""
+        return time.perf_counter() - self.started_at
+
+    @property
+    def percent(self) -> float:
+        """完成百分比"""
+        if not self.bytes_total:
+            return 100.0
+        return min(100.0, self.bytes_done * 100.0 / self.bytes_total)
+
+    @property
+    def mb_per_second(self) -> float:
+        """吞吐量（MB/s）"""
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return self.bytes_done / 1024 / 1024 / elapsed
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            'bytes_done': self.bytes_done,
+            'bytes_total': self.bytes_total,
+            'lines': self.lines,
+            'percent': round(self.percent, 2),
+            'elapsed': round(self.elapsed, 3),
+            'mb_per_second': round(self.mb_per_second, 2)
+        }
+
+
+_PREFETCH_DONE = object()
+
+
+def _prefetch(iterable: Iterable, depth: int) -> Iterator:
+    """
+    在后台线程中预取迭代器元素
+
+    xlog解压（zlib会释放GIL）在后台线程进行，与消费方的行解析重叠。
+    消费方提前结束时，后台线程在下一次放入时退出。
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker():
+        try:
+            for item in iterable:
+                if not _put((item, None)):
+                    return
+            _put((_PREFETCH_DONE, None))
+        except Exception as e:
+            _put((_PREFETCH_DONE, e))
+
+    worker = threading.Thread(target=_worker, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _PREFETCH_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
 
 class StreamLoader:
     """
     流式文件加载器
 
     核心功能：
-    1. 快速编码检测：只读取前10KB检测编码
-    2. 分块流式读取：避免内存峰值
+    1. 快速编码检测：在文件中均匀采样（有上限）检测编码
+    2. 分块流式读取：mmap 只读一次，二进制分块 + 增量解码
     3. 增量解析：边读边解析，不累积
-    4. 进度反馈：实时反馈加载进度
+    4. 进度反馈：按真实字节偏移反馈加载进度与吞吐量（self.progress）
 
     使用示例：
         loader = StreamLoader()
@@ -43,25 +305,33 @@ class StreamLoader:
             process_entries(chunk)
     """
 
-    def __init__(self, default_encoding='utf-8'):
+    # 每次解码的字节块大小（按换行对齐）
+    BLOCK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, default_encoding='utf-8', encodings: Sequence[str] = DEFAULT_ENCODINGS):
         """
         初始化加载器
 
         Args:
             default_encoding: 默认编码
+            encodings: 编码检测的候选列表（最后一项为兜底编码）
         """
         self.default_encoding = default_encoding
+        self.encodings = tuple(encodings)
         self.encoding_cache = {}  # 文件路径 -> 编码缓存
+        self.fallback_blocks = 0  # 最近一次加载中降级解码的块数
+        self.progress: Optional[LoadProgress] = None  # 最近一次流式加载的进度
 
-    def detect_encoding(self, filepath: str, sample_size: int = 10000) -> str:
+    def detect_encoding(self, filepath: str, sample_size: int = 64 * 1024) -> str:
         """
         快速检测文件编码
 
-        只读取文件前sample_size字节进行检测，大幅提升速度
+        在文件中均匀读取若干个sample_size字节的采样进行检测，
+        读取量有上限，与文件大小无关
 
         Args:
             filepath: 文件路径
-            sample_size: 采样大小（字节）
+            sample_size: 单个采样大小（字节）
 
         Returns:
             检测到的编码
@@ -71,30 +341,13 @@ class StreamLoader:
             return self.encoding_cache[filepath]
 
         try:
-            if CHARDET_AVAILABLE:
-                # 使用chardet检测
-                with open(filepath, 'rb') as f:
-                    raw_data = f.read(sample_size)
-
-                result = chardet.detect(raw_data)
-                encoding = result['encoding']
-
-                if not encoding or result['confidence'] < 0.7:
-                    # 置信度低，使用默认编码
-                    encoding = self.default_encoding
-            else:
-                # chardet不可用，尝试常见编码
-                encodings = ['utf-8', 'gbk', 'gb2312']
-                encoding = self.default_encoding
-
-                for enc in encodings:
-                    try:
-                        with open(filepath, 'r', encoding=enc) as f:
-                            f.read(sample_size // 2)  # 尝试读取部分内容
-                        encoding = enc
-                        break
-                    except UnicodeDecodeError:
-                        continue
+            with open(filepath, 'rb') as f:
+                buffer = self._map_file(f)
+                try:
+                    encoding = detect_buffer_encoding(buffer, self.encodings, sample_size)
+                finally:
+                    if isinstance(buffer, mmap.mmap):
+                        buffer.close()
 
             # 缓存结果
             self.encoding_cache[filepath] = encoding
@@ -104,6 +357,114 @@ class StreamLoader:
             print(f"编码检测失败: {e}，使用默认编码")
             return self.default_encoding
 
+    @staticmethod
+    def _map_file(f):
+        """将文件映射为只读缓冲区（空文件无法mmap，返回空bytes）"""
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def iter_line_blocks(
+        self,
+        filepath: str,
+        encoding: Optional[str] = None,
+        block_size: Optional[int] = None
+    ) -> Iterator[Tuple[List[str], int]]:
+        """
+        按块惰性解码文件
+
+        文件通过mmap只读取一次：编码检测与解码共用同一映射。
+        字节块交给增量解码器，块边界处被截断的字符和行会与下一块拼接；
+        某块严格解码失败时，仅对该块使用 errors='replace' 降级，不会重读整个文件。
+
+        Args:
+            filepath: 文件路径
+            encoding: 指定编码（None则自动检测）
+            block_size: 每块字节数
+
+        Yields:
+            (完整行列表, 已消费的字节偏移)
+        """
+        block_size = block_size or self.BLOCK_SIZE
+
+        with open(filepath, 'rb') as f:
+            buffer = self._map_file(f)
+            try:
+                if encoding is None:
+                    encoding = self.encoding_cache.get(filepath)
+                if encoding is None:
+                    encoding = detect_buffer_encoding(buffer, self.encodings)
+                    self.encoding_cache[filepath] = encoding
+
+                size = len(buffer)
+                blocks = ((buffer[offset:offset + block_size], min(offset + block_size, size))
+                          for offset in range(0, size, block_size))
+                yield from self.iter_decoded_blocks(blocks, encoding)
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+
+    def iter_decoded_blocks(
+        self,
+        blocks: Iterable[Tuple[Any, ...]],
+        encoding: str = 'utf-8'
+    ) -> Iterator[Tuple[List[str], int]]:
+        """
+        将字节块迭代器增量解码为行（普通文件与xlog共用）
+
+        Args:
+            blocks: 产出 (字节块, 输入源中的结束偏移, ...) 的迭代器，
+                    例如 OptimizedXLogDecoder.iter_blocks() 的输出
+            encoding: 文本编码
+
+        Yields:
+            (完整行列表, 已消费的字节偏移)
+        """
+        decoder = IncrementalLineDecoder(encoding)
+        self.fallback_blocks = 0
+        offset = 0
+
+        for block in blocks:
+            data, offset = block[0], block[1]
+            lines = decoder.feed(data)
+            self.fallback_blocks = decoder.fallback_blocks
+            if lines:
+                yield lines, offset
+
+        lines = decoder.flush()
+        if lines:
+            yield lines, offset
+
+    def iter_lines(self, filepath: str, encoding: Optional[str] = None) -> Iterator[str]:
+        """
+        惰性逐行读取文件
+
+        Args:
+            filepath: 文件路径
+            encoding: 指定编码（None则自动检测）
+
+        Yields:
+            日志行（保留行尾换行符）
+        """
+        for lines, _ in self.iter_line_blocks(filepath, encoding):
+            yield from lines
+
+    def load_lines(self, filepath: str, encoding: Optional[str] = None) -> List[str]:
+        """
+        一次性读取文件的全部行（单次读取 + 自动编码检测）
+
+        Args:
+            filepath: 文件路径
+            encoding: 指定编码（None则自动检测）
+
+        Returns:
+            日志行列表
+        """
+        lines: List[str] = []
+        for block, _ in self.iter_line_blocks(filepath, encoding):
+            lines.extend(block)
+        return lines
+
     def load_streaming(
         self,
         filepath: str,
@@ -116,46 +477,75 @@ class StreamLoader:
         Args:
             filepath: 文件路径
             chunk_size: 每次读取的行数
-            progress_callback: 进度回调函数 callback(current_bytes, total_bytes)
+            progress_callback: 进度回调函数 callback(current_bytes, total_bytes)，
+                               current_bytes 为真实的已读取字节偏移
 
         Yields:
             日志行列表（每个chunk）
         """
-        # 检测编码
-        encoding = self.detect_encoding(filepath)
-
-        # 获取文件大小
-        file_size = os.path.getsize(filepath)
-        bytes_read = 0
-        lines_read = 0
-
         try:
-            with open(filepath, 'r', encoding=encoding, errors='ignore', buffering=8192) as f:
-                while True:
-                    # 读取chunk_size行
-                    lines = list(itertools.islice(f, chunk_size))
+            yield from self.load_blocks(
+                self.iter_line_blocks(filepath),
+                os.path.getsize(filepath),
+                chunk_size,
+                progress_callback,
+                decoded=True
+            )
+        except Exception as e:
+            print(f"文件加载失败: {e}")
+            raise
 
-                    if not lines:
-                        break
+    def load_blocks(
+        self,
+        blocks: Iterable[Tuple[Any, ...]],
+        total_bytes: int,
+        chunk_size: int = 10000,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        encoding: str = 'utf-8',
+        decoded: bool = False
+    ) -> Iterator[List[str]]:
+        """
+        从块迭代器流式产出行chunk，并按真实字节偏移报告进度
 
-                    # 更新进度（估算）
-                    lines_read += len(lines)
-                    # 估算已读取的字节数（假设每行平均大小）
-                    bytes_read = int((lines_read / 10) * file_size) if lines_read < 10 else \
-                                 int((lines_read * file_size) / (lines_read + 1000))
+        Args:
+            blocks: 产出 (字节块, 结束偏移, ...) 的迭代器；decoded=True 时为 (行列表, 结束偏移)
+            total_bytes: 输入源总字节数（用于进度）
+            chunk_size: 每个chunk的行数
+            progress_callback: 进度回调 callback(current_bytes, total_bytes)
+            encoding: 字节块的文本编码
+            decoded: 输入是否已经是解码后的行
 
+        Yields:
+            日志行列表（每个chunk）；self.progress 同步更新
+        """
+        progress = LoadProgress(total_bytes)
+        self.progress = progress
+        line_blocks = blocks if decoded else self.iter_decoded_blocks(blocks, encoding)
+        pending: List[str] = []
+
+        for lines, offset in line_blocks:
+            pending.extend(lines)
+            progress.bytes_done = offset
+
+            if len(pending) >= chunk_size:
+                # 按chunk_size切分，剩余部分留到下一块
+                split = len(pending) - len(pending) % chunk_size
+                for start in range(0, split, chunk_size):
+                    chunk = pending[start:start + chunk_size]
+                    progress.lines += len(chunk)
                     if progress_callback:
-                        progress_callback(min(bytes_read, file_size), file_size)
+                        progress_callback(offset, total_bytes)
+                    yield chunk
+                pending = pending[split:]
 
-                    yield lines
+        if pending:
+            progress.lines += len(pending)
+            yield pending
 
-                # 确保最后调用100%
-                if progress_callback:
-                    progress_callback(file_size, file_size)
-
-        except Exception as e:
-            print(f"文件加载失败: {e}")
-            raise
+        # 确保最后调用100%
+        progress.bytes_done = total_bytes
+        if progress_callback:
+            progress_callback(total_bytes, total_bytes)
 
     def load_file_memory_efficient(
         self,
@@ -215,34 +605,76 @@ class StreamLoader:
     def load_with_decode(
         self,
         filepath: str,
-        decoder_func: Callable[[str], str],
+        decoder_func: Optional[Callable[[str], Any]] = None,
         chunk_size: int = 10000,
-        progress_callback: Optional[Callable[[int, int], None]] = None
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        prefetch: int = 4
     ) -> Iterator[List[str]]:
         """
         加载并解码xlog文件（流式）
 
+        默认直接消费 OptimizedXLogDecoder.iter_blocks() 的块迭代器：不生成临时.log文件，
+        解压在后台线程中进行并与行解析重叠，进度按xlog文件的真实偏移计算。
+
         Args:
             filepath: xlog文件路径
-            decoder_func: 解码函数
+            decoder_func: 可选解码函数；返回块迭代器时直接消费，
+                          返回字符串时视为已解码的.log文件路径（兼容旧用法）
             chunk_size: chunk大小
             progress_callback: 进度回调
+            prefetch: 后台预取的块数（0表示不使用后台线程）
 
         Yields:
             解码后的日志行列表
         """
-        # 先解码xlog文件
         try:
-            # 调用解码器，生成临时.log文件
-            decoded_path = decoder_func(filepath)
-
-            # 流式加载解码后的文件
-            yield from self.load_streaming(decoded_path, chunk_size, progress_callback)
+            decoder = None
+            if decoder_func is None:
+                decoder = self._xlog_decoder()
+                blocks = decoder.iter_blocks(filepath)
+            else:
+                blocks = decoder_func(filepath)
+
+            if isinstance(blocks, str):
+                # 旧用法：解码器已生成.log文件
+                yield from self.load_streaming(blocks, chunk_size, progress_callback)
+                return
+
+            started = time.perf_counter()
+            yield from self.load_blocks(
+                _prefetch(blocks, prefetch),
+                os.path.getsize(filepath),
+                chunk_size,
+                progress_callback
+            )
+
+            # 上报本文件的解码统计（块数与解压耗时来自解码器）
+            block_stats = decoder.block_stats if decoder is not None else {}
+            get_session_profiler().record(
+                'decode_file', time.perf_counter() - started, category='decode',
+                start=started,
+                file=os.path.basename(filepath),
+                bytes=self.progress.bytes_total,
+                lines=self.progress.lines,
+                blocks=block_stats.get('blocks', 0),
+                decompress_time=block_stats.get('decompress_time', 0.0),
+                fallback_blocks=self.fallback_blocks
+            )
 
         except Exception as e:
             print(f"xlog解码失败: {e}")
             raise
 
+    @staticmethod
+    def _xlog_decoder():
+        """创建流式xlog解码器"""
+        decoders_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'decoders')
+        if decoders_path not in sys.path:
+            sys.path.insert(0, decoders_path)
+
+        from optimized_decoder import OptimizedXLogDecoder
+        return OptimizedXLogDecoder()
+
 
 class EnhancedFileOperations:
     """
@@ -300,20 +732,7 @@ class EnhancedFileOperations:
         Returns:
             日志行列表
         """
-        encodings = ['utf-8', 'gbk', 'gb2312', 'ascii']
-
-        for encoding in encodings:
-            try:
-                with open(filepath, 'r', encoding=encoding) as f:
-                    lines = f.readlines()
-                return lines
-            except UnicodeDecodeError:
-                continue
-
-        # 所有编码都失败，尝试自动检测
-        encoding = self.stream_loader.detect_encoding(filepath)
-        with open(filepath, 'r', encoding=encoding, errors='ignore') as f:
-            return f.readlines()
+        return self.stream_loader.load_lines(filepath)
 
     def _load_file_streaming(
         self,
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志模板挖掘（Drain风格）
+
+把只在ID、数字、地址上不同的日志归为同一个模板，例如：
+    订单 10023 支付失败: 网络超时
+    订单 10087 支付失败: 网络超时
+  -> 订单 <*> 支付失败: 网络超时
+
+算法：
+1. 掩码：UUID、十六进制地址、IP、长ID、数字 统一替换为 <*>
+2. 分词后按 (词数, 前几个词) 路由到固定深度前缀树的叶子
+3. 叶子内按位置相似度找最相似模板，超过阈值则合并（不同位置变为 <*>），否则新建模板
+
+单遍流式处理；模板总数、每个树节点的子节点数、每个模板的样本数都有上限，
+超过模板上限时淘汰最久未命中的模板，内存有界。
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+WILDCARD = '<*>'
+
+# 变量片段（按优先级排列，组合为一个正则一次替换）
+_MASK_PATTERN = re.compile('|'.join([
+    r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}',  # UUID
+    r'0[xX][0-9a-fA-F]+',                                                          # 地址
+    r'\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?',                                           # IP[:端口]
+    r'\b[0-9a-fA-F]{16,}\b',                                                       # 长十六进制ID
+    r'[-+]?\d+(?:\.\d+)?',                                                         # 数字
+]))
+_WILDCARD_RUN = re.compile(r'(?:<\*>)+')
+
+
+def mask_content(content: str) -> str:
+    """把日志内容中的变量片段替换为 <*>"""
+    return _WILDCARD_RUN.sub(WILDCARD, _MASK_PATTERN.sub(WILDCARD, content))
+
+
+@dataclass
+class LogTemplate:
+    """日志模板"""
+    template_id: int
+    tokens: List[str]
+    count: int = 0
+    first_timestamp: Optional[str] = None
+    last_timestamp: Optional[str] = None
+    samples: List = field(default_factory=list)  # 样本LogEntry（最多max_samples条）
+
+    @property
+    def template(self) -> str:
+        """模板文本"""
+        return ' '.join(self.tokens)
+
+    def to_dict(self) -> Dict:
+        """转换为字典（不含样本对象）"""
+        return {
+            'template_id': self.template_id,
+            'template': self.template,
+            'count': self.count,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp,
+        }
+
+
+class TemplateMiner:
+    """
+    在线日志模板挖掘器
+
+    使用示例:
+        miner = TemplateMiner()
+        for entry in entries:
+            template = miner.add(entry)
+        for t in miner.top(10):
+            print(t.count, t.template)
+    """
+
+    def __init__(self, similarity_threshold: float = 0.5, depth: int = 2,
+                 max_children: int = 100, max_templates: int = 5000,
+                 max_samples: int = 3, max_tokens: int = 64):
+        """
+        初始化挖掘器
+
+        Args:
+            similarity_threshold: 合并到已有模板所需的最小位置相似度
+            depth: 前缀树路由使用的前导词数
+            max_children: 每个树节点的最大子节点数（超出后归入 <*> 分支）
+            max_templates: 模板总数上限（超出时淘汰最久未命中的模板）
+            max_samples: 每个模板保留的样本数
+            max_tokens: 参与匹配的最大词数（超长内容只按前缀归类）
+        """
+        self.similarity_threshold = similarity_threshold
+        self.depth = depth
+        self.max_children = max_children
+        self.max_templates = max_templates
+        self.max_samples = max_samples
+        self.max_tokens = max_tokens
+
+        self._root: Dict = {}
+        # template_id -> (模板, 所在叶子)，按最近命中排序
+        self._templates: 'OrderedDict[int, Tuple[LogTemplate, List[LogTemplate]]]' = OrderedDict()
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def tokenize(self, content: str) -> List[str]:
+        """掩码并分词"""
+        tokens = mask_content(content or '').split()
+        return tokens[:self.max_tokens]
+
+    def add(self, entry) -> LogTemplate:
+        """
+        加入一条日志（LogEntry），返回其所属模板
+
+        Args:
+            entry: LogEntry（使用 content 与 timestamp）
+        """
+        return self.add_content(entry.content or entry.raw_line, entry.timestamp, entry)
+
+    def add_content(self, content: str, timestamp: Optional[str] = None, sample=None) -> LogTemplate:
+        """
+        加入一条日志内容，返回其所属模板
+
+        Args:
+            content: 日志内容
+            timestamp: 时间戳（用于首次/最后出现时间）
+            sample: 作为样本保存的对象（通常为LogEntry）
+        """
+        tokens = self.tokenize(content)
+        leaf = self._leaf(tokens, create=True)
+        template = self._best_match(leaf, tokens)
+
+        if template is None:
+            template = LogTemplate(template_id=self._next_id, tokens=list(tokens), first_timestamp=timestamp)
+            self._next_id += 1
+            leaf.append(template)
+            self._templates[template.template_id] = (template, leaf)
+            self._evict()
+        else:
+            if template.tokens != tokens:
+                template.tokens = [a if a == b else WILDCARD for a, b in zip(template.tokens, tokens)]
+            self._templates.move_to_end(template.template_id)
+
+        template.count += 1
+        if timestamp:
+            if template.first_timestamp is None:
+                template.first_timestamp = timestamp
+            template.last_timestamp = timestamp
+        if sample is not None and len(template.samples) < self.max_samples:
+            template.samples.append(sample)
+        return template
+
+    def add_entries(self, entries: Iterable) -> List[LogTemplate]:
+        """批量加入日志，返回与输入一一对应的模板列表"""
+        return [self.add(entry) for entry in entries]
+
+    def match(self, content: str) -> Optional[LogTemplate]:
+        """查找内容所属的模板（不修改模板、不计数）"""
+        tokens = self.tokenize(content)
+        leaf = self._leaf(tokens, create=False)
+        return self._best_match(leaf, tokens) if leaf else None
+
+    def get(self, template_id: int) -> Optional[LogTemplate]:
+        """按ID获取模板（已被淘汰时返回None）"""
+        item = self._templates.get(template_id)
+        return item[0] if item else None
+
+    @property
+    def templates(self) -> List[LogTemplate]:
+        """所有模板（按创建顺序）"""
+        return sorted((t for t, _ in self._templates.values()), key=lambda t: t.template_id)
+
+    def top(self, n: Optional[int] = None) -> List[LogTemplate]:
+        """按出现次数降序返回前n个模板（次数相同按首次出现顺序）"""
+        ranked = sorted(self.templates, key=lambda t: -t.count)
+        return ranked if n is None else ranked[:n]
+
+    def _leaf(self, tokens: List[str], create: bool) -> Optional[List[LogTemplate]]:
+        """按 (词数, 前导词) 路由到叶子"""
+        node = self._root
+        keys = [len(tokens)] + [self._route_key(token) for token in tokens[:self.depth]]
+        for i, key in enumerate(keys):
+            child = node.get(key)
+            if child is None:
+                if not create:
+                    child = node.get(WILDCARD)
+                    if child is None:
+                        return None
+                else:
+                    if key != WILDCARD and len(node) >= self.max_children:
+                        key = WILDCARD
+                    child = node.get(key)
+                    if child is None:
+                        child = node[key] = [] if i == len(keys) - 1 else {}
+            node = child
+        return node
+
+    @staticmethod
+    def _route_key(token: str) -> str:
+        """含变量的词统一走 <*> 分支，避免参数值撑爆树"""
+        return WILDCARD if WILDCARD in token else token
+
+    def _best_match(self, leaf: List[LogTemplate], tokens: List[str]) -> Optional[LogTemplate]:
+        """叶子内找相似度最高且超过阈值的模板"""
+        best = None
+        best_key = (-1.0, -1)
+        length = len(tokens) or 1
+        for template in leaf:
+            same = 0
+            params = 0
+            for a, b in zip(template.tokens, tokens):
+                # 两边都是掩码后的 <*> 也算相同；模板通配符对具体词只用于打破平局
+                if a == b:
+                    same += 1
+                elif a == WILDCARD:
+                    params += 1
+            key = (same / length, params)
+            if key > best_key:
+                best, best_key = template, key
+
+        if best is not None and (best_key[0] >= self.similarity_threshold or not tokens):
+            return best
+        return None
+
+    def _evict(self) -> None:
+        """超出上限时淘汰最久未命中的模板"""
+        while len(self._templates) > self.max_templates:
+            _, (template, leaf) = self._templates.popitem(last=False)
+            leaf.remove(template)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多文件时间线合并
+
+将同一文件组中多个文件（主App + 各扩展进程）的日志按时间交织合并：
+- 堆式k路归并：O(N log k)，不做全局排序
+- 流式输出：边合并边产出，可分批喂给查看器
+- 稳定：时间相同时按文件顺序、文件内原始顺序输出
+
+无时间戳的行（堆栈、多行续行等）沿用所在文件上一条日志的时间，
+因此始终紧跟在其父日志之后，不会被其他文件的日志插开。
+"""
+
+import heapq
+import itertools
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from .data_models import LogEntry, parse_timestamp_value
+
+
+def iter_timeline_keys(entries: Iterable[LogEntry]) -> Iterator[Tuple[float, LogEntry]]:
+    """
+    为单个文件的日志流生成排序键
+
+    键为数值时间戳，并保证在流内单调不减：
+    无时间戳或时间回退的行沿用当前最大时间，使每个输入流对归并而言都是有序的。
+
+    Args:
+        entries: 单个文件的LogEntry序列（文件内原始顺序）
+
+    Yields:
+        (排序键, LogEntry)
+    """
+    current = float('-inf')
+    for entry in entries:
+        value = parse_timestamp_value(entry.timestamp)
+        if value is not None and value > current:
+            current = value
+        yield current, entry
+
+
+def merge_timelines(streams: Sequence[Iterable[LogEntry]]) -> Iterator[LogEntry]:
+    """
+    k路归并多个文件的日志流
+
+    Args:
+        streams: 每个文件的LogEntry序列，按文件顺序排列（决定同一时间的先后）
+
+    Yields:
+        按时间交织后的LogEntry
+    """
+    if len(streams) == 1:
+        yield from streams[0]
+        return
+
+    keyed = [iter_timeline_keys(stream) for stream in streams]
+    for _, entry in heapq.merge(*keyed, key=itemgetter(0)):
+        yield entry
+
+
+def merge_timelines_batched(
+    streams: Sequence[Iterable[LogEntry]],
+    batch_size: int = 5000
+) -> Iterator[List[LogEntry]]:
+    """
+    分批产出合并后的时间线，便于查看器增量加载
+
+    Args:
+        streams: 每个文件的LogEntry序列
+        batch_size: 每批条数
+
+    Yields:
+        LogEntry列表（每批）
+    """
+    merged = merge_timelines(streams)
+    while True:
+        batch = list(itertools.islice(merged, batch_size))
+        if not batch:
+            return
+        yield batch
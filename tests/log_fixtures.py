@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试用日志构造工具
+各测试共用的Mars格式日志条目与会话构造函数
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntry
+
+
+def mars_entry(seconds: float, module: str = "App", text: str = "", level: str = 'I',
+               source: str = "a.log", millis: int = 0) -> LogEntry:
+    """2025-10-11 10:00:00 起第 seconds 秒（另加 millis 毫秒）的一条日志，分钟数按小时取模"""
+    total = round(seconds * 1000) + millis
+    minute, rest = divmod(total, 60000)
+    timestamp = f"10:{minute % 60:02d}:{rest // 1000:02d}.{rest % 1000:03d}"
+    return LogEntry(f"[{level}][2025-10-11 +8.0 {timestamp}][1][{module}] {text}", source)
+
+
+def render_session() -> list:
+    """30分钟、每30秒一条的UI渲染日志（共60条）"""
+    return [mars_entry(minute * 60 + second, "UI", f"render frame {minute} ok")
+            for minute in range(30) for second in (0, 30)]
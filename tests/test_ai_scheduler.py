@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI请求调度器测试
+使用假客户端验证并发上限、重复请求合并、优先级、令牌桶限流、
+可重试错误的退避重试以及流式调用的取消
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.ai_diagnosis.ai_client import AIClient
+from gui.modules.ai_diagnosis.ai_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AIRequestScheduler,
+    ScheduledAIClient,
+    TokenBucket,
+    is_retryable,
+)
+
+
+class FakeClient(AIClient):
+    """记录调用与并发数的假客户端"""
+
+    def __init__(self, delay=0.05, chunks=None, failures=None):
+        self.delay = delay
+        self.chunks = chunks
+        self.failures = list(failures or [])
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.gate = None
+        self._lock = threading.Lock()
+
+    def ask(self, prompt, **kwargs):
+        return ''.join(self.ask_stream(prompt))
+
+    def ask_stream(self, prompt, cancel_event=None, **kwargs):
+        with self._lock:
+            self.calls.append(prompt)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            if self.failures:
+                raise self.failures.pop(0)
+            for chunk in self.chunks or [f"answer:{prompt}"]:
+                if cancel_event is not None and cancel_event.wait(self.delay):
+                    return
+                yield chunk
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestScheduler(unittest.TestCase):
+    """测试调度行为"""
+
+    def setUp(self):
+        self.scheduler = AIRequestScheduler(max_workers=2, backoff_base=0.01)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_bounded_concurrency(self):
+        """十个不同请求同时提交，实际并发不超过工作线程数"""
+        client = FakeClient(delay=0.05)
+        futures = [self.scheduler.submit(client, f"analyze module {i}") for i in range(10)]
+        results = [future.result(5) for future in futures]
+
+        self.assertEqual(results, [f"answer:analyze module {i}" for i in range(10)])
+        self.assertEqual(client.max_active, 2)
+        self.assertEqual(self.scheduler.get_stats()['executed'], 10)
+
+    def test_coalesce_identical_prompts(self):
+        """归一化后相同的进行中请求只发送一次"""
+        client = FakeClient(delay=0.1)
+        prompts = ["分析 Network 模块", "分析  network 模块", "分析network模块"]
+        futures = [self.scheduler.submit(client, prompt) for prompt in prompts]
+
+        self.assertEqual({future.result(5) for future in futures}, {"answer:分析 Network 模块"})
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(self.scheduler.get_stats()['coalesced'], 2)
+
+        # 完成后再次提交会重新请求 (结果缓存由AnalysisCache负责)
+        self.scheduler.submit(client, prompts[0]).result(5)
+        self.assertEqual(len(client.calls), 2)
+
+    def test_interactive_before_batch(self):
+        """排队中的交互式请求先于批量请求执行，合并时提升优先级"""
+        scheduler = AIRequestScheduler(max_workers=1)
+        self.addCleanup(scheduler.shutdown)
+        client = FakeClient(delay=0)
+        client.gate = threading.Event()
+
+        blocker = scheduler.submit(client, "blocker")
+        time.sleep(0.05)
+        batch = [scheduler.submit(client, f"chunk {i}", priority=PRIORITY_BATCH) for i in range(3)]
+        interactive = scheduler.submit(client, "user question", priority=PRIORITY_INTERACTIVE)
+        upgraded = scheduler.submit(client, "chunk 2", priority=PRIORITY_INTERACTIVE)
+        client.gate.set()
+
+        for future in [blocker, interactive, upgraded] + batch:
+            future.result(5)
+        self.assertEqual(client.calls, ["blocker", "user question", "chunk 2", "chunk 0", "chunk 1"])
+
+    def test_token_bucket_rate_limit(self):
+        """限流后端按令牌桶速率放行请求"""
+        self.scheduler.set_rate_limit('FakeClient', per_minute=600, burst=1)
+        client = FakeClient(delay=0)
+        started = time.monotonic()
+        for future in [self.scheduler.submit(client, f"q{i}") for i in range(4)]:
+            future.result(5)
+        self.assertGreaterEqual(time.monotonic() - started, 0.28)
+
+        bucket = TokenBucket(rate=1, capacity=2)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertGreater(bucket.try_acquire(), 0.9)
+
+    def test_retry_with_backoff(self):
+        """可重试错误退避后重试，不可重试错误直接上抛"""
+        client = FakeClient(delay=0, failures=[TimeoutError("timed out"), RuntimeError("HTTP 429: slow down")])
+        self.assertEqual(self.scheduler.submit(client, "q").result(5), "answer:q")
+        self.assertEqual(len(client.calls), 3)
+        self.assertEqual(self.scheduler.get_stats()['retries'], 2)
+
+        client = FakeClient(delay=0, failures=[RuntimeError("API认证失败")])
+        with self.assertRaisesRegex(RuntimeError, "认证"):
+            self.scheduler.submit(client, "q").result(5)
+        self.assertEqual(len(client.calls), 1)
+
+        self.assertTrue(is_retryable(RuntimeError("Claude Code代理调用失败: 请求超时")))
+        self.assertTrue(is_retryable(RuntimeError("HTTP 503: overloaded")))
+        self.assertFalse(is_retryable(ValueError("timeout must be positive")))
+        self.assertFalse(is_retryable(RuntimeError("日志共5000行")))
+
+
+class TestSchedulerStreaming(unittest.TestCase):
+    """测试流式调用"""
+
+    def setUp(self):
+        self.scheduler = AIRequestScheduler(max_workers=1)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_stream_and_late_joiner(self):
+        """流式输出逐段到达，合并进来的调用方先补发已输出片段"""
+        client = FakeClient(delay=0.05, chunks=["a", "b", "c", "d"])
+        first = self.scheduler.stream(client, "same prompt")
+        self.assertEqual(next(first), "a")
+        self.assertEqual(next(first), "b")
+
+        second = self.scheduler.stream(client, "same prompt")
+        self.assertEqual(list(second), ["a", "b", "c", "d"])
+        self.assertEqual(list(first), ["c", "d"])
+        self.assertEqual(len(client.calls), 1)
+
+    def test_cancel_frees_worker(self):
+        """取消后后端请求中止，工作线程立即处理下一个请求"""
+        client = FakeClient(delay=2.0, chunks=["slow", "never"])
+        cancel = threading.Event()
+        stream = self.scheduler.stream(client, "slow prompt", cancel_event=cancel)
+        self.assertEqual(next(stream), "slow")
+        cancel.set()
+        self.assertEqual(list(stream), [])
+
+        fast = FakeClient(delay=0)
+        started = time.monotonic()
+        self.assertEqual(self.scheduler.submit(fast, "next").result(5), "answer:next")
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(self.scheduler.get_stats()['cancelled'], 1)
+
+    def test_cancel_while_queued(self):
+        """排队中取消的请求不会发往后端"""
+        client = FakeClient(delay=0)
+        client.gate = threading.Event()
+        blocker = self.scheduler.submit(client, "blocker")
+        queued = self.scheduler.submit(client, "queued")
+        time.sleep(0.05)
+        self.assertTrue(queued.cancel())
+        client.gate.set()
+        blocker.result(5)
+        self.scheduler.submit(client, "after").result(5)
+        self.assertEqual(client.calls, ["blocker", "after"])
+
+    def test_scheduled_client_wrapper(self):
+        """ScheduledAIClient保持AIClient接口并转发未知属性"""
+        client = FakeClient(delay=0, chunks=["x", "y"])
+        client.model = "fake"
+        scheduled = ScheduledAIClient(client, self.scheduler)
+        self.assertEqual(scheduled.ask("q"), "xy")
+        self.assertEqual(list(scheduled.ask_stream("q")), ["x", "y"])
+        self.assertEqual(scheduled.model, "fake")
+        self.assertEqual(scheduled.with_priority(PRIORITY_BATCH).priority, PRIORITY_BATCH)
+
+
+if __name__ == '__main__':
+    unittest.main()
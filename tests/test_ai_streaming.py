@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI流式输出测试
+使用本地假AI服务器（tools/fake_ai_server.py）与假claude脚本验证各后端的
+ask_stream：逐段返回、首段先于整体完成到达、取消立即断开、错误上抛
+"""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.ai_diagnosis.ai_client import AIClient, ClaudeClient, OllamaClient
+from gui.modules.ai_diagnosis.claude_code_client import ClaudeCodeHTTPClient, ClaudeCodeProxyClient
+from gui.modules.ai_diagnosis.streaming import iter_anthropic_text, iter_sse
+from tools.fake_ai_server import FakeAIServer
+
+CHUNKS = ["崩溃发生在", " [2025-09-21 13:09:49] ", "，", "原因是空指针。"]
+
+
+def _timed(iterator):
+    """返回 (片段列表, 首段到达耗时, 总耗时)"""
+    started = time.monotonic()
+    first = None
+    chunks = []
+    for chunk in iterator:
+        if first is None:
+            first = time.monotonic() - started
+        chunks.append(chunk)
+    return chunks, first, time.monotonic() - started
+
+
+class TestSSEParsing(unittest.TestCase):
+    """测试SSE解析"""
+
+    def test_events_and_multiline_data(self):
+        lines = [": keep-alive", "event: ping", "data: {}", "",
+                 "data: line1", "data: line2", "", "data:tail"]
+        self.assertEqual(list(iter_sse(lines)),
+                         [('ping', '{}'), ('message', 'line1\nline2'), ('message', 'tail')])
+
+    def test_anthropic_error_event(self):
+        events = [('content_block_delta', '{"delta": {"type": "text_delta", "text": "a"}}'),
+                  ('error', '{"error": {"message": "overloaded"}}')]
+        stream = iter_anthropic_text(events)
+        self.assertEqual(next(stream), "a")
+        with self.assertRaisesRegex(RuntimeError, "overloaded"):
+            next(stream)
+
+
+class TestHTTPStreaming(unittest.TestCase):
+    """测试基于HTTP的流式后端"""
+
+    def setUp(self):
+        self.server = FakeAIServer(chunks=CHUNKS, delay=0.1).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_ollama_stream(self):
+        """Ollama NDJSON逐段返回，首段在整体完成前到达"""
+        client = OllamaClient(model="fake", base_url=self.server.base_url)
+        chunks, first, total = _timed(client.ask_stream("为什么崩溃?"))
+
+        self.assertEqual(chunks, CHUNKS)
+        self.assertLess(first, total / 2)
+        self.assertTrue(self.server.requests[0]['body']['stream'])
+        self.assertEqual(self.server.requests[0]['body']['prompt'], "为什么崩溃?")
+
+    def test_claude_code_http_sse(self):
+        """Claude Code HTTP代理按Anthropic SSE格式解析"""
+        client = ClaudeCodeHTTPClient(base_url=self.server.base_url, timeout=5)
+        self.assertEqual(list(client.ask_stream("hi")), CHUNKS)
+        self.assertEqual(self.server.requests[0]['path'], '/v1/messages')
+
+    def test_cancel_disconnects_immediately(self):
+        """取消事件置位后阻塞中的读取立即结束，服务器端观察到断开"""
+        self.server.delay = 2.0
+        cancel = threading.Event()
+        client = OllamaClient(model="fake", base_url=self.server.base_url)
+
+        stream = client.ask_stream("hi", cancel_event=cancel)
+        self.assertEqual(next(stream), CHUNKS[0])
+        threading.Timer(0.1, cancel.set).start()
+        started = time.monotonic()
+        rest = list(stream)
+
+        self.assertEqual(rest, [])
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_http_error(self):
+        """HTTP错误状态转换为RuntimeError"""
+        self.server.status = 500
+        client = OllamaClient(model="fake", base_url=self.server.base_url)
+        with self.assertRaisesRegex(RuntimeError, "HTTP 500"):
+            list(client.ask_stream("hi"))
+
+
+class TestClientStreaming(unittest.TestCase):
+    """测试SDK后端与默认实现"""
+
+    def test_default_falls_back_to_ask(self):
+        """未实现流式的客户端一次性返回完整响应"""
+        class EchoClient(AIClient):
+            def ask(self, prompt, **kwargs):
+                return f"echo {prompt}"
+
+        self.assertEqual(list(EchoClient().ask_stream("x")), ["echo x"])
+        cancel = threading.Event()
+        cancel.set()
+        self.assertEqual(list(EchoClient().ask_stream("x", cancel_event=cancel)), [])
+
+    def test_claude_sdk_stream(self):
+        """Claude SDK流：逐段返回text_stream，取消时关闭流"""
+        closed = []
+
+        class FakeStream:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            @property
+            def text_stream(self):
+                for chunk in CHUNKS:
+                    time.sleep(0.05)
+                    yield chunk
+
+            def close(self):
+                closed.append(True)
+
+        class FakeMessages:
+            def stream(self, **kwargs):
+                self.kwargs = kwargs
+                return FakeStream()
+
+        client = ClaudeClient.__new__(ClaudeClient)
+        client.model = "fake"
+        client.client = type('FakeSDK', (), {'messages': FakeMessages()})()
+        self.assertEqual(list(client.ask_stream("hi")), CHUNKS)
+
+        cancel = threading.Event()
+        stream = client.ask_stream("hi", cancel_event=cancel)
+        next(stream)
+        cancel.set()
+        self.assertEqual(list(stream), [])
+        time.sleep(0.1)
+        self.assertTrue(closed)
+
+
+class TestClaudeCodeCLIStreaming(unittest.TestCase):
+    """测试Claude Code CLI流式输出（假claude脚本）"""
+
+    SCRIPT = '''#!{python}
+import sys, time
+prompt = sys.stdin.read()
+if "fail" in prompt:
+    sys.stderr.write("boom")
+    sys.exit(3)
+for part in ["收到", ":", prompt.strip(), "\\n结束"]:
+    sys.stdout.write(part)
+    sys.stdout.flush()
+    time.sleep({delay})
+'''
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _client(self, delay=0.1, timeout=10):
+        path = os.path.join(self.temp_dir, 'claude')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.SCRIPT.format(python=sys.executable, delay=delay))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        client = ClaudeCodeProxyClient(timeout=timeout, claude_path=path)
+        client._claude_cmd = path
+        return client
+
+    def test_stream_output(self):
+        """输出到达即返回，拼接结果与一次性调用一致"""
+        client = self._client()
+        chunks, first, total = _timed(client.ask_stream("你好"))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), "收到:你好\n结束")
+        self.assertLess(first, total / 2)
+        self.assertEqual(client.ask("你好"), "收到:你好\n结束")
+
+    def test_cancel_and_errors(self):
+        """取消结束进程；超时与非零退出码上抛"""
+        cancel = threading.Event()
+        stream = self._client(delay=2).ask_stream("hi", cancel_event=cancel)
+        self.assertEqual(next(stream), "收到")
+        cancel.set()
+        started = time.monotonic()
+        self.assertEqual(list(stream), [])
+        self.assertLess(time.monotonic() - started, 1.0)
+
+        with self.assertRaises(TimeoutError):
+            list(self._client(delay=2, timeout=0.5).ask_stream("hi"))
+        with self.assertRaisesRegex(RuntimeError, "boom"):
+            list(self._client().ask_stream("please fail"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI分析缓存测试
+验证MinHash+LSH查找与原线性扫描结果一致，索引随淘汰/失效/持久化保持同步，
+以及SQLite存储的逐条持久化、按需加载与多进程共享
+"""
+
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.ai_diagnosis import analysis_cache
+from gui.modules.ai_diagnosis.analysis_cache import AnalysisCache
+from gui.modules.ai_diagnosis.minhash_lsh import LSHIndex, MinHasher, jaccard, tokenize
+from tools.benchmark_analysis_cache import benchmark_similar_lookup, generate_queries, linear_find_similar
+
+
+class TestMinHashLSH(unittest.TestCase):
+    """测试签名与分桶索引"""
+
+    def test_signature_estimates_jaccard(self):
+        """签名相等比例接近真实Jaccard，且跨实例稳定"""
+        a = tokenize(' '.join(f"w{i}" for i in range(40)))
+        b = tokenize(' '.join(f"w{i}" for i in range(10, 50)))
+        hasher = MinHasher()
+        sig_a, sig_b = hasher.signature(a), hasher.signature(b)
+        estimate = sum(x == y for x, y in zip(sig_a, sig_b)) / hasher.num_perm
+
+        self.assertAlmostEqual(estimate, jaccard(a, b), delta=0.15)
+        self.assertEqual(MinHasher().signature(a), sig_a)
+
+    def test_index_insert_remove(self):
+        """相同签名必为候选，删除后不再返回"""
+        hasher = MinHasher()
+        index = LSHIndex()
+        sig = hasher.signature(tokenize("socket closed by peer"))
+        index.insert('a', sig)
+        index.insert('b', hasher.signature(tokenize("完全 不同 的 内容")))
+
+        self.assertIn('a', index.query(sig))
+        index.remove('a')
+        self.assertNotIn('a', index.query(sig))
+        self.assertEqual(len(index), 1)
+        self.assertGreater(index.candidate_probability(0.7), 0.999)
+
+
+class TestAnalysisCacheSimilar(unittest.TestCase):
+    """测试缓存的相似查找"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _fill(self, count, max_size=None):
+        cache = AnalysisCache(max_size=max_size or count)
+        texts = generate_queries(count, seed=7)
+        for text in texts:
+            cache.put(text, f"resp {text}")
+        return cache, texts
+
+    def test_same_result_as_linear_scan(self):
+        """各阈值下与原线性实现返回同一条目"""
+        cache, texts = self._fill(500)
+        rng = random.Random(3)
+        probes = []
+        for text in rng.sample(texts, 40):
+            words = text.split()
+            for _ in range(rng.randint(0, 4)):
+                words[rng.randrange(len(words))] = f"x{rng.randint(0, 9)}"
+            probes.append(' '.join(words))
+        probes += generate_queries(10, seed=99)
+
+        for threshold in (0.95, 0.9, 0.8, 0.7, 0.5, 0.3):
+            with self.subTest(threshold=threshold):
+                for probe in probes:
+                    self.assertIs(cache._find_similar(probe, threshold),
+                                  linear_find_similar(cache, probe, threshold))
+
+    def test_tie_prefers_least_recent(self):
+        """相似度并列时与按LRU顺序扫描一致，取最久未使用的条目"""
+        cache = AnalysisCache()
+        cache.put("alpha beta gamma delta one", "first")
+        cache.put("alpha beta gamma delta two", "second")
+        probe = "alpha beta gamma delta"
+        self.assertEqual(cache.get(probe, similarity_threshold=0.8), "first")
+
+        # 精确命中后移动到LRU末尾，并列时改选另一条
+        cache.get("alpha beta gamma delta one")
+        self.assertEqual(cache.get(probe, similarity_threshold=0.8), "second")
+
+    def test_index_follows_eviction_and_invalidate(self):
+        """LRU淘汰、失效、过期清理、清空后索引同步"""
+        cache, texts = self._fill(20, max_size=10)
+        self.assertEqual(len(cache._lsh), 10)
+        self.assertIsNone(cache._find_similar(texts[0], 0.9))
+        self.assertIsNotNone(cache._find_similar(texts[-1], 0.9))
+
+        cache.invalidate(texts[-1])
+        self.assertIsNone(cache._find_similar(texts[-1], 0.9))
+        self.assertEqual(len(cache._lsh), 9)
+
+        for entry in list(cache.cache.values())[:4]:
+            entry.timestamp = datetime.now() - timedelta(hours=48)
+        self.assertEqual(cache.cleanup_expired(24), 4)
+        self.assertEqual(len(cache._lsh), len(cache.cache))
+        self.assertEqual(set(cache._tokens), set(cache.cache))
+
+        cache.clear()
+        self.assertEqual(len(cache._lsh), 0)
+        self.assertIsNone(cache._find_similar(texts[10], 0.9))
+
+    def test_signature_persisted(self):
+        """签名随条目保存，加载后直接复用并可相似命中"""
+        cache, texts = self._fill(30)
+        path = os.path.join(self.temp_dir, 'cache.json')
+        cache.save_to_file(path)
+
+        loaded = AnalysisCache(cache_file=path)
+        original = cache.cache[cache._compute_hash(texts[5])]
+        restored = loaded.cache[original.query_hash]
+        self.assertEqual(restored.signature, original.signature)
+        self.assertEqual(loaded.get(texts[5] + " extra", similarity_threshold=0.9), f"resp {texts[5]}")
+
+    def test_benchmark_smoke(self):
+        """基准在小规模下可运行且结果与线性实现一致"""
+        result = benchmark_similar_lookup(entries=300, queries=20)
+        self.assertEqual(result['mismatches'], 0)
+        self.assertEqual(result['lsh']['hits'], result['linear']['hits'])
+        self.assertGreater(result['lsh']['hits'], 0)
+
+
+# 子进程写入脚本 (独立解释器，避免fork时继承其他测试线程持有的锁)
+_WRITER_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from gui.modules.ai_diagnosis.analysis_cache import AnalysisCache
+cache = AnalysisCache(store_path=sys.argv[2])
+for i in range(int(sys.argv[4])):
+    cache.put(f"{sys.argv[3]} query {i}", f"{sys.argv[3]} resp {i}")
+cache.close()
+"""
+
+
+class TestAnalysisCacheStore(unittest.TestCase):
+    """测试SQLite持久化存储"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = os.path.join(self.temp_dir, 'cache.db')
+        self.caches = []
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _open(self, **kwargs):
+        cache = AnalysisCache(store_path=self.db, **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def test_put_persists_and_lazy_load(self):
+        """put立即落盘；新实例启动时不加载，首次查询时加载最近条目"""
+        writer = self._open()
+        writer.put("socket closed by peer during upload", "网络断开", problem_type="网络")
+        writer.get("socket closed by peer during upload")
+
+        reader = self._open()
+        self.assertEqual(len(reader.cache), 0)
+        self.assertEqual(reader.get("socket closed by peer during upload now", similarity_threshold=0.8),
+                         "网络断开")
+        self.assertEqual(len(reader.cache), 1)
+
+        row = reader.store.get(reader._compute_hash("socket closed by peer during upload"))
+        self.assertEqual(row['problem_type'], "网络")
+        self.assertEqual(row['hit_count'], 2)
+        self.assertEqual(len(row['signature']), 128)
+
+    def test_memory_lru_backed_by_store(self):
+        """内存LRU淘汰的条目仍可从存储精确命中"""
+        cache = self._open(max_size=5)
+        for i in range(20):
+            cache.put(f"query number {i}", f"resp {i}")
+
+        self.assertEqual(len(cache.cache), 5)
+        self.assertEqual(cache.get_stats()['persisted'], 20)
+        self.assertEqual(cache.get("query number 0"), "resp 0")
+        self.assertEqual(len(cache.cache), 5)
+        self.assertEqual(list(cache.cache)[-1], cache._compute_hash("query number 0"))
+
+    def test_shared_between_windows(self):
+        """两个实例共享存储：写入、失效、过期清理对另一方可见"""
+        a, b = self._open(), self._open()
+        a.put("内存泄漏分析 Activity", "Activity未释放")
+        self.assertEqual(b.get("内存泄漏分析 Activity"), "Activity未释放")
+
+        b.invalidate("内存泄漏分析 Activity")
+        self.assertIsNone(a.store.get(a._compute_hash("内存泄漏分析 Activity")))
+
+        a.put("old query", "old")
+        a.cache[a._compute_hash("old query")].timestamp -= timedelta(hours=48)
+        a.store.put(a.cache[a._compute_hash("old query")])
+        self.assertEqual(b.cleanup_expired(24), 1)
+        self.assertEqual(a.store.count(), 0)
+
+    def test_concurrent_writers(self):
+        """多线程与多进程并发写入不丢条目"""
+        cache = self._open()
+        threads = [threading.Thread(target=lambda t=t: [cache.put(f"thread {t} q {i}", "r") for i in range(30)])
+                   for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        processes = [subprocess.Popen([sys.executable, '-c', _WRITER_SCRIPT, project_root, self.db, f"proc{n}", "30"])
+                     for n in range(2)]
+        for process in processes:
+            self.assertEqual(process.wait(60), 0)
+
+        self.assertEqual(cache.store.count(), 180)
+        self.assertEqual(cache.get("proc1 query 29"), "proc1 resp 29")
+
+    def test_export_import_and_legacy_migration(self):
+        """JSON导出/导入保留，旧JSON缓存在全局存储为空时迁移一次"""
+        cache = self._open(max_size=3)
+        for i in range(6):
+            cache.put(f"export query {i}", f"resp {i}")
+        legacy = os.path.join(self.temp_dir, 'legacy.json')
+        cache.save_to_file(legacy)
+        with open(legacy, encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)['entries']), 6)
+
+        saved = analysis_cache._global_cache
+        analysis_cache._global_cache = None
+        try:
+            migrated = analysis_cache.get_global_cache(
+                cache_file=legacy, store_path=os.path.join(self.temp_dir, 'global.db'))
+            self.caches.append(migrated)
+            self.assertEqual(migrated.store.count(), 6)
+            self.assertEqual(migrated.get("export query 1"), "resp 1")
+            self.assertTrue(os.path.exists(legacy + '.migrated'))
+        finally:
+            analysis_cache._global_cache = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code常驻进程测试
+使用按stream-json协议应答的假claude脚本验证单次请求互不共享对话、多轮对话复用进程、
+超时后重建、上下文文件引用，以及不支持常驻协议时回退为单次调用
+"""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.ai_diagnosis.claude_code_client import ClaudeCodeProxyClient
+from gui.modules.ai_diagnosis.claude_code_worker import (
+    STREAM_JSON_ARGS,
+    ClaudeCodeWorkerPool,
+)
+
+# 按stream-json协议逐行应答的假claude：回复中带进程号与进程内已收到的轮次（对话长度）
+STREAM_SCRIPT = '''#!{python}
+import json, os, sys, time
+print(json.dumps({{"type": "system", "subtype": "init"}}), flush=True)
+turns = 0
+for line in sys.stdin:
+    turns += 1
+    text = json.loads(line)["message"]["content"][0]["text"]
+    if "slow" in text:
+        time.sleep(5)
+    if "fail" in text:
+        print(json.dumps({{"type": "result", "is_error": True, "result": "bad request"}}), flush=True)
+        continue
+    parts = ["pid=%d" % os.getpid(), " turn=%d" % turns, " len=%d" % len(text)]
+    for path in [l[2:] for l in text.splitlines() if l.startswith("- ")]:
+        parts.append(" file=%d" % os.path.getsize(path))
+    for part in parts:
+        event = {{"type": "content_block_delta", "delta": {{"type": "text_delta", "text": part}}}}
+        print(json.dumps({{"type": "stream_event", "event": event}}), flush=True)
+    print(json.dumps({{"type": "assistant", "message": {{"content": [{{"type": "text", "text": "".join(parts)}}]}}}}), flush=True)
+    print(json.dumps({{"type": "result", "is_error": False, "result": "".join(parts)}}), flush=True)
+'''
+
+# 只支持单次调用的旧版假claude：读完stdin后输出纯文本
+ONESHOT_SCRIPT = '''#!{python}
+import sys
+if "--input-format" in sys.argv:
+    sys.stderr.write("unknown option --input-format")
+    sys.exit(1)
+sys.stdout.write("oneshot:" + sys.stdin.read().strip())
+'''
+
+
+class _ScriptMixin:
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _script(self, template):
+        path = os.path.join(self.temp_dir, 'claude')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(template.format(python=sys.executable))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+
+class TestWorkerPool(_ScriptMixin, unittest.TestCase):
+    """测试常驻进程池"""
+
+    def _pool(self, **kwargs):
+        path = self._script(STREAM_SCRIPT)
+        pool = ClaudeCodeWorkerPool(lambda ctx: [path, '-p', '--add-dir', ctx, *STREAM_JSON_ARGS], **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_requests_do_not_share_conversation(self):
+        """单次请求各自使用全新进程，第二个请求不带之前的轮次；替补进程提前预热"""
+        pool = self._pool(size=1)
+        answers = [pool.ask("hello", timeout=10) for _ in range(3)]
+        self.assertEqual([answer.split()[1] for answer in answers], ["turn=1"] * 3)
+        self.assertEqual(len({answer.split()[0] for answer in answers}), 3)
+        self.assertEqual(pool.stats['retired'], 3)
+        self.assertEqual(pool.health_check()['idle'], 1)
+        self.assertTrue(pool.responded)
+
+    def test_conversation_keeps_turns(self):
+        """显式对话的各轮固定在同一进程上，关闭后进程不再复用"""
+        pool = self._pool(size=1)
+        with pool.conversation(timeout=10) as conversation:
+            first = conversation.ask("hello", timeout=10)
+            second = conversation.ask("again", timeout=10)
+        self.assertEqual(first.split()[1], "turn=1")
+        self.assertEqual(second.split()[:2], [first.split()[0], "turn=2"])
+        self.assertEqual(conversation.turns, 2)
+
+        answer = pool.ask("hi", timeout=10)
+        self.assertNotEqual(answer.split()[0], first.split()[0])
+        self.assertEqual(answer.split()[1], "turn=1")
+
+    def test_stream_chunks_and_error(self):
+        """增量文本逐段返回；错误结果上抛，后续请求不受影响"""
+        pool = self._pool(size=1)
+        chunks = list(pool.stream("hi", timeout=10))
+        self.assertEqual(len(chunks), 3)
+        with self.assertRaisesRegex(RuntimeError, "bad request"):
+            pool.ask("please fail", timeout=10)
+        self.assertEqual(pool.ask("hi", timeout=10).split()[1], "turn=1")
+
+    def test_timeout_recycles_worker(self):
+        """超时结束进程，下一个请求使用新进程"""
+        pool = self._pool(size=1)
+        first = pool.ask("hi", timeout=10).split()[0]
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            pool.ask("slow", timeout=0.5)
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertNotEqual(pool.ask("hi", timeout=10).split()[0], first)
+        self.assertEqual(pool.stats['recycled'], 1)
+
+    def test_concurrent_requests_bounded(self):
+        """并发请求最多占用size个进程，每个请求都是全新对话"""
+        pool = self._pool(size=2)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(pool.ask("hi", timeout=10)))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(len(results), 6)
+        self.assertEqual({r.split()[1] for r in results}, {"turn=1"})
+        status = pool.health_check()
+        self.assertEqual(status['busy'], 0)
+        self.assertLessEqual(status['idle'], 2)
+
+    def test_context_by_file_reference(self):
+        """上下文文件与超长提示词以路径传递，请求结束后删除"""
+        pool = self._pool(size=1, inline_limit=1000)
+        log_path = os.path.join(self.temp_dir, 'big.log')
+        with open(log_path, 'w', encoding='utf-8') as f:
+            f.write("x" * 50000)
+
+        answer = pool.ask("分析日志", context_files=[log_path], timeout=10)
+        self.assertIn("file=50000", answer)
+        self.assertLess(int(answer.split("len=")[1].split()[0]), 500)
+
+        answer = pool.ask("y" * 5000, timeout=10)
+        self.assertIn("file=5000", answer)
+        self.assertEqual(os.listdir(pool.context_dir), [])
+        self.assertTrue(os.path.exists(log_path))
+
+
+class TestProxyClientPersistent(_ScriptMixin, unittest.TestCase):
+    """测试代理客户端的常驻模式"""
+
+    def _client(self, template):
+        path = self._script(template)
+        client = ClaudeCodeProxyClient(timeout=10, claude_path=path, persistent=True, pool_size=1)
+        client._claude_cmd = path
+        self.addCleanup(client.close)
+        return client
+
+    def test_persistent_mode(self):
+        """常驻模式下每次提问都是全新对话，下一个进程已提前预热"""
+        client = self._client(STREAM_SCRIPT)
+        first = client.ask("hi")
+        second = client.ask("hi")
+        self.assertEqual([first.split()[1], second.split()[1]], ["turn=1", "turn=1"])
+        self.assertNotEqual(first.split()[0], second.split()[0])
+        self.assertEqual(client.health_check()['idle'], 1)
+
+    def test_fallback_to_oneshot(self):
+        """CLI不支持stream-json时回退为单次调用并关闭常驻模式"""
+        client = self._client(ONESHOT_SCRIPT)
+        self.assertEqual(client.ask("hi"), "oneshot:hi")
+        self.assertFalse(client.persistent)
+        self.assertEqual(''.join(client.ask_stream("again")), "oneshot:again")
+
+
+if __name__ == '__main__':
+    unittest.main()
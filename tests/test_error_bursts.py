@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间直方图与错误突增检测测试
+验证每秒/每分钟直方图、EWMA突增检测、跳转位置与突增窗口上下文提取
+"""
+
+import math
+import os
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntry, LogEntryList, parse_timestamp_value
+from gui.modules.error_bursts import (
+    EWMADetector,
+    TimeHistogram,
+    detect_error_bursts,
+    timestamp_column,
+)
+from gui.modules.log_display import build_display_items
+from gui.modules.ai_diagnosis.log_navigator import LogNavigator
+from gui.modules.ai_diagnosis.smart_context_extractor import SmartContextExtractor
+
+from log_fixtures import mars_entry
+
+
+def _session(burst_at=None, seconds: int = 600) -> list:
+    """每秒4条日志，每20秒一条零星错误；burst_at起5秒内Net模块每秒8条错误"""
+    entries = []
+    for second in range(seconds):
+        for k in range(4):
+            level = 'E' if k == 0 and second % 20 == 0 else 'I'
+            entries.append(mars_entry(second, "UI", f"frame {second}-{k}", level, millis=k * 200))
+        if burst_at is not None and burst_at <= second < burst_at + 5:
+            for k in range(8):
+                entries.append(mars_entry(second, "Net", f"request {k} timeout", 'E', millis=900 + k))
+    return entries
+
+
+class TestTimeHistogram(unittest.TestCase):
+    """测试时间直方图"""
+
+    def test_timestamp_column(self):
+        """同一秒内复用解析结果；无时间戳的行沿用上一条时间"""
+        entries = [mars_entry(1, "UI", "a", millis=5), mars_entry(1, "UI", "b", millis=250),
+                   LogEntry("    at Foo.bar()", "a.log"), mars_entry(2, "UI", "c")]
+        column = timestamp_column([LogEntry("orphan line", "a.log")] + entries)
+        self.assertTrue(math.isnan(column[0]))
+        for value, entry in zip(column[1:], entries):
+            expected = parse_timestamp_value(entry.timestamp) if entry.timestamp else column[2]
+            self.assertAlmostEqual(value, expected, places=6)
+
+    def test_counts(self):
+        """每秒级别计数、每分钟模块计数与错误位置"""
+        entries = _session(burst_at=101, seconds=180)
+        histogram = TimeHistogram(entries)
+
+        self.assertEqual(len(histogram), 180)
+        self.assertTrue(histogram.monotonic)
+        self.assertEqual(sum(histogram.total), len(entries))
+        self.assertEqual(histogram.errors()[101], 8)
+        self.assertEqual(histogram.errors()[20], 1)
+        self.assertEqual(list(histogram.errors(60)), [3 + 0, 3 + 40, 3])
+        self.assertEqual(list(histogram.module_errors["Net"]), [0, 40, 0])
+        self.assertEqual(histogram.level_counts("INFO", 60)[0], 60 * 4 - 3)
+
+        first, last = histogram.error_positions(101, 105)
+        self.assertEqual(entries[first].content.strip(), "request 0 timeout")
+        self.assertEqual(entries[last].content.strip(), "request 7 timeout")
+
+        start = histogram.bucket_time(101)
+        lo, hi = histogram.entry_range(start, start + 1)
+        self.assertEqual(hi - lo, 12)
+
+    def test_of_cache(self):
+        """会话列表复用直方图，追加或中间条目修改后重建；普通列表不缓存"""
+        entries = LogEntryList(_session(seconds=30))
+        histogram = TimeHistogram.of(entries)
+        self.assertIs(TimeHistogram.of(entries), histogram)
+        entries.append(mars_entry(31, "UI", "late"))
+        appended = TimeHistogram.of(entries)
+        self.assertIsNot(appended, histogram)
+        self.assertIs(TimeHistogram.of(entries), appended)
+
+        entries[60] = mars_entry(15, "Net", "timeout", 'E')
+        rebuilt = TimeHistogram.of(entries)
+        self.assertIsNot(rebuilt, appended)
+        self.assertEqual(sum(rebuilt.errors()), sum(1 for e in entries if e.level == 'ERROR'))
+
+        plain = _session(seconds=30)
+        self.assertIsNot(TimeHistogram.of(plain), TimeHistogram.of(plain))
+
+
+class TestBurstDetection(unittest.TestCase):
+    """测试错误突增检测"""
+
+    def test_ewma_detector(self):
+        """平稳序列不报警，突增报警"""
+        detector = EWMADetector(alpha=0.1, threshold=4.0, min_count=5)
+        flags = [detector.update(value)[0] for value in [1, 0, 1, 0, 1, 0, 1, 0, 1, 0]]
+        self.assertFalse(any(flags))
+        anomalous, z = detector.update(12)
+        self.assertTrue(anomalous)
+        self.assertGreater(z, 4.0)
+
+    def test_detects_burst(self):
+        """检测到突增，给出跳转位置与模块；零星错误不报警"""
+        self.assertEqual(detect_error_bursts(_session()), [])
+
+        entries = _session(burst_at=301)
+        bursts = detect_error_bursts(entries)
+        self.assertEqual(len(bursts), 1)
+        burst = bursts[0]
+        self.assertEqual(burst.errors, 40)
+        self.assertEqual(burst.duration, 5.0)
+        self.assertEqual(burst.top_modules[0], ("Net", 40))
+        self.assertEqual(entries[burst.first_error_index].module, "Net")
+        self.assertEqual(burst.start_label, "2025-10-11 +8.0 10:05:01.900")
+        self.assertEqual(burst.to_dict()['line'], burst.first_error_index + 1)
+
+        minute_bursts = detect_error_bursts(entries, bucket_seconds=60)
+        self.assertEqual(len(minute_bursts), 1)
+        self.assertEqual(minute_bursts[0].duration, 60.0)
+
+    def test_burst_line_in_filtered_view(self):
+        """突增位置（会话列表索引）经显示行换算为过滤后视图中的控件行号"""
+        entries = _session(burst_at=301)
+        burst = detect_error_bursts(entries)[0]
+        errors = [e for e in entries if e.level == 'ERROR']
+        navigator = LogNavigator(object(), entries_provider=lambda: build_display_items(errors)[1])
+
+        first_error = entries[burst.first_error_index]
+        line = navigator.line_of_entry(first_error)
+        self.assertEqual(line, errors.index(first_error) + 1)
+        self.assertNotEqual(line, burst.first_error_index + 1)
+        self.assertIsNone(navigator.line_of_entry(entries[1]))
+
+    def test_burst_contexts(self):
+        """只为突增窗口提取上下文"""
+        entries = _session(burst_at=201)
+        bursts = detect_error_bursts(entries)
+        contexts = SmartContextExtractor(entries).extract_burst_contexts(bursts, max_tokens=4000)
+
+        self.assertEqual(len(contexts), 1)
+        self.assertIs(contexts[0]['burst'], bursts[0])
+        self.assertIs(contexts[0]['target'], entries[bursts[0].first_error_index])
+        self.assertGreater(len(contexts[0]['context_before']), 0)
+        self.assertEqual(SmartContextExtractor(entries).extract_burst_contexts([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问题链路图布局测试
+验证分层、去环、跨层边折点、交叉最小化、布局缓存与可见区域查询
+"""
+
+import os
+import random
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.ai_diagnosis.graph_layout import (
+    LAYER_SPACING,
+    SpatialIndex,
+    cached_layout,
+    compute_layout,
+    count_crossings,
+    get_layout,
+)
+
+
+class TestLayeredLayout(unittest.TestCase):
+    """测试分层布局"""
+
+    def test_layers_follow_edges(self):
+        """根节点在第0层,连线总是指向更深的层"""
+        graph = {0: [1, 2], 1: [3], 2: [4], 3: [], 4: [], 5: [0]}
+        layout = compute_layout(graph)
+        self.assertEqual(layout.layers[0], [5])
+        self.assertEqual(sorted(layout.layers[1]), [0])
+        for u, related in graph.items():
+            for v in related:
+                self.assertLess(layout.positions[u][1], layout.positions[v][1])
+
+    def test_cycles_and_long_edges(self):
+        """环中的回边反向后分层;跨层边带中间折点"""
+        graph = {0: [1], 1: [2], 2: [0, 3], 3: [], 9: [7]}
+        layout = compute_layout(graph)
+        self.assertEqual(len(layout.reversed_edges), 1)
+        self.assertEqual(len(layout.positions), len(graph))
+        self.assertEqual(len(layout.edges), 4)  # 指向不存在节点的连接被忽略
+
+        layout = compute_layout({0: [1, 3], 1: [2], 2: [3], 3: []})
+        long_edge = next(points for u, v, points in layout.edges if (u, v) == (0, 3))
+        self.assertEqual(len(long_edge), 4)
+        self.assertEqual(long_edge[0], layout.positions[0])
+        self.assertEqual(long_edge[-1], layout.positions[3])
+        self.assertEqual(long_edge[1][1] - long_edge[0][1], LAYER_SPACING)
+
+    def test_crossing_minimization(self):
+        """交错连接的两层重新排序后没有交叉"""
+        self.assertEqual(count_crossings([0, 1], [2, 3], [(0, 3), (1, 2)]), 1)
+        self.assertEqual(count_crossings([0, 1, 2], [3, 4, 5], [(0, 5), (1, 4), (2, 3)]), 3)
+
+        graph = {0: [13], 1: [12], 2: [11], 3: [10], 10: [], 11: [], 12: [], 13: []}
+        self.assertEqual(compute_layout(graph).crossings, 0)
+
+        random.seed(7)
+        graph = {i: random.sample(range(60), 2) for i in range(60)}
+        layout = compute_layout(graph)
+        self.assertEqual(len(layout.positions), 60)
+        self.assertEqual(len({position for position in layout.positions.values()}), 60)
+
+    def test_cache(self):
+        """同一图结构复用布局"""
+        graph = {100: [101], 101: [102], 102: []}
+        self.assertIsNone(cached_layout(graph))
+        layout = get_layout(graph)
+        self.assertIs(cached_layout({100: [101], 101: [102], 102: []}), layout)
+        self.assertIsNone(cached_layout({100: [101, 102], 101: [102], 102: []}))
+
+
+class TestSpatialIndex(unittest.TestCase):
+    """测试可见区域查询"""
+
+    def test_query_visible(self):
+        """只返回与视口相交的节点与连线"""
+        graph = {i: [i + 1] for i in range(50)}
+        graph[50] = []
+        layout = compute_layout(graph)
+        index = SpatialIndex.for_layout(layout, node_radius=40, cell_size=300)
+
+        visible = index.query((0, 0, 800, 400))
+        nodes = {key for kind, key in visible if kind == 'node'}
+        self.assertEqual(nodes, {0, 1, 2})
+        self.assertIn(('edge', 0), visible)
+        self.assertNotIn(('edge', 10), visible)
+        self.assertEqual(index.query((-500, -500, -400, -400)), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
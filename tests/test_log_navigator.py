@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志导航器模式搜索测试
+验证在全部显示行上按正则搜索、只高亮可见行、跳转历史，
+以及过滤与崩溃分组后条目到控件行号的换算
+"""
+
+import os
+import re
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntry
+from gui.modules.log_display import build_display_items
+from gui.modules.ai_diagnosis.log_navigator import LogNavigator
+
+from log_fixtures import mars_entry
+
+
+class FakeLazyText:
+    """模拟懒加载日志控件：只记录标签、光标与可见范围"""
+
+    def __init__(self, loaded: int, visible=(1, 20)):
+        self.current_index = loaded
+        self.visible = visible
+        self.tags = {}
+        self.insert_line = 1
+
+    def tag_config(self, tagname, **kwargs):
+        pass
+
+    def tag_add(self, tagname, start, end):
+        self.tags.setdefault(tagname, set()).add(int(start.split('.')[0]))
+
+    def tag_remove(self, tagname, start, end):
+        if start == "1.0":
+            self.tags.pop(tagname, None)
+        else:
+            self.tags.get(tagname, set()).discard(int(start.split('.')[0]))
+
+    def load_until(self, count):
+        self.current_index = max(self.current_index, count)
+
+    def see(self, index):
+        line = int(index.split('.')[0])
+        self.visible = (max(1, line - 10), line + 10)
+
+    def mark_set(self, name, index):
+        self.insert_line = int(index.split('.')[0])
+
+    def index(self, index):
+        return f"{self.insert_line}.0"
+
+    def after(self, ms, func):
+        pass
+
+    def after_idle(self, func):
+        func()
+
+    def visible_line_range(self):
+        return self.visible[0], min(self.visible[1], self.current_index)
+
+
+def _entries(count: int = 1000) -> list:
+    entries = []
+    for i in range(count):
+        text = f"request {i} timeout" if i % 100 == 7 else f"request {i} ok"
+        entries.append(mars_entry(i % 60, "Net", text))
+    return entries
+
+
+class TestPatternSearch(unittest.TestCase):
+    """测试模式搜索"""
+
+    def setUp(self):
+        self.entries = _entries()
+        self.widget = FakeLazyText(loaded=100)
+        self.navigator = LogNavigator(self.widget, self.entries)
+
+    def test_searches_all_entries(self):
+        """搜索不限于已加载的行，每条日志只计一次"""
+        lines = self.navigator.find_logs_by_pattern(r"time\w+")
+        self.assertEqual(lines, [i + 1 for i in range(7, 1000, 100)])
+        self.assertEqual(self.navigator.find_entries_by_pattern(r"^\[I\].*request 99\d "), list(range(990, 1000)))
+        self.assertEqual(self.navigator.find_entries_by_pattern("TIMEOUT", re.IGNORECASE), list(range(7, 1000, 100)))
+        self.assertEqual(self.navigator.find_logs_by_pattern("(unclosed"), [])
+
+    def test_highlights_only_visible(self):
+        """只高亮可见范围内的匹配行，滚动后更新"""
+        self.navigator.find_logs_by_pattern("timeout")
+        self.assertEqual(self.widget.tags["related_log"], {8})
+
+        self.widget.load_until(200)
+        self.widget.visible = (100, 120)
+        self.navigator.highlight_visible_matches()
+        self.assertEqual(self.widget.tags["related_log"], {108})
+
+        self.navigator.clear_search()
+        self.assertEqual(self.widget.tags["related_log"], set())
+
+    def test_match_navigation_keeps_history(self):
+        """依次跳转到搜索结果，加载目标行，可后退/前进"""
+        self.navigator.find_logs_by_pattern("timeout")
+        self.assertTrue(self.navigator.next_match())
+        self.assertEqual(self.widget.insert_line, 8)
+        self.assertTrue(self.navigator.next_match())
+        self.assertEqual(self.widget.insert_line, 108)
+        self.assertTrue(self.navigator.next_match())
+        self.assertEqual(self.widget.insert_line, 208)
+        self.assertGreaterEqual(self.widget.current_index, 208)
+        self.assertIn(208, self.widget.tags["related_log"])
+
+        self.assertTrue(self.navigator.go_back())
+        self.assertEqual(self.widget.insert_line, 108)
+        self.assertTrue(self.navigator.go_forward())
+        self.assertEqual(self.widget.insert_line, 208)
+
+        self.assertTrue(self.navigator.previous_match())
+        self.assertEqual(self.widget.insert_line, 108)
+
+    def test_follows_reloaded_entries(self):
+        """日志重新加载后按新列表搜索"""
+        current = {'entries': self.entries}
+        navigator = LogNavigator(self.widget, entries_provider=lambda: current['entries'])
+        self.assertEqual(len(navigator.find_entries_by_pattern("timeout")), 10)
+
+        current['entries'] = _entries(200)
+        self.assertEqual(navigator.find_entries_by_pattern("timeout"), [7, 107])
+
+
+def _crash_session() -> list:
+    """含崩溃分组、堆栈、Crash模块附属日志与多行日志的会话"""
+    crash = mars_entry(10, 'Crash', "uncaught exception NSRangeException", 'E')
+    crash.is_crash, crash.level = True, 'CRASH'
+    stack = LogEntry("0   CoreFoundation  0x0000000180 __exceptionPreprocess + 164", "a.log")
+    report = mars_entry(11, 'Crash', "crash report saved")
+    multi = mars_entry(12, 'DB', "open failed", 'E')
+    multi.raw_line += "\nsqlite: disk I/O error"
+    entries = [mars_entry(i, 'Net', f"request {i} ok") for i in range(10)]
+    entries += [crash, stack, report, multi]
+    entries += [mars_entry(13 + i, 'Net', f"request {13 + i} timeout", 'E' if i % 2 else 'I') for i in range(6)]
+    return entries
+
+
+class TestDisplayedRows(unittest.TestCase):
+    """测试过滤、分组后的行号换算"""
+
+    def test_filtered_lines(self):
+        """过滤后搜索与跳转返回实际显示的控件行号"""
+        entries = _crash_session()
+        filtered = [e for e in entries if e.level in ('ERROR', 'CRASH') or e.module == 'Crash']
+        log_data, rows = build_display_items(filtered)
+        self.assertEqual(len(log_data), len(rows))
+
+        # 渲染文本逐行对应
+        rendered = "".join(item.get('prefix', '') + item['text'] for item in log_data).split("\n")
+        widget = FakeLazyText(loaded=len(log_data), visible=(1, 50))
+        navigator = LogNavigator(widget, entries_provider=lambda: rows)
+
+        # 崩溃(1) + 堆栈(2)；附属日志合并到崩溃行；多行日志占3-4行；之后每条一行
+        lines = navigator.find_logs_by_pattern("timeout")
+        self.assertEqual(lines, [5, 6, 7])
+        for line in lines:
+            self.assertIn("timeout", rendered[line - 1])
+        self.assertEqual(navigator.find_logs_by_pattern("disk I/O"), [3])
+        self.assertIn("sqlite: disk I/O error", rendered[4 - 1])
+        self.assertEqual(navigator.find_logs_by_pattern(r"\[CRASH\]"), [1])
+
+        self.assertEqual(navigator.line_of_entry(entries[12]), 1)
+        self.assertIsNone(navigator.line_of_entry(entries[0]))
+        self.assertTrue(navigator.jump_to_log_entry(entries[17]))
+        self.assertEqual(widget.insert_line, 6)
+        self.assertIn("request 16 timeout", rendered[widget.insert_line - 1])
+        self.assertFalse(navigator.jump_to_log_entry(entries[16]))
+
+    def test_follows_redisplay(self):
+        """重新显示（如更换过滤条件）后按新的显示行搜索"""
+        entries = _crash_session()
+        current = {'rows': build_display_items(entries)[1]}
+        navigator = LogNavigator(FakeLazyText(loaded=30), entries_provider=lambda: current['rows'])
+        self.assertEqual(navigator.find_logs_by_pattern("request 16 timeout"), [18])
+
+        current['rows'] = build_display_items([e for e in entries if e.level == 'ERROR'])[1]
+        self.assertEqual(navigator.find_logs_by_pattern("request 16 timeout"), [4])
+
+    def test_reloads_before_search(self):
+        """连续重新显示两次后再搜索，不复用已释放的显示行的索引"""
+        current = {'rows': build_display_items([mars_entry(0, 'Net', "alpha"), mars_entry(1, 'Net', "beta")])[1]}
+        navigator = LogNavigator(FakeLazyText(loaded=2), entries_provider=lambda: current['rows'])
+        self.assertEqual(navigator.find_entries_by_pattern("alpha"), [0])
+
+        for texts in (("x", "y"), ("gamma", "delta")):
+            current['rows'] = build_display_items([mars_entry(i, 'Net', text) for i, text in enumerate(texts)])[1]
+            navigator._rows()
+        self.assertEqual(navigator.find_entries_by_pattern("alpha"), [])
+        self.assertEqual(navigator.find_entries_by_pattern("gamma"), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+问答日志检索测试
+验证BM25排序、级别与时间加权、token预算，以及交互式问答对检索结果的使用
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntryList
+from gui.modules.log_indexer import LogIndexer
+from gui.modules.ai_diagnosis.log_retriever import LogRetriever
+from gui.modules.ai_diagnosis.smart_compressor import estimate_tokens
+from gui.modules.ai_diagnosis.token_optimizer import TokenOptimizer
+
+from log_fixtures import mars_entry, render_session
+
+
+class TestLogIndexerBM25(unittest.TestCase):
+    """测试索引器的BM25打分"""
+
+    def test_rare_terms_rank_higher(self):
+        """同时命中多个词、命中稀有词的行分数更高"""
+        entries = render_session()
+        entries[5] = mars_entry(2 * 60 + 30, "Net", "socket timeout while login")
+        entries[9] = mars_entry(4 * 60 + 30, "Net", "socket connected")
+        indexer = LogIndexer(index_trigrams=False)
+        indexer.build_index(entries)
+
+        scores = indexer.bm25_scores(["socket", "timeout", "render"])
+        self.assertGreater(scores[5], scores[9])
+        self.assertGreater(scores[9], scores[0])
+        self.assertEqual(indexer.bm25_scores(["missing"]), {})
+        self.assertEqual(len(indexer.doc_lengths), len(entries))
+
+    def test_trigrams_optional(self):
+        """关闭Trigram索引时词索引与搜索不受影响"""
+        entries = render_session()
+        indexer = LogIndexer(index_trigrams=False)
+        indexer.build_index(entries)
+        self.assertEqual(indexer.trigram_index, {})
+        self.assertEqual(len(indexer.search("frame")), len(entries))
+
+
+class TestLogRetriever(unittest.TestCase):
+    """测试相关日志检索"""
+
+    def test_level_boost(self):
+        """内容相同时错误级别排在前面"""
+        entries = render_session()
+        entries[10] = mars_entry(5 * 60, "Net", "request timeout", level='I')
+        entries[40] = mars_entry(20 * 60, "Net", "request timeout", level='E')
+        lines = LogRetriever(entries).retrieve("timeout", token_budget=30)
+        self.assertEqual([line.line_number for line in lines], [40])
+
+    def test_time_anchor(self):
+        """问题中提到的时间附近的行优先"""
+        entries = render_session()
+        entries[4] = mars_entry(2 * 60, "Net", "request timeout")
+        entries[50] = mars_entry(25 * 60, "Net", "request timeout")
+        lines = LogRetriever(entries).retrieve("10:25 为什么 timeout", token_budget=30)
+        self.assertEqual([line.line_number for line in lines], [50])
+
+        # 没有提到时间时以崩溃时间为锚点（新列表，避免复用上面建立的索引）
+        entries = entries[:52] + [mars_entry(26 * 60, "Crash", "signal 11 received", level='F')] + entries[53:]
+        lines = LogRetriever(entries).retrieve("request timeout", token_budget=30)
+        self.assertEqual([line.line_number for line in lines], [50])
+
+    def test_chinese_expansion_and_budget(self):
+        """中文问题词扩展为英文检索词；结果按行号排序且不超出预算"""
+        entries = render_session()
+        for i in range(0, 60, 3):
+            entries[i] = mars_entry((i // 2) * 60, "Net", f"http connection reset code={i}", level='E')
+        retriever = LogRetriever(entries)
+        self.assertIn("connection", retriever.query_terms("网络为什么断开"))
+
+        lines = retriever.retrieve("网络为什么断开", token_budget=60)
+        self.assertGreater(len(lines), 0)
+        self.assertLess(len(lines), 20)
+        self.assertLessEqual(sum(estimate_tokens(line.text) + 1 for line in lines), 60)
+        self.assertEqual([line.line_number for line in lines], sorted(line.line_number for line in lines))
+        self.assertTrue(all(line.entry.module == "Net" for line in lines))
+        self.assertEqual(retriever.retrieve("你好", token_budget=60), [])
+
+    def test_aligned_indexer_reused(self):
+        """与列表对齐的索引器直接复用，不对齐时单独建立"""
+        entries = render_session()
+        indexer = LogIndexer()
+        indexer.build_index(entries)
+        self.assertIs(LogRetriever(entries, indexer)._ensure_index(), indexer)
+
+        shorter = LogEntryList(entries[:10])
+        retriever = LogRetriever(shorter, indexer)
+        self.assertIsNot(retriever._ensure_index(), indexer)
+        self.assertIs(LogRetriever(shorter)._ensure_index(), retriever.indexer)
+
+    def test_private_index_follows_list_changes(self):
+        """单独建立的索引缓存在会话列表上，中间条目修改后重新建立；普通列表不缓存"""
+        entries = LogEntryList(render_session())
+        first = LogRetriever(entries)._ensure_index()
+        self.assertIs(LogRetriever(entries)._ensure_index(), first)
+
+        entries[30] = mars_entry(15 * 60, "Net", "socket timeout", 'E')
+        rebuilt = LogRetriever(entries)._ensure_index()
+        self.assertIsNot(rebuilt, first)
+        lines = LogRetriever(entries).retrieve("socket timeout", token_budget=500)
+        self.assertEqual(lines[0].line_number, 30)
+
+        plain = render_session()
+        self.assertIsNot(LogRetriever(plain)._ensure_index(), LogRetriever(plain)._ensure_index())
+
+
+class TestInteractiveQA(unittest.TestCase):
+    """测试交互式问答提示词"""
+
+    def test_retrieved_lines_in_prompt(self):
+        """命中时提示词包含相关日志；无命中时退回整体压缩"""
+        entries = render_session()
+        entries[33] = mars_entry(16 * 60 + 30, "Pay", "payment order 42 rejected by gateway", level='E')
+        optimizer = TokenOptimizer("gpt-4")
+
+        optimized = optimizer.optimize_for_interactive_qa(entries, "支付为什么失败")
+        self.assertEqual(optimized.template_name, "interactive_qa_retrieval")
+        self.assertIn("#34 [10:16:30.000] ERROR @Pay: payment order 42 rejected", optimized.prompt)
+        self.assertIn("支付为什么失败", optimized.prompt)
+
+        fallback = optimizer.optimize_for_interactive_qa(entries, "你好")
+        self.assertEqual(fallback.template_name, "interactive_qa_compact")
+
+
+if __name__ == '__main__':
+    unittest.main()
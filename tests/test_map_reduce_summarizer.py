@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段摘要 (map-reduce) 测试
+验证按时间窗口/模块切分、摘要并行执行与缓存复用、分层合并与取消
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntry
+from gui.modules.ai_diagnosis.ai_client import AIClient
+from gui.modules.ai_diagnosis.ai_scheduler import AIRequestScheduler
+from gui.modules.ai_diagnosis.analysis_cache import AnalysisCache
+from gui.modules.ai_diagnosis.map_reduce_summarizer import (
+    SPLIT_BY_MODULE,
+    MapReduceSummarizer,
+    split_by_module,
+    split_by_time,
+)
+from gui.modules.ai_diagnosis.token_optimizer import TokenOptimizer
+
+from log_fixtures import mars_entry
+
+
+def _session(minutes: int = 60) -> list:
+    modules = ["Net", "DB", "UI", "Player"]
+    entries = []
+    for minute in range(minutes):
+        for second in (0, 20, 40):
+            module = modules[(minute + second) % len(modules)]
+            entries.append(mars_entry(minute * 60 + second, module,
+                                      f"{module} request {minute}-{second} failed code={minute}", level='E'))
+    return entries
+
+
+class FakeSummaryClient(AIClient):
+    """按提示词类型返回固定摘要的假客户端"""
+
+    def __init__(self, gate=None):
+        self.prompts = []
+        self.gate = gate
+        self._lock = threading.Lock()
+
+    def ask(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if prompt.startswith("提取以下日志片段"):
+            label = prompt.split("片段: ", 1)[1].split("）", 1)[0]
+            return f"片段摘要 {label} " + "事实" * 40
+        if prompt.startswith("合并以下"):
+            return "合并摘要 " + "事实" * 20
+        return "最终回答"
+
+
+class TestSplit(unittest.TestCase):
+    """测试会话切分"""
+
+    def test_split_by_time(self):
+        """等长时间窗口切分，保持顺序，无时间戳的行跟随前一条"""
+        entries = _session(60)
+        entries.insert(10, LogEntry("    at Net.retry()", "a.log"))
+        chunks = split_by_time(entries, max_chunks=6)
+
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual([e for chunk in chunks for e in chunk.entries], entries)
+        self.assertIn(entries[10], chunks[0].entries)
+        self.assertTrue(chunks[0].label.startswith("2025-10-11 +8.0 10:00:00.000 ~ "))
+        for chunk in chunks:
+            minutes = {int(e.timestamp.split(':')[1]) for e in chunk.entries if e.timestamp}
+            self.assertLessEqual(max(minutes) - min(minutes), 10)
+
+    def test_split_by_module(self):
+        """按模块切分，超出段数的小模块合并"""
+        entries = _session(8) + [mars_entry(9 * 60, "Rare", "rare event", level='E')]
+        chunks = split_by_module(entries, max_chunks=3)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[-1].label, "其他模块")
+        self.assertEqual(sum(len(c.entries) for c in chunks), len(entries))
+
+
+class TestMapReduceSummarizer(unittest.TestCase):
+    """测试分段摘要流程"""
+
+    def setUp(self):
+        self.scheduler = AIRequestScheduler(max_workers=4)
+        self.cache = AnalysisCache()
+        self.client = FakeSummaryClient()
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def _summarizer(self, **kwargs):
+        return MapReduceSummarizer(self.client, cache=self.cache, scheduler=self.scheduler, **kwargs)
+
+    def test_every_chunk_reaches_final_prompt(self):
+        """每段都被摘要，最终提示词包含全部分段摘要与用户问题"""
+        summarizer = self._summarizer(max_chunks=8, reduce_tokens=20000)
+        entries = _session(60)
+        result = summarizer.build_prompt(entries, "为什么请求失败?")
+
+        self.assertEqual(len(result.chunks), 8)
+        self.assertEqual(result.requests, 8)
+        self.assertEqual(result.levels, 0)
+        for chunk in result.chunks:
+            self.assertIn(chunk.summary, result.prompt)
+        self.assertIn("为什么请求失败?", result.prompt)
+        self.assertIn(f"覆盖 {len(entries)} 条日志", result.prompt)
+        self.assertEqual(sum(c.entry_count for c in result.chunks), len(entries))
+
+    def test_rerun_and_follow_up_reuse_cache(self):
+        """重新分析与追问直接复用分段摘要缓存"""
+        summarizer = self._summarizer(max_chunks=6, reduce_tokens=20000)
+        entries = _session(30)
+        first = summarizer.build_prompt(entries, "问题一")
+        sent = len(self.client.prompts)
+
+        follow_up = summarizer.build_prompt(entries, "问题二")
+        self.assertEqual(len(self.client.prompts), sent)
+        self.assertEqual(follow_up.requests, 0)
+        self.assertEqual(follow_up.cache_hits, len(first.chunks))
+        self.assertTrue(all(chunk.cached for chunk in follow_up.chunks))
+
+        by_module = summarizer.build_prompt(entries, "问题三", split=SPLIT_BY_MODULE)
+        self.assertEqual(by_module.requests, 4)
+        self.assertIn("按模块分为4段", by_module.prompt)
+
+    def test_hierarchical_reduce(self):
+        """摘要总量超出预算时分组合并，逐层收敛"""
+        summarizer = self._summarizer(max_chunks=16, chunk_tokens=300, reduce_tokens=200)
+        result = summarizer.build_prompt(_session(64), "")
+
+        self.assertGreaterEqual(result.levels, 1)
+        merges = [p for p in self.client.prompts if p.startswith("合并以下")]
+        self.assertGreater(len(merges), 0)
+        self.assertIn("合并摘要", result.prompt)
+        self.assertIn("总结整个会话中的关键问题", result.prompt)
+
+    def test_cancel(self):
+        """取消后返回cancelled且不生成提示词"""
+        self.client.gate = threading.Event()
+        cancel = threading.Event()
+        threading.Timer(0.1, cancel.set).start()
+        result = self._summarizer(max_chunks=8).build_prompt(_session(60), "q", cancel_event=cancel)
+        self.client.gate.set()
+
+        self.assertTrue(result.cancelled)
+        self.assertEqual(result.prompt, "")
+
+    def test_analyze_and_optimizer_threshold(self):
+        """analyze返回最终回答；只有远超日志预算时才启用分段摘要"""
+        self.assertEqual(self._summarizer(max_chunks=4).analyze(_session(20), "q"), "最终回答")
+
+        optimizer = TokenOptimizer("gpt-4")
+        self.assertFalse(optimizer.needs_map_reduce(_session(5)))
+        self.assertTrue(optimizer.needs_map_reduce(_session(1200)))
+        summarizer = optimizer.create_map_reduce(self.client, cache=self.cache)
+        self.assertEqual(summarizer.chunk_tokens, optimizer.budget.max_logs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模块健康度聚合测试
+验证单遍聚合结果与逐模块重新扫描一致、会话列表追加后增量更新、
+任意位置修改后重新聚合，以及预处理器/压缩器共用同一份聚合结果
+"""
+
+import os
+import sys
+import unittest
+from collections import Counter
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntryList
+from gui.modules.module_health import ModuleHealthAggregator, is_crash_log
+from gui.modules.template_miner import TemplateMiner
+from gui.modules.ai_diagnosis.log_preprocessor import LogPreprocessor
+from gui.modules.ai_diagnosis.smart_compressor import SmartLogCompressor
+
+from log_fixtures import mars_entry
+
+
+def _session(count: int) -> LogEntryList:
+    entries = LogEntryList()
+    for i in range(count):
+        module = ["Net", "DB", "UI", "Player", "Crash"][i % 5 if i % 37 else 4]
+        level = "EWIID"[i % 5]
+        text = f"request {i} failed code={i % 7}" if level == 'E' else f"tick {i}"
+        if i % 53 == 0:
+            text = f"uncaught exception in worker {i}"
+        entries.append(mars_entry(i, module, text, level))
+    return entries
+
+
+def _reference_health(entries):
+    """逐模块重新扫描的参考实现"""
+    result = {}
+    for module in set(e.module for e in entries):
+        logs = [e for e in entries if e.module == module]
+        errors = sum(1 for e in logs if e.level == "ERROR")
+        warnings = sum(1 for e in logs if e.level == "WARNING")
+        crashes = sum(1 for e in logs if is_crash_log(e))
+        penalty = (crashes * 10 + errors * 5 + warnings) / len(logs)
+        result[module] = {'total': len(logs), 'errors': errors, 'warnings': warnings,
+                          'crashes': crashes, 'health_score': round(max(0, 1 - penalty / 10), 2)}
+    return result
+
+
+class TestModuleHealthAggregator(unittest.TestCase):
+    """测试聚合结果"""
+
+    def test_matches_rescan(self):
+        """单遍聚合与逐模块扫描结果一致"""
+        entries = _session(3000)
+        preprocessor = LogPreprocessor()
+        self.assertEqual(preprocessor.get_module_health(entries), _reference_health(entries))
+        self.assertEqual(preprocessor.extract_module_specific_logs(entries, "DB"),
+                         [e for e in entries if e.module == "DB"])
+
+        health = _reference_health(entries)
+        expected = sorted((m for m, s in health.items() if s['health_score'] < 0.7),
+                          key=lambda m: health[m]['health_score'])
+        self.assertEqual(sorted(preprocessor.get_unhealthy_modules(entries)), sorted(expected))
+
+        stats = preprocessor.get_statistics(entries)
+        self.assertEqual(stats['modules'], dict(Counter(e.module for e in entries).most_common(10)))
+        self.assertEqual(stats['crashes'], sum(1 for e in entries if is_crash_log(e)))
+
+    def test_error_patterns_match_miner(self):
+        """错误模式与单独挖掘ERROR日志的结果一致，并记录各模块模板计数"""
+        entries = _session(1000)
+        miner = TemplateMiner()
+        for entry in entries:
+            if entry.level == "ERROR":
+                miner.add(entry)
+        patterns = LogPreprocessor().extract_error_patterns(entries, top_n=5)
+        self.assertEqual([(p.signature, p.count) for p in patterns],
+                         [(t.template, t.count) for t in miner.top(5)])
+
+        module_templates = ModuleHealthAggregator.of(entries).module_templates("Net")
+        self.assertEqual(sum(count for _, count in module_templates),
+                         sum(1 for e in entries if e.module == "Net" and e.level == "ERROR"))
+
+    def test_incremental_append(self):
+        """同一列表追加后只扫描新增部分；原地修改后重新聚合"""
+        entries = _session(500)
+        first = ModuleHealthAggregator.of(entries)
+        self.assertIs(ModuleHealthAggregator.of(entries), first)
+
+        entries.extend(_session(200))
+        again = ModuleHealthAggregator.of(entries)
+        self.assertIs(again, first)
+        self.assertEqual(again.total, 700)
+        self.assertEqual(again.module_health(), _reference_health(entries))
+
+        entries[0] = mars_entry(0, "New", "replaced")
+        rebuilt = ModuleHealthAggregator.of(entries)
+        self.assertIsNot(rebuilt, first)
+        self.assertIn("New", rebuilt.modules)
+
+    def test_middle_entry_change(self):
+        """修改中间的日志（首尾不变）也会重新聚合"""
+        entries = _session(500)
+        first = ModuleHealthAggregator.of(entries)
+        entries[250] = mars_entry(250, "Middle", "replaced", 'E')
+        rebuilt = ModuleHealthAggregator.of(entries)
+        self.assertIsNot(rebuilt, first)
+        self.assertEqual(rebuilt.module_health(), _reference_health(entries))
+
+        del entries[100]
+        self.assertEqual(ModuleHealthAggregator.of(entries).total, 499)
+
+    def test_plain_list_not_cached(self):
+        """普通列表没有版本号，每次都重新聚合，不持有任何缓存"""
+        entries = list(_session(100))
+        first = ModuleHealthAggregator.of(entries)
+        self.assertIsNot(ModuleHealthAggregator.of(entries), first)
+        entries[50] = mars_entry(50, "Middle", "replaced")
+        self.assertIn("Middle", ModuleHealthAggregator.of(entries).modules)
+
+    def test_session_fields(self):
+        """崩溃日志与按小时分布随聚合一并产出"""
+        entries = _session(300)
+        health = ModuleHealthAggregator.of(entries)
+        self.assertEqual(health.flagged_crashes,
+                         [e for e in entries if e.is_crash or e.level == 'CRASH'])
+        self.assertEqual(sum(health.hour_counts.values()), 300)
+        self.assertEqual(set(health.hour_counts), {"10:00"})
+
+    def test_compressor_statistics(self):
+        """压缩器统计头部与按条计数一致，并复用同一聚合器"""
+        entries = _session(800)
+        compressor = SmartLogCompressor()
+        stats = compressor.compress(entries).statistics
+        self.assertEqual(stats['top_modules'], Counter(e.module for e in entries).most_common(5))
+        self.assertEqual(stats['levels'], dict(Counter(e.level for e in entries)))
+        self.assertEqual(ModuleHealthAggregator.of(entries).total, 800)
+
+
+if __name__ == '__main__':
+    unittest.main()
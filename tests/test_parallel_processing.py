@@ -184,14 +184,93 @@ class TestMultiProcessTransformer(unittest.TestCase):
         transformer = MultiProcessTransformer(max_workers=2)
         self.assertEqual(transformer.max_workers, 2)
 
-    @unittest.skip("Multiprocess transformer requires full CodeTransformer setup in subprocess")
     def test_multiprocess_transformation_execution(self):
-        """测试多进程转换执行（需要完整环境）"""
-        # Note: This test is skipped because the multiprocess transformer worker
-        # requires a complete CodeTransformer setup in subprocess, which needs
-        # WhitelistManager and NameGenerator initialization. In real usage, these
-        # are properly configured in the obfuscation engine.
-        pass
+        """测试多进程转换结果与单进程一致，并支持子进程直接写出文件"""
+        from gui.modules.obfuscation.code_parser import ParsedFile, Symbol, SymbolType
+        from gui.modules.obfuscation.code_transformer import CodeTransformer
+        from gui.modules.obfuscation.name_generator import NameGenerator
+
+        parsed_files = {}
+        for i, file_path in enumerate(self.large_files):
+            parsed = ParsedFile(file_path=file_path, language="objc")
+            parsed.symbols = [Symbol(name=f'LargeClass{i}', type=SymbolType.CLASS,
+                                     file_path=file_path, line_number=1)]
+            parsed.symbols += [Symbol(name=f'method{j}', type=SymbolType.METHOD,
+                                      file_path=file_path, line_number=j + 2) for j in range(100)]
+            parsed_files[file_path] = parsed
+
+        transformer = CodeTransformer(NameGenerator(seed="mp"))
+        symbol_table = transformer.build_symbol_table(parsed_files)
+        serial = transformer.transform_files(parsed_files)
+
+        mp_transformer = MultiProcessTransformer(max_workers=2)
+        results = mp_transformer.transform_large_files(parsed_files, symbol_table)
+        self.assertEqual(mp_transformer.failed_files, 0)
+        for file_path, result in results.items():
+            self.assertEqual(result.transformed_code, serial[file_path].transformed_content)
+            self.assertEqual(result.replacements, serial[file_path].replacements)
+            converted = result.to_transform_result()
+            self.assertEqual(converted.transformed_content, result.transformed_code)
+            self.assertEqual(converted.original_content, serial[file_path].original_content)
+            self.assertEqual(result.to_transform_result("given").original_content, "given")
+
+        # 映射字典同样可用；指定输出目录时子进程直接写出文件
+        output_dir = os.path.join(self.temp_dir, 'output')
+        results = mp_transformer.transform_large_files(parsed_files, symbol_table.to_dict(),
+                                                       output_dir=output_dir)
+        for file_path, result in results.items():
+            self.assertIsNone(result.transformed_code)
+            with open(result.output_path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), serial[file_path].transformed_content)
+
+    def test_output_keeps_relative_paths(self):
+        """子进程写出的文件保持相对项目根目录的路径，不同目录下的同名文件互不覆盖"""
+        from gui.modules.obfuscation.code_parser import ParsedFile, Symbol, SymbolType
+        from gui.modules.obfuscation.code_transformer import CodeTransformer
+        from gui.modules.obfuscation.name_generator import NameGenerator
+
+        project_dir = os.path.join(self.temp_dir, 'project')
+        parsed_files = {}
+        for module in ('Account', 'Feed'):
+            file_path = os.path.join(project_dir, module, 'Views', 'Cell.m')
+            os.makedirs(os.path.dirname(file_path))
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(f'@implementation {module}Cell\n@end\n')
+            parsed = ParsedFile(file_path=file_path, language="objc")
+            parsed.symbols = [Symbol(name=f'{module}Cell', type=SymbolType.CLASS,
+                                     file_path=file_path, line_number=1)]
+            parsed_files[file_path] = parsed
+
+        transformer = CodeTransformer(NameGenerator(seed="mp"))
+        symbol_table = transformer.build_symbol_table(parsed_files)
+        serial = transformer.transform_files(parsed_files)
+
+        mp_transformer = MultiProcessTransformer(max_workers=2)
+        output_dir = os.path.join(self.temp_dir, 'output')
+        for project_root in (None, project_dir):
+            results = mp_transformer.transform_large_files(parsed_files, symbol_table,
+                                                           output_dir=output_dir, project_root=project_root)
+            for file_path, result in results.items():
+                relative = os.path.relpath(file_path, project_dir)
+                self.assertEqual(result.output_path, os.path.join(output_dir, relative))
+                with open(result.output_path, 'r', encoding='utf-8') as f:
+                    self.assertEqual(f.read(), serial[file_path].transformed_content)
+
+        # 文件不在指定的项目根目录内时记为失败，不写到输出目录之外
+        results = mp_transformer.transform_large_files(parsed_files, symbol_table, output_dir=output_dir,
+                                                       project_root=os.path.join(project_dir, 'Feed'))
+        self.assertEqual(mp_transformer.failed_files, 1)
+
+    def test_benchmark(self):
+        """基准测试生成合成项目，单进程与多进程输出一致并给出耗时"""
+        from gui.modules.obfuscation.multiprocess_transformer import benchmark_multiprocess_transformation
+
+        report = benchmark_multiprocess_transformation(file_count=4, methods_per_file=20, max_workers=2)
+        self.assertEqual(report['files'], 4)
+        self.assertEqual(report['total_lines'], 4 * (2 + 20 * 2))
+        self.assertGreater(report['serial_time'], 0)
+        self.assertGreater(report['multiprocess_time'], 0)
+        self.assertFalse(report['should_use'])
 
     def test_multiprocess_statistics(self):
         """测试多进程转换统计信息"""
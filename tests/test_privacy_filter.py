@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+隐私过滤器测试
+验证前置条件跳过规则后的输出与逐条替换完全一致，以及结果缓存与批量过滤
+"""
+
+import os
+import random
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntry
+from gui.modules.ai_diagnosis.log_preprocessor import PrivacyFilter
+
+
+def _sequential(privacy_filter: PrivacyFilter, text: str) -> str:
+    """逐条替换的参考实现"""
+    for pattern, replacement in privacy_filter.compiled_patterns:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class TestPrivacyFilter(unittest.TestCase):
+    """测试隐私过滤"""
+
+    PIECES = [
+        'token', 'Token: ', 'api_key=', 'SECRET', 'password=', 'pwd:', 'user id=', 'UID=',
+        'device_id=', 'openid=', '@', 'a.b', '.', ' ', '"', '=', ':', '1', '123',
+        '13812345678', '110101199001011234', '192.168.1.1', 'user@x.com',
+        'abcdefghijklmnopqrstuvwxyz0123', 'secretoken=', 'passwordevice_id=',
+        '中文', 'İ', 'ı', 'ſ', 'K', 'u', 'i', 'd', 's', '１２', '٣',
+    ]
+
+    def test_identical_to_sequential(self):
+        """随机拼接的文本过滤结果与逐条替换一致"""
+        privacy_filter = PrivacyFilter()
+        rng = random.Random(7)
+        for _ in range(20000):
+            text = ''.join(rng.choice(self.PIECES) for _ in range(rng.randint(0, 16)))
+            self.assertEqual(privacy_filter.filter(text), _sequential(privacy_filter, text), text)
+
+    def test_known_replacements(self):
+        """典型敏感信息被替换"""
+        privacy_filter = PrivacyFilter()
+        text = "login uid=12345 token: abcdefghijklmnopqrstuvwxyz from 10.0.0.8 mail a.b@c.com"
+        self.assertEqual(privacy_filter.filter(text), "login UID_*** TOKEN_*** from IP_*** mail EMAIL_***")
+        self.assertEqual(privacy_filter.filter("[Net] request 42 done in 15ms"), "[Net] request 42 done in 15ms")
+        self.assertEqual(PrivacyFilter(enabled=False).filter(text), text)
+
+    def test_cache_and_entries(self):
+        """相同文本只过滤一次；批量过滤返回副本，不修改原条目"""
+        privacy_filter = PrivacyFilter()
+        line = "[E][2025-10-11 +8.0 10:05:09.000][1][Login] user_id=42 failed"
+        entries = [LogEntry(line, "a.log") for _ in range(3)]
+        entries.append(LogEntry("[I][2025-10-11 +8.0 10:05:10.000][1][Net] ok", "a.log"))
+
+        filtered = privacy_filter.filter_log_entries(entries)
+        self.assertEqual(len(privacy_filter._cache), 3)  # 两种内容 + 一条原始行
+        self.assertEqual(filtered[0].content, filtered[2].content)
+        self.assertIn("USER_***", filtered[0].content)
+        self.assertIn("user_id=42", entries[0].content)
+        self.assertEqual(filtered[0].module, "Login")
+        self.assertIs(filtered[3], entries[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前缀稳定会话提示词测试
+验证分段顺序、缓存断点标记、追问时前缀不变，以及模拟后端的缓存命中
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntryList
+from gui.modules.ai_diagnosis.ai_client import _anthropic_payload, _openai_messages
+from gui.modules.ai_diagnosis.ai_scheduler import AIRequestScheduler, ScheduledAIClient
+from gui.modules.ai_diagnosis.prompt_session import (
+    CachedPrompt,
+    PrefixCacheMockClient,
+    PromptSession,
+)
+from gui.modules.ai_diagnosis.token_optimizer import TokenOptimizer
+
+from log_fixtures import mars_entry, render_session
+
+
+def _session_logs() -> list:
+    entries = render_session()
+    entries[20] = mars_entry(10 * 60, "Net", "socket timeout while login", level='E')
+    entries[33] = mars_entry(16 * 60 + 30, "Pay", "payment order 42 rejected by gateway", level='E')
+    return entries
+
+
+class TestPromptSession(unittest.TestCase):
+    """测试会话提示词布局"""
+
+    def test_layout_and_markers(self):
+        """系统指令与上下文在前并带断点，问题在最后"""
+        session = PromptSession()
+        session.set_context("【日志摘要】总数:10", key=1)
+        prompt = session.build("为什么登录失败")
+
+        self.assertIsInstance(prompt, CachedPrompt)
+        self.assertIsInstance(prompt, str)
+        self.assertTrue(prompt.startswith(session.system_prompt))
+        self.assertTrue(prompt.prefix.endswith(session.context))
+        self.assertTrue(prompt.endswith("**回答**："))
+        self.assertNotIn("为什么登录失败", prompt.prefix)
+
+        payload = _anthropic_payload(prompt)
+        self.assertEqual(payload["system"][0]["cache_control"], {"type": "ephemeral"})
+        blocks = payload["messages"][0]["content"]
+        self.assertIn("cache_control", blocks[0])
+        self.assertNotIn("cache_control", blocks[-1])
+        self.assertEqual(''.join(b["text"] for b in payload["system"] + blocks), prompt)
+
+        messages = _openai_messages(prompt)
+        self.assertEqual(messages[0]["role"], "system")
+        self.assertEqual(_openai_messages("plain"), [{"role": "user", "content": "plain"}])
+
+    def test_history_extends_prefix(self):
+        """追问时前一次的前缀保持不变；上下文变化时清空历史"""
+        session = PromptSession(max_history_turns=4)
+        session.set_context("summary", key=1)
+        first = session.build("q1")
+        session.record("q1", "a1")
+        second = session.build("q2")
+        self.assertTrue(second.prefix.startswith(first.prefix))
+        self.assertIn("a1", second.prefix)
+
+        self.assertFalse(session.set_context("summary", key=2))
+        self.assertEqual(len(session.history), 1)
+        self.assertTrue(session.set_context("other", key=3))
+        self.assertEqual(session.history, [])
+
+
+class TestPrefixCaching(unittest.TestCase):
+    """测试模拟后端的缓存命中"""
+
+    def test_follow_ups_hit_cache(self):
+        """同一会话的追问命中日志上下文缓存，只为新增部分付全价"""
+        entries = _session_logs()
+        optimizer = TokenOptimizer("claude-3-5-sonnet-20241022")
+        session = optimizer.create_prompt_session()
+        backend = PrefixCacheMockClient(responder=lambda prompt: "网关拒绝了支付请求")
+
+        prompts = []
+        for question in ["支付为什么失败", "登录超时是什么原因", "还有别的错误吗"]:
+            optimized = optimizer.optimize_for_session_qa(entries, question, session)
+            self.assertEqual(optimized.template_name, "interactive_qa_session")
+            prompts.append(optimized.prompt)
+            session.record(question, backend.ask(optimized.prompt))
+
+        self.assertIn("#34 [10:16:30.000] ERROR @Pay", prompts[0])
+        self.assertNotIn("@Pay", prompts[0].prefix)
+        for previous, current in zip(prompts, prompts[1:]):
+            self.assertTrue(current.prefix.startswith(previous.prefix))
+
+        first, second, third = backend.usage
+        self.assertEqual(first['cache_read_tokens'], 0)
+        self.assertGreater(first['cache_write_tokens'], 0)
+        self.assertGreaterEqual(second['cache_read_tokens'], first['cache_write_tokens'])
+        self.assertLess(second['cache_write_tokens'], first['cache_write_tokens'])
+        self.assertGreater(third['cache_read_tokens'], second['cache_read_tokens'])
+
+        # 普通文本提示词没有断点，全部按输入计
+        backend.ask(str(prompts[-1]))
+        self.assertEqual(backend.usage[-1]['cache_read_tokens'], 0)
+
+    def test_context_follows_log_list(self):
+        """换成长度相同的另一份日志或原地修改会话列表后重新生成上下文，不复用旧摘要"""
+        optimizer = TokenOptimizer("claude-3-5-sonnet-20241022")
+        session = optimizer.create_prompt_session()
+        entries = LogEntryList(_session_logs())
+        optimizer.optimize_for_session_qa(entries, "支付为什么失败", session)
+        context = session.context
+        optimizer.optimize_for_session_qa(entries, "还有别的错误吗", session)
+        self.assertIs(session.context, context)
+
+        other = _session_logs()
+        other[33] = mars_entry(16 * 60 + 30, "Push", "apns token expired", level='E')
+        optimizer.optimize_for_session_qa(other, "推送为什么失败", session)
+        self.assertIn("Push", session.context)
+        self.assertNotIn("Pay", session.context)
+
+        entries[40] = mars_entry(20 * 60, "DB", "database is locked", level='E')
+        optimizer.optimize_for_session_qa(entries, "数据库错误", session)
+        self.assertIn("DB", session.context)
+
+    def test_passes_through_scheduler(self):
+        """分段提示词经调度器转发后仍保留分段"""
+        backend = PrefixCacheMockClient()
+        scheduler = AIRequestScheduler(max_workers=1)
+        try:
+            session = PromptSession()
+            session.set_context("summary")
+            ScheduledAIClient(backend, scheduler, backend='mock').ask(session.build("q"))
+            ScheduledAIClient(backend, scheduler, backend='mock').ask(session.build("q2"))
+        finally:
+            scheduler.shutdown()
+        self.assertGreater(backend.usage[1]['cache_read_tokens'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话性能分析器测试
+验证阶段聚合、装饰器计数、JSON与Chrome Trace导出
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.filter_search import FilterSearchManager
+from gui.modules.data_models import LogEntry
+from gui.modules.session_profiler import SessionProfiler, get_session_profiler, profiled
+
+
+class TestSessionProfiler(unittest.TestCase):
+    """测试会话分析器"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_aggregates_spans_and_numeric_args(self):
+        """同名阶段累计次数、耗时与数值参数"""
+        profiler = SessionProfiler()
+        for i in range(3):
+            with profiler.span('decode_file', category='decode', file=f'{i}.xlog', bytes=1024) as args:
+                args['lines'] = 10
+        profiler.record('decode_file', 0.5, category='decode', bytes=2048, lines=5)
+
+        stats = {s.name: s for s in profiler.get_stats()}['decode_file']
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.totals, {'bytes': 3 * 1024 + 2048, 'lines': 35})
+        self.assertGreaterEqual(stats.total_time, 0.5)
+        self.assertEqual(stats.max_time, 0.5)
+
+        summary = profiler.summary()
+        self.assertEqual(summary['span_count'], 4)
+        self.assertIn('mb_per_second', summary['stages'][0])
+
+    def test_span_recorded_on_exception(self):
+        """代码块抛出异常时仍记录耗时"""
+        profiler = SessionProfiler()
+        with self.assertRaises(ValueError):
+            with profiler.span('render'):
+                raise ValueError('boom')
+        self.assertEqual(profiler.get_stats()[0].count, 1)
+
+    def test_disabled_and_bounded(self):
+        """禁用时不记录；明细span有上限但聚合不丢失"""
+        profiler = SessionProfiler(enabled=False)
+        with profiler.span('a'):
+            pass
+        profiler.record('a', 1.0)
+        self.assertEqual(profiler.get_stats(), [])
+
+        profiler = SessionProfiler(max_spans=10)
+        for _ in range(100):
+            profiler.record('filter_query', 0.001)
+        self.assertEqual(len(profiler.get_spans()), 10)
+        self.assertEqual(profiler.get_stats()[0].count, 100)
+
+    def test_thread_safety(self):
+        """多线程并发记录不丢计数"""
+        profiler = SessionProfiler()
+
+        def worker():
+            for _ in range(500):
+                profiler.record('decode_file', 0.0, lines=1)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = profiler.get_stats()[0]
+        self.assertEqual(stats.count, 4000)
+        self.assertEqual(stats.totals['lines'], 4000)
+
+    def test_exports(self):
+        """导出JSON与Chrome Trace格式"""
+        profiler = SessionProfiler()
+        with profiler.span('index_build', category='index', entries=100):
+            pass
+        profiler.record('decode_file', 0.002, category='decode', file='a.xlog')
+
+        json_path = os.path.join(self.temp_dir, 'profile.json')
+        profiler.export_json(json_path)
+        with open(json_path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual({s['name'] for s in data['stages']}, {'index_build', 'decode_file'})
+        self.assertEqual(len(data['spans']), 2)
+
+        trace_path = os.path.join(self.temp_dir, 'trace.json')
+        profiler.export_chrome_trace(trace_path)
+        with open(trace_path, encoding='utf-8') as f:
+            trace = json.load(f)
+        events = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+        self.assertEqual(len(events), 2)
+        decode = next(e for e in events if e['name'] == 'decode_file')
+        self.assertEqual(decode['cat'], 'decode')
+        self.assertAlmostEqual(decode['dur'], 2000, delta=1)
+        self.assertEqual(decode['args']['file'], 'a.xlog')
+        self.assertTrue(any(e['ph'] == 'M' for e in trace['traceEvents']))
+
+    def test_profiled_decorator_counts_entries(self):
+        """装饰器记录到全局分析器，并按参数名记录条目数"""
+        profiler = get_session_profiler()
+        profiler.reset()
+
+        entries = [LogEntry(f"[I][2025-10-11 +8.0 10:00:00.000][1][App] msg {i}", 'a') for i in range(20)]
+        result = FilterSearchManager().filter_entries(entries, level='INFO')
+
+        @profiled('custom', category='test', count_arg='items')
+        def process(prefix, items):
+            return len(items)
+
+        self.assertEqual(process('x', items=[1, 2, 3]), 3)
+
+        stats = {s.name: s for s in profiler.get_stats()}
+        self.assertEqual(stats['filter_query'].totals['entries'], 20)
+        self.assertEqual(stats['custom'].totals['entries'], 3)
+        self.assertEqual(len(result), 20)
+        profiler.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+智能上下文提取器测试
+验证按对象身份O(1)定位、字符串目标借助索引定位、预编译规则与逐条正则结果一致，
+以及关联日志按关键词稀有度排序
+"""
+
+import os
+import re
+import sys
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.log_indexer import LogIndexer
+from gui.modules.ai_diagnosis.smart_context_extractor import ProblemType, SmartContextExtractor
+
+from log_fixtures import mars_entry
+
+
+def _session(count: int) -> list:
+    modules = ["Net", "DB", "UI", "Player"]
+    return [mars_entry(i, modules[i % 4], f"request {i} finished status=200 worker{i % 50}") for i in range(count)]
+
+
+class TestSmartContextExtractor(unittest.TestCase):
+    """测试上下文提取"""
+
+    def setUp(self):
+        self.entries = _session(2000)
+        self.entries[1500] = mars_entry(1500, "Net", "HTTP timeout code=E4021 host=api.example.com", 'E')
+        for i in (100, 700, 1900):
+            self.entries[i] = mars_entry(i, "Net", f"retry after code=E4021 attempt {i}", 'W')
+        self.indexer = LogIndexer()
+        self.indexer.build_index(self.entries)
+        self.extractor = SmartContextExtractor(self.entries, self.indexer)
+
+    def test_identity_lookup(self):
+        """按对象身份定位；列表追加、换列表与原地替换（显式重置）后仍正确"""
+        self.assertEqual(self.extractor._find_entry_index(self.entries[1234]), 1234)
+        self.assertIsNone(self.extractor._find_entry_index(mars_entry(1, "Net", "not in list")))
+
+        extra = mars_entry(5000, "UI", "appended later")
+        self.entries.append(extra)
+        self.assertEqual(self.extractor._find_entry_index(extra), 2000)
+
+        replacement = mars_entry(3, "UI", "replaced in place")
+        self.entries[3] = replacement
+        self.extractor.reset_positions()
+        self.assertEqual(self.extractor._find_entry_index(replacement), 3)
+
+        self.extractor.all_entries = self.entries[:10]
+        self.assertEqual(self.extractor._find_entry_index(self.entries[5]), 5)
+        self.assertIsNone(self.extractor._find_entry_index(extra))
+
+    def test_miss_does_not_rebuild(self):
+        """列表未变化时查不到的目标直接返回None，不重建位置表"""
+        self.assertEqual(self.extractor._find_entry_index(self.entries[10]), 10)
+        positions = self.extractor._positions
+
+        class CountingDict(dict):
+            sets = 0
+
+            def setdefault(self, key, default=None):
+                CountingDict.sets += 1
+                return super().setdefault(key, default)
+
+        self.extractor._positions = CountingDict(positions)
+        for i in range(50):
+            self.assertIsNone(self.extractor._find_entry_index(mars_entry(i, "Net", "absent")))
+        self.assertEqual(CountingDict.sets, 0)
+        self.assertEqual(self.extractor._find_entry_index(self.entries[1999]), 1999)
+
+    def test_text_lookup_matches_linear_scan(self):
+        """字符串目标借助索引缩小范围，结果与逐条扫描一致"""
+        def linear(text):
+            for i, entry in enumerate(self.entries):
+                if text in entry.content:
+                    return i
+            return None
+
+        for text in ["code=E4021 host", "request 42 finished", "equest 42 fin", "status=200 worker7",
+                     "HTTP timeout", "no such text here", "E4021"]:
+            self.assertEqual(self.extractor._find_entry_index(text), linear(text), text)
+            self.assertEqual(self.extractor._find_entry_index(text), linear(text), text)
+
+    def test_detection_matches_uncompiled_rules(self):
+        """合并后的规则与逐条正则检测结果一致"""
+        def reference(content, level):
+            for pattern in self.extractor.problem_patterns[ProblemType.CRASH]:
+                if re.search(pattern, content, re.IGNORECASE):
+                    return ProblemType.CRASH
+            for ptype, patterns in self.extractor.problem_patterns.items():
+                if any(re.search(p, content, re.IGNORECASE) for p in patterns):
+                    return ptype
+            return {'ERROR': ProblemType.ERROR, 'WARNING': ProblemType.WARNING}.get(level, ProblemType.UNKNOWN)
+
+        samples = ["Signal 11 received", "app CRASHED", "OOM killer", "socket closed", "frame drop 30",
+                   "memory warning", "all good", "Stuck in loop", "DNS lookup"]
+        for text in samples:
+            for level in ('E', 'W', 'I'):
+                entry = mars_entry(1, "X", text, level)
+                self.assertEqual(self.extractor._detect_problem_type(entry), reference(entry.content, entry.level))
+
+    def test_related_logs_ranked_by_rarity(self):
+        """关联日志优先包含稀有关键词的行，按时间顺序返回"""
+        context = self.extractor.extract_context(self.entries[1500])
+        self.assertEqual(context['problem_type'], ProblemType.NETWORK)
+        related = context['related_logs']
+        self.assertEqual([e for e in related if "E4021" in e.content],
+                         [self.entries[100], self.entries[700], self.entries[1900]])
+        indices = [self.entries.index(e) for e in related]
+        self.assertEqual(indices, sorted(indices))
+
+    def test_repeated_extraction_fast(self):
+        """位置表建立后，重复提取不随日志量线性增长"""
+        entries = _session(200000)
+        extractor = SmartContextExtractor(entries, None)
+        extractor.extract_context(entries[0])
+        started = time.perf_counter()
+        for i in range(100):
+            extractor.extract_context(entries[199000 + i])
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+源码分段词法器测试
+验证代码/字符串/注释的切分与拼接还原，以及字符串保护器的占位符恢复
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.obfuscation.parsers import StringLiteralProtector, join_segments, split_source
+from gui.modules.obfuscation.parsers.source_lexer import CODE, COMMENT, STRING
+
+
+OBJC_SOURCE = '''#import "UserCell.h"
+// don't touch "quoted" text
+NSString *url = @"http://example.com/*path*/";
+char c = '"'; /* a "b" */ int x = 1;
+'''
+
+
+class TestSplitSource(unittest.TestCase):
+    """测试分段切分"""
+
+    def test_objc_segments(self):
+        """按出现顺序归属：字符串中的注释符号、注释中的引号都不会误判"""
+        segments = split_source(OBJC_SOURCE, "objc")
+        self.assertEqual(join_segments(segments), OBJC_SOURCE)
+
+        literals = [(segment.kind, segment.text) for segment in segments if not segment.is_code]
+        self.assertEqual(literals, [
+            (STRING, '"UserCell.h"'),
+            (COMMENT, '// don\'t touch "quoted" text'),
+            (STRING, '@"http://example.com/*path*/"'),
+            (STRING, "'\"'"),
+            (COMMENT, '/* a "b" */'),
+        ])
+        kinds = [segment.kind for segment in segments]
+        self.assertFalse(any(a == b == CODE for a, b in zip(kinds, kinds[1:])))
+
+    def test_swift_multiline_string(self):
+        """Swift多行字符串整体作为一个分段"""
+        source = 'let json = """\n{"class": "Fake"} // no comment\n"""\nfunc run() {}\n'
+        segments = split_source(source, "swift")
+        self.assertEqual(join_segments(segments), source)
+        self.assertEqual([s.kind for s in segments], [CODE, STRING, CODE])
+
+
+class TestStringLiteralProtector(unittest.TestCase):
+    """测试字符串保护器"""
+
+    def test_protect_and_restore(self):
+        """只保护 @"..."，恢复时不混淆编号相近的占位符"""
+        source = ''.join(f'NSLog(@"message {i}");\n' for i in range(13)) + '#import "A.h"\n'
+        protector = StringLiteralProtector()
+        protected = protector.protect(source, language="objc")
+
+        self.assertNotIn('@"', protected)
+        self.assertIn('#import "A.h"', protected)
+        self.assertIn("__STRING_PLACEHOLDER_12__", protected)
+        self.assertEqual(protector.restore(protected), source)
+
+
+if __name__ == '__main__':
+    unittest.main()
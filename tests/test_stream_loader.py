@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式加载器测试
+验证单次读取加载路径：分布式采样编码检测、分块解码降级、与文本模式读取结果一致
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'decoders'))
+
+from gui.modules.file_operations import FileOperations
+from gui.modules.stream_loader import (
+    IncrementalLineDecoder,
+    StreamLoader,
+    detect_buffer_encoding,
+)
+from xlog_writer import encode_block as _xlog_block
+
+
+class TestUnifiedLoader(unittest.TestCase):
+    """测试统一加载路径"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, name, data: bytes) -> str:
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_utf8_matches_text_mode(self):
+        """UTF-8文件：结果与文本模式readlines()一致"""
+        content = ''.join(f"[I][2025-10-11 +8.0 10:00:{i % 60:02d}.000][1][网络] 请求 #{i}\n"
+                          for i in range(5000))
+        content += "windows\r\nmac\rlast line without newline"
+        path = self._write('utf8.log', content.encode('utf-8'))
+
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = f.readlines()
+
+        loader = StreamLoader()
+        self.assertEqual(loader.detect_encoding(path), 'utf-8')
+        self.assertEqual(loader.load_lines(path), expected)
+        self.assertEqual(FileOperations.load_log_file(path), expected)
+
+    def test_small_blocks_keep_lines_intact(self):
+        """小块解码时行与多字节字符都不会被截断"""
+        content = ''.join(f"第{i}行日志内容\n" for i in range(2000))
+        path = self._write('blocks.log', content.encode('utf-8'))
+
+        loader = StreamLoader()
+        blocks = list(loader.iter_line_blocks(path, block_size=100))
+        lines = [line for block, _ in blocks for line in block]
+
+        self.assertEqual(lines, content.splitlines(keepends=True))
+        self.assertEqual(blocks[-1][1], os.path.getsize(path))
+        offsets = [offset for _, offset in blocks]
+        self.assertEqual(offsets, sorted(offsets))
+
+    def test_gbk_detected_from_samples(self):
+        """GBK文件通过采样识别，而不是整文件逐个编码重试"""
+        content = ''.join(f"[E][2025-10-11 +8.0 10:00:00.000][1][支付] 订单失败 {i}\n"
+                          for i in range(20000))
+        path = self._write('gbk.log', content.encode('gbk'))
+
+        loader = StreamLoader()
+        encoding = loader.detect_encoding(path)
+        self.assertIn(encoding, ('gb2312', 'gbk', 'gb18030'))
+        self.assertEqual(''.join(loader.load_lines(path)), content)
+
+    def test_bad_byte_only_degrades_one_block(self):
+        """文件尾部单个坏字节只影响所在块，其余内容保持UTF-8解码"""
+        good = ''.join(f"正常日志 {i}\n" for i in range(50000)).encode('utf-8')
+        path = self._write('bad.log', good + b"broken \xff byte\n")
+
+        loader = StreamLoader()
+        lines = list(loader.iter_lines(path))
+
+        self.assertEqual(lines[0], "正常日志 0\n")
+        self.assertEqual(lines[-1], "broken � byte\n")
+        self.assertEqual(loader.fallback_blocks, 1)
+
+    def test_lossless_gbk_preferred_over_tolerant_gb2312(self):
+        """GB2312 个别字符解码失败而 GBK 无损时选择 GBK"""
+        data = ('中文日志内容' * 100 + '镕').encode('gbk')
+        self.assertEqual(detect_buffer_encoding(data), 'gbk')
+
+        # 少量坏字节仍按容错规则保持原编码
+        corrupted = ('中文日志内容' * 100).encode('utf-8') + b'\xff'
+        self.assertEqual(detect_buffer_encoding(corrupted), 'utf-8')
+
+    def test_sample_reads_are_bounded(self):
+        """采样总量有上限"""
+        data = b"a" * (10 * 1024 * 1024)
+
+        class CountingBuffer:
+            def __init__(self, raw):
+                self.raw = raw
+                self.read = 0
+
+            def __len__(self):
+                return len(self.raw)
+
+            def __getitem__(self, item):
+                chunk = self.raw[item]
+                self.read += len(chunk)
+                return chunk
+
+        buffer = CountingBuffer(data)
+        self.assertEqual(detect_buffer_encoding(buffer, sample_size=4096, sample_count=4), 'utf-8')
+        self.assertLessEqual(buffer.read, 4096 * 4)
+
+    def test_empty_file(self):
+        """空文件返回空列表"""
+        path = self._write('empty.log', b'')
+        self.assertEqual(StreamLoader().load_lines(path), [])
+        self.assertEqual(list(StreamLoader().load_streaming(path)), [])
+
+    def test_streaming_reports_real_offsets(self):
+        """流式加载的进度基于真实字节偏移，且单调到100%"""
+        content = ''.join(f"line {i}\n" for i in range(30000))
+        path = self._write('progress.log', content.encode('utf-8'))
+        size = os.path.getsize(path)
+
+        progress = []
+        loader = StreamLoader()
+        loader.BLOCK_SIZE = 16 * 1024
+        chunks = list(loader.load_streaming(path, chunk_size=1000,
+                                            progress_callback=lambda cur, total: progress.append((cur, total))))
+
+        self.assertEqual(sum(len(c) for c in chunks), 30000)
+        self.assertEqual(progress[-1], (size, size))
+        values = [cur for cur, _ in progress]
+        self.assertEqual(values, sorted(values))
+        self.assertTrue(all(cur <= size for cur in values))
+
+
+class TestIncrementalDecoding(unittest.TestCase):
+    """测试增量解码与xlog流式加载"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_split_characters_and_crlf(self):
+        """块边界切断多字节字符与\\r\\n时结果不变"""
+        data = "第一行\r\n第二行\r第三行\n尾".encode('utf-8')
+        for size in range(1, 8):
+            decoder = IncrementalLineDecoder('utf-8')
+            lines = []
+            for i in range(0, len(data), size):
+                lines.extend(decoder.feed(data[i:i + size]))
+            lines.extend(decoder.flush())
+            self.assertEqual(lines, ["第一行\n", "第二行\n", "第三行\n", "尾"])
+            self.assertEqual(decoder.fallback_blocks, 0)
+
+    def test_xlog_block_iterator(self):
+        """直接消费xlog块迭代器：无临时文件、进度为真实偏移"""
+        lines = [f"[I][2025-10-11 +8.0 10:00:00.{i:03d}][1][模块] 消息 {i}\n" for i in range(3000)]
+        text = ''.join(lines).encode('utf-8')
+        # 故意在多字节字符中间切块
+        cuts = [0, 1001, 40001, 80003, len(text)]
+        blocks = [_xlog_block(text[a:b], seq + 1) for seq, (a, b) in enumerate(zip(cuts, cuts[1:]))]
+
+        path = os.path.join(self.temp_dir, 'test.xlog')
+        with open(path, 'wb') as f:
+            f.write(b''.join(blocks))
+        size = os.path.getsize(path)
+
+        progress = []
+        loader = StreamLoader()
+        chunks = list(loader.load_with_decode(path, chunk_size=500,
+                                              progress_callback=lambda cur, total: progress.append(cur)))
+
+        self.assertEqual([line for chunk in chunks for line in chunk], lines)
+        self.assertFalse(os.path.exists(path + '.log'))
+        self.assertEqual(progress[-1], size)
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(loader.progress.bytes_done, size)
+        self.assertEqual(loader.progress.lines, len(lines))
+        self.assertGreaterEqual(loader.progress.mb_per_second, 0.0)
+
+    def test_xlog_seq_gap_marker(self):
+        """序列号缺失插入[F]标记行"""
+        path = os.path.join(self.temp_dir, 'gap.xlog')
+        with open(path, 'wb') as f:
+            f.write(_xlog_block(b"a\n", 2) + _xlog_block(b"b\n", 3) + _xlog_block(b"c\n", 7))
+
+        lines = [line for chunk in StreamLoader().load_with_decode(path, prefetch=0) for line in chunk]
+        self.assertEqual(lines, ["a\n", "b\n", "[F]log seq:4-6 is missing\n", "c\n"])
+
+    def test_markers_start_new_line(self):
+        """前一块以未完成的行结束时，[F]标记另起一行，不拼接到该行上"""
+        path = os.path.join(self.temp_dir, 'partial.xlog')
+        head = _xlog_block(b"a\npart", 2) + _xlog_block(b"ial\n", 5) + _xlog_block(b"tail", 6)
+        with open(path, 'wb') as f:
+            f.write(head + b"garbage" + _xlog_block(b"b\n", 7))
+
+        lines = [line for chunk in StreamLoader().load_with_decode(path, prefetch=0) for line in chunk]
+        self.assertEqual(lines, ["a\n", "part\n", "[F]log seq:3-4 is missing\n", "ial\n",
+                                 "tail\n", f"[F]decode error at offset {len(head)}\n", "b\n"])
+
+    def test_legacy_decoder_func(self):
+        """decoder_func返回.log路径时保持旧行为"""
+        decoded = os.path.join(self.temp_dir, 'decoded.log')
+        with open(decoded, 'w', encoding='utf-8') as f:
+            f.write("x\ny\n")
+
+        lines = [line for chunk in StreamLoader().load_with_decode('unused.xlog', decoder_func=lambda _: decoded)
+                 for line in chunk]
+        self.assertEqual(lines, ["x\n", "y\n"])
+
+
+if __name__ == '__main__':
+    unittest.main()
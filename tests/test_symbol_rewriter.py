@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单遍符号重写器测试
+验证与 SymbolReplacer 按类型逐个替换的输出和替换次数一致，以及 CodeTransformer 的接入
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.obfuscation.code_parser import CodeParser, Symbol, SymbolType
+from gui.modules.obfuscation.code_transformer import CodeTransformer
+from gui.modules.obfuscation.name_generator import NameGenerator
+from gui.modules.obfuscation.symbol_replacer import SymbolReplacer
+from gui.modules.obfuscation.symbol_rewriter import SymbolRewriter
+from gui.modules.obfuscation.whitelist_manager import WhitelistManager
+
+
+OBJC_SOURCE = '''#import <UIKit/UIKit.h>
+#import <Demo/UserCell.h>
+#define kMaxRetry 3
+#define kRetryTwice (kMaxRetry * 2)
+
+@protocol UserCellDelegate <NSObject>
+- (void)cellDidTap;
+- (void)cell:(id)cell didSelectIndex:(NSInteger)index;
+@end
+
+@interface UserCell : UITableViewCell <UserCellDelegate>
+@property (nonatomic, strong) NSString *title;
+@property (nonatomic, assign) NSInteger retryCount;
+@property (nonatomic, weak) id<UserCellDelegate> delegate;
+- (void)reloadContent;
+@end
+
+@implementation UserCell
+@synthesize retryCount = _retryCount;
+
+- (void)reloadContent {
+    UserCell *other = [[UserCell alloc] init];
+    other.title = self.title;
+    _retryCount = kMaxRetry;
+    [[self cellSelf] reloadContent];
+    [self.delegate cell:other didSelectIndex:self.retryCount];
+    [self.delegate cellDidTap];
+}
+
+- (UserCell *)cellSelf {
+    return self;
+}
+@end
+'''
+
+
+def _replace_by_type(content, symbols, mappings):
+    """SymbolReplacer 按类型分组逐个替换（原实现）"""
+    replacer = SymbolReplacer(mappings)
+    total = 0
+    for symbol_type, replace in [(SymbolType.CLASS, replacer.replace_class_name),
+                                 (SymbolType.PROTOCOL, replacer.replace_protocol_name),
+                                 (SymbolType.METHOD, replacer.replace_method_name),
+                                 (SymbolType.PROPERTY, replacer.replace_property_name),
+                                 (SymbolType.MACRO, replacer.replace_macro_name)]:
+        for symbol in symbols:
+            if symbol.type == symbol_type:
+                content, count = replace(content, symbol)
+                total += count
+    return content, total
+
+
+def _symbol(name, symbol_type):
+    return Symbol(name=name, type=symbol_type, file_path="UserCell.m", line_number=1)
+
+
+class TestSymbolRewriter(unittest.TestCase):
+    """测试单遍重写与逐类型替换一致"""
+
+    def setUp(self):
+        self.symbols = [
+            _symbol("UserCell", SymbolType.CLASS),
+            _symbol("UserCellDelegate", SymbolType.PROTOCOL),
+            _symbol("reloadContent", SymbolType.METHOD),
+            _symbol("cellSelf", SymbolType.METHOD),
+            _symbol("cellDidTap", SymbolType.METHOD),
+            _symbol("cell:didSelectIndex:", SymbolType.METHOD),
+            _symbol("title", SymbolType.PROPERTY),
+            _symbol("retryCount", SymbolType.PROPERTY),
+            _symbol("_retryCount", SymbolType.PROPERTY),
+            _symbol("kMaxRetry", SymbolType.MACRO),
+        ]
+        self.mappings = {
+            "UserCell": "Qa81", "UserCellDelegate": "Zk20", "reloadContent": "mP3x",
+            "cellSelf": "vv9c", "cellDidTap": "rT2u", "cell:didSelectIndex:": "xa:yb:",
+            "title": "hq0e", "retryCount": "nn4d", "_retryCount": "_wq5s", "kMaxRetry": "K7wz",
+        }
+
+    def test_matches_symbol_replacer(self):
+        """输出与替换次数和逐类型替换一致"""
+        expected = _replace_by_type(OBJC_SOURCE, self.symbols, self.mappings)
+        actual = SymbolRewriter(self.mappings).rewrite(OBJC_SOURCE, self.symbols)
+        self.assertEqual(actual, expected)
+        self.assertGreater(actual[1], 20)
+
+        content = actual[0]
+        self.assertIn("@interface Qa81 : UITableViewCell <Zk20>", content)
+        self.assertIn("[[Qa81 alloc] init]", content)
+        self.assertIn("[self.delegate xa:other yb:self.nn4d]", content)
+        self.assertIn("#define kRetryTwice (kMaxRetry * 2)", content)
+
+    def test_rule_contexts(self):
+        """上下文相关的规则：只有位于对应位置的标识符被替换"""
+        cases = [
+            # 无参方法只在声明与 ]...] 消息中替换
+            ("- (void)load;\n[obj load];\n[[obj a] load];", [_symbol("load", SymbolType.METHOD)]),
+            # 同一个 ']' 不能同时作为两个消息匹配的结尾与开头
+            ("[[[a b] run] run];", [_symbol("run", SymbolType.METHOD)]),
+            # 属性声明必须是 @property 语句的最后一个标识符且前面有空白
+            ("@property int count;\n@property NSString *count;\nx.count = count;",
+             [_symbol("count", SymbolType.PROPERTY)]),
+            # 协议列表按个计数，列表之外、'>' 之前的同名标识符也被替换
+            ("id<Pr> a; Pr b; NSArray<Pr, Pr> c; Pr d",
+             [_symbol("Pr", SymbolType.PROTOCOL)]),
+            # 同名符号按类型优先级处理
+            ("@interface Pr : NSObject <Pr>\n- (Pr *)Pr;\n@end",
+             [_symbol("Pr", SymbolType.METHOD), _symbol("Pr", SymbolType.PROTOCOL),
+              _symbol("Pr", SymbolType.CLASS)]),
+        ]
+        mappings = {"load": "x1", "run": "x2", "count": "x3", "Pr": "x4"}
+        for source, symbols in cases:
+            with self.subTest(source=source):
+                self.assertEqual(SymbolRewriter(mappings).rewrite(source, symbols),
+                                 _replace_by_type(source, symbols, mappings))
+
+    def test_declaration_at_file_start(self):
+        """返回类型的 ')' 位于文件开头时不向后搜索 '('"""
+        source = ") load;\n- (x"
+        start = source.index("load")
+        self.assertFalse(SymbolRewriter._is_method_declaration(source, start, start + 4))
+        source = "- (void)load;"
+        start = source.index("load")
+        self.assertTrue(SymbolRewriter._is_method_declaration(source, start, start + 4))
+
+    def test_unmapped_symbols_untouched(self):
+        """没有映射（如白名单）的符号不替换"""
+        source = "@interface UserCell : NSObject\n@end"
+        self.assertEqual(SymbolRewriter({}).rewrite(source, self.symbols), (source, 0))
+
+
+class TestTransformerIntegration(unittest.TestCase):
+    """测试 CodeTransformer 使用单遍重写"""
+
+    def test_transform_file(self):
+        """转换结果的替换次数与逐类型替换加import更新一致，字符串与注释原样保留"""
+        source = OBJC_SOURCE.replace(
+            "- (UserCell *)cellSelf {",
+            '// UserCell "title" -> see http://example.com/UserCell\n- (UserCell *)cellSelf {\n'
+            '    NSLog(@"UserCell reloadContent");')
+        with tempfile.NamedTemporaryFile('w', suffix='.m', delete=False, encoding='utf-8') as f:
+            f.write(source)
+            path = f.name
+        try:
+            whitelist = WhitelistManager()
+            parsed = CodeParser(whitelist).parse_file(path)
+            transformer = CodeTransformer(NameGenerator(), whitelist)
+            result = transformer.transform_file(path, parsed)
+
+            content, count = _replace_by_type(OBJC_SOURCE, parsed.symbols, transformer.symbol_mappings)
+            content, import_count = SymbolReplacer(transformer.symbol_mappings).update_import_statements(content)
+            self.assertEqual(result.replacements, count + import_count)
+            self.assertNotIn("@interface UserCell ", result.transformed_content)
+            self.assertIn('// UserCell "title" -> see http://example.com/UserCell\n', result.transformed_content)
+            self.assertIn('NSLog(@"UserCell reloadContent");', result.transformed_content)
+        finally:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
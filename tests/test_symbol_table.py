@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全局符号表测试
+验证一次性生成映射、批量白名单过滤、反向索引、不可变性，以及 CodeTransformer 的接入
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.obfuscation.code_parser import ParsedFile, Symbol, SymbolType
+from gui.modules.obfuscation.code_transformer import CodeTransformer
+from gui.modules.obfuscation.name_generator import NameGenerator
+from gui.modules.obfuscation.symbol_table import SymbolTable
+from gui.modules.obfuscation.whitelist_manager import WhitelistManager
+
+
+class CountingGenerator(NameGenerator):
+    """记录生成次数的名称生成器"""
+
+    def __init__(self):
+        super().__init__(seed="symbol-table")
+        self.calls = []
+
+    def generate(self, original_name, name_type):
+        self.calls.append((original_name, name_type))
+        return super().generate(original_name, name_type)
+
+
+def _parsed(path, *symbols):
+    parsed = ParsedFile(file_path=path, language="objc")
+    parsed.symbols = [Symbol(name=name, type=symbol_type, file_path=path, line_number=1)
+                      for name, symbol_type in symbols]
+    return parsed
+
+
+class TestSymbolTable(unittest.TestCase):
+    """测试符号表构建"""
+
+    def setUp(self):
+        self.files = {
+            "A.m": _parsed("A.m", ("UserCell", SymbolType.CLASS), ("reload", SymbolType.METHOD),
+                           ("UIView", SymbolType.CLASS)),
+            "B.m": _parsed("B.m", ("reload", SymbolType.PROPERTY), ("title", SymbolType.PROPERTY),
+                           ("UserCell", SymbolType.CLASS)),
+        }
+
+    def test_build_once(self):
+        """每个名称只生成一次，白名单符号不生成，类型以首次出现为准"""
+        generator = CountingGenerator()
+        table = SymbolTable.build(self.files, generator, WhitelistManager())
+
+        self.assertEqual([name for name, _ in generator.calls], ["UserCell", "reload", "title"])
+        self.assertEqual(table.type_of("reload"), SymbolType.METHOD.value)
+        self.assertNotIn("UIView", table)
+        self.assertEqual(table.original_of(table["title"]), "title")
+        self.assertEqual(table.added, {"class": 1, "method": 1, "property": 1})
+        self.assertTrue(table.covers(self.files["A.m"].symbols))
+
+    def test_immutable_and_picklable(self):
+        """映射视图只读；符号表可序列化后在其他进程中使用"""
+        table = SymbolTable.build(self.files, NameGenerator(seed="x"))
+        with self.assertRaises(TypeError):
+            table.mappings["UserCell"] = "Other"
+        restored = pickle.loads(pickle.dumps(table))
+        self.assertEqual(restored.to_dict(), table.to_dict())
+
+    def test_extend_and_conflict(self):
+        """基于已有符号表扩展时保留原映射；混淆名冲突的符号保留原名"""
+        base = SymbolTable({"Old": "Zq1"}, {"Old": "class"})
+        generator = NameGenerator(seed="x")
+        generator.generate("Clash", "class")
+        generator.mappings["Clash"].obfuscated = "Zq1"
+
+        table = SymbolTable.build([_parsed("C.m", ("Clash", SymbolType.CLASS),
+                                           ("Fresh", SymbolType.CLASS))], generator, base=base)
+        self.assertEqual(table["Old"], "Zq1")
+        self.assertNotIn("Clash", table)
+        self.assertIn("Fresh", table)
+        self.assertEqual(len(base), 1)
+
+    def test_bulk_whitelist_filter(self):
+        """批量白名单过滤与逐个判断一致"""
+        whitelist = WhitelistManager()
+        names = ["UIView", "viewDidLoad", "UserCell", "NSObject"]
+        self.assertEqual(whitelist.filter_whitelisted(names),
+                         {name for name in names if whitelist.is_whitelisted(name)})
+
+
+class TestTransformerSymbolTable(unittest.TestCase):
+    """测试 CodeTransformer 使用全局符号表"""
+
+    def test_transform_files_builds_once(self):
+        """批量转换前一次性生成映射，逐文件转换不再生成"""
+        with tempfile.TemporaryDirectory() as tmp:
+            files = {}
+            for name, source in [("A.m", "@interface UserCell : NSObject\n@end\n"),
+                                 ("B.m", "UserCell *cell = nil;\n")]:
+                path = os.path.join(tmp, name)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(source)
+                files[path] = _parsed(path, ("UserCell", SymbolType.CLASS))
+
+            generator = CountingGenerator()
+            transformer = CodeTransformer(generator, WhitelistManager())
+            results = transformer.transform_files(files)
+
+            self.assertEqual(generator.calls, [("UserCell", "class")])
+            self.assertEqual(transformer.get_statistics()['classes_renamed'], 1)
+            obfuscated = transformer.symbol_mappings["UserCell"]
+            for result in results.values():
+                self.assertIn(obfuscated, result.transformed_content)
+                self.assertEqual(result.replacements, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
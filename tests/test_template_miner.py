@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志模板挖掘测试
+验证变量掩码、模板聚类、内存上限，以及预处理器/压缩器按模板分组
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.template_miner import TemplateMiner, mask_content
+from gui.modules.ai_diagnosis.log_preprocessor import LogPreprocessor
+from gui.modules.ai_diagnosis.smart_compressor import SmartLogCompressor
+
+from log_fixtures import mars_entry
+
+
+class TestTemplateMiner(unittest.TestCase):
+    """测试模板挖掘器"""
+
+    def test_mask_variables(self):
+        """ID、地址、IP、UUID被掩码"""
+        self.assertEqual(mask_content("订单10023支付失败 addr=0x1a2b ip 10.0.0.1:8080"),
+                         "订单<*>支付失败 addr=<*> ip <*>")
+        self.assertEqual(mask_content("req 3f2504e0-4f89-11d3-9a0c-0305e82c3301 took 1.5s"),
+                         "req <*> took <*>s")
+
+    def test_clusters_by_template(self):
+        """只在变量上不同的日志归入同一模板，并记录次数与首末时间"""
+        miner = TemplateMiner()
+        entries = [mars_entry(i, "Net", f"connect to server {i} failed, retry {i * 3}", 'E') for i in range(20)]
+        entries += [mars_entry(30 + i, "Net", f"user {i} token expired", 'E') for i in range(5)]
+        templates = miner.add_entries(entries)
+
+        self.assertEqual(len(miner), 2)
+        top = miner.top()
+        self.assertEqual(top[0].template, "connect to server <*> failed, retry <*>")
+        self.assertEqual(top[0].count, 20)
+        self.assertEqual(top[0].first_timestamp, "2025-10-11 +8.0 10:00:00.000")
+        self.assertEqual(top[0].last_timestamp, "2025-10-11 +8.0 10:00:19.000")
+        self.assertEqual(len(top[0].samples), 3)
+        self.assertEqual(templates[0].template_id, templates[19].template_id)
+        self.assertIs(miner.match("connect to server 99 failed, retry 1"), top[0])
+
+    def test_merges_differing_words(self):
+        """相似度超过阈值时不同位置变为通配符"""
+        miner = TemplateMiner()
+        miner.add_content("cache miss for key alpha")
+        template = miner.add_content("cache miss for key beta")
+        self.assertEqual(template.template, "cache miss for key <*>")
+        self.assertEqual(len(miner), 1)
+
+        # 完全不同的内容不会被合并
+        miner.add_content("socket closed by peer now")
+        self.assertEqual(len(miner), 2)
+
+    def test_bounded_templates(self):
+        """模板数超过上限时淘汰最久未命中的模板"""
+        miner = TemplateMiner(max_templates=10)
+        miner.add_content("keep me alive")
+        for i in range(100):
+            miner.add_content(f"unique{chr(65 + i % 26)}{chr(65 + i // 26)} message")
+            miner.add_content("keep me alive")
+
+        self.assertEqual(len(miner), 10)
+        self.assertEqual(miner.top(1)[0].template, "keep me alive")
+        self.assertEqual(miner.top(1)[0].count, 101)
+
+
+class TestTemplateConsumers(unittest.TestCase):
+    """测试预处理器与压缩器使用模板分组"""
+
+    def setUp(self):
+        self.entries = [mars_entry(i % 60, "Net", f"订单 {1000 + i} 支付失败: 网络超时", 'E') for i in range(30)]
+        self.entries += [mars_entry(i, "Net", f"load image {i}.png failed, code {i * 7}", 'E') for i in range(10)]
+        self.entries += [mars_entry(1, "Net", "heartbeat ok", 'I')]
+
+    def test_error_patterns(self):
+        """错误模式按模板聚类，而不是按前50字符"""
+        patterns = LogPreprocessor().extract_error_patterns(self.entries)
+
+        self.assertEqual(len(patterns), 2)
+        self.assertEqual(patterns[0].signature, "订单 <*> 支付失败: 网络超时")
+        self.assertEqual(patterns[0].count, 30)
+        self.assertEqual(patterns[1].count, 10)
+        self.assertEqual(len(patterns[1].sample_logs), 3)
+        self.assertNotEqual(patterns[0].template_id, patterns[1].template_id)
+
+    def test_compressor_dedup(self):
+        """压缩器去重按模板合并计数"""
+        deduped = SmartLogCompressor()._deduplicate_logs(self.entries, max_samples=10)
+        self.assertEqual([count for _, count in deduped], [30, 10, 1])
+        self.assertIs(deduped[0][0], self.entries[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多文件时间线合并测试
+验证k路归并的时间顺序、稳定性以及无时间戳行的归属
+"""
+
+import os
+import random
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntry, parse_timestamp_value
+from gui.modules.timeline_merge import merge_timelines, merge_timelines_batched
+
+from log_fixtures import mars_entry
+
+
+class TestTimelineMerge(unittest.TestCase):
+    """测试k路时间线归并"""
+
+    def test_parse_timestamp_value(self):
+        """时区被换算为UTC，毫秒保留"""
+        self.assertEqual(parse_timestamp_value("2025-09-15 +8.0 11:05:43.995"),
+                         parse_timestamp_value("2025-09-15 03:05:43.995"))
+        self.assertAlmostEqual(parse_timestamp_value("2025-09-15 +8.0 11:05:44.000")
+                               - parse_timestamp_value("2025-09-15 +8.0 11:05:43.995"), 0.005, places=6)
+        self.assertIsNone(parse_timestamp_value("not a time"))
+        self.assertIsNone(parse_timestamp_value(None))
+
+    def test_interleaves_by_time(self):
+        """多文件按时间交织，结果与稳定全排序一致"""
+        rng = random.Random(7)
+        streams = []
+        for f in range(20):
+            times = sorted(rng.uniform(0, 600) for _ in range(200))
+            streams.append([mars_entry(round(t, 3), text=f"f{f}-{i}", source=f"file{f}") for i, t in enumerate(times)])
+
+        merged = list(merge_timelines(streams))
+        expected = sorted((e for s in streams for e in s), key=lambda e: e.timestamp_value)
+
+        self.assertEqual(len(merged), 20 * 200)
+        self.assertEqual([e.raw_line for e in merged], [e.raw_line for e in expected])
+
+    def test_stable_for_equal_times(self):
+        """时间相同时保持文件顺序和文件内顺序"""
+        a = [mars_entry(1, text="a1", source="a"), mars_entry(1, text="a2", source="a")]
+        b = [mars_entry(1, text="b1", source="b"), mars_entry(0.5, text="b0", source="b")]
+
+        merged = [e.content.strip() for e in merge_timelines([a, b])]
+        self.assertEqual(merged, ["a1", "a2", "b1", "b0"])
+
+    def test_lines_without_timestamp_stay_with_parent(self):
+        """堆栈行沿用上一条日志的时间，紧跟父日志"""
+        crash = [mars_entry(10, text="crash", source="ext"),
+                 LogEntry("0   CoreFoundation  0x00000001897c92ec 0x00000001896af000 + 1155820", "ext"),
+                 LogEntry("1   libobjc.A.dylib 0x0000000181f3c5ec 0x0000000181f33000 + 38380", "ext"),
+                 mars_entry(30, text="after", source="ext")]
+        main = [mars_entry(5, text="m1", source="main"), mars_entry(10, text="m2", source="main"),
+                mars_entry(20, text="m3", source="main")]
+
+        merged = [e.source_file + ":" + (e.content or '')[:8].strip() for e in merge_timelines([main, crash])]
+        self.assertEqual(merged[:2], ["main:m1", "main:m2"])
+        self.assertEqual(merged[2], "ext:crash")
+        self.assertTrue(merged[3].startswith("ext:0"))
+        self.assertTrue(merged[4].startswith("ext:1"))
+        self.assertEqual(merged[5:], ["main:m3", "ext:after"])
+
+    def test_streaming_batches(self):
+        """流式分批输出，且输入可以是惰性迭代器"""
+        streams = [iter([mars_entry(i * 2, text=f"even{i}", source="e") for i in range(50)]),
+                   iter([mars_entry(i * 2 + 1, text=f"odd{i}", source="o") for i in range(50)])]
+
+        batches = list(merge_timelines_batched(streams, batch_size=30))
+        self.assertEqual([len(b) for b in batches], [30, 30, 30, 10])
+        flat = [e.timestamp_value for b in batches for e in b]
+        self.assertEqual(flat, sorted(flat))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token计数器测试
+验证计数缓存、模板计数、中英文估算，以及压缩器按token预算截断
+"""
+
+import json
+import os
+import sys
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.data_models import LogEntry
+from gui.modules.ai_diagnosis.token_counter import (
+    HeuristicCounter,
+    TokenCounter,
+    count_tokens,
+    get_token_counter,
+    set_token_counter,
+)
+from gui.modules.ai_diagnosis.compact_prompts import CompactPromptTemplates, estimate_prompt_tokens
+from gui.modules.ai_diagnosis.smart_compressor import SmartLogCompressor
+
+
+class WordCounter(TokenCounter):
+    """按空白分词的参考计数器，记录实际分词次数"""
+
+    name = "words"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def _count(self, text):
+        self.calls += 1
+        return len(text.split())
+
+
+class TestTokenCounter(unittest.TestCase):
+    """测试计数器"""
+
+    def test_memoized(self):
+        """同一文本只分词一次"""
+        counter = WordCounter()
+        self.assertEqual(counter.count("socket timeout while login"), 4)
+        self.assertEqual(counter.count("socket timeout while login"), 4)
+        self.assertEqual(counter.calls, 1)
+        self.assertEqual(counter.count(""), 0)
+
+    def test_template(self):
+        """模板固定部分只计一次，参数按值计数"""
+        counter = WordCounter()
+        template = "分析以下日志 {log_summary} 用户问题 {user_question} 请回答"
+        self.assertEqual(counter.count_template(template, log_summary="a b c", user_question="why"), 7)
+        calls = counter.calls
+        self.assertEqual(counter.count_template(template, log_summary="a b", user_question="why"), 6)
+        self.assertEqual(counter.calls, calls + 1)
+
+    def test_template_missing_argument(self):
+        """占位符没有对应参数时给出明确错误"""
+        counter = WordCounter()
+        with self.assertRaisesRegex(ValueError, r"\{user_question\}"):
+            counter.count_template("问题 {user_question} 日志 {log_summary}", log_summary="a b")
+        with self.assertRaisesRegex(ValueError, r"\{0\}"):
+            counter.count_template("位置参数 {0}", log_summary="a")
+
+    def test_abstract_base(self):
+        """基类不能直接实例化，子类必须实现 _count"""
+        with self.assertRaises(TypeError):
+            TokenCounter()
+
+        class Incomplete(TokenCounter):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_heuristic_cjk_and_ascii(self):
+        """中文按字计价，英文按词计价"""
+        counter = HeuristicCounter()
+        self.assertEqual(counter.features("网络连接超时")['cjk'], 6)
+        self.assertEqual(counter.features("connection timeout")['letter_run'], 2)
+        self.assertEqual(counter.features("code=123456")['digit_group'], 2)
+        self.assertGreater(counter.count("网络连接超时"), counter.count("network"))
+        self.assertLess(counter.count("connection timeout"), len("connection timeout") // 2)
+
+        prompt = CompactPromptTemplates.INTERACTIVE_QA_COMPACT
+        filled = prompt.format(log_summary="【日志摘要】总数:10", user_question="为什么卡顿")
+        self.assertAlmostEqual(counter.count_template(prompt, log_summary="【日志摘要】总数:10",
+                                                      user_question="为什么卡顿"),
+                               counter.count(filled), delta=4)
+
+    def test_heuristic_calibration_bound(self):
+        """默认权重相对cl100k_base参考计数的误差在文档给出的上界内"""
+        path = os.path.join(project_root, 'tests', 'data', 'token_calibration.json')
+        with open(path, encoding='utf-8') as f:
+            calibration = json.load(f)
+        self.assertEqual(calibration['weights'], HeuristicCounter.DEFAULT_WEIGHTS)
+
+        counter = HeuristicCounter()
+        samples = calibration['samples']
+        errors = []
+        for sample in samples:
+            estimate = counter.count(sample['text'])
+            self.assertLessEqual(abs(estimate - sample['tokens']), max(4, sample['tokens'] * 0.2),
+                                 sample['text'][:80])
+            errors.append(abs(estimate - sample['tokens']) / sample['tokens'])
+        self.assertLess(sum(errors) / len(errors), 0.05)
+
+        estimated = sum(counter.count(sample['text']) for sample in samples)
+        reference = sum(sample['tokens'] for sample in samples)
+        self.assertLess(abs(estimated - reference) / reference, 0.01)
+
+    def test_default_counter_override(self):
+        """替换默认计数器后全局估算随之改变"""
+        counter = WordCounter()
+        set_token_counter(counter)
+        try:
+            self.assertIs(get_token_counter(), counter)
+            self.assertEqual(count_tokens("a b c"), 3)
+            self.assertEqual(estimate_prompt_tokens("{x} y", x="a b"), 3)
+        finally:
+            set_token_counter(None)
+        self.assertIsNot(get_token_counter(), counter)
+
+    def test_assistant_panel_uses_counter(self):
+        """AI助手面板的简化模式提示词与回答使用优化器的计数器（与优化后提示词同一口径）"""
+        from types import SimpleNamespace
+        from gui.modules.ai_assistant.panel_main import AIAssistantPanel
+        from gui.modules.ai_diagnosis.token_optimizer import TokenOptimizer
+
+        counter = WordCounter()
+        optimizer = TokenOptimizer()
+        optimizer.counter = counter
+        panel = SimpleNamespace(token_optimizer=optimizer)
+        self.assertEqual(AIAssistantPanel.count_tokens(panel, "用户问题： hello world"), 3)
+        self.assertEqual(counter.calls, 1)
+
+        # 面板按 ai_diagnosis / modules.ai_diagnosis / gui.modules.ai_diagnosis 顺序导入，
+        # 其他测试可能已加载了不同路径下的同一模块，先按面板的顺序导入一次，再逐个替换默认计数器
+        AIAssistantPanel.count_tokens(SimpleNamespace(token_optimizer=None), "a")
+        copies = [module for name, module in list(sys.modules.items())
+                  if name.endswith('ai_diagnosis.token_counter')]
+        for module in copies:
+            module.set_token_counter(counter)
+        try:
+            self.assertEqual(AIAssistantPanel.count_tokens(SimpleNamespace(token_optimizer=None), "a b"), 2)
+        finally:
+            for module in copies:
+                module.set_token_counter(None)
+
+
+class TestCompressorBudget(unittest.TestCase):
+    """测试压缩器的token预算"""
+
+    def test_truncates_to_budget(self):
+        """摘要超出预算时按行截断，预估token为实际计数"""
+        entries = [LogEntry(f"[E][2025-10-11 +8.0 10:00:{i % 60:02d}.000][1][Mod{i}] "
+                            f"请求{i}失败 code={i} reason=connection reset by peer", "a.log")
+                   for i in range(200)]
+        counter = HeuristicCounter()
+        compressor = SmartLogCompressor(max_tokens=120, token_counter=counter)
+        compressed = compressor.compress(entries)
+
+        self.assertTrue(compressed.summary.endswith(SmartLogCompressor.TRUNCATION_MARK))
+        self.assertEqual(compressed.estimated_tokens, counter.count(compressed.summary))
+        self.assertLessEqual(compressed.estimated_tokens, 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI分析缓存相似查找基准测试
+
+构造 N 条（默认10000）合成查询写入 AnalysisCache，比较：
+- linear: 原实现，每次查找对所有条目重新分词并计算Jaccard
+- lsh:    MinHash签名 + LSH分桶候选，只校验候选
+两者使用同一批查询（近似改写 + 无关查询），并校验返回的条目一致。
+
+用法:
+    python tools/benchmark_analysis_cache.py
+    python tools/benchmark_analysis_cache.py --entries 20000 --queries 500 --threshold 0.8
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.ai_diagnosis.analysis_cache import AnalysisCache, CacheEntry
+
+_MODULES = ['Network', 'Payment', 'Login', 'Render', 'Storage', 'Player', 'Push', 'Upload']
+_WORDS = ['timeout', 'crash', 'null', 'pointer', 'retry', 'socket', 'closed', 'oom', 'leak',
+          'frame', 'drop', 'anr', 'deadlock', 'token', 'expired', 'refused', 'ssl', 'handshake',
+          'disk', 'full', 'permission', 'denied', 'decode', 'failed', 'cache', 'miss', 'slow']
+
+
+def generate_queries(count: int, seed: int = 42) -> List[str]:
+    """生成互不相同的合成分析查询"""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        words = rng.sample(_WORDS, 8)
+        queries.append(f"分析 {rng.choice(_MODULES)} 模块 问题#{i} 日志: " + ' '.join(words)
+                       + f" thread-{rng.randint(1, 64)} code={rng.randint(100, 999)}")
+    return queries
+
+
+def _perturb(query: str, rng: random.Random) -> str:
+    """插入一个新词，得到与原查询高度相似的改写（Jaccard约0.94）"""
+    words = query.split()
+    words.insert(rng.randrange(len(words) + 1), rng.choice(_WORDS) + '_x')
+    return ' '.join(words)
+
+
+def linear_find_similar(cache: AnalysisCache, query: str, threshold: float) -> Optional[CacheEntry]:
+    """原始线性实现（基准对照）"""
+    query_words = set(query.lower().split())
+    best_match = None
+    best_score = 0.0
+    for entry in cache.cache.values():
+        entry_words = set(entry.query_text.lower().split())
+        union = len(query_words | entry_words)
+        if union == 0:
+            continue
+        similarity = len(query_words & entry_words) / union
+        if similarity >= threshold and similarity > best_score:
+            best_score = similarity
+            best_match = entry
+    return best_match
+
+
+def benchmark_similar_lookup(entries: int = 10000, queries: int = 200,
+                             threshold: float = 0.9, seed: int = 42) -> Dict[str, Any]:
+    """
+    运行基准
+
+    Returns:
+        {'entries', 'queries', 'threshold', 'build_seconds',
+         'linear': {...}, 'lsh': {...}, 'speedup', 'mismatches'}
+    """
+    rng = random.Random(seed)
+    texts = generate_queries(entries, seed)
+
+    cache = AnalysisCache(max_size=entries)
+    started = time.perf_counter()
+    for text in texts:
+        cache.put(text, f"response for {text[:20]}")
+    build_seconds = time.perf_counter() - started
+
+    # 一半近似改写（应命中），一半全新查询（应未命中）
+    probes = [_perturb(rng.choice(texts), rng) for _ in range(queries // 2)]
+    probes += generate_queries(queries - len(probes), seed + 1)
+
+    results = {}
+    found = {}
+    for name, lookup in (('linear', lambda q: linear_find_similar(cache, q, threshold)),
+                         ('lsh', lambda q: cache._find_similar(q, threshold))):
+        started = time.perf_counter()
+        found[name] = [lookup(q) for q in probes]
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            'seconds': round(elapsed, 6),
+            'ms_per_query': round(elapsed / len(probes) * 1000, 4),
+            'hits': sum(1 for e in found[name] if e is not None),
+        }
+
+    mismatches = sum(1 for a, b in zip(found['linear'], found['lsh']) if a is not b)
+    return {
+        'entries': entries,
+        'queries': len(probes),
+        'threshold': threshold,
+        'build_seconds': round(build_seconds, 6),
+        'linear': results['linear'],
+        'lsh': results['lsh'],
+        'speedup': round(results['linear']['seconds'] / max(results['lsh']['seconds'], 1e-9), 1),
+        'mismatches': mismatches,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='AI分析缓存相似查找基准测试')
+    parser.add_argument('--entries', type=int, default=10000, help='缓存条目数')
+    parser.add_argument('--queries', type=int, default=200, help='查找次数')
+    parser.add_argument('--threshold', type=float, default=0.9, help='相似度阈值')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', help='结果JSON路径（可选）')
+    args = parser.parse_args(argv)
+
+    result = benchmark_similar_lookup(args.entries, args.queries, args.threshold, args.seed)
+    print(f"条目: {result['entries']}  查询: {result['queries']}  阈值: {result['threshold']}")
+    print(f"建索引: {result['build_seconds'] * 1000:.1f}ms")
+    for name in ('linear', 'lsh'):
+        data = result[name]
+        print(f"{name:<8} {data['ms_per_query']:>10.3f} ms/查询  命中 {data['hits']}")
+    print(f"加速: {result['speedup']}x  结果不一致: {result['mismatches']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"结果已写入: {args.output}")
+
+    return 1 if result['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
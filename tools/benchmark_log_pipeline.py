@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志流水线基准测试
+
+用合成xlog（decoders/xlog_writer.py）覆盖所有可解码的magic类型，
+依次测量 解码 -> 解析 -> 索引 -> 过滤 -> 导出 各阶段的吞吐量与内存峰值，
+结果写为JSON，便于跨提交比较回归。
+
+用法:
+    python tools/benchmark_log_pipeline.py --size-mb 20 --output bench.json
+    python tools/benchmark_log_pipeline.py --magic compress_chunked --seq-gaps 3 --corrupt-blocks 2
+    python tools/benchmark_log_pipeline.py --output new.json --compare old.json
+
+说明:
+- 计时与内存分两轮测量：计时轮不开启tracemalloc，内存轮单独运行同一阶段，
+  避免tracemalloc的开销污染吞吐量数据。
+- 每个阶段重复 --repeat 次，取最快的一次（排除偶发的调度抖动）。
+- 吞吐量(MB/s)统一按日志原文字节计算，压缩与不压缩的数据集可直接比较。
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'decoders'))
+sys.path.append(os.path.join(project_root, 'gui', 'modules'))
+
+from fast_decoder import FastXLogDecoder
+from xlog_writer import MAGIC_NAMES, magics_by_name, write_synthetic_xlog
+
+from gui.modules.file_operations import FileOperations
+from gui.modules.filter_search import FilterSearchManager
+from gui.modules.log_indexer import IndexedFilterSearchManager
+from gui.modules.stream_loader import StreamLoader
+
+
+# 过滤阶段的查询集合：(名称, filter参数)
+FILTER_QUERIES: List[Tuple[str, Dict[str, Any]]] = [
+    ('level_error', {'level': 'ERROR'}),
+    ('module_network', {'module': 'Network'}),
+    ('keyword_plain', {'keyword': 'reconnect'}),
+    ('keyword_regex', {'keyword': r'cost \d{4}ms', 'search_mode': '正则'}),
+    ('combined', {'level': 'WARNING', 'module': 'Payment', 'keyword': 'frame'}),
+]
+
+EXPORT_FORMATS = ('txt', 'json', 'csv')
+
+
+def _measure(func: Callable[[], Any], repeat: int, memory: bool) -> Tuple[Any, Dict[str, float]]:
+    """
+    测量一个阶段
+
+    Returns:
+        (最后一次运行的返回值, {'seconds', 'peak_memory_mb'})
+    """
+    best = float('inf')
+    result = None
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+
+    metrics = {'seconds': round(best, 6)}
+    if memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = func()
+            metrics['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        finally:
+            tracemalloc.stop()
+    return result, metrics
+
+
+def _throughput(metrics: Dict[str, float], nbytes: int = 0, items: int = 0) -> Dict[str, float]:
+    """补充吞吐量字段"""
+    seconds = metrics['seconds'] or 1e-9
+    if nbytes:
+        metrics['bytes'] = nbytes
+        metrics['mb_per_second'] = round(nbytes / 1024 / 1024 / seconds, 2)
+    if items:
+        metrics['items'] = items
+        metrics['items_per_second'] = round(items / seconds, 1)
+    return metrics
+
+
+def benchmark_dataset(xlog_path: str, raw_bytes: int, work_dir: str,
+                      repeat: int = 3, memory: bool = True) -> Dict[str, Dict[str, float]]:
+    """
+    对单个xlog文件跑完整流水线
+
+    Args:
+        xlog_path: 合成xlog路径
+        raw_bytes: 日志原文字节数
+        work_dir: 导出等临时文件目录
+        repeat: 每阶段重复次数
+        memory: 是否测量内存峰值
+
+    Returns:
+        {阶段名: 指标}
+    """
+    stages: Dict[str, Dict[str, float]] = {}
+    source = os.path.basename(xlog_path)
+
+    # 1. 流式解码（块迭代器 + 增量行解码）
+    loader = StreamLoader()
+    lines, metrics = _measure(
+        lambda: [line for chunk in loader.load_with_decode(xlog_path) for line in chunk],
+        repeat, memory
+    )
+    stages['decode_stream'] = _throughput(metrics, raw_bytes, len(lines))
+
+    # 2. 主窗口使用的解码路径（原始解码器 + 临时.log文件）
+    decoder = FastXLogDecoder(max_workers=1)
+    _, metrics = _measure(lambda: decoder.decode_single_file(xlog_path), repeat, memory)
+    stages['decode_legacy'] = _throughput(metrics, raw_bytes, len(lines))
+    legacy_output = xlog_path + '.log'
+    if os.path.exists(legacy_output):
+        os.remove(legacy_output)
+
+    # 3. 解析为LogEntry
+    entries, metrics = _measure(lambda: FileOperations.parse_log_lines(lines, source), repeat, memory)
+    stages['parse'] = _throughput(metrics, raw_bytes, len(entries))
+
+    # 4. 构建索引
+    def build_index():
+        manager = IndexedFilterSearchManager()
+        manager.indexer.build_index(entries)
+        return manager
+
+    manager, metrics = _measure(build_index, repeat, memory)
+    stages['index'] = _throughput(metrics, raw_bytes, len(entries))
+
+    # 5. 过滤查询（全量扫描与索引两条路径）
+    scan_manager = FilterSearchManager()
+    for name, query in FILTER_QUERIES:
+        matched, metrics = _measure(lambda: scan_manager.filter_entries(entries, **query), repeat, False)
+        stages[f'filter_scan_{name}'] = _throughput(metrics, items=len(entries))
+        stages[f'filter_scan_{name}']['matched'] = len(matched)
+
+        matched, metrics = _measure(lambda: manager.filter_entries_with_index(entries, **query), repeat, False)
+        stages[f'filter_index_{name}'] = _throughput(metrics, items=len(entries))
+        stages[f'filter_index_{name}']['matched'] = len(matched)
+
+    # 6. 导出
+    for fmt in EXPORT_FORMATS:
+        output = os.path.join(work_dir, f'export.{fmt}')
+        _, metrics = _measure(lambda: FileOperations.export_to_file(entries, output, fmt), repeat, memory)
+        stages[f'export_{fmt}'] = _throughput(metrics, os.path.getsize(output), len(entries))
+        os.remove(output)
+
+    return stages
+
+
+def _git_commit() -> Optional[str]:
+    """当前提交（不可用时返回None）"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=project_root, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(magics: List[int], size_mb: float = 10.0, seed: int = 42,
+                   seq_gaps: int = 0, corrupt_blocks: int = 0, repeat: int = 3,
+                   memory: bool = True, work_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    生成合成数据并运行全部基准
+
+    Args:
+        magics: 要测试的magic列表
+        size_mb: 每个数据集的日志原文大小(MB)
+        seed: 随机种子（同一种子生成完全相同的数据）
+        seq_gaps: 注入的序列号缺失数
+        corrupt_blocks: 注入的损坏段数
+        repeat: 每阶段重复次数
+        memory: 是否测量内存峰值
+        work_dir: 临时目录（None则自动创建并清理）
+
+    Returns:
+        结果字典（可直接写为JSON）
+    """
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='log_bench_')
+    results: Dict[str, Any] = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {
+                'size_mb': size_mb,
+                'seed': seed,
+                'seq_gaps': seq_gaps,
+                'corrupt_blocks': corrupt_blocks,
+                'repeat': repeat,
+                'memory': memory,
+            },
+        },
+        'datasets': {},
+    }
+
+    try:
+        for magic in magics:
+            name = MAGIC_NAMES[magic]
+            xlog_path = os.path.join(work_dir, f'{name}.xlog')
+            written = write_synthetic_xlog(
+                xlog_path, magic,
+                target_bytes=int(size_mb * 1024 * 1024),
+                seed=seed, seq_gaps=seq_gaps, corrupt_blocks=corrupt_blocks
+            )
+            print(f"[{name}] {written.raw_bytes / 1024 / 1024:.1f}MB 原文, "
+                  f"{written.file_bytes / 1024 / 1024:.1f}MB xlog, {written.blocks} 块")
+
+            stages = benchmark_dataset(xlog_path, written.raw_bytes, work_dir, repeat, memory)
+            results['datasets'][name] = {
+                'magic': f'0x{magic:02x}',
+                'raw_bytes': written.raw_bytes,
+                'file_bytes': written.file_bytes,
+                'blocks': written.blocks,
+                'lines': written.lines,
+                'stages': stages,
+            }
+            os.remove(xlog_path)
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    tolerance: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    比较两次基准结果，找出变慢超过容差的阶段
+
+    Args:
+        baseline: 基线结果
+        current: 当前结果
+        tolerance: 允许的相对变慢比例
+
+    Returns:
+        回归列表 [{'dataset', 'stage', 'baseline', 'current', 'change'}]
+    """
+    regressions = []
+    for dataset, data in current.get('datasets', {}).items():
+        base_stages = baseline.get('datasets', {}).get(dataset, {}).get('stages', {})
+        for stage, metrics in data['stages'].items():
+            base = base_stages.get(stage)
+            if not base or not base.get('seconds'):
+                continue
+            change = metrics['seconds'] / base['seconds'] - 1
+            if change > tolerance:
+                regressions.append({
+                    'dataset': dataset,
+                    'stage': stage,
+                    'baseline': base['seconds'],
+                    'current': metrics['seconds'],
+                    'change': round(change, 3),
+                })
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    """打印结果摘要"""
+    for dataset, data in results['datasets'].items():
+        print(f"\n=== {dataset} ({data['magic']}, {data['lines']} 行) ===")
+        print(f"{'阶段':<32} {'耗时(ms)':>10} {'MB/s':>10} {'条/s':>12} {'峰值MB':>8}")
+        for stage, metrics in data['stages'].items():
+            print(f"{stage:<32} {metrics['seconds'] * 1000:>10.1f} "
+                  f"{metrics.get('mb_per_second', ''):>10} "
+                  f"{metrics.get('items_per_second', ''):>12} "
+                  f"{metrics.get('peak_memory_mb', ''):>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='日志流水线基准测试')
+    parser.add_argument('--magic', nargs='*', default=['all'],
+                        help=f"magic类型: all 或 {', '.join(MAGIC_NAMES.values())}")
+    parser.add_argument('--size-mb', type=float, default=10.0, help='每个数据集的日志原文大小(MB)')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--seq-gaps', type=int, default=0, help='注入的序列号缺失数')
+    parser.add_argument('--corrupt-blocks', type=int, default=0, help='注入的损坏段数')
+    parser.add_argument('--repeat', type=int, default=3, help='每阶段重复次数（取最快）')
+    parser.add_argument('--no-memory', action='store_true', help='跳过内存峰值测量')
+    parser.add_argument('--output', default='bench_results.json', help='结果JSON路径')
+    parser.add_argument('--compare', help='与之比较的基线JSON')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='回归判定的相对容差')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        magics_by_name(args.magic),
+        size_mb=args.size_mb,
+        seed=args.seed,
+        seq_gaps=args.seq_gaps,
+        corrupt_blocks=args.corrupt_blocks,
+        repeat=args.repeat,
+        memory=not args.no_memory,
+    )
+    print_report(results)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已写入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.tolerance)
+        for item in regressions:
+            print(f"⚠️ 回归 {item['dataset']}/{item['stage']}: "
+                  f"{item['baseline'] * 1000:.1f}ms -> {item['current'] * 1000:.1f}ms (+{item['change']:.0%})")
+        if regressions:
+            return 1
+        print("✅ 未发现回归")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
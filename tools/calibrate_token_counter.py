@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token估算模型校准
+
+用固定随机种子生成一批样本（Mars格式日志行、多行日志片段、内置提示词模板、用户问题），
+以tiktoken的真实BPE计数为参考，对 HeuristicCounter 的计价特征做加权最小二乘拟合
+（最小化相对误差的平方和，权重不允许为负），输出拟合权重与误差统计。
+
+加 --write 时把样本与参考计数写入 tests/data/token_calibration.json，
+单元测试据此校验 DEFAULT_WEIGHTS 的误差上界（测试本身不依赖tiktoken）。
+
+需要安装tiktoken且对应编码文件可用。
+
+用法:
+    python tools/calibrate_token_counter.py
+    python tools/calibrate_token_counter.py --encoding cl100k_base --write
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Optional, Sequence
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from gui.modules.ai_diagnosis.token_counter import HeuristicCounter
+from gui.modules.ai_diagnosis.compact_prompts import CompactPromptTemplates
+from gui.modules.ai_diagnosis.prompt_templates import PromptTemplates
+
+OUTPUT_PATH = os.path.join(project_root, 'tests', 'data', 'token_calibration.json')
+
+FEATURES = list(HeuristicCounter.DEFAULT_WEIGHTS)
+
+_LEVELS = ['I', 'I', 'I', 'D', 'W', 'E', 'V', 'F']
+_MODULES = ['Network', 'Payment', 'Login', 'Render', 'Storage', 'Player', 'Push', 'Upload',
+            'mars::stn', 'mars::sdt', 'HTTPDNS', 'WebView', 'AppDelegate', 'BLE']
+_FILES = ['NetworkManager.m', 'longlink.cc', 'shortlink_task.cc', 'PaymentService.swift',
+          'LoginViewController.m', 'PlayerCore.mm', 'MainActivity.java', 'StorageHelper.kt']
+_FUNCS = ['-[NetworkManager sendRequest:completion:]', 'LongLink::__RunReadWrite',
+          'ShortLink::__OnResponse', 'PaymentService.confirm(order:)', 'onCreate',
+          '-[PlayerCore prepareToPlay]', 'StorageHelper.flush', 'NetCore::OnNetworkChange']
+_MESSAGES_CN = [
+    '网络请求超时，准备重试', '数据库连接失败', '用户登录成功', '收到推送消息', '开始上传日志文件',
+    '支付回调验签失败，订单状态未知', '内存警告，释放图片缓存', '长连接断开，进入重连流程',
+    '主线程卡顿超过阈值', '磁盘空间不足，停止写入缓存', '证书校验失败', '播放器缓冲中',
+    '切换到后台，暂停任务', '解析配置文件出错', 'WebView白屏检测触发',
+]
+_MESSAGES_EN = [
+    'request timeout after {n}ms, retry={r}', 'socket closed by peer, errno={n}',
+    'ssl handshake failed: certificate verify failed', 'cache miss for key={key}',
+    'frame drop detected, fps={r}', 'decode failed: unexpected token at offset {n}',
+    'connection refused host={host} port={port}', 'token expired, refreshing session',
+    'OOM warning: resident={n}KB', 'task {key} finished cost={n}ms',
+]
+_HOSTS = ['api.example.com', 'long.weixin.qq.com', '10.0.0.12', 'cdn.example.net']
+_EXCEPTIONS = ['NSInvalidArgumentException', 'NSRangeException', 'java.lang.NullPointerException',
+               'EXC_BAD_ACCESS', 'SIGABRT']
+_QUESTIONS = [
+    '为什么应用启动后会卡顿？', '支付失败的原因是什么', '这次崩溃和网络切换有关系吗？',
+    '帮我找出所有登录相关的错误', '长连接为什么频繁断开', '内存占用过高是哪个模块导致的',
+    'Why does the upload keep failing?', '最近一次 crash 之前发生了什么',
+    'longlink 重连的间隔是多少？', '总结一下这段日志里的主要问题',
+]
+
+
+def _message(rng: random.Random) -> str:
+    """随机的日志正文（中文、英文或混合）"""
+    english = rng.choice(_MESSAGES_EN).format(
+        n=rng.randint(1, 99999), r=rng.randint(0, 60), key=f"{rng.getrandbits(32):08x}",
+        host=rng.choice(_HOSTS), port=rng.choice([80, 443, 8080]))
+    kind = rng.random()
+    if kind < 0.35:
+        return rng.choice(_MESSAGES_CN)
+    if kind < 0.6:
+        return english
+    if kind < 0.8:
+        return f"{rng.choice(_MESSAGES_CN)} {english}"
+    if kind < 0.9:
+        return (f"request url=https://{rng.choice(_HOSTS)}/v{rng.randint(1, 3)}/user/info"
+                f"?uid={rng.randint(10000, 99999999)}&ts={rng.randint(1600000000, 1800000000)}")
+    return json.dumps({'code': rng.randint(0, 500), 'msg': rng.choice(_MESSAGES_CN),
+                       'cost': rng.randint(1, 9999)}, ensure_ascii=False)
+
+
+def log_line(rng: random.Random) -> str:
+    """一条Mars xlog格式的日志行"""
+    timestamp = (f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} +8.0 "
+                 f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+                 f".{rng.randint(0, 999):03d}")
+    thread = f"{rng.randint(100, 99999)}, {rng.randint(1, 999)}{'*' if rng.random() < 0.3 else ''}"
+    if rng.random() < 0.5:
+        location = f"[{rng.choice(_FILES)}, {rng.choice(_FUNCS)}, {rng.randint(1, 3000)}]"
+    else:
+        location = ""
+    return (f"[{rng.choice(_LEVELS)}][{timestamp}][{thread}][{rng.choice(_MODULES)}]"
+            f"{location}[{_message(rng)}")
+
+
+def crash_block(rng: random.Random) -> str:
+    """一段崩溃堆栈"""
+    lines = [f"*** Terminating app due to uncaught exception '{rng.choice(_EXCEPTIONS)}', "
+             f"reason: '{rng.choice(_MESSAGES_EN).split(',')[0]}'"]
+    for depth in range(rng.randint(4, 10)):
+        lines.append(f"{depth:<4}{rng.choice(['MarsApp', 'UIKitCore', 'libobjc.A.dylib', 'CoreFoundation'])}"
+                     f"{' ' * rng.randint(1, 8)}0x{rng.getrandbits(40):010x} "
+                     f"{rng.choice(_FUNCS)} + {rng.randint(4, 900)}")
+    return "\n".join(lines)
+
+
+def generate_samples(seed: int = 20251019) -> List[Dict[str, str]]:
+    """生成校准样本（固定种子，结果可复现）"""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(120):
+        samples.append({'kind': 'log_line', 'text': log_line(rng)})
+    for _ in range(20):
+        samples.append({'kind': 'log_chunk',
+                        'text': "\n".join(log_line(rng) for _ in range(rng.randint(5, 30)))})
+    for _ in range(10):
+        samples.append({'kind': 'crash', 'text': crash_block(rng)})
+    for question in _QUESTIONS:
+        samples.append({'kind': 'question', 'text': question})
+    for templates in (CompactPromptTemplates, PromptTemplates):
+        for name in sorted(vars(templates)):
+            value = getattr(templates, name)
+            if name.isupper() and isinstance(value, str) and value.strip():
+                samples.append({'kind': 'prompt', 'text': value})
+    return samples
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """高斯消元解线性方程组（列主元）"""
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            raise ValueError("特征线性相关，无法拟合")
+        for r in range(size):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                for c in range(col, size + 1):
+                    rows[r][c] -= factor * rows[col][c]
+    return [rows[i][size] / rows[i][i] for i in range(size)]
+
+
+def fit_weights(features: Sequence[Dict[str, int]], targets: Sequence[int]) -> Dict[str, float]:
+    """
+    非负加权最小二乘：最小化 Σ((w·f - t)/t)²
+
+    出现负权重时把最小的一个固定为0后重新拟合（特征数很少，简单的有效集法足够）。
+    """
+    active = list(FEATURES)
+    while True:
+        matrix = [[0.0] * len(active) for _ in active]
+        vector = [0.0] * len(active)
+        for feature, target in zip(features, targets):
+            row = [feature[name] / target for name in active]
+            for i, value in enumerate(row):
+                vector[i] += value
+                for j, other in enumerate(row):
+                    matrix[i][j] += value * other
+        solution = _solve(matrix, vector)
+        negative = min(range(len(active)), key=lambda i: solution[i])
+        if solution[negative] >= 0:
+            break
+        active.pop(negative)
+    weights = dict.fromkeys(FEATURES, 0.0)
+    weights.update((name, round(value, 3)) for name, value in zip(active, solution))
+    return weights
+
+
+def error_stats(counter: HeuristicCounter, samples: Sequence[Dict]) -> Dict[str, float]:
+    """估算相对参考计数的误差统计"""
+    errors = [abs(counter.count(s['text']) - s['tokens']) / s['tokens'] for s in samples]
+    total_estimate = sum(counter.count(s['text']) for s in samples)
+    total_reference = sum(s['tokens'] for s in samples)
+    errors.sort()
+    return {
+        'mean': sum(errors) / len(errors),
+        'p90': errors[int(len(errors) * 0.9)],
+        'max': errors[-1],
+        'total': abs(total_estimate - total_reference) / total_reference,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="校准HeuristicCounter的计价权重")
+    parser.add_argument('--encoding', default='cl100k_base', help="参考的tiktoken编码")
+    parser.add_argument('--seed', type=int, default=20251019, help="样本随机种子")
+    parser.add_argument('--write', action='store_true', help="写入 tests/data/token_calibration.json")
+    args = parser.parse_args(argv)
+
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(args.encoding)
+    except Exception as e:
+        print(f"需要可用的tiktoken编码 {args.encoding}: {e}", file=sys.stderr)
+        return 1
+
+    samples = generate_samples(args.seed)
+    for sample in samples:
+        sample['tokens'] = len(encoding.encode(sample['text'], disallowed_special=()))
+
+    counter = HeuristicCounter()
+    features = [counter.features(s['text']) for s in samples]
+    weights = fit_weights(features, [s['tokens'] for s in samples])
+
+    print(f"样本: {len(samples)} 条, 参考token总数: {sum(s['tokens'] for s in samples)}")
+    print(f"拟合权重: {weights}")
+    for label, candidate in (('当前权重', counter), ('拟合权重', HeuristicCounter(weights))):
+        stats = error_stats(candidate, samples)
+        print(f"{label}: 平均 {stats['mean']:.1%}  P90 {stats['p90']:.1%}  "
+              f"最大 {stats['max']:.1%}  总量 {stats['total']:.1%}")
+
+    if args.write:
+        os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+        with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'encoding': args.encoding, 'seed': args.seed, 'weights': weights,
+                       'samples': samples}, f, ensure_ascii=False, indent=1)
+            f.write('\n')
+        print(f"已写入 {os.path.relpath(OUTPUT_PATH, project_root)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
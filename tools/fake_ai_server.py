@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地假AI流式服务器
+
+在本机模拟各AI后端的流式接口，用于测试 ask_stream() 与聊天面板的增量渲染，
+无需API Key或网络：
+- POST /v1/messages          Anthropic Messages（stream=true时为SSE）
+- POST /v1/chat/completions  OpenAI Chat Completions（stream=true时为SSE）
+- POST /api/generate         Ollama（stream=true时为NDJSON）
+- GET  /health, /api/tags    可用性检查
+
+用法:
+    python tools/fake_ai_server.py --port 11434 --delay 0.1
+    # 然后在设置中把Ollama地址指向 http://127.0.0.1:11434
+
+    # 测试中:
+    with FakeAIServer(chunks=["你好", "，世界"], delay=0.05) as server:
+        client = OllamaClient(base_url=server.base_url)
+        print(list(client.ask_stream("hi")))
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_CHUNKS = ["日志显示", "网络请求在", " [2025-09-21 13:09:49] ", "超时，", "建议检查 @Network 模块。"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """请求处理（配置从 self.server.fake 读取）"""
+
+    def log_message(self, format, *args):
+        pass  # 保持测试输出干净
+
+    @property
+    def fake(self) -> 'FakeAIServer':
+        return self.server.fake
+
+    def do_GET(self):
+        if self.path in ('/health', '/api/tags'):
+            self._send_json({'status': 'ok', 'models': [{'name': 'fake'}]})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self.fake.requests.append({'path': self.path, 'body': body})
+
+        if self.fake.status != 200:
+            self._send_json({'error': {'message': 'fake failure'}}, status=self.fake.status)
+            return
+
+        routes = {
+            '/v1/messages': (self._anthropic_events, self._anthropic_json),
+            '/v1/chat/completions': (self._openai_events, self._openai_json),
+            '/api/generate': (self._ollama_lines, self._ollama_json),
+        }
+        if self.path not in routes:
+            self._send_json({'error': 'not found'}, status=404)
+            return
+
+        stream_fn, json_fn = routes[self.path]
+        if not body.get('stream'):
+            self._send_json(json_fn(''.join(self.fake.chunks)))
+            return
+
+        content_type = 'application/x-ndjson' if self.path == '/api/generate' else 'text/event-stream'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            for i, piece in enumerate(stream_fn()):
+                self.wfile.write(piece.encode('utf-8'))
+                self.wfile.flush()
+                if self.fake.delay and i < len(self.fake.chunks):
+                    time.sleep(self.fake.delay)
+        except (BrokenPipeError, ConnectionResetError):
+            self.fake.disconnects += 1
+
+    def _send_json(self, data: Dict, status: int = 200):
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # ---------- Anthropic ----------
+
+    @staticmethod
+    def _sse(event: Optional[str], data: Dict) -> str:
+        prefix = f"event: {event}\n" if event else ''
+        return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def _anthropic_events(self):
+        yield self._sse('message_start', {'type': 'message_start', 'message': {'role': 'assistant'}})
+        yield self._sse('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                                'content_block': {'type': 'text', 'text': ''}})
+        for chunk in self.fake.chunks:
+            yield self._sse('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                                    'delta': {'type': 'text_delta', 'text': chunk}})
+        yield self._sse('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        yield self._sse('message_stop', {'type': 'message_stop'})
+
+    @staticmethod
+    def _anthropic_json(text: str) -> Dict:
+        return {'content': [{'type': 'text', 'text': text}]}
+
+    # ---------- OpenAI ----------
+
+    def _openai_events(self):
+        for chunk in self.fake.chunks:
+            yield self._sse(None, {'choices': [{'index': 0, 'delta': {'content': chunk}}]})
+        yield "data: [DONE]\n\n"
+
+    @staticmethod
+    def _openai_json(text: str) -> Dict:
+        return {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}}]}
+
+    # ---------- Ollama ----------
+
+    def _ollama_lines(self):
+        for chunk in self.fake.chunks:
+            yield json.dumps({'response': chunk, 'done': False}, ensure_ascii=False) + "\n"
+        yield json.dumps({'response': '', 'done': True}) + "\n"
+
+    @staticmethod
+    def _ollama_json(text: str) -> Dict:
+        return {'response': text, 'done': True}
+
+
+class FakeAIServer:
+    """
+    假AI服务器（后台线程运行）
+
+    Attributes:
+        chunks: 流式返回的文本片段
+        delay: 每个片段之后的等待秒数（模拟生成速度）
+        status: 非200时所有POST返回该错误码
+        requests: 收到的请求 [{'path', 'body'}]
+        disconnects: 客户端中途断开的次数（用于验证取消）
+    """
+
+    def __init__(self, chunks: Optional[List[str]] = None, delay: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.chunks = list(chunks if chunks is not None else DEFAULT_CHUNKS)
+        self.delay = delay
+        self.status = 200
+        self.requests: List[Dict] = []
+        self.disconnects = 0
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeAIServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'FakeAIServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地假AI流式服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=11434, help='监听端口')
+    parser.add_argument('--delay', type=float, default=0.1, help='片段间隔（秒）')
+    parser.add_argument('--text', help='响应文本（按字符切分为片段）')
+    args = parser.parse_args()
+
+    chunks = list(args.text) if args.text else None
+    server = FakeAIServer(chunks=chunks, delay=args.delay, host=args.host, port=args.port)
+    print(f"假AI服务器已启动: {server.base_url}  (Ctrl+C 退出)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()